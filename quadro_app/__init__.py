@@ -2,7 +2,6 @@
 
 import sys
 import os
-import time
 import secrets
 from flask import Flask, request, jsonify, session, redirect, url_for
 from flask_socketio import SocketIO, join_room # <-- ADICIONADO: join_room
@@ -11,7 +10,15 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 from sqlalchemy import text
 from .extensions import db, tz_cuiaba
+from .monitor_sql import init_monitor_sql
+from .banco_analitico import init_banco_analitico
+from .assets import init_assets
+from .compressao import init_compressao
+from .json_rapido import init_json_rapido, JSONSocketIO
+from .fotos import registrar_comandos_fotos, registrar_cache_fotos
 from .blueprints.listas_dinamicas import garantir_listas_padrao
+from .observacoes import migrar_observacoes_json
+from .dimensoes import migrar_dimensoes, registrar_vinculo_dimensoes
 
 
 def _garantir_schema_campanhas_ajuste():
@@ -28,6 +35,20 @@ def _garantir_schema_campanhas_ajuste():
             conn.commit()
 
 
+def _garantir_coluna_thumb_ajuste():
+    """
+    db.create_all() nao adiciona colunas novas em tabelas existentes.
+    Garante que ajuste_estoque tem foto_thumb_path (miniatura gerada no upload).
+    Fotos antigas ficam com NULL e usam a propria foto como miniatura.
+    """
+    engine = db.engine
+    with engine.connect() as conn:
+        cols = [row[1] for row in conn.execute(text("PRAGMA table_info(ajuste_estoque)"))]
+        if 'foto_thumb_path' not in cols:
+            conn.execute(text("ALTER TABLE ajuste_estoque ADD COLUMN foto_thumb_path VARCHAR(255)"))
+            conn.commit()
+
+
 def _garantir_coluna_prioridade_conferencia():
     """
     db.create_all() nao adiciona colunas novas em tabelas existentes.
@@ -46,6 +67,114 @@ def _garantir_coluna_prioridade_conferencia():
             conn.commit()
 
 
+def _garantir_indice_log():
+    """
+    db.create_all() so cria indices junto com tabelas novas.
+    Garante o indice do historico por item em bancos ja populados.
+    """
+    engine = db.engine
+    with engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_log_tipo_item ON log (log_type, item_id, timestamp)"))
+        conn.commit()
+
+
+def _garantir_indices_lixeira():
+    """
+    db.create_all() so cria indices junto com tabelas novas.
+    Garante os indices da listagem da lixeira (ordem por data_exclusao, id)
+    e do expurgo por retencao em bancos ja populados.
+    """
+    engine = db.engine
+    with engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_item_excluido_data "
+                          "ON item_excluido (data_exclusao, id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_item_excluido_tipo_data "
+                          "ON item_excluido (tipo_item, data_exclusao, id)"))
+        conn.commit()
+
+
+def _garantir_posicao_anotacoes():
+    """
+    db.create_all() nao adiciona colunas novas em tabelas existentes.
+    Garante a coluna 'posicao' (ordem fracionaria) nas colunas e cards do Kanban
+    de anotacoes e preenche a dos registros antigos a partir da 'ordem' inteira.
+    """
+    from .blueprints.anotacoes import chaves_distribuidas
+    engine = db.engine
+    with engine.connect() as conn:
+        for tabela, grupo in (('anotacao_coluna', None), ('anotacao_card', 'coluna_id')):
+            cols = [row[1] for row in conn.execute(text(f"PRAGMA table_info({tabela})"))]
+            if 'posicao' not in cols:
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN posicao VARCHAR(64)"))
+            sem_posicao = conn.execute(text(f"SELECT count(*) FROM {tabela} WHERE posicao IS NULL")).scalar()
+            if sem_posicao:
+                ordem = 'ordem, id' if 'ordem' in cols else 'id'
+                linhas = conn.execute(text(
+                    f"SELECT id, {grupo or 'NULL'} FROM {tabela} ORDER BY {grupo + ', ' if grupo else ''}{ordem}"
+                )).fetchall()
+                grupos = {}
+                for id_, g in linhas:
+                    grupos.setdefault(g, []).append(id_)
+                for ids in grupos.values():
+                    for id_, chave in zip(ids, chaves_distribuidas(len(ids))):
+                        conn.execute(text(f"UPDATE {tabela} SET posicao = :p WHERE id = :id"), {'p': chave, 'id': id_})
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_anotacao_coluna_posicao ON anotacao_coluna (posicao)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_anotacao_card_coluna_posicao ON anotacao_card (coluna_id, posicao)"))
+        conn.commit()
+
+
+def _garantir_indices_garantia():
+    """
+    db.create_all() so cria indices junto com tabelas novas.
+    Garante os indices da listagem de garantias em bancos ja populados, inclusive
+    o de expressao usado para ordenar finalizadas pela duracao do processo
+    (precisa ser a mesma expressao de CHAVE_DURACAO em blueprints/garantias.py).
+    O indice antigo, sem o coalesce, nao serve mais para a ordenacao.
+    """
+    engine = db.engine
+    with engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_garantia_status_inicio ON garantia (status, data_inicio)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_garantia_finalizado_em ON garantia (finalizado_em)"))
+        conn.execute(text("DROP INDEX IF EXISTS idx_garantia_duracao"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_garantia_chave_duracao "
+                          "ON garantia (coalesce(julianday(data_final) - julianday(data_inicio), -1))"))
+        conn.commit()
+
+
+def _garantir_colunas_dimensoes():
+    """
+    db.create_all() nao adiciona colunas novas em tabelas existentes.
+    Garante as chaves para os cadastros de fornecedor e cliente (ver
+    dimensoes.py); os ids sao preenchidos por migrar_dimensoes().
+    O resumo por fornecedor passou a ser por fornecedor_id: a versao antiga
+    (por nome) e descartada e remontada por garantir_resumo_fornecedores().
+    """
+    from .models import ResumoFornecedor
+    colunas = (
+        ('conferencia', 'fornecedor_id', 'fornecedor'),
+        ('garantia', 'fornecedor_id', 'fornecedor'),
+        ('registro_compra', 'fornecedor_id', 'fornecedor'),
+        ('separacao', 'cliente_id', 'cliente'),
+        ('separacao_cancelada', 'cliente_id', 'cliente'),
+        ('garantia', 'cliente_id', 'cliente'),
+    )
+    engine = db.engine
+    with engine.connect() as conn:
+        for tabela, coluna, cadastro in colunas:
+            cols = [row[1] for row in conn.execute(text(f"PRAGMA table_info({tabela})"))]
+            if coluna not in cols:
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} INTEGER REFERENCES {cadastro}(id)"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabela}_{coluna} ON {tabela} ({coluna})"))
+        cols = [row[1] for row in conn.execute(text("PRAGMA table_info(resumo_fornecedor)"))]
+        if 'chave' in cols:
+            conn.execute(text("DROP TABLE resumo_fornecedor"))
+            for indice in ('idx_conferencia_chave_fornecedor', 'idx_garantia_chave_fornecedor',
+                           'idx_registro_compra_chave_fornecedor'):
+                conn.execute(text(f"DROP INDEX IF EXISTS {indice}"))
+        conn.commit()
+    ResumoFornecedor.__table__.create(engine, checkfirst=True)
+
+
 def _migrar_ajustes_legado():
     """
     Se existirem ajustes sem campanha, cria/reutiliza uma campanha 'Legado' finalizada
@@ -78,7 +207,8 @@ def _migrar_ajustes_legado():
 
 # Inicializamos o SocketIO globalmente para que possa ser importado nos Blueprints
 # cors_allowed_origins="*" garante que não haja bloqueio de conexão no navegador
-socketio = SocketIO(cors_allowed_origins="*")
+# json=JSONSocketIO: pacotes serializados com orjson (ver json_rapido.py)
+socketio = SocketIO(cors_allowed_origins="*", json=JSONSocketIO)
 
 def create_app():
     # Define caminhos absolutos para static e templates
@@ -87,6 +217,9 @@ def create_app():
     app = Flask(__name__,
                 static_folder=os.path.join(project_root, 'static'),
                 template_folder=os.path.join(project_root, 'templates'))
+
+    # Respostas JSON com orjson (volta para o json padrão se não instalado).
+    init_json_rapido(app)
     
     # Chave secreta persistente para assinar os cookies de sessão
     secret_key_file = os.path.join(project_root, '.secret_key')
@@ -103,23 +236,43 @@ def create_app():
     db_path = os.path.join(project_root, 'quadro_local.db')
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
+    # Arquivos de histórico tirados do banco (lixeira expurgada etc.)
+    app.config['ARQUIVO_DIR'] = os.path.join(project_root, 'arquivo')
+    app.config['LIXEIRA_RETENCAO_DIAS'] = 180   # idade para sair da lixeira para o arquivo
+    app.config['LOG_MESES_ATIVOS'] = 3          # meses do log na tabela principal
+    app.config['LOG_RETENCAO_MESES'] = 24       # meses em partição .db antes do arquivo JSONL
+    app.config['RETIRADAS_DIAS_PENDENCIA'] = 7  # retirada não conferida vira pendência na conciliação
+    app.config['RELATORIOS_SNAPSHOTS_MANTIDOS'] = 7  # snapshots guardados por relatório agendado
 
     # Confia nos headers X-Forwarded-* enviados pelo nginx (HTTPS termina no nginx).
     # Sem isso, Flask acha que requisicoes vem em HTTP e gera redirects http://
     # causando Mixed Content no navegador quando acessado via HTTPS.
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
+    # Compressão gzip/brotli das respostas. Precisa envolver o app antes do
+    # socketio.init_app: assim o engine.io fica por fora e atende /socket.io
+    # sem passar pela compressão.
+    init_compressao(app)
+
     # Inicialização das extensões no App
     db.init_app(app)
     socketio.init_app(app)
     migrate = Migrate(app, db)
+
+    # Contagem de queries/tempo de banco por requisição (header Server-Timing).
+    init_monitor_sql(app)
+
+    # Dashboards e relatórios leem de uma cópia do banco (ver banco_analitico.py).
+    init_banco_analitico(app)
+
+    # Estáticos com hash do conteúdo na URL (cache longo) e versão comprimida.
+    init_assets(app)
     
-    # Variáveis globais para os templates (Modo TV e Cache Buster para CSS/JS)
+    # Variáveis globais para os templates (Modo TV)
     TV_MODE = '--tv' in sys.argv
     @app.context_processor
     def inject_global_vars():
-        return dict(tv_mode=TV_MODE, cache_id=int(time.time()))
+        return dict(tv_mode=TV_MODE)
 
     # --- HANDLER DE ERROS ---
     @app.errorhandler(403)
@@ -171,6 +324,13 @@ def create_app():
     from .blueprints.separacoes_canceladas import separacoes_canceladas_bp
     from .blueprints.clientes import clientes_bp
     from .blueprints.garantias import garantias_bp
+    from .blueprints.tv import tv_bp
+    from .blueprints.versoes import versoes_bp, garantir_dominios, registrar_contadores_versao
+    from .blueprints.fornecedores import (
+        fornecedores_bp, garantir_resumo_fornecedores, registrar_resumo_fornecedores,
+        registrar_comandos_fornecedores,
+    )
+    from .blueprints.relatorios_agendados import relatorios_agendados_bp
 
     app.register_blueprint(main_views_bp)
     app.register_blueprint(pedidos_bp)
@@ -191,21 +351,67 @@ def create_app():
     app.register_blueprint(separacoes_canceladas_bp)
     app.register_blueprint(clientes_bp)
     app.register_blueprint(garantias_bp)
+    app.register_blueprint(tv_bp)
+    app.register_blueprint(versoes_bp)
+    app.register_blueprint(fornecedores_bp)
+    app.register_blueprint(relatorios_agendados_bp)
 
     # Garante que a pasta de uploads de fotos de pecas existe
     os.makedirs(os.path.join(app.static_folder, 'uploads', 'pecas'), exist_ok=True)
+    registrar_comandos_fotos(app)
+    registrar_cache_fotos(app)
 
     # Criação das tabelas e carregamento de listas padrão
     with app.app_context():
         from . import models
         db.create_all()
         _garantir_schema_campanhas_ajuste()
+        _garantir_coluna_thumb_ajuste()
         _garantir_coluna_prioridade_conferencia()
+        _garantir_indice_log()
+        _garantir_indices_lixeira()
+        _garantir_posicao_anotacoes()
+        _garantir_indices_garantia()
+        _garantir_colunas_dimensoes()
         _migrar_ajustes_legado()
+        migrar_observacoes_json()
+        migrar_dimensoes()
         garantir_listas_padrao()
+        garantir_dominios()
+        garantir_resumo_fornecedores()
+
+    # Contadores de versão por domínio (sobem junto com cada alteração).
+    registrar_contadores_versao()
+
+    # Cadastros de fornecedor/cliente: o id é resolvido a partir do nome no flush.
+    registrar_vinculo_dimensoes()
+
+    # Scorecard dos fornecedores: resumo por dia recalculado a cada flush.
+    registrar_resumo_fornecedores()
+    registrar_comandos_fornecedores(app)
 
     # Monitor de escalonamento automático de prioridades (sobe nível após 48h).
     from .blueprints.conferencias import iniciar_monitor_prioridades
     iniciar_monitor_prioridades(app)
 
+    # Retenção da lixeira: arquiva e remove itens antigos uma vez por dia.
+    from .blueprints.lixeira import iniciar_expurgo_lixeira, registrar_comandos_lixeira
+    registrar_comandos_lixeira(app)
+    iniciar_expurgo_lixeira(app)
+
+    # Log: meses antigos vão para partições mensais e depois para o arquivo.
+    from .blueprints.logs import iniciar_manutencao_logs, registrar_comandos_logs
+    registrar_comandos_logs(app)
+    iniciar_manutencao_logs(app)
+
+    # Conciliação das retiradas antecipadas (relatório recalculado por dia).
+    from .blueprints.retiradas import iniciar_conciliacao_retiradas, registrar_comandos_retiradas
+    registrar_comandos_retiradas(app)
+    iniciar_conciliacao_retiradas(app)
+
+    # Relatórios agendados: snapshots gerados no horário de cada relatório.
+    from .blueprints.relatorios_agendados import iniciar_agendador_relatorios, registrar_comandos_relatorios
+    registrar_comandos_relatorios(app)
+    iniciar_agendador_relatorios(app)
+
     return app, socketio, TV_MODE
\ No newline at end of file
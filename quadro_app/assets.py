@@ -0,0 +1,181 @@
+# quadro_app/assets.py
+"""Versionamento e compressão dos arquivos estáticos (CSS, JS, imagens).
+
+Todo url_for('static', filename=...) ganha ?v=<hash do conteúdo>. Com a
+versão na URL o arquivo é servido com Cache-Control immutable por um ano:
+enquanto o conteúdo não muda, o navegador nem pergunta ao servidor; quando
+muda, o hash muda e a URL é outra. Sem ?v (ou com versão antiga) o arquivo
+sai com no-cache e é revalidado pelo ETag (304).
+
+Os módulos JS se importam por caminho relativo ('./ui.js'), sem versão. Para
+que também fiquem em cache, base.html publica um import map (mapa_importacao)
+que troca cada /static/js/... pela URL versionada.
+
+Arquivos de texto (css, js, svg...) são enviados comprimidos quando o
+navegador aceita: brotli se o pacote 'brotli' estiver instalado, senão gzip.
+A versão comprimida é gerada uma vez por conteúdo e fica em memória.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import current_app, request, url_for, Response
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: só gzip
+    brotli = None
+
+EXTENSOES_COMPRIMIVEIS = {'.css', '.js', '.mjs', '.svg', '.ico', '.json', '.txt', '.map'}
+# Abaixo disso a compressão não compensa o custo.
+TAMANHO_MINIMO_COMPRESSAO = 512
+CACHE_IMUTAVEL_SEGUNDOS = 365 * 24 * 3600
+# Fotos enviadas têm cache próprio (fotos.py) e não entram no manifesto.
+PASTAS_IGNORADAS = ('uploads',)
+
+_lock = threading.Lock()
+_manifesto = {}      # filename -> (mtime_ns, tamanho, hash)
+_comprimidos = {}    # (filename, codificacao) -> (hash, bytes)
+
+
+def _hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(65536), b''):
+            h.update(bloco)
+    return h.hexdigest()[:12]
+
+
+def versao_asset(static_folder, filename):
+    """Hash do conteúdo do arquivo (None se não existir). Recalcula só quando
+    o mtime/tamanho muda, então editar um arquivo com o servidor no ar já
+    gera a URL nova."""
+    if filename.split('/', 1)[0] in PASTAS_IGNORADAS:
+        return None
+    caminho = safe_join(static_folder, filename)
+    if caminho is None:
+        return None
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    chave = (info.st_mtime_ns, info.st_size)
+    atual = _manifesto.get(filename)
+    if atual and atual[:2] == chave:
+        return atual[2]
+    versao = _hash_arquivo(caminho)
+    with _lock:
+        _manifesto[filename] = chave + (versao,)
+    return versao
+
+
+def gerar_manifesto(static_folder):
+    """Calcula a versão de todos os arquivos estáticos (chamado no startup)."""
+    for raiz, pastas, arquivos in os.walk(static_folder):
+        if raiz == static_folder:
+            pastas[:] = [p for p in pastas if p not in PASTAS_IGNORADAS]
+        for nome in arquivos:
+            rel = os.path.relpath(os.path.join(raiz, nome), static_folder)
+            versao_asset(static_folder, rel.replace(os.sep, '/'))
+    return dict((f, v[2]) for f, v in _manifesto.items())
+
+
+def mapa_importacao(app):
+    """{'imports': {url sem versão: url versionada}} dos módulos em static/js."""
+    pasta_js = os.path.join(app.static_folder, 'js')
+    imports = {}
+    for raiz, _, arquivos in os.walk(pasta_js):
+        for nome in arquivos:
+            if not nome.endswith(('.js', '.mjs')):
+                continue
+            rel = os.path.relpath(os.path.join(raiz, nome), app.static_folder).replace(os.sep, '/')
+            imports[url_for('static', filename=rel, v=None)] = url_for('static', filename=rel)
+    return {'imports': imports}
+
+
+def _injetar_versao(endpoint, values):
+    if endpoint == 'static' and 'v' not in values and 'filename' in values:
+        versao = versao_asset(current_app.static_folder, values['filename'])
+        if versao:
+            values['v'] = versao
+
+
+def _codificacao_aceita():
+    if brotli is not None and 'br' in request.accept_encodings:
+        return 'br'
+    if 'gzip' in request.accept_encodings:
+        return 'gzip'
+    return None
+
+
+def _comprimir(caminho, codificacao):
+    with open(caminho, 'rb') as f:
+        dados = f.read()
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=11)
+    return gzip.compress(dados, compresslevel=9, mtime=0)
+
+
+def _servir_comprimido():
+    """before_request: responde /static/<arquivo de texto> com a versão
+    comprimida. Retorna None (segue para a view padrão) quando não se aplica."""
+    if request.endpoint != 'static' or request.method not in ('GET', 'HEAD'):
+        return None
+    filename = (request.view_args or {}).get('filename', '')
+    if os.path.splitext(filename)[1].lower() not in EXTENSOES_COMPRIMIVEIS:
+        return None
+    codificacao = _codificacao_aceita()
+    if codificacao is None:
+        return None
+    versao = versao_asset(current_app.static_folder, filename)
+    if versao is None:
+        return None
+    caminho = safe_join(current_app.static_folder, filename)
+    if os.path.getsize(caminho) < TAMANHO_MINIMO_COMPRESSAO:
+        return None
+
+    chave = (filename, codificacao)
+    guardado = _comprimidos.get(chave)
+    if not guardado or guardado[0] != versao:
+        guardado = (versao, _comprimir(caminho, codificacao))
+        with _lock:
+            _comprimidos[chave] = guardado
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = Response(guardado[1], mimetype=mimetype)
+    response.headers['Content-Encoding'] = codificacao
+    response.set_etag(f"{versao}-{codificacao}")
+    return response.make_conditional(request)
+
+
+def _cabecalhos_cache(response):
+    if request.endpoint != 'static':
+        return response
+    filename = (request.view_args or {}).get('filename', '')
+    if filename.split('/', 1)[0] in PASTAS_IGNORADAS:
+        return response
+    if os.path.splitext(filename)[1].lower() in EXTENSOES_COMPRIMIVEIS:
+        response.vary.add('Accept-Encoding')
+    if response.status_code not in (200, 304):
+        return response
+    versao = request.args.get('v')
+    if versao and versao == versao_asset(current_app.static_folder, filename):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = CACHE_IMUTAVEL_SEGUNDOS
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = 0
+    return response
+
+
+def init_assets(app):
+    app.url_defaults(_injetar_versao)
+    app.before_request(_servir_comprimido)
+    app.after_request(_cabecalhos_cache)
+    app.jinja_env.globals['mapa_importacao'] = lambda: mapa_importacao(app)
+    gerar_manifesto(app.static_folder)
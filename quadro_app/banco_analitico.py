@@ -0,0 +1,283 @@
+# quadro_app/banco_analitico.py
+"""Cópia do banco para as leituras analíticas (dashboards, relatórios,
+auditoria).
+
+Essas rotas varrem tabelas inteiras no mesmo arquivo SQLite em que as
+separações e conferências gravam, e a leitura longa segura o lock que as
+gravações esperam. Aqui elas leem de uma cópia (BANCO_ANALITICO_CAMINHO)
+feita com a API de backup online do SQLite e refeita quando passa de
+BANCO_ANALITICO_FRESCOR segundos e o banco principal mudou.
+
+O banco principal é posto em WAL (_garantir_wal): com o journal padrão a
+transação de leitura do backup seguraria as gravações até o fim da cópia, e
+um backup em passos recomeça a cada gravação de outra conexão (num banco
+movimentado, não termina). Em WAL a cópia é feita num passo só e as
+gravações seguem durante ela. A atualização roda em segundo plano: a
+requisição que encontra a cópia vencida dispara a atualização e segue lendo
+a cópia atual. Sem nenhuma cópia ainda (logo depois de subir), as leituras
+vão para o principal até a primeira ficar pronta.
+
+Quem lê da cópia:
+    - as rotas em BANCO_ANALITICO_ROTAS, que aceita nomes de blueprint
+      ('fornecedores') ou de endpoint ('dashboard.get_dashboard_data');
+    - qualquer bloco dentro de 'with leitura_analitica():' (ex.: o agendador
+      de relatórios, fora de requisição).
+
+Só os SELECTs do ORM vão para a cópia (evento do_orm_execute da sessão);
+gravações e o flush continuam no banco principal. Usuários (permissões) e os
+relatórios agendados são sempre lidos do principal (SEMPRE_PRINCIPAL).
+As respostas dessas rotas levam o header X-Banco-Analitico-Idade (segundos).
+
+BANCO_ANALITICO_ATIVO = False desliga tudo (as rotas voltam ao principal).
+
+    flask --app run analitico atualizar | status
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import create_engine, event
+
+from .extensions import db, tz_cuiaba
+from .models import Usuario, RelatorioAgendado, SnapshotRelatorio
+
+SEMPRE_PRINCIPAL = (Usuario, RelatorioAgendado, SnapshotRelatorio)
+
+ROTAS_PADRAO = (
+    'dashboard.get_dashboard_data',
+    'dashboard.gerar_relatorio_endpoint',
+    'dashboard.gerar_relatorio_csv',
+    'separacoes.get_dashboard_logistica_data',
+    'conferencias.get_dashboard_conferencia_data',
+    'compras_registro.auditoria_listar',
+    'compras_registro.gerar_relatorio_registro',
+    'fornecedores',
+)
+
+_ativo = ContextVar('banco_analitico', default=False)
+
+
+class BancoAnalitico:
+    """Arquivo da cópia, engine somente leitura sobre ele e a atualização."""
+
+    def __init__(self, caminho, frescor):
+        self.caminho = caminho
+        self.frescor = frescor
+        self.atualizado_em = None        # time.time() da última verificação
+        self._mtime_origem = None        # mtime do principal na última cópia
+        self._lock = threading.Lock()
+        self.engine = create_engine(f"sqlite:///file:{caminho}?mode=ro&uri=true")
+
+    def idade(self):
+        if self.atualizado_em is None:
+            return None
+        return time.time() - self.atualizado_em
+
+    def _mtime_principal(self):
+        caminho = db.engine.url.database
+        return max((os.path.getmtime(p) for p in (caminho, caminho + '-wal') if os.path.exists(p)),
+                   default=None)
+
+    def momento(self):
+        """Datetime em que a cópia refletia o principal (None sem cópia)."""
+        if self.atualizado_em is None:
+            return None
+        return datetime.fromtimestamp(self.atualizado_em, tz_cuiaba)
+
+    def pronta(self):
+        return self.atualizado_em is not None and os.path.exists(self.caminho)
+
+    def atualizar(self, forcar=False):
+        """Refaz a cópia se o principal mudou desde a última (ou se forcar).
+        Copia para um arquivo temporário e troca de uma vez: quem está lendo a
+        cópia antiga termina nela. Devolve True se copiou. Precisa de app
+        context; roda fora das requisições (ver garantir_recente)."""
+        mtime = self._mtime_principal()
+        if not forcar and mtime == self._mtime_origem and os.path.exists(self.caminho):
+            self.atualizado_em = time.time()
+            return False
+        temporario = f'{self.caminho}.{os.getpid()}.tmp'   # um por processo (vários workers)
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        # O instante é tomado antes de copiar: a cópia tem pelo menos o que
+        # havia no principal neste momento.
+        inicio = time.time()
+        destino = sqlite3.connect(temporario)
+        try:
+            with db.engine.connect() as conn:
+                # Um passo só, num snapshot de leitura do WAL: as gravações
+                # no principal não esperam a cópia.
+                conn.connection.driver_connection.backup(destino)
+            # A cópia é aberta em modo somente leitura: sem WAL.
+            destino.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            destino.close()
+        os.replace(temporario, self.caminho)
+        self.engine.dispose()
+        self._mtime_origem = mtime
+        self.atualizado_em = inicio
+        return True
+
+    def _vencida(self):
+        idade = self.idade()
+        return idade is None or idade > self.frescor
+
+    def garantir_recente(self, app, desde=None):
+        """Se a cópia passou do frescor, dispara a atualização em segundo plano
+        (uma por vez) e devolve se a cópia atual pode ser lida. Com desde
+        (time.time(); fora de requisição, ex.: o agendador de relatórios),
+        atualiza antes de voltar se a cópia é anterior a esse instante."""
+        if desde is not None:
+            with self._lock:
+                if self.atualizado_em is None or self.atualizado_em < desde:
+                    self.atualizar()
+            return True
+        if not self._vencida():
+            return True
+        if self._lock.acquire(blocking=False):
+            from quadro_app import socketio
+            socketio.start_background_task(self._atualizar_em_segundo_plano, app)
+        return self.pronta()
+
+    def _atualizar_em_segundo_plano(self, app):
+        try:
+            with app.app_context():
+                if self._vencida():
+                    self.atualizar()
+        except Exception as e:
+            print(f"[analitico] erro ao atualizar a cópia: {e}")
+        finally:
+            self._lock.release()
+
+
+def _banco():
+    if not has_app_context() or not current_app.config.get('BANCO_ANALITICO_ATIVO'):
+        return None
+    return current_app.extensions.get('banco_analitico')
+
+
+@contextmanager
+def leitura_analitica(desde=None):
+    """Os SELECTs do bloco leem da cópia analítica. A atualização da cópia
+    vencida é disparada no primeiro SELECT: uma rota que responde antes de
+    consultar (401, 403) não dispara cópia. Com desde (datetime; fora de
+    requisição), a cópia é atualizada na entrada do bloco se é anterior a ele."""
+    banco = _banco()
+    if desde is not None and banco is not None:
+        banco.garantir_recente(current_app._get_current_object(), desde=desde.timestamp())
+    token = _ativo.set(True)
+    try:
+        yield
+    finally:
+        _ativo.reset(token)
+
+
+def momento_copia():
+    """Datetime dos dados da cópia analítica, ou None se ela está desligada ou
+    ainda não existe (as leituras foram ao principal)."""
+    banco = _banco()
+    return banco.momento() if banco is not None and banco.pronta() else None
+
+
+def _ao_executar(orm_execute_state):
+    if not _ativo.get() or not orm_execute_state.is_select:
+        return None
+    if any(m.class_ in SEMPRE_PRINCIPAL for m in orm_execute_state.all_mappers):
+        return None
+    banco = _banco()
+    if banco is None or not banco.garantir_recente(current_app._get_current_object()):
+        return None
+    return orm_execute_state.invoke_statement(bind_arguments={'bind': banco.engine})
+
+
+def _rota_analitica(app):
+    rotas = app.config.get('BANCO_ANALITICO_ROTAS') or ()
+    return request.endpoint in rotas or request.blueprint in rotas
+
+
+def _antes_requisicao():
+    app = current_app
+    if not app.config.get('BANCO_ANALITICO_ATIVO') or not request.endpoint or not _rota_analitica(app):
+        return
+    contexto = leitura_analitica()
+    contexto.__enter__()
+    g._banco_analitico = contexto
+
+
+def _depois_requisicao(response):
+    if '_banco_analitico' in g:
+        idade = current_app.extensions['banco_analitico'].idade()
+        if idade is not None:
+            response.headers['X-Banco-Analitico-Idade'] = str(int(idade))
+    return response
+
+
+def _fim_requisicao(exc):
+    contexto = g.pop('_banco_analitico', None)
+    if contexto is not None:
+        contexto.__exit__(None, None, None)
+
+
+def _garantir_wal(app):
+    """Põe o banco principal em WAL (fica gravado no arquivo). Leitores não
+    bloqueiam gravações, inclusive o backup da cópia."""
+    with app.app_context():
+        if not db.engine.url.database or db.engine.url.database == ':memory:':
+            return
+        with db.engine.connect() as conn:
+            modo = conn.exec_driver_sql('PRAGMA journal_mode=WAL').scalar()
+        if modo != 'wal':
+            print(f"[analitico] não foi possível usar WAL no banco principal (modo: {modo}).")
+
+
+def init_banco_analitico(app):
+    caminho_principal = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '', 1)
+    app.config.setdefault('BANCO_ANALITICO_ATIVO', True)
+    app.config.setdefault('BANCO_ANALITICO_CAMINHO', os.path.splitext(caminho_principal)[0] + '_analitico.db')
+    app.config.setdefault('BANCO_ANALITICO_FRESCOR', 300)
+    app.config.setdefault('BANCO_ANALITICO_ROTAS', list(ROTAS_PADRAO))
+
+    _garantir_wal(app)
+    app.extensions['banco_analitico'] = BancoAnalitico(
+        app.config['BANCO_ANALITICO_CAMINHO'], app.config['BANCO_ANALITICO_FRESCOR'])
+    if not event.contains(db.session, 'do_orm_execute', _ao_executar):
+        event.listen(db.session, 'do_orm_execute', _ao_executar)
+    app.before_request(_antes_requisicao)
+    app.after_request(_depois_requisicao)
+    app.teardown_request(_fim_requisicao)
+    registrar_comandos_analitico(app)
+
+
+def registrar_comandos_analitico(app):
+    """flask --app run analitico atualizar | status"""
+    import click
+
+    @app.cli.group('analitico')
+    def analitico_cli():
+        """Cópia do banco para dashboards e relatórios."""
+
+    @analitico_cli.command('atualizar')
+    def atualizar_cmd():
+        banco = app.extensions['banco_analitico']
+        inicio = time.perf_counter()
+        banco.atualizar(forcar=True)
+        tamanho = os.path.getsize(banco.caminho) / 1024 / 1024
+        click.echo(f"Cópia analítica atualizada em {(time.perf_counter() - inicio) * 1000:.0f} ms "
+                   f"({tamanho:.1f} MB): {banco.caminho}")
+
+    @analitico_cli.command('status')
+    def status_cmd():
+        banco = app.extensions['banco_analitico']
+        click.echo(f"Ativo: {'sim' if app.config['BANCO_ANALITICO_ATIVO'] else 'não'}")
+        click.echo(f"Arquivo: {banco.caminho}")
+        if os.path.exists(banco.caminho):
+            idade = time.time() - os.path.getmtime(banco.caminho)
+            click.echo(f"Última cópia: há {int(idade)} s (frescor: {banco.frescor} s)")
+        else:
+            click.echo("Última cópia: nenhuma")
+        click.echo("Rotas: " + ', '.join(app.config['BANCO_ANALITICO_ROTAS']))
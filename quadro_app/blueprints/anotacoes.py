@@ -11,6 +11,71 @@ PAGE_KEY = 'anotacoes'
 COR_PADRAO = '#6366f1'
 
 
+# ==========================================
+# POSIÇÃO FRACIONÁRIA
+# ==========================================
+# Colunas e cards são ordenados por 'posicao', uma string comparada em ordem
+# lexicográfica (dígitos 0-9A-Za-z, nunca terminada em '0'). Para pôr um item
+# entre dois vizinhos basta gerar uma chave entre as deles: mover altera só a
+# linha do item movido. Acrescentar no fim (o caso mais comum: criar card ou
+# coluna) só sobe o primeiro dígito, e a chave ganha um caractere a cada ~60
+# inclusões; inserir repetidamente no mesmo ponto do meio alonga mais rápido.
+# Quando a chave passa de TAMANHO_MAXIMO_POSICAO, a coluna (ou o quadro, no
+# caso das colunas) é redistribuída com chaves curtas.
+
+DIGITOS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+TAMANHO_MAXIMO_POSICAO = 24
+
+
+def _meio(a, b):
+    """Chave estritamente entre a e b ('' = início, None = fim)."""
+    if b is None and a:
+        # Depois da última: o próximo dígito; em 'z', mantém e desce um nível
+        # ('z' -> 'z1' -> 'z2' ... 'zz' -> 'zz1').
+        da = DIGITOS.index(a[0])
+        if da + 1 < len(DIGITOS):
+            return DIGITOS[da + 1]
+        return a[0] + (_meio(a[1:], None) if len(a) > 1 else DIGITOS[1])
+    if b is not None:
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else '0') == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _meio(a[n:], b[n:])
+    da = DIGITOS.index(a[0]) if a else 0
+    db_ = DIGITOS.index(b[0]) if b is not None else len(DIGITOS)
+    if db_ - da > 1:
+        return DIGITOS[(da + db_ + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITOS[da] + _meio(a[1:], None)
+
+
+def chave_entre(antes, depois):
+    """Posição para um item entre 'antes' e 'depois' (None = sem vizinho)."""
+    if antes is not None and depois is not None and antes >= depois:
+        raise ValueError(f'posições fora de ordem: {antes!r} >= {depois!r}')
+    return _meio(antes or '', depois)
+
+
+def chaves_distribuidas(n):
+    """n chaves curtas e igualmente espaçadas, em ordem (redistribuição)."""
+    base = len(DIGITOS)
+    largura = 1
+    while base ** largura <= n:
+        largura += 1
+    passo = base ** largura / (n + 1)
+    chaves = []
+    for i in range(1, n + 1):
+        valor = int(passo * i)
+        digitos = ''
+        for _ in range(largura):
+            valor, resto = divmod(valor, base)
+            digitos = DIGITOS[resto] + digitos
+        chaves.append(digitos.rstrip('0'))
+    return chaves
+
+
 def _usuario_atual():
     uid = session.get('user_id')
     if not uid:
@@ -31,20 +96,20 @@ def serialize_card(c):
         'titulo': c.titulo or '',
         'conteudo': c.conteudo or '',
         'cor': c.cor,
-        'ordem': c.ordem,
+        'posicao': c.posicao,
         'criado_por': c.criado_por,
         'data_criacao': c.data_criacao,
     }
 
 
-def serialize_coluna(col):
-    cards = sorted(col.cards, key=lambda c: (c.ordem, c.id))
+def serialize_coluna(col, cards=None):
+    """'cards' já em ordem; se omitido, usa o relacionamento (ordenado por posicao)."""
     return {
         'id': col.id,
         'nome': col.nome,
         'cor': col.cor or COR_PADRAO,
-        'ordem': col.ordem,
-        'cards': [serialize_card(c) for c in cards],
+        'posicao': col.posicao,
+        'cards': [serialize_card(c) for c in (col.cards if cards is None else cards)],
     }
 
 
@@ -52,14 +117,55 @@ def _emitir():
     socketio.emit('anotacoes_atualizado')
 
 
+def _vizinhos(dados, item_id):
+    """(antes_id, depois_id) do body: explícitos ou tirados da lista 'ordem'
+    (formato antigo, com os ids na ordem final)."""
+    if dados.get('ordem'):
+        ids = [int(i) for i in dados['ordem']]
+        if item_id not in ids:
+            return None, None
+        i = ids.index(item_id)
+        return (ids[i - 1] if i > 0 else None), (ids[i + 1] if i + 1 < len(ids) else None)
+    return tuple(int(dados[k]) if dados.get(k) else None for k in ('antes_id', 'depois_id'))
+
+
+def _posicao_entre(vizinhos, antes_id, depois_id):
+    """Chave entre as posições dos vizinhos ({id: posicao}); None se algum
+    vizinho informado não existe mais ali ou a ordem do cliente está velha."""
+    if any(i is not None and i not in vizinhos for i in (antes_id, depois_id)):
+        return None
+    try:
+        return chave_entre(vizinhos.get(antes_id), vizinhos.get(depois_id))
+    except ValueError:
+        return None
+
+
+def _redistribuir(itens):
+    for item, chave in zip(itens, chaves_distribuidas(len(itens))):
+        item.posicao = chave
+
+
+def _redistribuir_colunas():
+    _redistribuir(AnotacaoColuna.query.order_by(AnotacaoColuna.posicao, AnotacaoColuna.id).all())
+
+
+def _redistribuir_cards(coluna_id):
+    _redistribuir(AnotacaoCard.query.filter_by(coluna_id=coluna_id)
+                  .order_by(AnotacaoCard.posicao, AnotacaoCard.id).all())
+
+
 # --- QUADRO COMPLETO ---
 @anotacoes_bp.route('', methods=['GET'])
 def listar():
     u = _usuario_atual()
     if not _pode_ver(u):
         return jsonify({'error': 'Acesso restrito.'}), 403
-    colunas = AnotacaoColuna.query.order_by(AnotacaoColuna.ordem, AnotacaoColuna.id).all()
-    return jsonify({'colunas': [serialize_coluna(c) for c in colunas]})
+    colunas = AnotacaoColuna.query.order_by(AnotacaoColuna.posicao, AnotacaoColuna.id).all()
+    # Cards numa segunda query, já na ordem final (coluna, posição).
+    por_coluna = {c.id: [] for c in colunas}
+    for card in AnotacaoCard.query.order_by(AnotacaoCard.coluna_id, AnotacaoCard.posicao, AnotacaoCard.id):
+        por_coluna.get(card.coluna_id, []).append(card)
+    return jsonify({'colunas': [serialize_coluna(c, por_coluna[c.id]) for c in colunas]})
 
 
 # --- COLUNAS ---
@@ -73,12 +179,15 @@ def criar_coluna():
     if not nome:
         return jsonify({'error': 'Nome da coluna é obrigatório.'}), 400
     cor = (dados.get('cor') or COR_PADRAO).strip()
-    ultima = AnotacaoColuna.query.order_by(AnotacaoColuna.ordem.desc()).first()
-    nova = AnotacaoColuna(nome=nome, cor=cor, ordem=(ultima.ordem + 1) if ultima else 0)
+    ultima = db.session.query(db.func.max(AnotacaoColuna.posicao)).scalar()
+    nova = AnotacaoColuna(nome=nome, cor=cor, posicao=chave_entre(ultima, None))
     db.session.add(nova)
+    if len(nova.posicao) > TAMANHO_MAXIMO_POSICAO:
+        db.session.flush()
+        _redistribuir_colunas()
     db.session.commit()
     _emitir()
-    return jsonify({'status': 'success', 'coluna': serialize_coluna(nova)}), 201
+    return jsonify({'status': 'success', 'coluna': serialize_coluna(nova, [])}), 201
 
 
 @anotacoes_bp.route('/colunas/<int:coluna_id>', methods=['PUT'])
@@ -114,19 +223,33 @@ def excluir_coluna(coluna_id):
 
 @anotacoes_bp.route('/colunas/ordem', methods=['PUT'])
 def reordenar_colunas():
-    """Recebe {ordem: [id1, id2, ...]} e aplica a nova ordem das colunas."""
+    """Move uma coluna para entre duas vizinhas.
+    Body: {coluna_id, antes_id, depois_id} (ids das colunas vizinhas na nova
+    posição; null nas pontas). Aceita também o formato antigo {ordem: [ids]}
+    junto com coluna_id.
+    """
     u = _usuario_atual()
     if not _pode_ver(u):
         return jsonify({'error': 'Acesso restrito.'}), 403
     dados = request.get_json() or {}
-    ids = dados.get('ordem') or []
-    for indice, cid in enumerate(ids):
-        col = AnotacaoColuna.query.get(cid)
-        if col:
-            col.ordem = indice
-    db.session.commit()
-    _emitir()
-    return jsonify({'status': 'success'})
+    col = AnotacaoColuna.query.get_or_404(dados.get('coluna_id'))
+    antes_id, depois_id = _vizinhos(dados, col.id)
+    vizinhos = dict(db.session.query(AnotacaoColuna.id, AnotacaoColuna.posicao)
+                    .filter(AnotacaoColuna.id.in_([i for i in (antes_id, depois_id) if i])).all())
+    posicao = _posicao_entre(vizinhos, antes_id, depois_id)
+    if posicao is None:
+        return jsonify({'error': 'O quadro mudou. Recarregue e tente de novo.'}), 409
+
+    col.posicao = posicao
+
+    if len(col.posicao) > TAMANHO_MAXIMO_POSICAO:
+        _redistribuir_colunas()
+        db.session.commit()
+        _emitir()
+    else:
+        db.session.commit()
+        socketio.emit('anotacao_coluna_movida', {'id': col.id, 'posicao': col.posicao})
+    return jsonify({'status': 'success', 'posicao': col.posicao})
 
 
 # --- CARDS ---
@@ -144,18 +267,21 @@ def criar_card():
     conteudo = (dados.get('conteudo') or '').strip()
     if not titulo and not conteudo:
         return jsonify({'error': 'Informe um título ou conteúdo.'}), 400
-    ultimo = (AnotacaoCard.query.filter_by(coluna_id=col.id)
-              .order_by(AnotacaoCard.ordem.desc()).first())
+    ultima = (db.session.query(db.func.max(AnotacaoCard.posicao))
+              .filter(AnotacaoCard.coluna_id == col.id).scalar())
     novo = AnotacaoCard(
         coluna_id=col.id,
         titulo=titulo,
         conteudo=conteudo,
         cor=(dados.get('cor') or None),
-        ordem=(ultimo.ordem + 1) if ultimo else 0,
+        posicao=chave_entre(ultima, None),
         criado_por=u.nome if u else 'Sistema',
         data_criacao=datetime.now(tz_cuiaba).isoformat(),
     )
     db.session.add(novo)
+    if len(novo.posicao) > TAMANHO_MAXIMO_POSICAO:
+        db.session.flush()
+        _redistribuir_cards(col.id)
     db.session.commit()
     _emitir()
     return jsonify({'status': 'success', 'card': serialize_card(novo)}), 201
@@ -195,8 +321,12 @@ def excluir_card(card_id):
 
 @anotacoes_bp.route('/cards/mover', methods=['PUT'])
 def mover_card():
-    """Move um card para uma coluna e reordena os cards dessa coluna.
-    Body: {card_id, coluna_id, ordem: [card_ids na ordem final da coluna destino]}.
+    """Move um card para uma coluna, entre dois cards dela.
+    Body: {card_id, coluna_id, antes_id, depois_id} (ids dos cards vizinhos
+    na coluna destino; null nas pontas). Aceita também o formato antigo
+    {card_id, coluna_id, ordem: [card_ids na ordem final da coluna destino]}.
+    Só a linha do card é alterada; os outros clientes recebem o delta em
+    'anotacao_card_movido'.
     """
     u = _usuario_atual()
     if not _pode_ver(u):
@@ -207,13 +337,22 @@ def mover_card():
     if not col:
         return jsonify({'error': 'Coluna não encontrada.'}), 404
 
+    antes_id, depois_id = _vizinhos(dados, card.id)
+    vizinhos = dict(db.session.query(AnotacaoCard.id, AnotacaoCard.posicao)
+                    .filter(AnotacaoCard.id.in_([i for i in (antes_id, depois_id) if i]),
+                            AnotacaoCard.coluna_id == col.id).all())
+    posicao = _posicao_entre(vizinhos, antes_id, depois_id)
+    if posicao is None:
+        return jsonify({'error': 'O quadro mudou. Recarregue e tente de novo.'}), 409
+
     card.coluna_id = col.id
-    # Reindexa os cards da coluna destino conforme a ordem recebida.
-    ids = dados.get('ordem') or [card.id]
-    for indice, cid in enumerate(ids):
-        c = AnotacaoCard.query.get(cid)
-        if c and c.coluna_id == col.id:
-            c.ordem = indice
-    db.session.commit()
-    _emitir()
-    return jsonify({'status': 'success'})
+    card.posicao = posicao
+    if len(posicao) > TAMANHO_MAXIMO_POSICAO:
+        db.session.flush()
+        _redistribuir_cards(col.id)
+        db.session.commit()
+        _emitir()
+    else:
+        db.session.commit()
+        socketio.emit('anotacao_card_movido', {'id': card.id, 'coluna_id': col.id, 'posicao': card.posicao})
+    return jsonify({'status': 'success', 'posicao': card.posicao})
@@ -1,29 +1,24 @@
 # quadro_app/blueprints/clientes.py
 from flask import Blueprint, request, jsonify
-from sqlalchemy import func
+from sqlalchemy import func, or_
 from ..extensions import db
-from quadro_app.models import Separacao, SeparacaoCancelada, ListaDinamica
+from quadro_app.models import Separacao, SeparacaoCancelada, Garantia, Cliente, ItemExcluido
+from quadro_app.dimensoes import buscar, normalizar_nome, obter_id
 from quadro_app.utils import registrar_log
 from quadro_app import socketio
 
 clientes_bp = Blueprint('clientes', __name__, url_prefix='/api/clientes')
 
-LISTA_OCULTOS = 'clientes_ocultos'
 
-
-def _get_ocultos_lista():
-    lista = ListaDinamica.query.filter_by(nome=LISTA_OCULTOS).first()
-    if not lista:
-        lista = ListaDinamica(nome=LISTA_OCULTOS, itens=[])
-        db.session.add(lista)
-        db.session.commit()
-    return lista
-
-
-def get_clientes_ocultos():
-    """Conjunto de nomes ocultos (usado também pelo autocomplete)."""
-    lista = ListaDinamica.query.filter_by(nome=LISTA_OCULTOS).first()
-    return set(lista.itens or []) if lista else set()
+def _usos(ids):
+    """{cliente_id: quantidade de separações + canceladas}."""
+    por_id = {i: 0 for i in ids}
+    for model in (Separacao, SeparacaoCancelada):
+        linhas = db.session.query(model.cliente_id, func.count(model.id))\
+            .filter(model.cliente_id.in_(ids)).group_by(model.cliente_id).all()
+        for cliente_id, qtd in linhas:
+            por_id[cliente_id] += qtd
+    return por_id
 
 
 @clientes_bp.route('/paginadas', methods=['POST'])
@@ -32,25 +27,21 @@ def listar_paginadas():
     page = dados.get('page', 0)
     limit = dados.get('limit', 30)
     search = (dados.get('search') or '').strip()
-
-    ocultos = get_clientes_ocultos()
     apenas_ocultos = bool(dados.get('apenas_ocultos'))
 
-    query = db.session.query(
-        Separacao.nome_cliente,
-        func.count(Separacao.id)
-    ).filter(
-        Separacao.nome_cliente.isnot(None),
-        Separacao.nome_cliente != ''
-    )
+    # Agrupa pelo cliente_id (inteiro) e lê o nome do cadastro.
+    usos = db.session.query(Separacao.cliente_id.label('cliente_id'),
+                            func.count(Separacao.id).label('usos'))\
+        .filter(Separacao.cliente_id.isnot(None))\
+        .group_by(Separacao.cliente_id).subquery()
+    query = db.session.query(Cliente, usos.c.usos).join(usos, usos.c.cliente_id == Cliente.id)
     if search:
-        query = query.filter(Separacao.nome_cliente.ilike(f'%{search}%'))
+        query = query.filter(or_(Cliente.nome.ilike(f'%{search}%'),
+                                 Cliente.nome_normalizado.contains(normalizar_nome(search),
+                                                                   autoescape=True)))
     if apenas_ocultos:
-        if not ocultos:
-            return jsonify({'clientes': [], 'temMais': False})
-        query = query.filter(Separacao.nome_cliente.in_(list(ocultos)))
-    query = query.group_by(Separacao.nome_cliente)\
-                 .order_by(func.lower(Separacao.nome_cliente))
+        query = query.filter(Cliente.oculto.is_(True))
+    query = query.order_by(Cliente.nome_normalizado)
 
     # Busca um a mais para saber se há próxima página. Ocultos continuam na lista,
     # marcados com 'oculto', para dar feedback visual em vez de sumir.
@@ -58,109 +49,137 @@ def listar_paginadas():
     linhas = query.offset(offset).limit(limit + 1).all()
     tem_mais = len(linhas) > limit
     visiveis = [
-        {'nome': n, 'usos': c, 'oculto': n in ocultos}
-        for (n, c) in linhas[:limit]
+        {'id': c.id, 'nome': c.nome, 'usos': qtd, 'oculto': bool(c.oculto)}
+        for (c, qtd) in linhas[:limit]
     ]
     return jsonify({'clientes': visiveis, 'temMais': tem_mais})
 
 
 @clientes_bp.route('/ocultos', methods=['GET'])
 def listar_ocultos():
-    return jsonify(sorted(get_clientes_ocultos(), key=lambda n: n.lower()))
+    nomes = db.session.query(Cliente.nome).filter(Cliente.oculto.is_(True))\
+                      .order_by(Cliente.nome_normalizado).all()
+    return jsonify([n for (n,) in nomes])
+
+
+def _mesclar_ids(origens, destino_id):
+    """Passa as linhas dos clientes 'origens' para destino_id e apaga os
+    cadastros de origem (sem commit). Só troca o inteiro cliente_id, também
+    nos snapshots da lixeira: restaurados, apontam para o cliente mesclado em
+    vez de recriar o de origem pelo nome."""
+    for model in (Separacao, SeparacaoCancelada, Garantia):
+        model.query.filter(model.cliente_id.in_(origens)).update(
+            {model.cliente_id: destino_id}, synchronize_session=False)
+    cliente_snapshot = func.json_extract(ItemExcluido.dados_item, '$.cliente_id')
+    ItemExcluido.query.filter(ItemExcluido.tipo_item.in_(('Separacao', 'Garantia')),
+                              cliente_snapshot.in_(origens)).update(
+        {ItemExcluido.dados_item: func.json_set(ItemExcluido.dados_item, '$.cliente_id', destino_id)},
+        synchronize_session=False)
+    Cliente.query.filter(Cliente.id.in_(origens)).delete(synchronize_session=False)
 
 
 @clientes_bp.route('/renomear', methods=['PUT'])
 def renomear():
+    """Renomeia o cadastro do cliente: uma linha, e todas as separações que
+    apontam para ele passam a exibir o nome novo. Se o nome novo já é de outro
+    cliente, os dois são mesclados."""
     dados = request.get_json() or {}
-    # 'de' é a chave de busca — NÃO pode ser alterada (nomes podem ter espaços
-    # nas pontas no banco). 'para' é o novo valor, esse sim limpamos.
     de = dados.get('de') or ''
-    para = (dados.get('para') or '').strip()
+    para = ' '.join((dados.get('para') or '').split())
     editor_nome = dados.get('editor_nome', 'Sistema')
     if not de.strip() or not para:
         return jsonify({'error': 'Informe o nome atual e o novo nome.'}), 400
-    if de == para:
-        return jsonify({'status': 'success'})
-
-    n1 = Separacao.query.filter_by(nome_cliente=de).update(
-        {Separacao.nome_cliente: para}, synchronize_session=False)
-    n2 = SeparacaoCancelada.query.filter_by(nome_cliente=de).update(
-        {SeparacaoCancelada.nome_cliente: para}, synchronize_session=False)
+    cliente = buscar(Cliente, de)
+    if not cliente:
+        return jsonify({'error': 'Cliente não encontrado.'}), 404
+    if cliente.nome == para:
+        return jsonify({'status': 'success', 'registros': 0})
+
+    existente = buscar(Cliente, para)
+    if existente and existente.id != cliente.id:
+        _mesclar_ids([cliente.id], existente.id)
+        cliente_id = existente.id
+    else:
+        cliente.nome = para
+        cliente.nome_normalizado = normalizar_nome(para)
+        cliente_id = cliente.id
+    registros = _usos([cliente_id])[cliente_id]
     db.session.commit()
 
     registrar_log('cliente', editor_nome, 'CLIENTE_RENOMEADO',
-                  detalhes={'de': de, 'para': para, 'registros': n1 + n2},
+                  detalhes={'de': de, 'para': para, 'registros': registros},
                   log_type='clientes')
     socketio.emit('clientes_atualizado', {})
-    return jsonify({'status': 'success', 'registros': n1 + n2})
+    return jsonify({'status': 'success', 'registros': registros})
 
 
 @clientes_bp.route('/mesclar', methods=['PUT'])
 def mesclar():
-    """Unifica vários nomes (variantes do mesmo cliente) em um só. Todas as
-    separações dos nomes em 'nomes' passam a usar 'para'."""
+    """Unifica vários nomes (variantes do mesmo cliente) em um só. As
+    separações dos nomes em 'nomes' passam a apontar para o cliente 'para'
+    (criado se ainda não existe) e os cadastros mesclados são apagados.
+
+    Com 'dry_run': true apenas devolve quantos registros cada nome afetaria,
+    sem alterar nada (usado para pré-visualizar a mesclagem)."""
     dados = request.get_json() or {}
     nomes = dados.get('nomes') or []
-    para = (dados.get('para') or '').strip()
+    para = ' '.join((dados.get('para') or '').split())
     editor_nome = dados.get('editor_nome', 'Sistema')
+    dry_run = bool(dados.get('dry_run'))
     if not isinstance(nomes, list) or not nomes or not para:
         return jsonify({'error': 'Selecione os nomes e informe o nome correto.'}), 400
 
-    total = 0
-    for de in nomes:
-        if de == para:
-            continue
-        total += Separacao.query.filter_by(nome_cliente=de).update(
-            {Separacao.nome_cliente: para}, synchronize_session=False)
-        total += SeparacaoCancelada.query.filter_by(nome_cliente=de).update(
-            {SeparacaoCancelada.nome_cliente: para}, synchronize_session=False)
-
-    # Os nomes mesclados deixam de existir: remove-os da lista de ocultos.
-    lista = ListaDinamica.query.filter_by(nome=LISTA_OCULTOS).first()
-    if lista and lista.itens:
-        mesclados = {n for n in nomes if n != para}
-        novos = [n for n in lista.itens if n not in mesclados]
-        if len(novos) != len(lista.itens):
-            lista.itens = novos
-
+    # Cadastros de origem (sem o destino e sem repetidos, preservando a ordem).
+    normalizado_para = normalizar_nome(para)
+    origens = {}
+    for nome in dict.fromkeys(nomes):
+        cliente = buscar(Cliente, nome)
+        if cliente and cliente.nome_normalizado != normalizado_para:
+            origens.setdefault(cliente.id, nome)
+    if not origens:
+        return jsonify({'status': 'success', 'registros': 0, 'por_nome': {}})
+
+    # Contagem por cliente: um GROUP BY por tabela pelo cliente_id.
+    usos = _usos(list(origens))
+    por_nome = {origens[i]: qtd for i, qtd in usos.items()}
+    total = sum(por_nome.values())
+
+    if dry_run:
+        return jsonify({'status': 'preview', 'registros': total, 'por_nome': por_nome})
+
+    destino_id = obter_id(db.session, Cliente, para)
+    Cliente.query.filter_by(id=destino_id).update({Cliente.nome: para}, synchronize_session=False)
+    _mesclar_ids(list(origens), destino_id)
     db.session.commit()
     registrar_log('cliente', editor_nome, 'CLIENTES_MESCLADOS',
-                  detalhes={'nomes': nomes, 'para': para, 'registros': total},
+                  detalhes={'nomes': list(por_nome), 'para': para, 'registros': total,
+                            'por_nome': por_nome},
                   log_type='clientes')
     socketio.emit('clientes_atualizado', {})
-    return jsonify({'status': 'success', 'registros': total})
+    return jsonify({'status': 'success', 'registros': total, 'por_nome': por_nome})
 
 
-@clientes_bp.route('/ocultar', methods=['POST'])
-def ocultar():
+def _alterar_oculto(oculto):
     dados = request.get_json() or {}
-    # Guarda o nome EXATAMENTE como está no banco (pode ter espaços nas pontas).
     nome = dados.get('nome') or ''
     editor_nome = dados.get('editor_nome', 'Sistema')
-    if not nome.strip():
-        return jsonify({'error': 'Nome inválido.'}), 400
-    lista = _get_ocultos_lista()
-    itens = list(lista.itens or [])
-    if nome not in itens:
-        itens.append(nome)
-        lista.itens = itens
-        db.session.commit()
-    registrar_log('cliente', editor_nome, 'CLIENTE_OCULTADO',
-                  detalhes={'nome': nome}, log_type='clientes')
+    cliente = buscar(Cliente, nome)
+    if not cliente:
+        return jsonify({'error': 'Cliente não encontrado.'}), 404
+    cliente.oculto = oculto
+    db.session.commit()
+    registrar_log('cliente', editor_nome, 'CLIENTE_OCULTADO' if oculto else 'CLIENTE_RESTAURADO',
+                  detalhes={'nome': cliente.nome}, log_type='clientes')
     socketio.emit('clientes_atualizado', {})
     return jsonify({'status': 'success'})
 
 
+@clientes_bp.route('/ocultar', methods=['POST'])
+def ocultar():
+    """Tira o cliente do autocomplete (as separações continuam intactas)."""
+    return _alterar_oculto(True)
+
+
 @clientes_bp.route('/restaurar', methods=['POST'])
 def restaurar():
-    dados = request.get_json() or {}
-    nome = dados.get('nome') or ''
-    editor_nome = dados.get('editor_nome', 'Sistema')
-    lista = _get_ocultos_lista()
-    itens = [n for n in (lista.itens or []) if n != nome]
-    lista.itens = itens
-    db.session.commit()
-    registrar_log('cliente', editor_nome, 'CLIENTE_RESTAURADO',
-                  detalhes={'nome': nome}, log_type='clientes')
-    socketio.emit('clientes_atualizado', {})
-    return jsonify({'status': 'success'})
+    return _alterar_oculto(False)
@@ -1,10 +1,11 @@
 # quadro_app/blueprints/conferencias.py
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-from sqlalchemy import or_, cast, String
+from sqlalchemy import or_, exists
 from ..extensions import db, tz_cuiaba
-from quadro_app.models import Conferencia, ItemExcluido, Usuario
-from quadro_app.utils import registrar_log, criar_notificacao
+from quadro_app.models import Conferencia, ItemExcluido, Usuario, Observacao, Fornecedor
+from quadro_app.utils import registrar_log, criar_notificacoes
+from quadro_app import observacoes
 from quadro_app import socketio
 
 conferencias_bp = Blueprint('conferencias', __name__, url_prefix='/api/conferencias')
@@ -26,11 +27,10 @@ def _destinatarios_pendencia():
     ]
 
 
-def _assinatura_pendencia(c):
+def _assinatura_pendencia(c, n_obs):
     """Assinatura de atividade de uma pendência. Muda quando há atualização de
     status ou uma nova observação/adição — fazendo a badge 'reacender' mesmo
     para uma pendência já vista."""
-    n_obs = len(c.observacoes or [])
     return f"{c.status}|{n_obs}"
 
 
@@ -38,7 +38,8 @@ def _pendencia_items():
     """Lista [{id, v}] das conferências pendentes; v = assinatura de atividade.
     O cliente compara com o que já viu para decidir o que ainda é 'novo'."""
     pendentes = Conferencia.query.filter(Conferencia.status.in_(STATUS_PENDENTES)).all()
-    return [{'id': c.id, 'v': _assinatura_pendencia(c)} for c in pendentes]
+    resumos = observacoes.resumos('conferencia', [c.id for c in pendentes])
+    return [{'id': c.id, 'v': _assinatura_pendencia(c, resumos[c.id]['qtd'])} for c in pendentes]
 
 
 def _contar_pendencias():
@@ -54,26 +55,36 @@ def _emitir_pendencias_atualizado():
 def _notificar_pendencia(conferencia, msg, actor_nome):
     """Cria notificação (sino + som + nativa) para os responsáveis, exceto para
     quem fez o movimento, e atualiza a badge de todos."""
-    for usuario in _destinatarios_pendencia():
-        if usuario.nome and usuario.nome == actor_nome:
-            continue
-        criar_notificacao(usuario.id, msg, link='/pendencias-e-alteracoes')
+    criar_notificacoes([
+        (usuario.id, msg, '/pendencias-e-alteracoes')
+        for usuario in _destinatarios_pendencia()
+        if not (usuario.nome and usuario.nome == actor_nome)
+    ])
     _emitir_pendencias_atualizado()
 
 
+def _mensagem_nova_pendencia(conferencia, tem_pendencia_fornecedor, solicita_alteracao):
+    if tem_pendencia_fornecedor and solicita_alteracao:
+        return f"Nova pendência (fornecedor + alteração) — NF {conferencia.numero_nota_fiscal} ({conferencia.nome_fornecedor})"
+    if tem_pendencia_fornecedor:
+        return f"Nova pendência de fornecedor — NF {conferencia.numero_nota_fiscal} ({conferencia.nome_fornecedor})"
+    return f"Nova solicitação de alteração — NF {conferencia.numero_nota_fiscal} ({conferencia.nome_fornecedor})"
+
+
 def _notificar_nova_pendencia(conferencia, tem_pendencia_fornecedor, solicita_alteracao, editor_nome):
     """Notifica quando uma conferência vira pendência/alteração."""
-    if tem_pendencia_fornecedor and solicita_alteracao:
-        msg = f"Nova pendência (fornecedor + alteração) — NF {conferencia.numero_nota_fiscal} ({conferencia.nome_fornecedor})"
-    elif tem_pendencia_fornecedor:
-        msg = f"Nova pendência de fornecedor — NF {conferencia.numero_nota_fiscal} ({conferencia.nome_fornecedor})"
-    else:
-        msg = f"Nova solicitação de alteração — NF {conferencia.numero_nota_fiscal} ({conferencia.nome_fornecedor})"
+    msg = _mensagem_nova_pendencia(conferencia, tem_pendencia_fornecedor, solicita_alteracao)
     _notificar_pendencia(conferencia, msg, editor_nome)
 
-def serialize_conferencia(c):
-    """Converte um objeto Conferencia do SQLAlchemy em um dicionário para JSON."""
+def serialize_conferencia(c, resumo=None):
+    """Converte um objeto Conferencia do SQLAlchemy em um dicionário para JSON.
+
+    As observações vêm resumidas (quantidade + última); a lista completa só sai
+    no detalhe (GET /<id>). Para listas, use serialize_conferencias, que busca
+    os resumos de todas numa consulta."""
     if not c: return None
+    if resumo is None:
+        resumo = observacoes.resumos('conferencia', [c.id]).get(c.id, {'qtd': 0, 'ultima': None})
     return {
         'id': c.id, 
         'data_recebimento': c.data_recebimento, 
@@ -88,7 +99,8 @@ def serialize_conferencia(c):
         'data_conferencia_finalizada': c.data_conferencia_finalizada,
         'data_finalizacao': c.data_finalizacao, 
         'conferentes': c.conferentes, 
-        'observacoes': c.observacoes,
+        'qtd_observacoes': resumo['qtd'],
+        'ultima_observacao': resumo['ultima'],
         'resolvido_gestor': c.resolvido_gestor, 
         'resolvido_contabilidade': c.resolvido_contabilidade,
         'conferente_nome': c.conferente_nome,
@@ -97,6 +109,21 @@ def serialize_conferencia(c):
         'prioridade_definida_em': c.prioridade_definida_em
     }
 
+
+def serialize_conferencias(itens):
+    resumos = observacoes.resumos('conferencia', [c.id for c in itens])
+    return [serialize_conferencia(c, resumos[c.id]) for c in itens]
+
+
+def _dados_lixeira(c):
+    """Snapshot só com colunas do modelo (a restauração faz Conferencia(**dados)).
+    As observações vão na coluna JSON e saem da tabela; importar_json as
+    devolve na restauração."""
+    dados = serialize_conferencia(c, {'qtd': 0, 'ultima': None})
+    del dados['qtd_observacoes'], dados['ultima_observacao']
+    dados['observacoes'] = observacoes.remover_da_entidade('conferencia', c.id)
+    return dados
+
 # Prioridades válidas no Kanban (inclui 'A definir' e as 4 prioridades).
 PRIORIDADES = ['A definir', 'Prioridade 1', 'Prioridade 2', 'Prioridade 3', 'Prioridade 4']
 # Prioridades "reais" que aparecem na TV (sem 'A definir').
@@ -163,14 +190,10 @@ def criar_recebimento():
         prioridade='A definir'
     )
 
-    if obs_inicial:
-        nova_conferencia.observacoes = [{
-            'texto': f"[OBS INICIAL] {obs_inicial}", 
-            'autor': editor_nome,
-            'timestamp': datetime.now(tz_cuiaba).isoformat()
-        }]
-
     db.session.add(nova_conferencia)
+    db.session.flush()
+    if obs_inicial:
+        observacoes.adicionar('conferencia', nova_conferencia.id, f"[OBS INICIAL] {obs_inicial}", editor_nome)
     db.session.commit()
     registrar_log(nova_conferencia.id, editor_nome, 'RECEBIMENTO_CRIADO', log_type='conferencias')
     socketio.emit('novo_recebimento', {'recebimento': serialize_conferencia(nova_conferencia)})
@@ -238,7 +261,7 @@ def get_recebimentos_paginados():
                           .paginate(page=page + 1, per_page=limit, error_out=False)
 
         return jsonify({
-            'recebimentos': [serialize_conferencia(c) for c in pagination.items],
+            'recebimentos': serialize_conferencias(pagination.items),
             'temMais': pagination.has_next
         })
     except Exception as e:
@@ -253,38 +276,20 @@ def get_conferencias_ativas():
     status_operacionais = ['Aguardando Conferência', 'Em Conferência']
     itens = Conferencia.query.filter(Conferencia.status.in_(status_operacionais))\
         .order_by(Conferencia.data_recebimento.desc()).all()
-    return jsonify([serialize_conferencia(c) for c in itens])
+    return jsonify(serialize_conferencias(itens))
 
-@conferencias_bp.route('/<int:conferencia_id>/iniciar', methods=['PUT'])
-def iniciar_conferencia(conferencia_id):
-    dados = request.get_json()
-    conferentes = dados.get('conferentes')
-    total_itens = dados.get('total_itens', 0)
-    editor_nome = dados.get('editor_nome', 'N/A')
-    
-    conferencia = Conferencia.query.get_or_404(conferencia_id)
+def _aplicar_inicio(conferencia, conferentes, total_itens):
     conferencia.status = 'Em Conferência'
     conferencia.data_inicio_conferencia = datetime.now(tz_cuiaba).isoformat()
     conferencia.conferentes = conferentes
     conferencia.total_itens = total_itens
-    db.session.commit()
-    
-    registrar_log(conferencia_id, editor_nome, 'INICIO_CONFERENCIA', log_type='conferencias')
-    socketio.emit('conferencia_iniciada', {'conferencia': serialize_conferencia(conferencia)})
-    return jsonify({'status': 'success'})
-
-@conferencias_bp.route('/<int:conferencia_id>/finalizar-conferencia', methods=['PUT'])
-def finalizar_conferencia_logica(conferencia_id):
-    dados = request.get_json()
-    editor_nome = dados.get('editor_nome', 'N/A')
-    conferencia = Conferencia.query.get_or_404(conferencia_id)
 
-    tem_pendencia_fornecedor = dados.get('tem_pendencia_fornecedor', False)
-    solicita_alteracao = dados.get('solicita_alteracao', False)
-    observacao = dados.get('observacao', '')
 
+def _aplicar_finalizacao(conferencia, tem_pendencia_fornecedor, solicita_alteracao, observacao, editor_nome):
+    """Aplica a finalização (sem commit). Retorna uma mensagem de erro quando
+    a transição é inválida, ou None."""
     if (tem_pendencia_fornecedor or solicita_alteracao) and not observacao.strip():
-        return jsonify({'error': 'Observação é obrigatória quando há divergências.'}), 400
+        return 'Observação é obrigatória quando há divergências.'
 
     conferencia.data_conferencia_finalizada = datetime.now(tz_cuiaba).isoformat()
 
@@ -302,13 +307,38 @@ def finalizar_conferencia_logica(conferencia_id):
     conferencia.resolvido_contabilidade = not solicita_alteracao
     
     if observacao:
-        obs_atuais = conferencia.observacoes or []
-        obs_atuais.append({
-            'texto': f"[DIVERGÊNCIA] {observacao}", 
-            'autor': editor_nome,
-            'timestamp': datetime.now(tz_cuiaba).isoformat()
-        })
-        conferencia.observacoes = list(obs_atuais)
+        observacoes.adicionar('conferencia', conferencia.id, f"[DIVERGÊNCIA] {observacao}", editor_nome)
+    return None
+
+
+@conferencias_bp.route('/<int:conferencia_id>/iniciar', methods=['PUT'])
+def iniciar_conferencia(conferencia_id):
+    dados = request.get_json()
+    conferentes = dados.get('conferentes')
+    total_itens = dados.get('total_itens', 0)
+    editor_nome = dados.get('editor_nome', 'N/A')
+    
+    conferencia = Conferencia.query.get_or_404(conferencia_id)
+    _aplicar_inicio(conferencia, conferentes, total_itens)
+    db.session.commit()
+    
+    registrar_log(conferencia_id, editor_nome, 'INICIO_CONFERENCIA', log_type='conferencias')
+    socketio.emit('conferencia_iniciada', {'conferencia': serialize_conferencia(conferencia)})
+    return jsonify({'status': 'success'})
+
+@conferencias_bp.route('/<int:conferencia_id>/finalizar-conferencia', methods=['PUT'])
+def finalizar_conferencia_logica(conferencia_id):
+    dados = request.get_json()
+    editor_nome = dados.get('editor_nome', 'N/A')
+    conferencia = Conferencia.query.get_or_404(conferencia_id)
+
+    tem_pendencia_fornecedor = dados.get('tem_pendencia_fornecedor', False)
+    solicita_alteracao = dados.get('solicita_alteracao', False)
+    observacao = dados.get('observacao', '')
+
+    erro = _aplicar_finalizacao(conferencia, tem_pendencia_fornecedor, solicita_alteracao, observacao, editor_nome)
+    if erro:
+        return jsonify({'error': erro}), 400
 
     db.session.commit()
     registrar_log(conferencia_id, editor_nome, f'FINALIZADO_COMO_{conferencia.status.upper()}', detalhes={'info': observacao}, log_type='conferencias')
@@ -320,6 +350,105 @@ def finalizar_conferencia_logica(conferencia_id):
 
     return jsonify({'status': 'success'})
 
+
+def _carregar_lote(itens):
+    """Valida o corpo de um endpoint em lote e carrega as conferências de uma
+    vez. Retorna (itens, {id: conferencia})."""
+    if not isinstance(itens, list) or not itens:
+        return None, {}
+    ids = [i.get('id') for i in itens if isinstance(i, dict)]
+    conferencias = Conferencia.query.filter(Conferencia.id.in_(ids)).all()
+    return [i for i in itens if isinstance(i, dict)], {c.id: c for c in conferencias}
+
+
+@conferencias_bp.route('/iniciar-lote', methods=['PUT'])
+def iniciar_conferencias_lote():
+    """Inicia várias conferências em uma transação.
+    Corpo: {itens: [{id, conferentes, total_itens}], editor_nome}."""
+    dados = request.get_json() or {}
+    editor_nome = dados.get('editor_nome', 'N/A')
+    itens, conferencias = _carregar_lote(dados.get('itens'))
+    if itens is None:
+        return jsonify({'error': 'Informe as conferências a iniciar.'}), 400
+
+    resultados, alteradas = [], []
+    for item in itens:
+        conferencia = conferencias.get(item.get('id'))
+        if conferencia is None:
+            resultados.append({'id': item.get('id'), 'ok': False, 'error': 'Conferência não encontrada.'})
+            continue
+        _aplicar_inicio(conferencia, item.get('conferentes'), item.get('total_itens', 0))
+        registrar_log(conferencia.id, editor_nome, 'INICIO_CONFERENCIA', log_type='conferencias', commit=False)
+        alteradas.append(conferencia)
+        resultados.append({'id': conferencia.id, 'ok': True})
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao iniciar em lote: {e}'}), 500
+
+    if alteradas:
+        socketio.emit('conferencias_lote', {
+            'acao': 'iniciada',
+            'conferencias': serialize_conferencias(alteradas),
+        })
+    return jsonify({'status': 'success', 'resultados': resultados})
+
+
+@conferencias_bp.route('/finalizar-lote', methods=['PUT'])
+def finalizar_conferencias_lote():
+    """Finaliza várias conferências em uma transação.
+    Corpo: {itens: [{id, tem_pendencia_fornecedor, solicita_alteracao,
+    observacao}], editor_nome}. As notificações de novas pendências saem em
+    lote e a badge é atualizada uma única vez."""
+    dados = request.get_json() or {}
+    editor_nome = dados.get('editor_nome', 'N/A')
+    itens, conferencias = _carregar_lote(dados.get('itens'))
+    if itens is None:
+        return jsonify({'error': 'Informe as conferências a finalizar.'}), 400
+
+    resultados, alteradas, mensagens = [], [], []
+    for item in itens:
+        conferencia = conferencias.get(item.get('id'))
+        if conferencia is None:
+            resultados.append({'id': item.get('id'), 'ok': False, 'error': 'Conferência não encontrada.'})
+            continue
+        tem_pendencia_fornecedor = item.get('tem_pendencia_fornecedor', False)
+        solicita_alteracao = item.get('solicita_alteracao', False)
+        observacao = item.get('observacao', '')
+        erro = _aplicar_finalizacao(conferencia, tem_pendencia_fornecedor, solicita_alteracao, observacao, editor_nome)
+        if erro:
+            resultados.append({'id': conferencia.id, 'ok': False, 'error': erro})
+            continue
+        registrar_log(conferencia.id, editor_nome, f'FINALIZADO_COMO_{conferencia.status.upper()}',
+                      detalhes={'info': observacao}, log_type='conferencias', commit=False)
+        alteradas.append(conferencia)
+        resultados.append({'id': conferencia.id, 'ok': True, 'status': conferencia.status})
+        if tem_pendencia_fornecedor or solicita_alteracao:
+            mensagens.append(_mensagem_nova_pendencia(conferencia, tem_pendencia_fornecedor, solicita_alteracao))
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao finalizar em lote: {e}'}), 500
+
+    if alteradas:
+        socketio.emit('conferencias_lote', {
+            'acao': 'finalizada',
+            'conferencias': serialize_conferencias(alteradas),
+        })
+    if mensagens:
+        destinatarios = [u for u in _destinatarios_pendencia()
+                         if not (u.nome and u.nome == editor_nome)]
+        criar_notificacoes([
+            (u.id, msg, '/pendencias-e-alteracoes') for msg in mensagens for u in destinatarios
+        ])
+        _emitir_pendencias_atualizado()
+
+    return jsonify({'status': 'success', 'resultados': resultados})
+
 # ==========================================
 # 2.1. GESTÃO DE PRIORIDADE (KANBAN + TV)
 # ==========================================
@@ -334,7 +463,7 @@ def get_prioridades_kanban():
         Conferencia.prioridade.isnot(None),
         Conferencia.status.in_(STATUS_OPERACIONAIS)
     ).order_by(Conferencia.data_recebimento.desc()).all()
-    return jsonify([serialize_conferencia(c) for c in itens])
+    return jsonify(serialize_conferencias(itens))
 
 
 @conferencias_bp.route('/prioridades/tv', methods=['GET'])
@@ -354,7 +483,7 @@ def get_prioridades_tv():
         return (em_conf, PRIORIDADES_TV.index(c.prioridade), c.data_recebimento or '')
 
     itens.sort(key=chave)
-    return jsonify([serialize_conferencia(c) for c in itens])
+    return jsonify(serialize_conferencias(itens))
 
 
 @conferencias_bp.route('/<int:conferencia_id>/prioridade', methods=['PUT'])
@@ -386,7 +515,7 @@ def definir_prioridade(conferencia_id):
 def get_pendentes_e_resolvidas():
     itens = Conferencia.query.filter(Conferencia.status.in_(STATUS_PENDENTES))\
         .order_by(Conferencia.data_recebimento.desc()).all()
-    return jsonify([serialize_conferencia(c) for c in itens])
+    return jsonify(serialize_conferencias(itens))
 
 @conferencias_bp.route('/pendencias-count', methods=['GET'])
 def get_pendencias_count():
@@ -419,13 +548,7 @@ def resolver_item_pendencia(conferencia_id):
         conferencia.status = 'Finalizado'
         conferencia.data_finalizacao = datetime.now(tz_cuiaba).isoformat()
 
-    obs_atuais = conferencia.observacoes or []
-    obs_atuais.append({
-        'texto': f"[RESOLVIDO] {observacao}", 
-        'autor': editor_nome,
-        'timestamp': datetime.now(tz_cuiaba).isoformat()
-    })
-    conferencia.observacoes = list(obs_atuais)
+    observacoes.adicionar('conferencia', conferencia_id, f"[RESOLVIDO] {observacao}", editor_nome)
     db.session.commit()
     registrar_log(conferencia_id, editor_nome, log_acao, detalhes={'info': observacao}, log_type='conferencias')
     socketio.emit('item_pendencia_resolvido', {'conferencia': serialize_conferencia(conferencia)})
@@ -445,11 +568,10 @@ def adicionar_observacao(conferencia_id):
     editor_nome = dados.get('autor', 'N/A')
     texto = dados.get('texto', '')
     conferencia = Conferencia.query.get_or_404(conferencia_id)
-    obs_atuais = conferencia.observacoes or []
-    obs_atuais.append({'texto': texto, 'autor': editor_nome, 'timestamp': datetime.now(tz_cuiaba).isoformat()})
-    conferencia.observacoes = list(obs_atuais)
+    nota = observacoes.adicionar('conferencia', conferencia_id, texto, editor_nome)
     db.session.commit()
-    socketio.emit('observacao_adicionada', {'conferencia_id': conferencia_id, 'observacao': obs_atuais[-1]})
+    socketio.emit('observacao_adicionada', {'conferencia_id': conferencia_id,
+                                            'observacao': observacoes.serialize_observacao(nota)})
 
     # Nova adição numa pendência: notifica os responsáveis (exceto o autor).
     if conferencia.status in STATUS_PENDENTES:
@@ -462,35 +584,41 @@ def adicionar_observacao(conferencia_id):
 _PREFIXOS_SISTEMA = ('[RESOLVIDO]', '[DIVERGÊNCIA]', '[OBS INICIAL]')
 
 
-@conferencias_bp.route('/<int:conferencia_id>/observacao/<int:indice>', methods=['PUT'])
-def editar_observacao(conferencia_id, indice):
-    """Edita o texto de UMA observação (identificada pelo índice na lista).
-    Só observações comuns (sem prefixo de sistema) podem ser editadas."""
+@conferencias_bp.route('/<int:conferencia_id>/observacao/<int:seq>', methods=['PUT'])
+def editar_observacao(conferencia_id, seq):
+    """Edita o texto de UMA observação (identificada pelo seq). O texto
+    anterior fica no histórico de edições. Só observações comuns (sem prefixo
+    de sistema) podem ser editadas."""
     dados = request.get_json() or {}
     novo_texto = (dados.get('texto') or '').strip()
     editor_nome = dados.get('autor', 'N/A')
     if not novo_texto:
         return jsonify({'error': 'O texto não pode ficar vazio.'}), 400
 
-    conferencia = Conferencia.query.get_or_404(conferencia_id)
-    obs_atuais = list(conferencia.observacoes or [])
-    if indice < 0 or indice >= len(obs_atuais):
+    Conferencia.query.get_or_404(conferencia_id)
+    nota = observacoes.buscar('conferencia', conferencia_id, seq)
+    if nota is None:
         return jsonify({'error': 'Observação não encontrada.'}), 404
 
-    texto_atual = (obs_atuais[indice].get('texto') or '').strip()
-    if texto_atual.startswith(_PREFIXOS_SISTEMA):
+    if (nota.texto or '').strip().startswith(_PREFIXOS_SISTEMA):
         return jsonify({'error': 'Esta observação é do sistema e não pode ser editada.'}), 403
 
-    obs_atuais[indice]['texto'] = novo_texto
-    obs_atuais[indice]['editado_em'] = datetime.now(tz_cuiaba).isoformat()
-    obs_atuais[indice]['editado_por'] = editor_nome
-    conferencia.observacoes = obs_atuais
+    observacoes.editar(nota, novo_texto, editor_nome)
     db.session.commit()
     registrar_log(conferencia_id, editor_nome, 'OBSERVACAO_EDITADA',
                   detalhes={'info': novo_texto}, log_type='conferencias')
     socketio.emit('observacao_adicionada', {'conferencia_id': conferencia_id})
     return jsonify({'status': 'success'})
 
+
+@conferencias_bp.route('/<int:conferencia_id>/observacao/<int:seq>/historico', methods=['GET'])
+def historico_observacao(conferencia_id, seq):
+    """Textos anteriores de uma observação editada."""
+    nota = observacoes.buscar('conferencia', conferencia_id, seq)
+    if nota is None:
+        return jsonify({'error': 'Observação não encontrada.'}), 404
+    return jsonify(observacoes.historico_edicoes(nota))
+
 # ==========================================
 # 4. HISTÓRICO DE CONFERÊNCIAS
 # ==========================================
@@ -513,11 +641,15 @@ def get_historico_conferencias():
             query = query.filter(Conferencia.data_finalizacao <= filtros['dataFim'] + 'T23:59:59')
         if filtros.get('apenas_resolvidas'):
             # Pendências resolvidas têm uma observação com prefixo [RESOLVIDO].
-            # observacoes é JSON (texto no SQLite); LIKE no texto serializado funciona.
-            query = query.filter(cast(Conferencia.observacoes, String).like('%[RESOLVIDO]%'))
+            query = query.filter(exists().where(
+                Observacao.entidade == 'conferencia',
+                Observacao.entidade_id == Conferencia.id,
+                Observacao.excluida_em.is_(None),
+                Observacao.texto.like('[RESOLVIDO]%'),
+            ))
 
         pagination = query.order_by(Conferencia.data_finalizacao.desc()).paginate(page=page + 1, per_page=limit, error_out=False)
-        return jsonify({'conferencias': [serialize_conferencia(c) for c in pagination.items], 'temMais': pagination.has_next})
+        return jsonify({'conferencias': serialize_conferencias(pagination.items), 'temMais': pagination.has_next})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -531,9 +663,7 @@ def reiniciar_conferencia(conferencia_id):
     conferencia.data_conferencia_finalizada = None 
     conferencia.resolvido_gestor = False
     conferencia.resolvido_contabilidade = False
-    obs_atuais = conferencia.observacoes or []
-    obs_atuais.append({'texto': f"[REINICIADO] {motivo}", 'autor': autor, 'timestamp': datetime.now(tz_cuiaba).isoformat()})
-    conferencia.observacoes = list(obs_atuais)
+    observacoes.adicionar('conferencia', conferencia_id, f"[REINICIADO] {motivo}", autor)
     db.session.commit()
     registrar_log(conferencia_id, autor, 'CONFERENCIA_REINICIADA', detalhes={'info': motivo}, log_type='conferencias')
     socketio.emit('conferencia_reiniciada', {'conferencia': serialize_conferencia(conferencia)})
@@ -547,7 +677,9 @@ def reiniciar_conferencia(conferencia_id):
 @conferencias_bp.route('/<int:conferencia_id>', methods=['GET'])
 def get_conferencia_detalhes(conferencia_id):
     c = Conferencia.query.get_or_404(conferencia_id)
-    return jsonify(serialize_conferencia(c))
+    dados = serialize_conferencia(c)
+    dados['observacoes'] = observacoes.listar('conferencia', c.id)
+    return jsonify(dados)
 
 @conferencias_bp.route('/<int:conferencia_id>', methods=['PUT'])
 def editar_conferencia(conferencia_id):
@@ -565,55 +697,65 @@ def editar_conferencia(conferencia_id):
 def deletar_conferencia(conferencia_id):
     editor_nome = request.json.get('editor_nome', 'N/A')
     conferencia = Conferencia.query.get_or_404(conferencia_id)
-    db.session.add(ItemExcluido(tipo_item='Conferencia', item_id_original=str(conferencia.id), dados_item=serialize_conferencia(conferencia), excluido_por=editor_nome, data_exclusao=datetime.now(tz_cuiaba).isoformat()))
+    db.session.add(ItemExcluido(tipo_item='Conferencia', item_id_original=str(conferencia.id), dados_item=_dados_lixeira(conferencia), excluido_por=editor_nome, data_exclusao=datetime.now(tz_cuiaba).isoformat()))
     db.session.delete(conferencia)
     db.session.commit()
     socketio.emit('conferencia_deletada', {'conferencia_id': conferencia_id})
     return jsonify({'status': 'success'})
 
+def calcular_dashboard_conferencias(filtros):
+    """Produtividade dos conferentes e volume por fornecedor no período
+    (dashboard de conferências e relatórios agendados)."""
+    data_inicio = filtros.get('dataInicio')
+    data_fim = filtros.get('dataFim')
+    query = Conferencia.query.filter(Conferencia.data_conferencia_finalizada.isnot(None))
+    if data_inicio: query = query.filter(Conferencia.data_conferencia_finalizada >= data_inicio)
+    if data_fim: query = query.filter(Conferencia.data_conferencia_finalizada <= data_fim + 'T23:59:59')
+    conferencias = query.all()
+    # Fornecedores agrupados pelo cadastro (fornecedor_id), com o nome de lá.
+    ids_fornecedor = {conf.fornecedor_id for conf in conferencias if conf.fornecedor_id}
+    nomes_fornecedor = dict(db.session.query(Fornecedor.id, Fornecedor.nome)
+                            .filter(Fornecedor.id.in_(ids_fornecedor)).all()) if ids_fornecedor else {}
+    conferente_stats, fornecedor_stats = {}, {}
+    for conf in conferencias:
+        forn_nome = nomes_fornecedor.get(conf.fornecedor_id) or conf.nome_fornecedor or "N/A"
+        f_stats = fornecedor_stats.setdefault(conf.fornecedor_id or forn_nome, {'nome': forn_nome, 'count': 0, 'volumes': 0, 'divergencias': 0})
+        f_stats['count'] += 1
+        f_stats['volumes'] += (conf.qtd_volumes or 0)
+        if conf.status.startswith('Pendente'): f_stats['divergencias'] += 1
+
+        c_list = conf.conferentes or []
+        num = len(c_list)
+        if num > 0:
+            # Distribui volumes e itens em valores inteiros (mesma regra do
+            # dashboard de separação): cada conferente recebe a parte inteira
+            # e o resto é distribuído de um em um, evitando dízimas quebradas.
+            vol_total = conf.qtd_volumes or 0
+            itens_total = conf.total_itens or 0
+            base_vol, resto_vol = divmod(vol_total, num)
+            base_itens, resto_itens = divmod(itens_total, num)
+            for i, nome in enumerate(c_list):
+                c_stats = conferente_stats.setdefault(nome, {'nome': nome, 'count': 0, 'volumes': 0, 'total_itens': 0, 'total_seconds': 0, 'items_for_avg': 0})
+                c_stats['count'] += 1
+                c_stats['volumes'] += base_vol + (1 if i < resto_vol else 0)
+                c_stats['total_itens'] += base_itens + (1 if i < resto_itens else 0)
+
+    # Garante valores inteiros na saída, igual ao dashboard de separação.
+    for data in conferente_stats.values():
+        data['volumes'] = round(data['volumes'])
+        data['total_itens'] = round(data['total_itens'])
+
+    return {
+        'conferentes': sorted(conferente_stats.values(), key=lambda x: x['count'], reverse=True),
+        'fornecedores': sorted(fornecedor_stats.values(), key=lambda x: x['count'], reverse=True)
+    }
+
+
 @conferencias_bp.route('/dashboard-data', methods=['POST'])
 def get_dashboard_conferencia_data():
     filtros = request.get_json() or {}
-    data_inicio = filtros.get('dataInicio')
-    data_fim = filtros.get('dataFim')
     try:
-        query = Conferencia.query.filter(Conferencia.data_conferencia_finalizada.isnot(None))
-        if data_inicio: query = query.filter(Conferencia.data_conferencia_finalizada >= data_inicio)
-        if data_fim: query = query.filter(Conferencia.data_conferencia_finalizada <= data_fim + 'T23:59:59')
-        conferencias = query.all()
-        conferente_stats, fornecedor_stats = {}, {}
-        for conf in conferencias:
-            forn_nome = conf.nome_fornecedor or "N/A"
-            f_stats = fornecedor_stats.setdefault(forn_nome, {'nome': forn_nome, 'count': 0, 'volumes': 0, 'divergencias': 0})
-            f_stats['count'] += 1
-            f_stats['volumes'] += (conf.qtd_volumes or 0)
-            if conf.status.startswith('Pendente'): f_stats['divergencias'] += 1
-            
-            c_list = conf.conferentes or []
-            num = len(c_list)
-            if num > 0:
-                # Distribui volumes e itens em valores inteiros (mesma regra do
-                # dashboard de separação): cada conferente recebe a parte inteira
-                # e o resto é distribuído de um em um, evitando dízimas quebradas.
-                vol_total = conf.qtd_volumes or 0
-                itens_total = conf.total_itens or 0
-                base_vol, resto_vol = divmod(vol_total, num)
-                base_itens, resto_itens = divmod(itens_total, num)
-                for i, nome in enumerate(c_list):
-                    c_stats = conferente_stats.setdefault(nome, {'nome': nome, 'count': 0, 'volumes': 0, 'total_itens': 0, 'total_seconds': 0, 'items_for_avg': 0})
-                    c_stats['count'] += 1
-                    c_stats['volumes'] += base_vol + (1 if i < resto_vol else 0)
-                    c_stats['total_itens'] += base_itens + (1 if i < resto_itens else 0)
-
-        # Garante valores inteiros na saída, igual ao dashboard de separação.
-        for data in conferente_stats.values():
-            data['volumes'] = round(data['volumes'])
-            data['total_itens'] = round(data['total_itens'])
-
-        return jsonify({
-            'conferentes': sorted(conferente_stats.values(), key=lambda x: x['count'], reverse=True),
-            'fornecedores': sorted(fornecedor_stats.values(), key=lambda x: x['count'], reverse=True)
-        })
+        return jsonify(calcular_dashboard_conferencias(filtros))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1,11 +1,12 @@
 # quadro_app/blueprints/dashboard.py
 from flask import Blueprint, request, jsonify, Response
 from datetime import datetime
-from sqlalchemy import or_, func
+from sqlalchemy import or_, func, case
 import io
 import csv
 from ..extensions import db, tz_cuiaba
 from quadro_app.models import Pedido, Sugestao, Separacao, Conferencia
+from ..relatorios import responder_relatorio, texto_periodo
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api')
 
@@ -169,137 +170,84 @@ def get_dashboard_data():
         print(f"ERRO ao gerar dados do dashboard: {e}")
         return jsonify({'error': str(e)}), 500
 
-@dashboard_bp.route('/relatorio', methods=['POST'])
-def gerar_relatorio_endpoint():
-    filtros = request.get_json() or {}
-    try:
-        query = Pedido.query.filter(or_(
-            Pedido.status == 'OK', 
-            Pedido.status == 'Finalizado',
-            Pedido.status == 'A Caminho'
+def _query_relatorio(filtros):
+    """Pedidos considerados nos relatórios (OK, Finalizado, A Caminho) com os
+    filtros da tela de histórico."""
+    query = Pedido.query.filter(Pedido.status.in_(['OK', 'Finalizado', 'A Caminho']))
+
+    if filtros.get('vendedor'):
+        query = query.filter(Pedido.vendedor.ilike(f"%{filtros['vendedor']}%"))
+    if filtros.get('comprador'):
+        query = query.filter(Pedido.comprador.ilike(f"%{filtros['comprador']}%"))
+    if filtros.get('dataInicio'):
+        query = query.filter(Pedido.data_criacao >= filtros['dataInicio'])
+    if filtros.get('dataFim'):
+        query = query.filter(Pedido.data_criacao <= filtros['dataFim'] + 'T23:59:59')
+    if filtros.get('codigo'):
+        termo_codigo = f"%{filtros['codigo']}%"
+        query = query.filter(or_(
+            Pedido.codigo.ilike(termo_codigo),
+            db.cast(Pedido.itens, db.String).ilike(termo_codigo)
         ))
+    return query
+
+
+def _stats_por(query, coluna):
+    """[[nome, {total, pedidos_rua, orcamentos, a_caminho}], ...] por nome,
+    num único GROUP BY."""
+    orcamentos = func.sum(case((Pedido.tipo_req == 'Atualização Orçamento', 1), else_=0))
+    a_caminho = func.sum(case((Pedido.status == 'A Caminho', 1), else_=0))
+    linhas = (query.filter(coluna.isnot(None), coluna != '')
+              .with_entities(coluna, func.count(Pedido.id), orcamentos, a_caminho)
+              .group_by(coluna).order_by(coluna).all())
+    return [[nome, {'total': total, 'pedidos_rua': total - orc, 'orcamentos': orc, 'a_caminho': ac}]
+            for nome, total, orc, ac in linhas]
+
+
+def dados_relatorio_pedidos(filtros):
+    """Estatísticas do relatório de pedidos (contexto do template
+    relatorios/pedidos.txt). Só listas e dicts: também é gravado nos
+    snapshots dos relatórios agendados."""
+    query = _query_relatorio(filtros)
+    total, total_a_caminho = query.with_entities(
+        func.count(Pedido.id), func.sum(case((Pedido.status == 'A Caminho', 1), else_=0))
+    ).one()
+
+    filtros_info = []
+    if filtros.get('vendedor'): filtros_info.append(f"Vendedor: {filtros['vendedor']}")
+    if filtros.get('comprador'): filtros_info.append(f"Comprador: {filtros['comprador']}")
+    if filtros.get('codigo'): filtros_info.append(f"Código: {filtros['codigo']}")
+    filtros_info.append(f"Período: {texto_periodo(filtros)}")
 
-        if filtros.get('vendedor'):
-            query = query.filter(Pedido.vendedor.ilike(f"%{filtros['vendedor']}%"))
-        if filtros.get('comprador'):
-            query = query.filter(Pedido.comprador.ilike(f"%{filtros['comprador']}%"))
-        
-        if filtros.get('dataInicio'):
-            query = query.filter(Pedido.data_criacao >= filtros['dataInicio'])
-        if filtros.get('dataFim'):
-            query = query.filter(Pedido.data_criacao <= filtros['dataFim'] + 'T23:59:59')
-            
-        if filtros.get('codigo'):
-            termo_codigo = f"%{filtros['codigo']}%"
-            query = query.filter(or_(
-                Pedido.codigo.ilike(termo_codigo),
-                db.cast(Pedido.itens, db.String).ilike(termo_codigo)
-            ))
-
-        pedidos_filtrados = query.all()
+    return {
+        'filtros_texto': ", ".join(filtros_info),
+        'total': total,
+        'total_a_caminho': total_a_caminho or 0,
+        'por_vendedor': _stats_por(query, Pedido.vendedor) if total else [],
+        'por_comprador': _stats_por(query, Pedido.comprador) if total else [],
+    }
 
-        if not pedidos_filtrados:
-            return jsonify({'relatorio': "Nenhum dado encontrado para o relatório com os filtros aplicados."})
 
-        stats = {
-            'totalPedidos': len(pedidos_filtrados),
-            'totalACaminho': 0,
-            'porVendedor': {},
-            'porComprador': {}
-        }
-        
-        for pedido in pedidos_filtrados:
-            if pedido.status == 'A Caminho':
-                stats['totalACaminho'] += 1
+def responder_relatorio_pedidos(formato, dados, gerado_em=None):
+    linhas_csv = [
+        [grupo, nome, d['total'], d['pedidos_rua'], d['orcamentos'], d['a_caminho']]
+        for grupo, stats in (('Vendedor', dados['por_vendedor']), ('Comprador', dados['por_comprador']))
+        for nome, d in stats
+    ]
+    return responder_relatorio(
+        formato, 'relatorios/pedidos.txt', 'relatorio_pedidos',
+        ['Grupo', 'Nome', 'Total', 'Pedidos de Rua', 'Atualizações de Orçamento', 'A Caminho'],
+        linhas_csv, gerado_em=gerado_em, **dados
+    )
 
-            vendedor, comprador, tipo_req = pedido.vendedor, pedido.comprador, pedido.tipo_req
-            
-            if vendedor:
-                # Inicializa estrutura se não existir, AGORA COM 'aCaminho'
-                stats['porVendedor'].setdefault(vendedor, {'total': 0, 'pedidosRua': 0, 'orcamentos': 0, 'aCaminho': 0})
-                
-                stats['porVendedor'][vendedor]['total'] += 1
-                if tipo_req == 'Atualização Orçamento': 
-                    stats['porVendedor'][vendedor]['orcamentos'] += 1
-                else: 
-                    stats['porVendedor'][vendedor]['pedidosRua'] += 1
-                
-                # Conta 'A Caminho' para este vendedor
-                if pedido.status == 'A Caminho':
-                    stats['porVendedor'][vendedor]['aCaminho'] += 1
-            
-            if comprador:
-                # Inicializa estrutura para comprador também
-                stats['porComprador'].setdefault(comprador, {'total': 0, 'pedidosRua': 0, 'orcamentos': 0, 'aCaminho': 0})
-                
-                stats['porComprador'][comprador]['total'] += 1
-                if tipo_req == 'Atualização Orçamento': 
-                    stats['porComprador'][comprador]['orcamentos'] += 1
-                else: 
-                    stats['porComprador'][comprador]['pedidosRua'] += 1
-
-                # Conta 'A Caminho' para este comprador
-                if pedido.status == 'A Caminho':
-                    stats['porComprador'][comprador]['aCaminho'] += 1
-
-         # --- GERAÇÃO DO TEXTO DO RELATÓRIO (MODIFICADO) ---
-        report_lines = []
-        now = datetime.now(tz_cuiaba)
-        
-        # Montar string de filtros aplicados
-        filtros_info = []
-        if filtros.get('vendedor'): filtros_info.append(f"Vendedor: {filtros['vendedor']}")
-        if filtros.get('comprador'): filtros_info.append(f"Comprador: {filtros['comprador']}")
-        if filtros.get('codigo'): filtros_info.append(f"Código: {filtros['codigo']}")
-        
-        data_str = "Todo o período"
-        if filtros.get('dataInicio') and filtros.get('dataFim'):
-            data_str = f"De {filtros['dataInicio']} até {filtros['dataFim']}"
-        elif filtros.get('dataInicio'):
-            data_str = f"A partir de {filtros['dataInicio']}"
-        elif filtros.get('dataFim'):
-            data_str = f"Até {filtros['dataFim']}"
-        filtros_info.append(f"Período: {data_str}")
-
-        filtros_texto = ", ".join(filtros_info)
-
-        header = f"""
-========================================
-         RELATÓRIO DE PEDIDOS
-========================================
-Gerado em: {now.strftime('%d/%m/%Y %H:%M:%S')}
-Filtros Aplicados: {filtros_texto}
-----------------------------------------
-Total de Pedidos Analisados: {stats['totalPedidos']}
-> A Caminho: {stats['totalACaminho']}
-----------------------------------------
-"""
-        report_lines.append(header.strip())
-        report_lines.append("\nREQUISIÇÕES POR VENDEDOR:")
-        vendedores = sorted(stats['porVendedor'].keys())
-        for vendedor in vendedores:
-            data = stats['porVendedor'][vendedor]
-            report_lines.append(f"  - {vendedor} ({data['total']} total):")
-            report_lines.append(f"    - {data['pedidosRua']} Pedido(s) de Rua")
-            report_lines.append(f"    - {data['orcamentos']} Atualização(ões) de Orçamento")
-            # NOVA LINHA NO RELATÓRIO
-            if data['aCaminho'] > 0:
-                report_lines.append(f"    > {data['aCaminho']} A Caminho")
-        
-        report_lines.append("\n----------------------------------------\n")
-        report_lines.append("ATENDIMENTOS POR COMPRADOR:")
-        compradores = sorted(stats['porComprador'].keys())
-        for comprador in compradores:
-            data = stats['porComprador'][comprador]
-            report_lines.append(f"  - {comprador} ({data['total']} total):")
-            report_lines.append(f"    - {data['pedidosRua']} Pedido(s) de Rua")
-            report_lines.append(f"    - {data['orcamentos']} Atualização(ões) de Orçamento")
-            # NOVA LINHA NO RELATÓRIO
-            if data['aCaminho'] > 0:
-                report_lines.append(f"    > {data['aCaminho']} A Caminho")
-
-        return jsonify({'relatorio': '\n'.join(report_lines)})
 
+@dashboard_bp.route('/relatorio', methods=['POST'])
+def gerar_relatorio_endpoint():
+    """Relatório de pedidos por vendedor e comprador: pré-visualização (JSON)
+    ou download com 'formato': 'txt' | 'csv' (ver relatorios.py)."""
+    filtros = request.get_json() or {}
+    try:
+        return responder_relatorio_pedidos(filtros.get('formato'), dados_relatorio_pedidos(filtros))
     except Exception as e:
         return jsonify({'error': f"Erro ao gerar relatório: {e}"}), 500
 
@@ -307,33 +255,10 @@ Total de Pedidos Analisados: {stats['totalPedidos']}
 def gerar_relatorio_csv():
     filtros = request.get_json() or {}
     try:
-        # Busca pedidos com status válidos (OK, Finalizado, A Caminho)
-        query = Pedido.query.filter(or_(
-            Pedido.status == 'OK', 
-            Pedido.status == 'Finalizado', 
-            Pedido.status == 'A Caminho'
-        ))
-
         # --- CORREÇÃO: FILTRA SOMENTE PEDIDOS DE PEÇA (RUA) ---
-        query = query.filter(Pedido.tipo_req == 'Pedido Produto')
+        query = _query_relatorio(filtros).filter(Pedido.tipo_req == 'Pedido Produto')
         # ------------------------------------------------------
 
-        # Aplica os filtros recebidos do frontend
-        if filtros.get('vendedor'): 
-            query = query.filter(Pedido.vendedor.ilike(f"%{filtros['vendedor']}%"))
-        if filtros.get('comprador'): 
-            query = query.filter(Pedido.comprador.ilike(f"%{filtros['comprador']}%"))
-        if filtros.get('dataInicio'): 
-            query = query.filter(Pedido.data_criacao >= filtros['dataInicio'])
-        if filtros.get('dataFim'): 
-            query = query.filter(Pedido.data_criacao <= filtros['dataFim'] + 'T23:59:59')
-        if filtros.get('codigo'):
-            termo = f"%{filtros['codigo']}%"
-            query = query.filter(or_(
-                Pedido.codigo.ilike(termo), 
-                db.cast(Pedido.itens, db.String).ilike(termo)
-            ))
-
         pedidos = query.all()
 
         # Agrega itens (Soma as quantidades)
@@ -378,16 +303,6 @@ def gerar_relatorio_csv():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@dashboard_bp.route('/download-relatorio', methods=['POST'])
-def download_relatorio():
-    report_content = request.data.decode('utf-8')
-    filename = f"relatorio_pedidos_{datetime.now(tz_cuiaba).strftime('%Y-%m-%d')}.txt"
-    return Response(
-        report_content,
-        mimetype="text/plain",
-        headers={"Content-disposition": f"attachment; filename={filename}"}
-    )
-
 @dashboard_bp.route('/resumo-operacional', methods=['GET'])
 def get_resumo_operacional():
     try:
@@ -1,19 +1,22 @@
 # quadro_app/blueprints/estoque.py
-import os
-import uuid
 from datetime import datetime
 
 from flask import Blueprint, request, jsonify, current_app, session
-from sqlalchemy import func
+from sqlalchemy import func, case, or_, and_
+from sqlalchemy.orm import selectinload
 from ..extensions import db, tz_cuiaba
 from ..models import AjusteEstoque, CampanhaAjuste, Usuario
 from ..utils import registrar_log
+from ..fotos import (
+    FotoInvalida, preparar_upload, agendar_processamento, aplicar_processada,
+    remover_se_orfas, uso_disco, verificar_integridade,
+)
 from quadro_app import socketio
+from quadro_app.monitor_sql import orcamento_sql
 
 estoque_bp = Blueprint('estoque', __name__, url_prefix='/api/estoque')
 
 ALLOWED_EXT = {'jpg', 'jpeg', 'png', 'webp'}
-UPLOAD_SUBDIR = os.path.join('uploads', 'pecas')
 
 
 def serialize_ajuste(a):
@@ -36,13 +39,50 @@ def serialize_ajuste(a):
         'data_aprovacao': a.data_aprovacao,
         'observacao_gerente': a.observacao_gerente,
         'foto_url': f"/static/{a.foto_path}" if a.foto_path else None,
+        # Fotos antigas (antes do pipeline) não têm miniatura: usa a original.
+        'thumb_url': f"/static/{a.foto_thumb_path or a.foto_path}" if a.foto_path else None,
         'foto_cadastrada_no_erp': a.foto_cadastrada_no_erp,
         'foto_cadastrada_em': a.foto_cadastrada_em,
         'foto_cadastrada_por': a.foto_cadastrada_por,
     }
 
 
-def serialize_campanha(c, incluir_stats=True, incluir_ajustadores=True):
+STATUS_AJUSTE = ('Pendente', 'Ajustado', 'Cancelado')
+
+
+def _subquery_stats_campanhas():
+    """Contagem de ajustes por status de todas as campanhas em um único
+    GROUP BY, para ser usada em LEFT JOIN na listagem de campanhas."""
+    colunas = [
+        func.sum(case((AjusteEstoque.status == st, 1), else_=0)).label(st)
+        for st in STATUS_AJUSTE
+    ]
+    return (
+        db.session.query(AjusteEstoque.campanha_id.label('campanha_id'), *colunas)
+        .group_by(AjusteEstoque.campanha_id)
+        .subquery()
+    )
+
+
+def _listar_com_stats(query):
+    """Executa a query de campanhas já trazendo as estatísticas (LEFT JOIN) e
+    os ajustadores (selectin): número constante de queries para N campanhas."""
+    sq = _subquery_stats_campanhas()
+    linhas = (
+        query.outerjoin(sq, sq.c.campanha_id == CampanhaAjuste.id)
+        .add_columns(*(sq.c[st] for st in STATUS_AJUSTE))
+        .options(selectinload(CampanhaAjuste.ajustadores))
+        .all()
+    )
+    resultado = []
+    for c, *contagens in linhas:
+        stats = {st: int(n or 0) for st, n in zip(STATUS_AJUSTE, contagens)}
+        stats['total'] = sum(stats.values())
+        resultado.append(serialize_campanha(c, stats=stats))
+    return resultado
+
+
+def serialize_campanha(c, incluir_stats=True, incluir_ajustadores=True, stats=None):
     d = {
         'id': c.id,
         'nome': c.nome,
@@ -60,7 +100,9 @@ def serialize_campanha(c, incluir_stats=True, incluir_ajustadores=True):
             {'id': u.id, 'nome': u.nome or u.email, 'email': u.email, 'role': u.role}
             for u in c.ajustadores
         ]
-    if incluir_stats:
+    if incluir_stats and stats is not None:
+        d['stats'] = stats
+    elif incluir_stats:
         rows = (
             db.session.query(AjusteEstoque.status, func.count(AjusteEstoque.id))
             .filter(AjusteEstoque.campanha_id == c.id)
@@ -75,19 +117,15 @@ def serialize_campanha(c, incluir_stats=True, incluir_ajustadores=True):
     return d
 
 
-def _save_upload(file_storage):
-    """Valida e salva foto. Retorna caminho relativo a static/ ou None."""
+def _preparar_foto(file_storage):
+    """Valida a foto pela extensão e pelo conteúdo. Retorna FotoPendente ou
+    None (sem foto); levanta FotoInvalida."""
     if not file_storage or not file_storage.filename:
         return None
     ext = file_storage.filename.rsplit('.', 1)[-1].lower()
     if ext not in ALLOWED_EXT:
-        return None
-    unique = f"{uuid.uuid4().hex}.{ext}"
-    abs_dir = os.path.join(current_app.static_folder, UPLOAD_SUBDIR)
-    os.makedirs(abs_dir, exist_ok=True)
-    abs_path = os.path.join(abs_dir, unique)
-    file_storage.save(abs_path)
-    return f"uploads/pecas/{unique}"
+        raise FotoInvalida('Formato de foto nao suportado (use jpg, png ou webp).')
+    return preparar_upload(file_storage, current_app.static_folder)
 
 
 def _get_usuario_sessao():
@@ -111,6 +149,7 @@ def _usuario_pode_aprovar(usuario):
 # ============================================================
 
 @estoque_bp.route('/campanhas', methods=['GET'])
+@orcamento_sql(3)
 def listar_campanhas():
     """Lista campanhas. Filtro opcional ?status=Ativa|Finalizada."""
     query = CampanhaAjuste.query
@@ -122,10 +161,11 @@ def listar_campanhas():
         CampanhaAjuste.status.asc(),
         CampanhaAjuste.data_inicio.desc(),
     )
-    return jsonify([serialize_campanha(c) for c in query.all()])
+    return jsonify(_listar_com_stats(query))
 
 
 @estoque_bp.route('/campanhas/minhas-ativas', methods=['GET'])
+@orcamento_sql(4)
 def listar_minhas_campanhas_ativas():
     """Campanhas Ativas onde o usuario logado e ajustador."""
     usuario = _get_usuario_sessao()
@@ -135,6 +175,7 @@ def listar_minhas_campanhas_ativas():
         CampanhaAjuste.query
         .filter(CampanhaAjuste.status == 'Ativa')
         .filter(CampanhaAjuste.ajustadores.any(Usuario.id == usuario.id))
+        .options(selectinload(CampanhaAjuste.ajustadores))
         .order_by(CampanhaAjuste.data_inicio.desc())
         .all()
     )
@@ -280,17 +321,26 @@ def excluir_campanha(campanha_id):
         }), 409
 
     total_ajustes = AjusteEstoque.query.filter_by(campanha_id=campanha_id).count()
+    fotos = [
+        p for linha in db.session.query(AjusteEstoque.foto_path, AjusteEstoque.foto_thumb_path)
+        .filter_by(campanha_id=campanha_id).all() for p in linha
+    ]
     AjusteEstoque.query.filter_by(campanha_id=campanha_id).delete(synchronize_session=False)
 
     nome_campanha = campanha.nome
     db.session.delete(campanha)
     db.session.commit()
 
+    # Apaga do disco as fotos que ficaram sem nenhum ajuste (as compartilhadas
+    # com ajustes de outras campanhas continuam).
+    fotos_removidas = remover_se_orfas(current_app.static_folder, fotos)
+
     registrar_log(
         campanha_id,
         usuario.nome or usuario.email,
         'CAMPANHA_EXCLUIDA',
-        detalhes={'nome': nome_campanha, 'ajustes_excluidos': total_ajustes},
+        detalhes={'nome': nome_campanha, 'ajustes_excluidos': total_ajustes,
+                  'fotos_removidas': fotos_removidas},
         log_type='estoque',
     )
     socketio.emit('campanha_ajuste_excluida', {'id': campanha_id, 'nome': nome_campanha})
@@ -342,7 +392,11 @@ def criar_ajuste():
     if not any(u.id == usuario.id for u in campanha.ajustadores):
         return jsonify({'error': 'Voce nao esta vinculado a esta campanha.'}), 403
 
-    foto_path = _save_upload(request.files.get('foto'))
+    try:
+        foto = _preparar_foto(request.files.get('foto'))
+    except FotoInvalida as e:
+        return jsonify({'error': str(e)}), 400
+    foto_path, foto_thumb_path = foto.caminhos_iniciais() if foto else (None, None)
 
     ajuste = AjusteEstoque(
         campanha_id=campanha.id,
@@ -357,10 +411,26 @@ def criar_ajuste():
         criado_por_role=usuario.role,
         data_criacao=datetime.now(tz_cuiaba).isoformat(),
         foto_path=foto_path,
+        foto_thumb_path=foto_thumb_path,
     )
     db.session.add(ajuste)
     db.session.commit()
 
+    if foto and foto_path == foto.original_path and foto.thumb_path:
+        # Redimensionamento/miniatura rodam fora do request; até lá o ajuste
+        # serve o original. Quando terminar, os ajustes passam para a versão
+        # processada e as telas recebem cada um de novo para recarregar a imagem.
+        app = current_app._get_current_object()
+
+        def _foto_pronta():
+            with app.app_context():
+                for a_id in aplicar_processada(foto):
+                    a = db.session.get(AjusteEstoque, a_id)
+                    if a:
+                        socketio.emit('ajuste_estoque_atualizado', serialize_ajuste(a))
+
+        agendar_processamento(foto, _foto_pronta)
+
     registrar_log(
         ajuste.id,
         ajuste.criado_por,
@@ -418,6 +488,90 @@ def listar_ajustes():
     return jsonify([serialize_ajuste(a) for a in query.limit(limit).all()])
 
 
+GALERIA_LIMITE_PADRAO = 48
+GALERIA_LIMITE_MAXIMO = 200
+
+
+def _item_galeria(row):
+    """Projeção compacta de um ajuste para o card da galeria."""
+    return {
+        'id': row.id,
+        'codigo': row.codigo,
+        'marca': row.marca,
+        'thumb_url': f"/static/{row.foto_thumb_path or row.foto_path}",
+        'foto_url': f"/static/{row.foto_path}",
+        'foto_cadastrada_no_erp': bool(row.foto_cadastrada_no_erp),
+        'foto_cadastrada_por': row.foto_cadastrada_por,
+        'criado_por': row.criado_por,
+        'data_criacao': row.data_criacao,
+    }
+
+
+def _ler_cursor_galeria(cursor):
+    """Cursor = '<data_criacao>|<id>' do último item da página anterior."""
+    data_criacao, _, ajuste_id = cursor.rpartition('|')
+    return data_criacao, int(ajuste_id)
+
+
+@estoque_bp.route('/galeria', methods=['GET'])
+@orcamento_sql(1)
+def listar_galeria():
+    """
+    Fotos de peças para a galeria, mais novas primeiro, em páginas por cursor.
+    Filtros: ?cadastrada_no_erp=0|1, ?campanha_id=<id>.
+    Paginação: ?limit=<n> e ?cursor=<proximo_cursor da página anterior>.
+    Retorna {itens, proximo_cursor}; proximo_cursor é null na última página.
+    """
+    query = db.session.query(
+        AjusteEstoque.id, AjusteEstoque.codigo, AjusteEstoque.marca,
+        AjusteEstoque.foto_path, AjusteEstoque.foto_thumb_path,
+        AjusteEstoque.foto_cadastrada_no_erp, AjusteEstoque.foto_cadastrada_por,
+        AjusteEstoque.criado_por, AjusteEstoque.data_criacao,
+    ).filter(AjusteEstoque.foto_path.isnot(None))
+
+    campanha_id = request.args.get('campanha_id')
+    if campanha_id:
+        try:
+            query = query.filter(AjusteEstoque.campanha_id == int(campanha_id))
+        except ValueError:
+            return jsonify({'error': 'campanha_id invalido.'}), 400
+
+    cad_erp = request.args.get('cadastrada_no_erp')
+    if cad_erp in ('0', '1'):
+        query = query.filter(AjusteEstoque.foto_cadastrada_no_erp == (cad_erp == '1'))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            data_cursor, id_cursor = _ler_cursor_galeria(cursor)
+        except ValueError:
+            return jsonify({'error': 'cursor invalido.'}), 400
+        query = query.filter(or_(
+            AjusteEstoque.data_criacao < data_cursor,
+            and_(AjusteEstoque.data_criacao == data_cursor, AjusteEstoque.id < id_cursor),
+        ))
+
+    try:
+        limit = int(request.args.get('limit', GALERIA_LIMITE_PADRAO))
+    except ValueError:
+        limit = GALERIA_LIMITE_PADRAO
+    limit = max(1, min(limit, GALERIA_LIMITE_MAXIMO))
+
+    # O índice de data_criacao já termina no rowid (= id), então esta ordem
+    # sai direto do índice. Busca um a mais só para saber se há próxima página.
+    rows = query.order_by(AjusteEstoque.data_criacao.desc(), AjusteEstoque.id.desc())\
+        .limit(limit + 1).all()
+    proximo_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        proximo_cursor = f"{rows[-1].data_criacao}|{rows[-1].id}"
+
+    return jsonify({
+        'itens': [_item_galeria(r) for r in rows],
+        'proximo_cursor': proximo_cursor,
+    })
+
+
 @estoque_bp.route('/ajustes/<int:ajuste_id>', methods=['GET'])
 def obter_ajuste(ajuste_id):
     ajuste = AjusteEstoque.query.get_or_404(ajuste_id)
@@ -517,3 +671,20 @@ def desmarcar_foto_cadastrada(ajuste_id):
     db.session.commit()
     socketio.emit('ajuste_estoque_atualizado', serialize_ajuste(ajuste))
     return jsonify({'status': 'success', 'ajuste': serialize_ajuste(ajuste)})
+
+
+# ============================================================
+# ARMAZENAMENTO DE FOTOS
+# ============================================================
+
+@estoque_bp.route('/fotos/armazenamento', methods=['GET'])
+def relatorio_armazenamento_fotos():
+    """Uso de disco e integridade das fotos (somente Admin). A limpeza de
+    órfãs é feita pelo comando `flask fotos gc`."""
+    usuario = _get_usuario_sessao()
+    if not usuario or usuario.role != 'Admin':
+        return jsonify({'error': 'Acesso restrito.'}), 403
+    return jsonify({
+        'uso': uso_disco(current_app.static_folder),
+        'integridade': verificar_integridade(current_app.static_folder),
+    })
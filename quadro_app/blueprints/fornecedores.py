@@ -0,0 +1,330 @@
+# quadro_app/blueprints/fornecedores.py
+from flask import Blueprint, request, jsonify
+from sqlalchemy import case, delete, event, func, insert, inspect, or_, select
+from ..extensions import db
+from ..monitor_sql import orcamento_sql
+from quadro_app.models import (
+    Conferencia, Garantia, RegistroCompra, MovimentacaoCompra, ResumoFornecedor, Fornecedor,
+)
+from quadro_app.dimensoes import normalizar_nome
+from .garantias import DURACAO_FINALIZADA, STATUS_FINAIS
+from .registro_compras import STATUS_FINALIZADO, _parse_ts, _segundos_uteis, _format_duracao
+
+fornecedores_bp = Blueprint('fornecedores', __name__, url_prefix='/api/fornecedores')
+
+# ==========================================
+# RESUMO POR FORNECEDOR E DIA
+# ==========================================
+# Cada dashboard calculava a sua parte do fornecedor a partir das linhas
+# brutas. A tabela resumo_fornecedor (ver models.ResumoFornecedor) guarda os
+# contadores por (fornecedor_id, dia) e o scorecard só soma os dias do período.
+#
+# Manutenção incremental: depois de cada flush, as linhas (fornecedor, dia)
+# tocadas pelas conferências, garantias e compras alteradas são apagadas e
+# calculadas de novo a partir da origem, na mesma transação. Uma compra conta
+# no dia do primeiro 'Pedido Efetuado': recalcula o dia de antes e o de depois. UPDATE/DELETE em
+# massa (Query.update) nessas tabelas não passa pelo flush; depois de um
+# desses, 'flask --app run fornecedores recalcular' refaz a tabela inteira.
+
+def _soma_se(condicao):
+    return func.coalesce(func.sum(case((condicao, 1), else_=0)), 0)
+
+
+_DIA_CONFERENCIA = func.substr(Conferencia.data_conferencia_finalizada, 1, 10)
+# A finalização abriu pendência (fornecedor ou alteração). Continua contando
+# depois de resolvida: a resolução grava data_finalizacao depois de
+# data_conferencia_finalizada; sem pendência as duas são iguais.
+_DIVERGENTE = or_(
+    Conferencia.status.like('Pendente%'),
+    Conferencia.data_finalizacao.is_(None),
+    Conferencia.data_finalizacao != Conferencia.data_conferencia_finalizada,
+)
+_DIA_GARANTIA = func.substr(Garantia.data_final, 1, 10)
+
+_ZERADA = {
+    'conferencias': 0, 'divergencias': 0,
+    'garantias_concedidas': 0, 'garantias_recusadas': 0, 'garantias_abandono': 0,
+    'garantias_dias': 0.0, 'compras': 0, 'compras_segundos_uteis': 0.0,
+}
+
+
+def _agregar(session, fornecedor_id=None, dias=None):
+    """Linhas do resumo calculadas da origem: {(fornecedor_id, dia): {...}}.
+    Sem fornecedor_id, todos os fornecedores; sem dias, todos os dias."""
+    linhas = {}
+
+    def linha(fid, dia):
+        if (fid, dia) not in linhas:
+            linhas[(fid, dia)] = dict(_ZERADA, fornecedor_id=fid, dia=dia)
+        return linhas[(fid, dia)]
+
+    q = select(Conferencia.fornecedor_id, _DIA_CONFERENCIA, func.count(), _soma_se(_DIVERGENTE))\
+        .where(Conferencia.data_conferencia_finalizada.isnot(None), Conferencia.fornecedor_id.isnot(None))
+    if fornecedor_id:
+        q = q.where(Conferencia.fornecedor_id == fornecedor_id)
+    if dias:
+        q = q.where(_DIA_CONFERENCIA.in_(dias))
+    for fid, dia, total, divergentes in session.execute(q.group_by(Conferencia.fornecedor_id, _DIA_CONFERENCIA)):
+        l = linha(fid, dia)
+        l['conferencias'], l['divergencias'] = total, divergentes
+
+    q = select(Garantia.fornecedor_id, _DIA_GARANTIA,
+               _soma_se(Garantia.status == 'Concedida'),
+               _soma_se(Garantia.status == 'Recusada'),
+               _soma_se(Garantia.status == 'Abandono'),
+               func.coalesce(func.sum(func.max(DURACAO_FINALIZADA, 0)), 0))\
+        .where(Garantia.status.in_(sorted(STATUS_FINAIS)), _DIA_GARANTIA != '',
+               Garantia.fornecedor_id.isnot(None))
+    if fornecedor_id:
+        q = q.where(Garantia.fornecedor_id == fornecedor_id)
+    if dias:
+        q = q.where(_DIA_GARANTIA.in_(dias))
+    for fid, dia, concedidas, recusadas, abandono, soma_dias in \
+            session.execute(q.group_by(Garantia.fornecedor_id, _DIA_GARANTIA)):
+        l = linha(fid, dia)
+        l['garantias_concedidas'], l['garantias_recusadas'] = concedidas, recusadas
+        l['garantias_abandono'], l['garantias_dias'] = abandono, soma_dias
+
+    # Compras: mesma regra da auditoria (_auditoria_de_registro): do evento de
+    # criação até o primeiro 'Pedido Efetuado', em horário de expediente.
+    criacao = func.min(case((MovimentacaoCompra.status_anterior.is_(None), MovimentacaoCompra.timestamp)))
+    final = func.min(case((MovimentacaoCompra.status_novo == STATUS_FINALIZADO, MovimentacaoCompra.timestamp)))
+    q = select(RegistroCompra.fornecedor_id, criacao, final)\
+        .join(MovimentacaoCompra, MovimentacaoCompra.registro_id == RegistroCompra.id)\
+        .where(RegistroCompra.fornecedor_id.isnot(None))
+    if fornecedor_id:
+        q = q.where(RegistroCompra.fornecedor_id == fornecedor_id)
+    q = q.group_by(RegistroCompra.id).having(criacao.isnot(None), final.isnot(None))
+    if dias:
+        q = q.having(func.substr(final, 1, 10).in_(dias))
+    for fid, ts_criacao, ts_final in session.execute(q):
+        dia = ts_final[:10]
+        segundos = _segundos_uteis(_parse_ts(ts_criacao), _parse_ts(ts_final))
+        if segundos is None:
+            continue
+        l = linha(fid, dia)
+        l['compras'] += 1
+        l['compras_segundos_uteis'] += segundos
+    return linhas
+
+
+def _regravar(session, fornecedor_id=None, dias=None):
+    """Apaga e recalcula as linhas do resumo (sem commit)."""
+    tabela = ResumoFornecedor.__table__
+    apagar = delete(tabela)
+    if fornecedor_id:
+        apagar = apagar.where(tabela.c.fornecedor_id == fornecedor_id)
+    if dias:
+        apagar = apagar.where(tabela.c.dia.in_(dias))
+    session.execute(apagar)
+    linhas = list(_agregar(session, fornecedor_id, dias).values())
+    if linhas:
+        session.execute(insert(tabela), linhas)
+    return len(linhas)
+
+
+# Colunas que mudam o resumo; alterações só em outras colunas não recalculam.
+# fornecedor_id é preenchido a partir do nome digitado no before_flush
+# (dimensoes.py), antes dos eventos abaixo.
+_CAMPOS_ORIGEM = {
+    Conferencia: ('fornecedor_id', 'status', 'data_conferencia_finalizada', 'data_finalizacao'),
+    Garantia: ('fornecedor_id', 'status', 'data_inicio', 'data_final'),
+    RegistroCompra: ('fornecedor_id',),
+    MovimentacaoCompra: ('registro_id', 'status_anterior', 'status_novo', 'timestamp'),
+}
+
+# O valor anterior de fornecedor_id, das datas e de registro_id (que decide
+# quais linhas recalcular) vem do active_history declarado nessas colunas em
+# models.py: é carregado mesmo quando o objeto estava expirado na atribuição.
+
+_CHAVE_COMPRAS = 'resumo_fornecedor_compras'
+
+
+def _valores(session, obj, campo):
+    """Valores do atributo antes e depois do flush (os dois lados contam)."""
+    historico = inspect(obj).attrs[campo].history
+    valores = {*historico.added, *historico.unchanged, *historico.deleted}
+    if not valores and obj not in session.deleted:
+        valores = {getattr(obj, campo)}     # não carregado: não mudou
+    return {v for v in valores if v}
+
+
+def _alterados(session):
+    """Objetos de origem novos, apagados ou com mudança em _CAMPOS_ORIGEM."""
+    dirty = session.dirty
+    for obj in (*session.new, *dirty, *session.deleted):
+        campos = _CAMPOS_ORIGEM.get(type(obj))
+        if not campos:
+            continue
+        if obj in dirty and not any(inspect(obj).attrs[c].history.has_changes() for c in campos):
+            continue
+        yield obj
+
+
+def _registros_alterados(session):
+    ids = set()
+    for obj in _alterados(session):
+        if isinstance(obj, RegistroCompra):
+            if obj.id:
+                ids.add(obj.id)
+        elif isinstance(obj, MovimentacaoCompra):
+            ids |= _valores(session, obj, 'registro_id')
+    return ids
+
+
+def _dias_compra(session, registros):
+    """{(fornecedor_id, dia)} em que cada registro conta no resumo: o dia do
+    primeiro 'Pedido Efetuado', como em _agregar."""
+    if not registros:
+        return set()
+    final = func.min(case((MovimentacaoCompra.status_novo == STATUS_FINALIZADO, MovimentacaoCompra.timestamp)))
+    q = select(RegistroCompra.fornecedor_id, func.substr(final, 1, 10))\
+        .join(MovimentacaoCompra, MovimentacaoCompra.registro_id == RegistroCompra.id)\
+        .where(RegistroCompra.id.in_(registros), RegistroCompra.fornecedor_id.isnot(None))\
+        .group_by(RegistroCompra.id).having(final.isnot(None))
+    return set(session.execute(q).all())
+
+
+def _antes_flush(session, flush_context, instances):
+    """Guarda onde as compras alteradas contavam antes do flush (fornecedor e
+    dia do 'Pedido Efetuado' ainda no banco): depois dele não dá mais para
+    saber o dia antigo."""
+    # Objeto apagado que estava expirado: carrega as colunas agora, enquanto a
+    # linha existe, para o after_flush enxergar os valores (_valores).
+    for obj in session.deleted:
+        for campo in _CAMPOS_ORIGEM.get(type(obj), ()):
+            getattr(obj, campo)
+    registros = _registros_alterados(session)
+    if registros:
+        antes = session.info.setdefault(_CHAVE_COMPRAS, set())
+        antes |= _dias_compra(session, registros)
+
+
+def _ao_flush(session, flush_context):
+    tocados = {}    # fornecedor_id -> set de dias
+
+    def tocar(ids, dias):
+        for fid in ids:
+            if fid and dias:
+                tocados.setdefault(fid, set()).update(d[:10] for d in dias)
+
+    for obj in _alterados(session):
+        if isinstance(obj, Conferencia):
+            tocar(_valores(session, obj, 'fornecedor_id'), _valores(session, obj, 'data_conferencia_finalizada'))
+        elif isinstance(obj, Garantia):
+            tocar(_valores(session, obj, 'fornecedor_id'), _valores(session, obj, 'data_final'))
+
+    # Compras: os pares (fornecedor, dia) de antes do flush e os de agora.
+    pares = session.info.pop(_CHAVE_COMPRAS, set()) | _dias_compra(session, _registros_alterados(session))
+    for fid, dia in pares:
+        tocar((fid,), (dia,))
+
+    for fid, dias in tocados.items():
+        _regravar(session, fid, sorted(dias))
+
+
+def _ao_rollback(session, transacao_anterior):
+    session.info.pop(_CHAVE_COMPRAS, None)
+
+
+def registrar_resumo_fornecedores():
+    """Liga o recálculo do resumo ao flush da sessão."""
+    if event.contains(db.session, 'after_flush', _ao_flush):
+        return
+    event.listen(db.session, 'before_flush', _antes_flush)
+    event.listen(db.session, 'after_flush', _ao_flush)
+    event.listen(db.session, 'after_soft_rollback', _ao_rollback)
+
+
+def recalcular_resumo_fornecedores():
+    """Refaz a tabela inteira a partir da origem."""
+    total = _regravar(db.session)
+    db.session.commit()
+    return total
+
+
+def garantir_resumo_fornecedores():
+    """Bancos anteriores ao resumo: monta a tabela uma vez, na inicialização."""
+    if db.session.query(ResumoFornecedor.dia).first() is not None:
+        return
+    total = recalcular_resumo_fornecedores()
+    if total:
+        print(f"[fornecedores] resumo montado: {total} linha(s) fornecedor/dia.")
+
+
+# ==========================================
+# SCORECARD
+# ==========================================
+
+def _taxa(parte, total):
+    return round(100 * parte / total, 1) if total else None
+
+
+def serialize_scorecard(row):
+    garantias = row.garantias_concedidas + row.garantias_recusadas + row.garantias_abandono
+    lead_time = row.compras_segundos_uteis / row.compras if row.compras else None
+    return {
+        'fornecedor_id': row.fornecedor_id,
+        'fornecedor': row.fornecedor,
+        'conferencias': row.conferencias,
+        'divergencias': row.divergencias,
+        'taxa_divergencia': _taxa(row.divergencias, row.conferencias),
+        'garantias_finalizadas': garantias,
+        'garantias_concedidas': row.garantias_concedidas,
+        'garantias_recusadas': row.garantias_recusadas,
+        'garantias_abandono': row.garantias_abandono,
+        'taxa_concessao': _taxa(row.garantias_concedidas, garantias),
+        'garantias_dias_medios': round(row.garantias_dias / garantias, 1) if garantias else None,
+        'compras': row.compras,
+        'compras_lead_time_segundos': round(lead_time) if lead_time is not None else None,
+        'compras_lead_time_texto': _format_duracao(lead_time),
+    }
+
+
+@fornecedores_bp.route('/scorecard', methods=['GET'])
+@orcamento_sql(1)
+def scorecard():
+    """
+    Scorecard por fornecedor: taxa de divergência nas conferências, desfecho
+    e duração das garantias e tempo de compra em horário de expediente.
+    Filtros via query string: data_inicio, data_fim (YYYY-MM-DD, inclusivos)
+    e fornecedor (parte do nome). Soma só as linhas diárias do período.
+    """
+    data_inicio = (request.args.get('data_inicio') or '').strip()[:10]
+    data_fim = (request.args.get('data_fim') or '').strip()[:10]
+    busca = normalizar_nome(request.args.get('fornecedor'))
+    try:
+        r = ResumoFornecedor
+        query = db.session.query(
+            r.fornecedor_id.label('fornecedor_id'),
+            Fornecedor.nome.label('fornecedor'),
+            *(func.sum(getattr(r, campo)).label(campo) for campo in _ZERADA),
+        ).join(Fornecedor, Fornecedor.id == r.fornecedor_id)
+        if data_inicio:
+            query = query.filter(r.dia >= data_inicio)
+        if data_fim:
+            query = query.filter(r.dia <= data_fim)
+        if busca:
+            query = query.filter(Fornecedor.nome_normalizado.contains(busca, autoescape=True))
+        fornecedores = [serialize_scorecard(row) for row in query.group_by(r.fornecedor_id).all()]
+        fornecedores.sort(key=lambda f: (-(f['conferencias'] + f['garantias_finalizadas'] + f['compras']),
+                                         f['fornecedor'] or ''))
+        return jsonify({'data_inicio': data_inicio or None, 'data_fim': data_fim or None,
+                        'fornecedores': fornecedores})
+    except Exception as e:
+        print(f"ERRO ao montar scorecard de fornecedores: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def registrar_comandos_fornecedores(app):
+    """flask --app run fornecedores recalcular"""
+    import click
+
+    @app.cli.group('fornecedores')
+    def fornecedores_cli():
+        """Resumo e scorecard dos fornecedores."""
+
+    @fornecedores_cli.command('recalcular')
+    def recalcular_cmd():
+        total = recalcular_resumo_fornecedores()
+        click.echo(f"Resumo refeito: {total} linha(s) fornecedor/dia.")
@@ -1,10 +1,13 @@
 # quadro_app/blueprints/garantias.py
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime, date
+from sqlalchemy import func, or_, and_
 from ..extensions import db, tz_cuiaba
-from quadro_app.models import Garantia, Usuario, ItemExcluido
+from ..monitor_sql import orcamento_sql
+from quadro_app.models import Garantia, Usuario, ItemExcluido, Cliente
+from quadro_app.dimensoes import nome_cliente, coluna_nome_cliente, filtro_nome_cliente
 from quadro_app.utils import registrar_log
-from quadro_app import socketio
+from quadro_app import socketio, observacoes
 
 garantias_bp = Blueprint('garantias', __name__, url_prefix='/api/garantias')
 
@@ -17,6 +20,16 @@ STATUS_PENDENTE = 'Pendente'
 STATUS_FINAIS = {'Recusada', 'Concedida', 'Abandono'}
 STATUS_VALIDOS = {STATUS_PENDENTE} | STATUS_FINAIS
 
+FINALIZADAS_LIMITE_PADRAO = 50
+FINALIZADAS_LIMITE_MAXIMO = 200
+
+# Duração de um processo finalizado, em dias; NULL se alguma data não for
+# 'YYYY-MM-DD'. A ordenação por idade usa CHAVE_DURACAO, que põe essas linhas
+# no fim (-1) em vez de deixá-las fora do cursor. A mesma expressão tem índice
+# próprio (idx_garantia_chave_duracao, ver create_app): ordenar não varre a tabela.
+DURACAO_FINALIZADA = func.julianday(Garantia.data_final) - func.julianday(Garantia.data_inicio)
+CHAVE_DURACAO = func.coalesce(DURACAO_FINALIZADA, -1)
+
 
 def _usuario_atual():
     uid = session.get('user_id')
@@ -49,6 +62,14 @@ def _parse_data(valor):
         return None
 
 
+def _data_iso(valor):
+    """True se 'valor' for exatamente uma data 'YYYY-MM-DD'."""
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').strftime('%Y-%m-%d') == valor
+    except (TypeError, ValueError):
+        return False
+
+
 def _calcular_tempo(g):
     """Dias decorridos do início até a data final (ou hoje, se pendente)."""
     inicio = _parse_data(g.data_inicio)
@@ -61,19 +82,22 @@ def _calcular_tempo(g):
     return dias if dias >= 0 else 0
 
 
+def _rotulo_tempo(dias):
+    if dias is None:
+        return '-'
+    if dias == 0:
+        return 'Hoje'
+    if dias == 1:
+        return '1 dia'
+    return f'{dias} dias'
+
+
 def serialize(g):
     dias = _calcular_tempo(g)
-    if dias is None:
-        tempo_label = '-'
-    elif dias == 0:
-        tempo_label = 'Hoje'
-    elif dias == 1:
-        tempo_label = '1 dia'
-    else:
-        tempo_label = f'{dias} dias'
+    tempo_label = _rotulo_tempo(dias)
     return {
         'id': g.id,
-        'nome_cliente': g.nome_cliente or '',
+        'nome_cliente': nome_cliente(g) or '',
         'descricao_peca': g.descricao_peca or '',
         'codigo_peca': g.codigo_peca or '',
         'marca': g.marca or '',
@@ -84,7 +108,7 @@ def serialize(g):
         'data_envio_fornecedor': g.data_envio_fornecedor or '',
         'ultimo_contato': g.ultimo_contato or '',
         'data_final': g.data_final or '',
-        'acompanhamento': g.acompanhamento or [],
+        'acompanhamento': observacoes.listar('garantia', g.id),
         'conclusao': g.conclusao or '',
         'status': g.status,
         'tempo_decorrido_dias': dias,
@@ -115,28 +139,147 @@ def _aplicar_campos(g, dados):
     # quando um acompanhamento é registrado.
 
 
+# Colunas da listagem. A linha do tempo só é lida ao abrir o processo
+# (GET /api/garantias/<id>); a listagem traz quantidade + último acompanhamento.
+_COLUNAS_LISTAGEM = (
+    Garantia.id, coluna_nome_cliente(Garantia), Garantia.descricao_peca, Garantia.codigo_peca,
+    Garantia.marca, Garantia.fornecedor, Garantia.defeito, Garantia.quantidade,
+    Garantia.data_inicio, Garantia.data_envio_fornecedor, Garantia.ultimo_contato,
+    Garantia.data_final, Garantia.conclusao, Garantia.status, Garantia.criado_por,
+    Garantia.data_criacao, Garantia.atualizado_em, Garantia.finalizado_por, Garantia.finalizado_em,
+)
+
+
+def _linha_listagem(row, resumo):
+    dias = None if row.dias is None else max(0, int(round(row.dias)))
+    return {
+        'id': row.id,
+        'nome_cliente': row.nome_cliente or '',
+        'descricao_peca': row.descricao_peca or '',
+        'codigo_peca': row.codigo_peca or '',
+        'marca': row.marca or '',
+        'fornecedor': row.fornecedor or '',
+        'defeito': row.defeito or '',
+        'quantidade': row.quantidade or 1,
+        'data_inicio': row.data_inicio or '',
+        'data_envio_fornecedor': row.data_envio_fornecedor or '',
+        'ultimo_contato': row.ultimo_contato or '',
+        'data_final': row.data_final or '',
+        'qtd_acompanhamentos': resumo['qtd'],
+        'ultimo_acompanhamento': resumo['ultima'],
+        'conclusao': row.conclusao or '',
+        'status': row.status,
+        'tempo_decorrido_dias': dias,
+        'tempo_decorrido': _rotulo_tempo(dias),
+        'criado_por': row.criado_por or '',
+        'data_criacao': row.data_criacao or '',
+        'atualizado_em': row.atualizado_em or '',
+        'finalizado_por': row.finalizado_por or '',
+        'finalizado_em': row.finalizado_em or '',
+    }
+
+
+def _query_listagem(dias):
+    return db.session.query(*_COLUNAS_LISTAGEM, dias.label('dias'))\
+                     .outerjoin(Cliente, Cliente.id == Garantia.cliente_id)
+
+
+def _linhas_listagem(rows):
+    resumos = observacoes.resumos('garantia', [r.id for r in rows])
+    return [_linha_listagem(r, resumos[r.id]) for r in rows]
+
+
 @garantias_bp.route('', methods=['GET'])
+@orcamento_sql(3)
 def listar():
-    """Lista as garantias de uma aba.
+    """Lista as garantias de uma aba, sem a linha do tempo de acompanhamento.
     ?aba=pendentes (padrão) | finalizadas
+    ?ordenar=recentes (padrão) | idade (mais tempo decorrido primeiro)
+
+    Pendentes vêm todas (é a lista de trabalho). Finalizadas vêm em páginas
+    por cursor (?limit=, ?cursor=<proximo_cursor>) e aceitam os filtros
+    ?fornecedor=, ?cliente= (parte do nome), ?codigo= (início do código),
+    ?status= e ?data_inicio=/?data_fim= (data final do processo).
     """
     u = _usuario_atual()
     aba = (request.args.get('aba') or 'pendentes').lower()
+    por_idade = request.args.get('ordenar') == 'idade'
 
-    if aba == 'finalizadas':
-        if not _pode(u, PAGE_FINALIZADAS):
-            return jsonify({'error': 'Acesso restrito.'}), 403
-        query = Garantia.query.filter(Garantia.status.in_(list(STATUS_FINAIS)))\
-            .order_by(Garantia.finalizado_em.desc(), Garantia.id.desc())
-    else:
+    if aba != 'finalizadas':
         if not _pode(u, PAGE_PENDENTES):
             return jsonify({'error': 'Acesso restrito.'}), 403
-        query = Garantia.query.filter(Garantia.status == STATUS_PENDENTE)\
-            .order_by(Garantia.id.desc())
+        dias = func.julianday(_hoje()) - func.julianday(Garantia.data_inicio)
+        query = _query_listagem(dias).filter(Garantia.status == STATUS_PENDENTE)
+        # Idade de uma pendente = hoje - início: ordenar por data_inicio usa
+        # idx_garantia_status_inicio.
+        if por_idade:
+            query = query.order_by(Garantia.data_inicio.asc(), Garantia.id.asc())
+        else:
+            query = query.order_by(Garantia.id.desc())
+        return jsonify({
+            'registros': _linhas_listagem(query.all()),
+            'pode_editar': _pode(u, PAGE_PENDENTES),
+            'pode_reabrir': _pode(u, PAGE_FINALIZADAS),
+        })
+
+    if not _pode(u, PAGE_FINALIZADAS):
+        return jsonify({'error': 'Acesso restrito.'}), 403
+    query = _query_listagem(DURACAO_FINALIZADA)
+    status = request.args.get('status')
+    if status in STATUS_FINAIS:
+        query = query.filter(Garantia.status == status)
+    else:
+        # '!= Pendente' (e não IN dos finais) deixa o SQLite percorrer o índice
+        # da ordenação direto, sem ordenar em memória.
+        query = query.filter(Garantia.status != STATUS_PENDENTE)
+    fornecedor = (request.args.get('fornecedor') or '').strip()
+    if fornecedor:
+        query = query.filter(Garantia.fornecedor.ilike(f'%{fornecedor}%'))
+    cliente = (request.args.get('cliente') or '').strip()
+    if cliente:
+        query = query.filter(filtro_nome_cliente(Garantia, cliente))
+    codigo = (request.args.get('codigo') or '').strip()
+    if codigo:
+        query = query.filter(Garantia.codigo_peca.ilike(f'{codigo}%'))
+    data_inicio = request.args.get('data_inicio')
+    if data_inicio:
+        query = query.filter(Garantia.data_final >= data_inicio)
+    data_fim = request.args.get('data_fim')
+    if data_fim:
+        query = query.filter(Garantia.data_final <= data_fim)
+
+    chave = CHAVE_DURACAO if por_idade else Garantia.finalizado_em
+    cursor = request.args.get('cursor')
+    if cursor:
+        valor_cursor, _, id_cursor = cursor.rpartition('|')
+        try:
+            id_cursor = int(id_cursor)
+            if por_idade:
+                valor_cursor = float(valor_cursor)
+        except ValueError:
+            return jsonify({'error': 'cursor invalido.'}), 400
+        query = query.filter(or_(chave < valor_cursor, and_(chave == valor_cursor, Garantia.id < id_cursor)))
+
+    try:
+        limit = int(request.args.get('limit', FINALIZADAS_LIMITE_PADRAO))
+    except ValueError:
+        limit = FINALIZADAS_LIMITE_PADRAO
+    limit = max(1, min(limit, FINALIZADAS_LIMITE_MAXIMO))
+
+    rows = query.order_by(chave.desc(), Garantia.id.desc()).limit(limit + 1).all()
+    proximo_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        ultimo = rows[-1]
+        if por_idade:
+            valor = -1 if ultimo.dias is None else ultimo.dias
+        else:
+            valor = ultimo.finalizado_em
+        proximo_cursor = f"{valor}|{ultimo.id}"
 
-    registros = query.all()
     return jsonify({
-        'registros': [serialize(g) for g in registros],
+        'registros': _linhas_listagem(rows),
+        'proximo_cursor': proximo_cursor,
         'pode_editar': _pode(u, PAGE_PENDENTES),
         'pode_reabrir': _pode(u, PAGE_FINALIZADAS),
     })
@@ -163,7 +306,7 @@ def criar():
     if not (dados.get('codigo_peca') or '').strip():
         return jsonify({'error': 'O código da peça é obrigatório.'}), 400
 
-    g = Garantia(status=STATUS_PENDENTE, acompanhamento=[])
+    g = Garantia(status=STATUS_PENDENTE)
     _aplicar_campos(g, dados)
     g.criado_por = u.nome if u else 'Sistema'
     g.data_criacao = _agora_iso()
@@ -214,34 +357,28 @@ def adicionar_acompanhamento(garantia_id):
     if not texto:
         return jsonify({'error': 'O texto do acompanhamento é obrigatório.'}), 400
 
-    entradas = list(g.acompanhamento or [])
-    nova = {
-        'texto': texto,
-        'autor': u.nome if u else 'Sistema',
-        'timestamp': _agora_iso(),
-    }
-    entradas.append(nova)
-    g.acompanhamento = entradas
+    nova = observacoes.adicionar('garantia', g.id, texto, u.nome if u else 'Sistema',
+                                 timestamp=_agora_iso())
     # Novo acompanhamento conta como contato: atualiza "último contato".
     g.ultimo_contato = _hoje()
-    g.atualizado_em = nova['timestamp']
+    g.atualizado_em = nova.timestamp
 
     db.session.commit()
-    registrar_log(g.id, nova['autor'], 'GARANTIA_ACOMPANHAMENTO',
+    registrar_log(g.id, nova.autor, 'GARANTIA_ACOMPANHAMENTO',
                   detalhes={'texto': texto}, log_type='garantias')
     socketio.emit('garantias_atualizado')
     return jsonify({'status': 'success', 'registro': serialize(g)})
 
 
-@garantias_bp.route('/<int:garantia_id>/acompanhamento/<int:indice>', methods=['PUT'])
-def editar_acompanhamento(garantia_id, indice):
+@garantias_bp.route('/<int:garantia_id>/acompanhamento/<int:seq>', methods=['PUT'])
+def editar_acompanhamento(garantia_id, seq):
     u = _usuario_atual()
     if not _pode(u, PAGE_PENDENTES):
         return jsonify({'error': 'Acesso restrito.'}), 403
 
     g = Garantia.query.get_or_404(garantia_id)
-    entradas = list(g.acompanhamento or [])
-    if indice < 0 or indice >= len(entradas):
+    entrada = observacoes.buscar('garantia', g.id, seq)
+    if entrada is None:
         return jsonify({'error': 'Acompanhamento não encontrado.'}), 404
 
     dados = request.get_json() or {}
@@ -249,38 +386,45 @@ def editar_acompanhamento(garantia_id, indice):
     if not texto:
         return jsonify({'error': 'O texto do acompanhamento é obrigatório.'}), 400
 
-    entrada = dict(entradas[indice])
-    entrada['texto'] = texto
-    entrada['editado_em'] = _agora_iso()
-    entrada['editado_por'] = u.nome if u else 'Sistema'
-    entradas[indice] = entrada
-    g.acompanhamento = entradas
-    g.atualizado_em = entrada['editado_em']
+    observacoes.editar(entrada, texto, u.nome if u else 'Sistema')
+    g.atualizado_em = entrada.editado_em
 
     db.session.commit()
     socketio.emit('garantias_atualizado')
     return jsonify({'status': 'success', 'registro': serialize(g)})
 
 
-@garantias_bp.route('/<int:garantia_id>/acompanhamento/<int:indice>', methods=['DELETE'])
-def excluir_acompanhamento(garantia_id, indice):
+@garantias_bp.route('/<int:garantia_id>/acompanhamento/<int:seq>', methods=['DELETE'])
+def excluir_acompanhamento(garantia_id, seq):
     u = _usuario_atual()
     if not _pode(u, PAGE_PENDENTES):
         return jsonify({'error': 'Acesso restrito.'}), 403
 
     g = Garantia.query.get_or_404(garantia_id)
-    entradas = list(g.acompanhamento or [])
-    if indice < 0 or indice >= len(entradas):
+    entrada = observacoes.buscar('garantia', g.id, seq)
+    if entrada is None:
         return jsonify({'error': 'Acompanhamento não encontrado.'}), 404
 
-    entradas.pop(indice)
-    g.acompanhamento = entradas
+    # A linha fica (marcada como excluída); só some da linha do tempo.
+    observacoes.excluir(entrada, u.nome if u else 'Sistema')
     g.atualizado_em = _agora_iso()
     db.session.commit()
     socketio.emit('garantias_atualizado')
     return jsonify({'status': 'success', 'registro': serialize(g)})
 
 
+@garantias_bp.route('/<int:garantia_id>/acompanhamento/<int:seq>/historico', methods=['GET'])
+def historico_acompanhamento(garantia_id, seq):
+    """Textos anteriores de um acompanhamento editado."""
+    u = _usuario_atual()
+    if not (_pode(u, PAGE_PENDENTES) or _pode(u, PAGE_FINALIZADAS)):
+        return jsonify({'error': 'Acesso restrito.'}), 403
+    entrada = observacoes.buscar('garantia', garantia_id, seq)
+    if entrada is None:
+        return jsonify({'error': 'Acompanhamento não encontrado.'}), 404
+    return jsonify(observacoes.historico_edicoes(entrada))
+
+
 @garantias_bp.route('/<int:garantia_id>/status', methods=['PUT'])
 def alterar_status(garantia_id):
     """Finaliza (Pendente -> Recusada/Concedida/Abandono) ou reabre
@@ -302,6 +446,11 @@ def alterar_status(garantia_id):
         if not _pode(u, PAGE_PENDENTES):
             return jsonify({'error': 'Acesso restrito.'}), 403
 
+    # A data final entra na duração e no cursor da listagem: só 'YYYY-MM-DD'.
+    data_final = (dados.get('data_final') or '').strip() or _hoje()
+    if not reabrindo and not _data_iso(data_final):
+        return jsonify({'error': 'Data final inválida (use AAAA-MM-DD).'}), 400
+
     nome = u.nome if u else 'Sistema'
     anterior = g.status
     g.status = novo
@@ -313,7 +462,7 @@ def alterar_status(garantia_id):
         g.finalizado_em = ''
     else:
         # Finalização: registra desfecho e data final.
-        g.data_final = (dados.get('data_final') or '').strip() or _hoje()
+        g.data_final = data_final
         if 'conclusao' in dados:
             g.conclusao = (dados.get('conclusao') or '').strip()
         g.finalizado_por = nome
@@ -329,21 +478,27 @@ def alterar_status(garantia_id):
 
 def _dados_lixeira(g):
     """Snapshot apenas com colunas reais do modelo, para que a restauração
-    pela lixeira funcione via Garantia(**dados_item)."""
+    pela lixeira funcione via Garantia(**dados_item). A linha do tempo sai da
+    tabela 'observacao' e vai na coluna JSON (importar_json a devolve).
+    Os ids dos cadastros vão junto: na restauração o flush mantém o id que
+    ainda existe (dimensoes._ao_flush) em vez de resolver o nome de novo, o
+    que recriaria um cliente já renomeado ou mesclado. O nome é o exibido."""
     return {
         'id': g.id,
-        'nome_cliente': g.nome_cliente,
+        'nome_cliente': nome_cliente(g),
+        'cliente_id': g.cliente_id,
         'descricao_peca': g.descricao_peca,
         'codigo_peca': g.codigo_peca,
         'marca': g.marca,
         'fornecedor': g.fornecedor,
+        'fornecedor_id': g.fornecedor_id,
         'defeito': g.defeito,
         'quantidade': g.quantidade,
         'data_inicio': g.data_inicio,
         'data_envio_fornecedor': g.data_envio_fornecedor,
         'ultimo_contato': g.ultimo_contato,
         'data_final': g.data_final,
-        'acompanhamento': g.acompanhamento or [],
+        'acompanhamento': observacoes.remover_da_entidade('garantia', g.id),
         'conclusao': g.conclusao,
         'status': g.status,
         'criado_por': g.criado_por,
@@ -1,11 +1,23 @@
 # quadro_app/blueprints/lixeira.py
-from flask import Blueprint, request, jsonify
-from ..extensions import db
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import func, or_, and_
+from ..extensions import db, tz_cuiaba
 from quadro_app.models import ItemExcluido, Pedido, Sugestao, Separacao, Conferencia, Garantia
 from quadro_app.utils import registrar_log
+from quadro_app import socketio, observacoes
+from quadro_app.monitor_sql import orcamento_sql
 
 lixeira_bp = Blueprint('lixeira', __name__, url_prefix='/api/lixeira')
 
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+# Itens mais antigos que isso saem da lixeira para o arquivo (ver expurgar_antigos).
+RETENCAO_PADRAO_DIAS = 180
+
 def serialize_item_excluido(item):
     return {
         'id': item.id,
@@ -24,14 +36,133 @@ MODEL_MAP = {
     'Garantia': Garantia
 }
 
+# Campos do snapshot usados na descrição da listagem. São extraídos no próprio
+# SQLite (json_extract), então a listagem não carrega nem envia o dados_item.
+_CAMPOS_RESUMO = {
+    'vendedor': '$.vendedor',
+    'codigo': '$.codigo',
+    'primeiro_codigo': '$.itens[0].codigo',
+    'numero_movimentacao': '$.numero_movimentacao',
+    'nome_cliente': '$.nome_cliente',
+    'numero_nota_fiscal': '$.numero_nota_fiscal',
+    'nome_fornecedor': '$.nome_fornecedor',
+    'codigo_peca': '$.codigo_peca',
+    'status': '$.status',
+}
+
+
+def _colunas_resumo():
+    colunas = [func.json_extract(ItemExcluido.dados_item, caminho).label(nome)
+               for nome, caminho in _CAMPOS_RESUMO.items()]
+    colunas.append(func.json_array_length(ItemExcluido.dados_item, '$.itens').label('qtd_itens'))
+    return colunas
+
+
+def _resumo(row):
+    """Descrição principal do item (mesmo texto que a tela montava a partir
+    do dados_item completo)."""
+    if row.tipo_item == 'Pedido':
+        return f"Vendedor: {row.vendedor or 'N/A'} - Cód: {row.codigo or row.primeiro_codigo}"
+    if row.tipo_item == 'Sugestao':
+        return f"Vendedor: {row.vendedor or 'N/A'} - Itens: {row.qtd_itens or 0}"
+    if row.tipo_item == 'Separacao':
+        return f"Mov: {row.numero_movimentacao} - Cliente: {row.nome_cliente}"
+    if row.tipo_item == 'Conferencia':
+        return f"NF: {row.numero_nota_fiscal} - Fornecedor: {row.nome_fornecedor}"
+    if row.tipo_item == 'Garantia':
+        return f"Cliente: {row.nome_cliente or 'N/A'} - Cód: {row.codigo_peca or 'N/A'} ({row.status or ''})"
+    return f"ID Original: {row.item_id_original}"
+
+
+def _linha_listagem(row):
+    """Projeção compacta da listagem: sem o dados_item."""
+    return {
+        'id': row.id,
+        'tipo_item': row.tipo_item,
+        'item_id_original': row.item_id_original,
+        'resumo': _resumo(row),
+        'excluido_por': row.excluido_por,
+        'data_exclusao': row.data_exclusao,
+    }
+
+
 @lixeira_bp.route('', methods=['GET'])
+@orcamento_sql(1)
 def get_itens_excluidos():
+    """
+    Lista a lixeira, mais recentes primeiro, em páginas por cursor.
+    Filtros: ?tipo=<tipo_item>, ?autor=<parte do nome>, ?data_inicio= e
+    ?data_fim= (YYYY-MM-DD) e ?q= (busca no tipo, id original, autor e nos
+    campos da descrição). Paginação: ?limit= e ?cursor=<proximo_cursor>.
+    O snapshot completo de um item sai em GET /api/lixeira/<id>.
+    """
     try:
-        itens = ItemExcluido.query.order_by(ItemExcluido.data_exclusao.desc()).all()
-        return jsonify([serialize_item_excluido(item) for item in itens])
+        query = db.session.query(
+            ItemExcluido.id, ItemExcluido.tipo_item, ItemExcluido.item_id_original,
+            ItemExcluido.excluido_por, ItemExcluido.data_exclusao, *_colunas_resumo()
+        )
+
+        # Ordem (data_exclusao, id) desc: idx_item_excluido_data, ou
+        # idx_item_excluido_tipo_data com o filtro de tipo.
+        tipo = request.args.get('tipo')
+        if tipo:
+            query = query.filter(ItemExcluido.tipo_item == tipo)
+        autor = (request.args.get('autor') or '').strip()
+        if autor:
+            query = query.filter(ItemExcluido.excluido_por.ilike(f'%{autor}%'))
+        data_inicio = request.args.get('data_inicio')
+        if data_inicio:
+            query = query.filter(ItemExcluido.data_exclusao >= data_inicio)
+        data_fim = request.args.get('data_fim')
+        if data_fim:
+            query = query.filter(ItemExcluido.data_exclusao <= data_fim + 'T23:59:59')
+
+        termo = (request.args.get('q') or '').strip()
+        if termo:
+            padrao = f'%{termo}%'
+            campos = [ItemExcluido.tipo_item, ItemExcluido.item_id_original, ItemExcluido.excluido_por]
+            campos += [func.json_extract(ItemExcluido.dados_item, c) for c in _CAMPOS_RESUMO.values()]
+            query = query.filter(or_(*(campo.ilike(padrao) for campo in campos)))
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            data_cursor, _, id_cursor = cursor.rpartition('|')
+            try:
+                id_cursor = int(id_cursor)
+            except ValueError:
+                return jsonify({'error': 'cursor invalido.'}), 400
+            query = query.filter(or_(
+                ItemExcluido.data_exclusao < data_cursor,
+                and_(ItemExcluido.data_exclusao == data_cursor, ItemExcluido.id < id_cursor),
+            ))
+
+        try:
+            limit = int(request.args.get('limit', LIMITE_PADRAO))
+        except ValueError:
+            limit = LIMITE_PADRAO
+        limit = max(1, min(limit, LIMITE_MAXIMO))
+
+        rows = query.order_by(ItemExcluido.data_exclusao.desc(), ItemExcluido.id.desc())\
+            .limit(limit + 1).all()
+        proximo_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            proximo_cursor = f"{rows[-1].data_exclusao}|{rows[-1].id}"
+
+        return jsonify({
+            'itens': [_linha_listagem(r) for r in rows],
+            'proximo_cursor': proximo_cursor,
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@lixeira_bp.route('/<int:item_id>', methods=['GET'])
+def get_item_excluido(item_id):
+    """Item completo, com o snapshot (dados_item), para a tela de detalhes."""
+    item = ItemExcluido.query.get_or_404(item_id)
+    return jsonify(serialize_item_excluido(item))
+
 @lixeira_bp.route('/restaurar/<int:item_id>', methods=['POST'])
 def restaurar_item(item_id):
     editor_nome = request.json.get('editor_nome', 'Sistema')
@@ -56,6 +187,9 @@ def restaurar_item(item_id):
         dados_item.pop('id', None)
         item_restaurado = model_class(**dados_item)
         db.session.add(item_restaurado)
+        db.session.flush()
+        # Observações/acompanhamentos do snapshot voltam para a tabela 'observacao'.
+        observacoes.importar_json(item_restaurado)
         
         # Remove da lixeira
         db.session.delete(item_lixeira)
@@ -69,4 +203,218 @@ def restaurar_item(item_id):
 
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': f'Erro ao restaurar: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Erro ao restaurar: {str(e)}'}), 500
+
+
+def _ids_do_corpo(dados):
+    ids = dados.get('ids')
+    if not isinstance(ids, list):
+        return []
+    return list(dict.fromkeys(i for i in ids if isinstance(i, int)))
+
+
+@lixeira_bp.route('/restaurar-lote', methods=['POST'])
+def restaurar_lote():
+    """Restaura vários itens de uma vez. Corpo: {ids: [...], editor_nome}.
+
+    Mesmas regras do restaurar_item (MODEL_MAP e conflito de ID original),
+    verificadas com uma busca por tipo. Itens com problema não impedem os
+    demais; o resultado de cada um volta em 'resultados'. Tudo em uma
+    transação, com um único log agregado e um único evento de socket."""
+    dados = request.get_json() or {}
+    editor_nome = dados.get('editor_nome', 'Sistema')
+    ids = _ids_do_corpo(dados)
+    if not ids:
+        return jsonify({'error': 'Informe os itens a restaurar.'}), 400
+
+    itens = {i.id: i for i in ItemExcluido.query.filter(ItemExcluido.id.in_(ids)).all()}
+
+    # IDs originais que já existem nas tabelas de destino, uma query por tipo.
+    originais_por_tipo = {}
+    for item in itens.values():
+        if item.tipo_item in MODEL_MAP and (item.dados_item or {}).get('id') is not None:
+            originais_por_tipo.setdefault(item.tipo_item, set()).add(item.dados_item['id'])
+    existentes = set()
+    for tipo, originais in originais_por_tipo.items():
+        model_class = MODEL_MAP[tipo]
+        existentes.update((tipo, row.id) for row in
+                          db.session.query(model_class.id).filter(model_class.id.in_(originais)))
+
+    resultados, restaurados = [], []
+    for item_id in ids:
+        item_lixeira = itens.get(item_id)
+        if item_lixeira is None:
+            resultados.append({'id': item_id, 'ok': False, 'error': 'Item não encontrado na lixeira.'})
+            continue
+        tipo_item = item_lixeira.tipo_item
+        model_class = MODEL_MAP.get(tipo_item)
+        if not model_class:
+            resultados.append({'id': item_id, 'ok': False, 'error': f'Tipo de item desconhecido: {tipo_item}'})
+            continue
+        try:
+            dados_item = dict(item_lixeira.dados_item)
+            id_original = dados_item.pop('id', None)
+            if (tipo_item, id_original) in existentes:
+                resultados.append({'id': item_id, 'ok': False,
+                                   'error': f'Um item do tipo {tipo_item} com o ID {id_original} já existe.'})
+                continue
+            # Snapshot antigo com campo que não é mais coluna: falha só este item.
+            item_restaurado = model_class(**dados_item)
+        except (TypeError, ValueError, AttributeError) as e:
+            resultados.append({'id': item_id, 'ok': False, 'error': f'Dados do item inválidos: {e}'})
+            continue
+        # Dois itens do lote com o mesmo ID original: só o primeiro volta.
+        existentes.add((tipo_item, id_original))
+
+        db.session.add(item_restaurado)
+        db.session.delete(item_lixeira)
+        restaurados.append((item_lixeira, id_original, item_restaurado))
+
+    if not restaurados:
+        return jsonify({'status': 'success', 'resultados': resultados})
+
+    try:
+        db.session.flush()
+        for _, _, novo in restaurados:
+            observacoes.importar_json(novo)
+        detalhes = [{'tipo': li.tipo_item, 'id_original': orig, 'novo_id': novo.id}
+                    for li, orig, novo in restaurados]
+        registrar_log('lixeira', editor_nome, 'RESTAURACAO_LOTE',
+                      detalhes={'total': len(detalhes), 'itens': detalhes},
+                      log_type='lixeira', commit=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao restaurar em lote: {e}'}), 500
+
+    for li, _, novo in restaurados:
+        resultados.append({'id': li.id, 'ok': True, 'tipo_item': li.tipo_item, 'novo_id': novo.id})
+    socketio.emit('lixeira_lote', {
+        'acao': 'restaurar',
+        'ids': [li.id for li, _, _ in restaurados],
+        'tipos': sorted({li.tipo_item for li, _, _ in restaurados}),
+    })
+    return jsonify({'status': 'success', 'resultados': resultados})
+
+
+@lixeira_bp.route('/expurgar-lote', methods=['POST'])
+def expurgar_lote():
+    """Apaga definitivamente itens da lixeira. Corpo: {ids: [...], editor_nome}
+    ou, para esvaziar por critério, {antes_de: 'AAAA-MM-DD', tipo?, editor_nome}.
+    Um DELETE, um log agregado e um evento de socket."""
+    dados = request.get_json() or {}
+    editor_nome = dados.get('editor_nome', 'Sistema')
+    ids = _ids_do_corpo(dados)
+    antes_de = dados.get('antes_de')
+
+    query = ItemExcluido.query
+    if ids:
+        query = query.filter(ItemExcluido.id.in_(ids))
+    elif antes_de:
+        query = query.filter(ItemExcluido.data_exclusao < antes_de)
+        if dados.get('tipo'):
+            query = query.filter(ItemExcluido.tipo_item == dados['tipo'])
+    else:
+        return jsonify({'error': 'Informe os itens ou a data limite.'}), 400
+
+    try:
+        removidos = [row.id for row in query.with_entities(ItemExcluido.id)]
+        if removidos:
+            ItemExcluido.query.filter(ItemExcluido.id.in_(removidos)).delete(synchronize_session=False)
+            registrar_log('lixeira', editor_nome, 'EXPURGO_LOTE',
+                          detalhes={'total': len(removidos), 'ids': removidos,
+                                    'antes_de': None if ids else antes_de, 'tipo': dados.get('tipo')},
+                          log_type='lixeira', commit=False)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao expurgar em lote: {e}'}), 500
+
+    if removidos:
+        socketio.emit('lixeira_lote', {'acao': 'expurgar', 'ids': removidos})
+    return jsonify({'status': 'success', 'removidos': len(removidos)})
+
+
+# ==========================================
+# RETENÇÃO: arquivo e expurgo dos itens antigos
+# ==========================================
+
+def _pasta_arquivo():
+    pasta = os.path.join(current_app.config['ARQUIVO_DIR'], 'lixeira')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def expurgar_antigos(dias=None, simular=False):
+    """Tira da lixeira os itens excluídos há mais de `dias` dias
+    (LIXEIRA_RETENCAO_DIAS). Antes de apagar, cada item é gravado por inteiro
+    em arquivo/lixeira/lixeira-<AAAA-MM>.jsonl.gz (um JSON por linha; o mês
+    é o da exclusão), de onde ainda pode ser consultado. Retorna o resumo."""
+    if dias is None:
+        dias = current_app.config.get('LIXEIRA_RETENCAO_DIAS', RETENCAO_PADRAO_DIAS)
+    limite = (datetime.now(tz_cuiaba) - timedelta(days=dias)).isoformat()
+    query = ItemExcluido.query.filter(ItemExcluido.data_exclusao < limite)
+    total = query.count()
+    if simular or not total:
+        return {'itens': total, 'arquivos': [], 'limite': limite, 'simulado': simular}
+
+    por_mes = {}
+    for item in query.order_by(ItemExcluido.data_exclusao).yield_per(500):
+        por_mes.setdefault(item.data_exclusao[:7], []).append(serialize_item_excluido(item))
+
+    pasta = _pasta_arquivo()
+    arquivos = []
+    for mes, itens in por_mes.items():
+        caminho = os.path.join(pasta, f'lixeira-{mes}.jsonl.gz')
+        # 'ab': cada expurgo acrescenta um membro gzip; gzip.open lê todos em sequência.
+        with gzip.open(caminho, 'ab') as f:
+            for dados in itens:
+                f.write(json.dumps(dados, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileobj.fileno())
+        arquivos.append(caminho)
+
+    # Só apaga depois que o arquivo está gravado no disco.
+    query.delete(synchronize_session=False)
+    registrar_log('lixeira', 'Sistema', 'LIXEIRA_EXPURGO',
+                  detalhes={'itens': total, 'dias': dias, 'arquivos': [os.path.basename(a) for a in arquivos]},
+                  log_type='lixeira', commit=False)
+    db.session.commit()
+    return {'itens': total, 'arquivos': arquivos, 'limite': limite, 'simulado': False}
+
+
+def iniciar_expurgo_lixeira(app):
+    """Roda expurgar_antigos logo depois de subir e então uma vez por dia."""
+    def _loop():
+        socketio.sleep(60)   # deixa o servidor terminar de subir
+        while True:
+            with app.app_context():
+                try:
+                    r = expurgar_antigos()
+                    if r['itens']:
+                        print(f"[lixeira] {r['itens']} item(ns) arquivado(s) e removido(s).")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[lixeira] erro no expurgo: {e}")
+            socketio.sleep(24 * 3600)
+
+    socketio.start_background_task(_loop)
+
+
+def registrar_comandos_lixeira(app):
+    """flask --app run lixeira expurgar [--dias N] [--simular]"""
+    import click
+
+    @app.cli.group('lixeira')
+    def lixeira_cli():
+        """Manutenção da lixeira."""
+
+    @lixeira_cli.command('expurgar')
+    @click.option('--dias', type=int, default=None, help='Idade mínima (padrão: LIXEIRA_RETENCAO_DIAS).')
+    @click.option('--simular', is_flag=True, help='Só conta o que seria arquivado.')
+    def expurgar_cmd(dias, simular):
+        r = expurgar_antigos(dias=dias, simular=simular)
+        acao = 'Seriam arquivados' if simular else 'Arquivados'
+        click.echo(f"{acao} {r['itens']} item(ns) excluído(s) antes de {r['limite'][:10]}.")
+        for caminho in r['arquivos']:
+            click.echo(f"  {caminho}")
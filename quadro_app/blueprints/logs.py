@@ -1,9 +1,23 @@
 # quadro_app/blueprints/logs.py
-from flask import Blueprint, jsonify
+import gzip
+import json
+import os
+import sqlite3
+from datetime import datetime
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import text
+from ..extensions import db, tz_cuiaba
 from quadro_app.models import Log
+from quadro_app import socketio
 
 logs_bp = Blueprint('logs', __name__, url_prefix='/api/logs')
 
+# Meses que ficam na tabela 'log' do banco principal (o atual + anteriores).
+MESES_ATIVOS_PADRAO = 3
+# Meses que uma partição mensal fica consultável como banco SQLite antes de
+# virar arquivo JSONL comprimido.
+RETENCAO_PADRAO_MESES = 24
+
 def serialize_log(log_entry):
     """Converte um objeto Log do SQLAlchemy para um dicionário JSON."""
     return {
@@ -19,16 +33,231 @@ def get_logs_for_item(log_type, item_id):
     """
     Busca todos os logs para um item específico, ordenados do mais recente para o mais antigo.
     Ex: /api/logs/pedidos/123
+    Inclui os logs já movidos para as partições mensais e para o arquivo.
     """
     try:
         logs = Log.query.filter_by(log_type=log_type, item_id=str(item_id))\
                         .order_by(Log.timestamp.desc())\
                         .all()
-        
-        if not logs:
-            return jsonify([]) # Retorna uma lista vazia se não houver logs
-            
-        return jsonify([serialize_log(log) for log in logs])
+        resultado = [serialize_log(log) for log in logs]
+        resultado += _logs_antigos(log_type, str(item_id))
+        resultado.sort(key=lambda l: l['timestamp'] or '', reverse=True)
+        return jsonify(resultado)
     except Exception as e:
         print(f"ERRO ao buscar logs para {log_type}/{item_id}: {e}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+# ==========================================
+# PARTIÇÕES MENSAIS E ARQUIVO
+# ==========================================
+# O log cresce a cada ação. Para a tabela principal não crescer sem limite:
+#   1. Meses mais antigos que LOG_MESES_ATIVOS saem da tabela 'log' para uma
+#      partição mensal: arquivo/logs/log-AAAA-MM.db (mesmo schema e índice).
+#   2. Partições mais antigas que LOG_RETENCAO_MESES viram
+#      arquivo/logs/log-AAAA-MM.jsonl.gz, com um arquivo de chaves ao lado
+#      (log-AAAA-MM.chaves.json) para a leitura só abrir os meses que têm o item.
+# get_logs_for_item lê das três camadas.
+
+_SCHEMA_PARTICAO = (
+    "CREATE TABLE IF NOT EXISTS log (id INTEGER PRIMARY KEY, item_id VARCHAR(100) NOT NULL, "
+    "log_type VARCHAR(50) NOT NULL, autor VARCHAR(100), acao VARCHAR(100), detalhes JSON, "
+    "timestamp VARCHAR(100))",
+    "CREATE INDEX IF NOT EXISTS idx_log_tipo_item ON log (log_type, item_id, timestamp)",
+)
+_COLUNAS = 'id, item_id, log_type, autor, acao, detalhes, timestamp'
+
+
+def _pasta_logs():
+    pasta = os.path.join(current_app.config['ARQUIVO_DIR'], 'logs')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def _arquivos(sufixo):
+    """{'AAAA-MM': caminho} dos arquivos log-AAAA-MM<sufixo> da pasta de logs."""
+    pasta = _pasta_logs()
+    return {
+        nome[4:11]: os.path.join(pasta, nome)
+        for nome in os.listdir(pasta)
+        if nome.startswith('log-') and nome.endswith(sufixo)
+    }
+
+
+def _mes_anterior(mes, n):
+    ano, m = int(mes[:4]), int(mes[5:7]) - n
+    while m < 1:
+        ano, m = ano - 1, m + 12
+    return f'{ano:04d}-{m:02d}'
+
+
+def _proximo_mes(mes):
+    ano, m = int(mes[:4]), int(mes[5:7]) + 1
+    return f'{ano + m // 13:04d}-{(m - 1) % 12 + 1:02d}'
+
+
+def _linha_para_dict(row):
+    """(id, item_id, log_type, autor, acao, detalhes, timestamp) -> registro completo."""
+    detalhes = row[5]
+    if isinstance(detalhes, str):
+        detalhes = json.loads(detalhes)
+    return {'id': row[0], 'item_id': row[1], 'log_type': row[2], 'autor': row[3],
+            'acao': row[4], 'detalhes': detalhes, 'timestamp': row[6]}
+
+
+def _publico(registro):
+    return {k: registro[k] for k in ('id', 'autor', 'acao', 'detalhes', 'timestamp')}
+
+
+def _logs_antigos(log_type, item_id):
+    """Logs do item nas partições mensais e no arquivo JSONL."""
+    encontrados = []
+    for caminho in _arquivos('.db').values():
+        con = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+        try:
+            rows = con.execute(f"SELECT {_COLUNAS} FROM log WHERE log_type = ? AND item_id = ?",
+                               (log_type, item_id)).fetchall()
+        finally:
+            con.close()
+        encontrados += [_publico(_linha_para_dict(r)) for r in rows]
+
+    chave = f'{log_type}/{item_id}'
+    for mes, caminho in _arquivos('.jsonl.gz').items():
+        indice = caminho.replace('.jsonl.gz', '.chaves.json')
+        if os.path.exists(indice):
+            with open(indice, encoding='utf-8') as f:
+                if chave not in set(json.load(f)):
+                    continue
+        with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+            for linha in f:
+                registro = json.loads(linha)
+                if registro['log_type'] == log_type and registro['item_id'] == item_id:
+                    encontrados.append(_publico(registro))
+    return encontrados
+
+
+def particionar_logs(meses_ativos=None, simular=False):
+    """Move os meses fora da janela ativa da tabela 'log' para as partições
+    mensais. Cópia idempotente (INSERT OR REPLACE pelo id): se o processo cair
+    entre copiar e apagar, a próxima execução termina o serviço sem duplicar."""
+    if meses_ativos is None:
+        meses_ativos = current_app.config.get('LOG_MESES_ATIVOS', MESES_ATIVOS_PADRAO)
+    corte = _mes_anterior(datetime.now(tz_cuiaba).strftime('%Y-%m'), meses_ativos - 1)
+    meses = [row[0] for row in db.session.execute(text(
+        "SELECT DISTINCT substr(timestamp, 1, 7) FROM log WHERE timestamp < :corte ORDER BY 1"
+    ), {'corte': corte})]
+    if simular:
+        return {'meses': meses, 'linhas': 0, 'simulado': True}
+
+    total = 0
+    pasta = _pasta_logs()
+    for mes in meses:
+        faixa = {'inicio': mes, 'fim': _proximo_mes(mes)}
+        filtro = "timestamp >= :inicio AND timestamp < :fim"
+        rows = db.session.execute(text(f"SELECT {_COLUNAS} FROM log WHERE {filtro}"), faixa).fetchall()
+        con = sqlite3.connect(os.path.join(pasta, f'log-{mes}.db'))
+        try:
+            for ddl in _SCHEMA_PARTICAO:
+                con.execute(ddl)
+            con.executemany(f"INSERT OR REPLACE INTO log ({_COLUNAS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            [tuple(r) for r in rows])
+            con.commit()
+        finally:
+            con.close()
+        # Só apaga do banco principal depois que a partição foi gravada.
+        db.session.execute(text(f"DELETE FROM log WHERE {filtro}"), faixa)
+        db.session.commit()
+        total += len(rows)
+    return {'meses': meses, 'linhas': total, 'simulado': False}
+
+
+def arquivar_particoes(retencao_meses=None, simular=False):
+    """Converte as partições mais antigas que a retenção em JSONL comprimido
+    (um log por linha) e remove o .db."""
+    if retencao_meses is None:
+        retencao_meses = current_app.config.get('LOG_RETENCAO_MESES', RETENCAO_PADRAO_MESES)
+    corte = _mes_anterior(datetime.now(tz_cuiaba).strftime('%Y-%m'), retencao_meses)
+    meses = sorted(mes for mes in _arquivos('.db') if mes < corte)
+    if simular:
+        return {'meses': meses, 'simulado': True}
+
+    pasta = _pasta_logs()
+    for mes in meses:
+        caminho_db = os.path.join(pasta, f'log-{mes}.db')
+        destino = os.path.join(pasta, f'log-{mes}.jsonl.gz')
+        con = sqlite3.connect(caminho_db)
+        try:
+            rows = con.execute(f"SELECT {_COLUNAS} FROM log ORDER BY timestamp").fetchall()
+        finally:
+            con.close()
+        chaves = set()
+        # 'ab': se o mês já tinha arquivo, acrescenta (gzip.open lê os membros em sequência).
+        with gzip.open(destino, 'ab') as f:
+            for row in rows:
+                registro = _linha_para_dict(row)
+                chaves.add(f"{registro['log_type']}/{registro['item_id']}")
+                f.write(json.dumps(registro, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileobj.fileno())
+        indice = destino.replace('.jsonl.gz', '.chaves.json')
+        if os.path.exists(indice):
+            with open(indice, encoding='utf-8') as f:
+                chaves.update(json.load(f))
+        with open(indice, 'w', encoding='utf-8') as f:
+            json.dump(sorted(chaves), f, ensure_ascii=False)
+        os.remove(caminho_db)
+    return {'meses': meses, 'simulado': False}
+
+
+def manter_logs(simular=False):
+    return {
+        'particionados': particionar_logs(simular=simular),
+        'arquivados': arquivar_particoes(simular=simular),
+    }
+
+
+def iniciar_manutencao_logs(app):
+    """Roda manter_logs logo depois de subir e então uma vez por dia."""
+    def _loop():
+        socketio.sleep(60)   # deixa o servidor terminar de subir
+        while True:
+            with app.app_context():
+                try:
+                    r = manter_logs()
+                    if r['particionados']['linhas'] or r['arquivados']['meses']:
+                        print(f"[logs] particionados: {r['particionados']['meses']} | "
+                              f"arquivados: {r['arquivados']['meses']}")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[logs] erro na manutenção: {e}")
+            socketio.sleep(24 * 3600)
+
+    socketio.start_background_task(_loop)
+
+
+def registrar_comandos_logs(app):
+    """flask --app run logs manter [--simular] | status"""
+    import click
+
+    @app.cli.group('logs')
+    def logs_cli():
+        """Partições e arquivo do log."""
+
+    @logs_cli.command('manter')
+    @click.option('--simular', is_flag=True, help='Só mostra os meses que seriam movidos.')
+    def manter_cmd(simular):
+        r = manter_logs(simular=simular)
+        p, a = r['particionados'], r['arquivados']
+        click.echo(f"Para partições mensais: {', '.join(p['meses']) or 'nada'}"
+                   + ('' if simular else f" ({p['linhas']} linha(s))"))
+        click.echo(f"Para arquivo JSONL: {', '.join(a['meses']) or 'nada'}")
+
+    @logs_cli.command('status')
+    def status_cmd():
+        ativos = db.session.execute(text("SELECT count(*) FROM log")).scalar()
+        click.echo(f"Tabela log: {ativos} linha(s)")
+        for rotulo, sufixo in (('Partições', '.db'), ('Arquivo', '.jsonl.gz')):
+            arquivos = _arquivos(sufixo)
+            tamanho = sum(os.path.getsize(c) for c in arquivos.values())
+            click.echo(f"{rotulo}: {len(arquivos)} mês(es), {tamanho / 1024:.1f} KB "
+                       f"{'(' + ', '.join(sorted(arquivos)) + ')' if arquivos else ''}")
@@ -1,11 +1,11 @@
 # quadro_app/blueprints/pedidos.py
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from sqlalchemy import func 
 from ..extensions import tz_cuiaba, db
 from quadro_app.models import Pedido, Usuario, ItemExcluido
 from quadro_app.utils import registrar_log, criar_notificacao 
 from quadro_app import socketio
+from quadro_app.blueprints.versoes import obter_versao
 import copy
 
 pedidos_bp = Blueprint('pedidos', __name__, url_prefix='/api/pedidos')
@@ -391,17 +391,11 @@ def get_codigos_historico():
 
 @pedidos_bp.route('/status-quadro', methods=['GET'])
 def get_quadro_status():
+    """Indicador barato de mudança no quadro: a versão do domínio 'pedidos'
+    sobe a cada alteração (inclusive edições que não mexem em data_criacao).
+    Prefira /api/versoes, que devolve todos os domínios de uma vez."""
     try:
-        # --- CORREÇÃO AQUI: Adicionado 'Aguardando Aprovação' na lista ---
-        status_visiveis = ['Aguardando', 'Em Cotação', 'Aguardando Aprovação']
-        
-        count = db.session.query(func.count(Pedido.id)).filter(Pedido.status.in_(status_visiveis)).scalar()
-        latest_timestamp_obj = db.session.query(func.max(Pedido.data_criacao)).filter(Pedido.status.in_(status_visiveis)).first()
-        latest_timestamp = latest_timestamp_obj[0] if latest_timestamp_obj else None
-
-        return jsonify({
-            'total_ativos': count,
-            'ultimo_update': latest_timestamp
-        })
+        versao = obter_versao('pedidos')
+        return jsonify({'versao': versao, 'ultimo_update': versao})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,8 +1,10 @@
 # quadro_app/blueprints/registro_compras.py
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime, timedelta, time
+from sqlalchemy import func
 from ..extensions import db, tz_cuiaba
-from ..models import RegistroCompra, MovimentacaoCompra, Usuario
+from ..models import RegistroCompra, MovimentacaoCompra, Usuario, Fornecedor
+from ..relatorios import responder_relatorio, texto_periodo
 from quadro_app import socketio
 
 compras_registro_bp = Blueprint('compras_registro', __name__, url_prefix='/api/registro-compras')
@@ -220,7 +222,11 @@ def excluir_registro(reg_id):
     try:
         reg = RegistroCompra.query.get_or_404(reg_id)
         # Remove eventos de auditoria manualmente (FK cascade nao e garantido no SQLite).
-        MovimentacaoCompra.query.filter_by(registro_id=reg_id).delete(synchronize_session=False)
+        # Pela sessao, nao em massa: o resumo por fornecedor precisa ver o dia
+        # do 'Pedido Efetuado' que sai (ver fornecedores._antes_flush).
+        for mov in reg.movimentacoes:
+            db.session.delete(mov)
+        db.session.flush()
         db.session.delete(reg)
         db.session.commit()
         socketio.emit('registro_compras_atualizado')
@@ -432,84 +438,68 @@ def auditoria_detalhe(reg_id):
 
 
 # ============================================================
-# RELATORIO (texto) — inalterado
+# RELATORIO (texto / csv) — ver relatorios.py
 # ============================================================
 
+def dados_relatorio_registro(filtros):
+    """Estatísticas do relatório de compras (contexto do template
+    relatorios/registro_compras.txt; também vai para os snapshots)."""
+    query = RegistroCompra.query
+    if filtros.get('fornecedor'):
+        query = query.filter(RegistroCompra.fornecedor.ilike(f"%{filtros['fornecedor']}%"))
+    if filtros.get('comprador'):
+        query = query.filter(RegistroCompra.comprador_nome == filtros['comprador'])
+    if filtros.get('status'):
+        query = query.filter(RegistroCompra.status == filtros['status'])
+    if filtros.get('dataInicio'):
+        query = query.filter(RegistroCompra.data_criacao >= filtros['dataInicio'])
+    if filtros.get('dataFim'):
+        query = query.filter(RegistroCompra.data_criacao <= filtros['dataFim'] + 'T23:59:59')
+
+    comprador = func.coalesce(func.nullif(RegistroCompra.comprador_nome, ''), 'EM ABERTO')
+    por_comprador = (query.with_entities(comprador, func.count(RegistroCompra.id))
+                     .group_by(comprador).order_by(comprador).all())
+    total_geral = sum(qtd for _, qtd in por_comprador)
+
+    # Fornecedores agrupados pelo cadastro (fornecedor_id), com o nome de lá.
+    por_fornecedor = []
+    if total_geral:
+        nome_fornecedor = func.coalesce(func.min(Fornecedor.nome), func.min(RegistroCompra.fornecedor), '')
+        por_fornecedor = (query.outerjoin(Fornecedor, Fornecedor.id == RegistroCompra.fornecedor_id)
+                          .with_entities(nome_fornecedor, func.count(RegistroCompra.id))
+                          .group_by(RegistroCompra.fornecedor_id)
+                          .order_by(func.count(RegistroCompra.id).desc(), nome_fornecedor).all())
+
+    f_info = []
+    if filtros.get('fornecedor'): f_info.append(f"Fornecedor: {filtros['fornecedor']}")
+    if filtros.get('comprador'): f_info.append(f"Comprador: {filtros['comprador']}")
+    if filtros.get('status'): f_info.append(f"Status: {filtros['status']}")
+    f_info.append(f"Período: {texto_periodo(filtros, separador='a', prefixo='')}")
+
+    return {
+        'filtros_texto': ', '.join(f_info),
+        'total': total_geral,
+        'por_comprador': [list(linha) for linha in por_comprador],
+        'por_fornecedor': [list(linha) for linha in por_fornecedor],
+    }
+
+
+def responder_relatorio_registro(formato, dados, gerado_em=None):
+    linhas_csv = [
+        [grupo, nome, qtd]
+        for grupo, stats in (('Comprador', dados['por_comprador']), ('Fornecedor', dados['por_fornecedor']))
+        for nome, qtd in stats
+    ]
+    return responder_relatorio(
+        formato, 'relatorios/registro_compras.txt', 'relatorio_compras',
+        ['Grupo', 'Nome', 'Registros'], linhas_csv, gerado_em=gerado_em, **dados
+    )
+
+
 @compras_registro_bp.route('/relatorio', methods=['POST'])
 def gerar_relatorio_registro():
     filtros = request.get_json() or {}
     try:
-        query = RegistroCompra.query
-        if filtros.get('fornecedor'):
-            query = query.filter(RegistroCompra.fornecedor.ilike(f"%{filtros['fornecedor']}%"))
-        if filtros.get('comprador'):
-            query = query.filter(RegistroCompra.comprador_nome == filtros['comprador'])
-        if filtros.get('status'):
-            query = query.filter(RegistroCompra.status == filtros['status'])
-        if filtros.get('dataInicio'):
-            query = query.filter(RegistroCompra.data_criacao >= filtros['dataInicio'])
-        if filtros.get('dataFim'):
-            query = query.filter(RegistroCompra.data_criacao <= filtros['dataFim'] + 'T23:59:59')
-
-        registros = query.all()
-        if not registros:
-            return jsonify({'relatorio': "Nenhum dado encontrado para os filtros aplicados."})
-
-        stats_compradores = {}
-        stats_fornecedores = {}
-        total_geral = len(registros)
-
-        for r in registros:
-            comp = r.comprador_nome or "EM ABERTO"
-            stats_compradores[comp] = stats_compradores.get(comp, 0) + 1
-            forn = r.fornecedor
-            stats_fornecedores[forn] = stats_fornecedores.get(forn, 0) + 1
-
-        now = datetime.now(tz_cuiaba)
-        report = []
-        report.append("========================================")
-        report.append("      RELATÓRIO DE REGISTRO DE COMPRAS")
-        report.append("========================================")
-        report.append(f"Gerado em: {now.strftime('%d/%m/%Y %H:%M:%S')}")
-
-        # --- NOVO BLOCO DE INFORMAÇÕES DE FILTRO ---
-        f_info = []
-        if filtros.get('fornecedor'): f_info.append(f"Fornecedor: {filtros['fornecedor']}")
-        if filtros.get('comprador'): f_info.append(f"Comprador: {filtros['comprador']}")
-        if filtros.get('status'): f_info.append(f"Status: {filtros['status']}")
-
-        data_str = "Todo o período"
-        if filtros.get('dataInicio') and filtros.get('dataFim'):
-            data_str = f"{filtros['dataInicio']} a {filtros['dataFim']}"
-        elif filtros.get('dataInicio'):
-            data_str = f"A partir de {filtros['dataInicio']}"
-        elif filtros.get('dataFim'):
-            data_str = f"Até {filtros['dataFim']}"
-        f_info.append(f"Período: {data_str}")
-
-        report.append(f"Filtros Aplicados: {', '.join(f_info)}")
-        report.append("----------------------------------------")
-
-        report.append(f"Total de Registros Analisados: {total_geral}")
-        report.append("----------------------------------------\n")
-
-
-        report.append("PRODUTIVIDADE POR COMPRADOR:")
-        for comp in sorted(stats_compradores.keys()):
-            qtd = stats_compradores[comp]
-            perc = (qtd / total_geral) * 100
-            report.append(f"  - {comp.ljust(20)}: {str(qtd).rjust(3)} registros")
-
-        report.append("\n----------------------------------------\n")
-        report.append("DEMANDA POR FORNECEDOR (Top Demandas):")
-        for forn in sorted(stats_fornecedores.keys(), key=lambda x: stats_fornecedores[x], reverse=True):
-            qtd = stats_fornecedores[forn]
-            report.append(f"  - {forn.ljust(25)}: {qtd} pedido(s)")
-
-        report.append("\n======================================== ")
-        report.append("            FIM DO RELATÓRIO")
-        report.append("======================================== ")
-
-        return jsonify({'relatorio': '\n'.join(report)})
+        return responder_relatorio_registro(filtros.get('formato'), dados_relatorio_registro(filtros))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
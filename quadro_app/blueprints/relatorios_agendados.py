@@ -0,0 +1,366 @@
+# quadro_app/blueprints/relatorios_agendados.py
+import re
+import time
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import func
+
+from ..extensions import db, tz_cuiaba
+from ..models import RelatorioAgendado, SnapshotRelatorio
+from ..relatorios import FORMATOS_DOWNLOAD, PERIODOS, resolver_periodo
+from ..banco_analitico import leitura_analitica, momento_copia
+from quadro_app import socketio
+from .conferencias import calcular_dashboard_conferencias
+from .dashboard import dados_relatorio_pedidos, responder_relatorio_pedidos
+from .registro_compras import dados_relatorio_registro, responder_relatorio_registro, _format_duracao
+from .separacoes import calcular_dashboard_logistica
+
+relatorios_agendados_bp = Blueprint('relatorios_agendados', __name__, url_prefix='/api/relatorios-agendados')
+
+# ==========================================
+# RELATÓRIOS AGENDADOS
+# ==========================================
+# Os gestores rodam os mesmos relatórios toda manhã com os mesmos filtros
+# ("mês passado", "esta semana"), e cada execução recalculava tudo das
+# tabelas. Um RelatorioAgendado guarda o tipo e os filtros; o agendador gera
+# um SnapshotRelatorio por dia no horário definido e GET /<id> devolve o
+# último snapshot na hora, com a idade, calculando ao vivo só quando não há
+# snapshot válido (ver _snapshot_valido).
+
+# tipo -> (descrição, calcular(filtros) -> dados, responder(formato, dados, gerado_em) ou None).
+# 'responder' existe nos relatórios de texto e dá os downloads TXT/CSV.
+TIPOS = {
+    'pedidos': ('Relatório de pedidos', dados_relatorio_pedidos, responder_relatorio_pedidos),
+    'compras': ('Relatório de registro de compras', dados_relatorio_registro, responder_relatorio_registro),
+    'conferencias': ('Dashboard de conferências', calcular_dashboard_conferencias, None),
+    'logistica': ('Dashboard de logística', calcular_dashboard_logistica, None),
+}
+
+SNAPSHOTS_MANTIDOS_PADRAO = 7
+
+
+def _agora():
+    return datetime.now(tz_cuiaba)
+
+
+def _filtros_efetivos(rel, hoje):
+    """Filtros salvos com o período relativo resolvido para 'hoje'."""
+    filtros = dict(rel.filtros or {})
+    filtros.pop('formato', None)
+    if rel.periodo:
+        filtros['dataInicio'], filtros['dataFim'] = resolver_periodo(rel.periodo, hoje)
+    return filtros
+
+
+def gerar_snapshot(rel, agora=None, copia=False):
+    """Calcula o relatório, grava o snapshot e apaga os mais antigos que
+    RELATORIOS_SNAPSHOTS_MANTIDOS. Faz commit.
+
+    Com copia (agendador, fora de requisição), lê da cópia analítica,
+    atualizada antes se é anterior a 'agora', e gerado_em é o momento dos
+    dados da cópia. Sem copia (pedidos explícitos: ao_vivo, max_idade,
+    /gerar), lê do banco principal."""
+    agora = agora or _agora()
+    filtros = _filtros_efetivos(rel, agora.date())
+    inicio = time.perf_counter()
+    if copia:
+        with leitura_analitica(desde=agora):
+            dados = TIPOS[rel.tipo][1](filtros)
+            gerado_em = momento_copia() or agora
+    else:
+        dados, gerado_em = TIPOS[rel.tipo][1](filtros), agora
+    snap = SnapshotRelatorio(
+        relatorio_id=rel.id, gerado_em=gerado_em.isoformat(),
+        data_inicio=filtros.get('dataInicio') or None, data_fim=filtros.get('dataFim') or None,
+        duracao_ms=int((time.perf_counter() - inicio) * 1000), dados=dados,
+    )
+    db.session.add(snap)
+    db.session.flush()
+
+    mantidos = current_app.config.get('RELATORIOS_SNAPSHOTS_MANTIDOS', SNAPSHOTS_MANTIDOS_PADRAO)
+    antigos = (db.session.query(SnapshotRelatorio.id)
+               .filter_by(relatorio_id=rel.id)
+               .order_by(SnapshotRelatorio.gerado_em.desc())
+               .offset(mantidos).subquery())
+    SnapshotRelatorio.query.filter(SnapshotRelatorio.id.in_(db.session.query(antigos.c.id))) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return snap
+
+
+def _ultimo_snapshot(relatorio_id):
+    return (SnapshotRelatorio.query.filter_by(relatorio_id=relatorio_id)
+            .order_by(SnapshotRelatorio.gerado_em.desc()).first())
+
+
+def _idade_segundos(snap, agora):
+    return max(0, int((agora - datetime.fromisoformat(snap.gerado_em)).total_seconds()))
+
+
+def _snapshot_valido(rel, snap, agora, max_idade=None):
+    """O snapshot serve se é posterior à última edição do relatório, cobre o
+    mesmo período que seria calculado agora (o 'mês passado' de ontem pode
+    não ser o de hoje) e, com max_idade, não é mais velho que isso."""
+    if snap is None:
+        return False
+    if rel.atualizado_em and snap.gerado_em < rel.atualizado_em:
+        return False
+    filtros = _filtros_efetivos(rel, agora.date())
+    if (snap.data_inicio, snap.data_fim) != (filtros.get('dataInicio') or None, filtros.get('dataFim') or None):
+        return False
+    return max_idade is None or _idade_segundos(snap, agora) <= max_idade
+
+
+def _horario_de_hoje(rel, agora):
+    horas, minutos = (int(x) for x in rel.horario.split(':'))
+    return agora.replace(hour=horas, minute=minutos, second=0, microsecond=0)
+
+
+def gerar_relatorios_pendentes(agora=None):
+    """Gera os relatórios ativos cujo horário de hoje já passou e que ainda
+    não têm snapshot desde então. Devolve quantos foram gerados."""
+    agora = agora or _agora()
+    ultimos = dict(db.session.query(SnapshotRelatorio.relatorio_id, func.max(SnapshotRelatorio.gerado_em))
+                   .group_by(SnapshotRelatorio.relatorio_id).all())
+    gerados = 0
+    for rel in RelatorioAgendado.query.filter_by(ativo=True).order_by(RelatorioAgendado.id).all():
+        horario = _horario_de_hoje(rel, agora)
+        ultimo = ultimos.get(rel.id)
+        if agora < horario or (ultimo and datetime.fromisoformat(ultimo) >= horario):
+            continue
+        try:
+            gerar_snapshot(rel, agora, copia=True)
+            gerados += 1
+        except Exception as e:
+            db.session.rollback()
+            print(f"[relatorios] erro ao gerar '{rel.nome}' (id {rel.id}): {e}")
+    return gerados
+
+
+def serialize_relatorio(rel, snap=None, agora=None):
+    agora = agora or _agora()
+    return {
+        'id': rel.id,
+        'nome': rel.nome,
+        'tipo': rel.tipo,
+        'tipo_descricao': TIPOS[rel.tipo][0] if rel.tipo in TIPOS else rel.tipo,
+        'periodo': rel.periodo,
+        'periodo_descricao': PERIODOS.get(rel.periodo, 'Datas fixas'),
+        'filtros': rel.filtros or {},
+        'horario': rel.horario,
+        'ativo': rel.ativo,
+        'criado_por': rel.criado_por,
+        'criado_em': rel.criado_em,
+        'ultimo_snapshot': _meta_snapshot(snap, agora) if snap else None,
+    }
+
+
+def _meta_snapshot(snap, agora):
+    idade = _idade_segundos(snap, agora)
+    return {
+        'id': snap.id,
+        'gerado_em': snap.gerado_em,
+        'idade_segundos': idade,
+        'idade_texto': _format_duracao(idade),
+        'data_inicio': snap.data_inicio,
+        'data_fim': snap.data_fim,
+        'duracao_ms': snap.duracao_ms,
+    }
+
+
+_HORARIO = re.compile(r'^([01]\d|2[0-3]):[0-5]\d$')
+
+
+def _aplicar_dados(rel, dados):
+    """Valida e copia os campos editáveis. Devolve a mensagem de erro ou None."""
+    if 'nome' in dados:
+        rel.nome = (dados.get('nome') or '').strip()
+    if 'tipo' in dados:
+        rel.tipo = dados.get('tipo')
+    if 'periodo' in dados:
+        rel.periodo = dados.get('periodo') or None
+    if 'filtros' in dados:
+        rel.filtros = dados.get('filtros') or {}
+    if 'horario' in dados:
+        rel.horario = dados.get('horario') or '06:00'
+    if 'ativo' in dados:
+        rel.ativo = bool(dados.get('ativo'))
+
+    if not rel.nome:
+        return 'Informe o nome do relatório.'
+    if rel.tipo not in TIPOS:
+        return f"Tipo inválido. Use: {', '.join(TIPOS)}."
+    if rel.periodo and rel.periodo not in PERIODOS:
+        return f"Período inválido. Use: {', '.join(PERIODOS)}."
+    if not isinstance(rel.filtros, dict):
+        return 'Os filtros devem ser um objeto.'
+    if not _HORARIO.match(rel.horario or ''):
+        return 'Horário inválido (use HH:MM).'
+    return None
+
+
+# ==========================================
+# ROTAS
+# ==========================================
+
+@relatorios_agendados_bp.route('/tipos', methods=['GET'])
+def listar_tipos():
+    return jsonify({
+        'tipos': [{'tipo': t, 'descricao': d[0], 'downloads': d[2] is not None} for t, d in TIPOS.items()],
+        'periodos': [{'periodo': p, 'descricao': d} for p, d in PERIODOS.items()],
+    })
+
+
+@relatorios_agendados_bp.route('', methods=['GET'])
+def listar_relatorios():
+    try:
+        agora = _agora()
+        relatorios = RelatorioAgendado.query.order_by(RelatorioAgendado.nome).all()
+        # Último snapshot de cada relatório numa consulta só.
+        ultimos = (db.session.query(SnapshotRelatorio.relatorio_id,
+                                    func.max(SnapshotRelatorio.gerado_em).label('gerado_em'))
+                   .group_by(SnapshotRelatorio.relatorio_id).subquery())
+        snaps = {s.relatorio_id: s for s in SnapshotRelatorio.query.join(
+            ultimos, (ultimos.c.relatorio_id == SnapshotRelatorio.relatorio_id)
+            & (ultimos.c.gerado_em == SnapshotRelatorio.gerado_em)
+        ).all()}
+        return jsonify([serialize_relatorio(r, snaps.get(r.id), agora) for r in relatorios])
+    except Exception as e:
+        print(f"ERRO ao listar relatórios agendados: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@relatorios_agendados_bp.route('', methods=['POST'])
+def criar_relatorio():
+    dados = request.get_json() or {}
+    agora = _agora().isoformat()
+    rel = RelatorioAgendado(criado_por=dados.get('editor_nome', 'Sistema'), criado_em=agora,
+                            atualizado_em=agora, filtros={}, horario='06:00', ativo=True)
+    erro = _aplicar_dados(rel, dados)
+    if erro:
+        return jsonify({'error': erro}), 400
+    db.session.add(rel)
+    db.session.commit()
+    return jsonify(serialize_relatorio(rel)), 201
+
+
+@relatorios_agendados_bp.route('/<int:relatorio_id>', methods=['PUT'])
+def atualizar_relatorio(relatorio_id):
+    rel = RelatorioAgendado.query.get_or_404(relatorio_id)
+    erro = _aplicar_dados(rel, request.get_json() or {})
+    if erro:
+        db.session.rollback()
+        return jsonify({'error': erro}), 400
+    rel.atualizado_em = _agora().isoformat()
+    db.session.commit()
+    return jsonify(serialize_relatorio(rel, _ultimo_snapshot(rel.id)))
+
+
+@relatorios_agendados_bp.route('/<int:relatorio_id>', methods=['DELETE'])
+def excluir_relatorio(relatorio_id):
+    rel = RelatorioAgendado.query.get_or_404(relatorio_id)
+    SnapshotRelatorio.query.filter_by(relatorio_id=rel.id).delete(synchronize_session=False)
+    db.session.delete(rel)
+    db.session.commit()
+    return jsonify({'status': 'success'})
+
+
+@relatorios_agendados_bp.route('/<int:relatorio_id>', methods=['GET'])
+def obter_relatorio(relatorio_id):
+    """Último snapshot válido do relatório, ou o cálculo ao vivo (que vira o
+    novo snapshot). Parâmetros:
+        formato=txt|csv  download (só relatórios de texto);
+        max_idade=N      recalcula se o snapshot tem mais de N segundos;
+        ao_vivo=1        recalcula sempre."""
+    rel = RelatorioAgendado.query.get_or_404(relatorio_id)
+    formato = request.args.get('formato')
+    responder = TIPOS[rel.tipo][2] if rel.tipo in TIPOS else None
+    if formato in FORMATOS_DOWNLOAD and responder is None:
+        return jsonify({'error': 'Este tipo de relatório não tem download.'}), 400
+    try:
+        agora = _agora()
+        max_idade = request.args.get('max_idade', type=int)
+        snap = None if request.args.get('ao_vivo') == '1' else _ultimo_snapshot(rel.id)
+        origem = 'snapshot'
+        if not _snapshot_valido(rel, snap, agora, max_idade):
+            snap, origem = gerar_snapshot(rel, agora), 'ao_vivo'
+
+        if formato in FORMATOS_DOWNLOAD:
+            resposta = responder(formato, snap.dados, datetime.fromisoformat(snap.gerado_em))
+            resposta.headers['X-Relatorio-Gerado-Em'] = snap.gerado_em
+            resposta.headers['X-Relatorio-Origem'] = origem
+            return resposta
+        corpo = serialize_relatorio(rel, snap, agora)
+        corpo.update(origem=origem, dados=snap.dados)
+        return jsonify(corpo)
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERRO ao obter relatório agendado {relatorio_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@relatorios_agendados_bp.route('/<int:relatorio_id>/gerar', methods=['POST'])
+def gerar_relatorio_agora(relatorio_id):
+    rel = RelatorioAgendado.query.get_or_404(relatorio_id)
+    try:
+        snap = gerar_snapshot(rel)
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERRO ao gerar relatório agendado {relatorio_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify(serialize_relatorio(rel, snap))
+
+
+# ==========================================
+# AGENDADOR (background) E CLI
+# ==========================================
+
+def iniciar_agendador_relatorios(app):
+    """Confere a cada minuto os relatórios com horário vencido e gera os
+    snapshots do dia."""
+    def _loop():
+        socketio.sleep(60)   # deixa o servidor terminar de subir
+        while True:
+            with app.app_context():
+                try:
+                    gerados = gerar_relatorios_pendentes()
+                    if gerados:
+                        print(f"[relatorios] {gerados} relatório(s) agendado(s) gerado(s).")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[relatorios] erro no agendador: {e}")
+            socketio.sleep(60)
+
+    socketio.start_background_task(_loop)
+
+
+def registrar_comandos_relatorios(app):
+    """flask --app run relatorios listar | gerar [--id N] [--pendentes]"""
+    import click
+
+    @app.cli.group('relatorios')
+    def relatorios_cli():
+        """Relatórios agendados e seus snapshots."""
+
+    @relatorios_cli.command('listar')
+    def listar_cmd():
+        agora = _agora()
+        for rel in RelatorioAgendado.query.order_by(RelatorioAgendado.id).all():
+            snap = _ultimo_snapshot(rel.id)
+            idade = _format_duracao(_idade_segundos(snap, agora)) if snap else 'nunca gerado'
+            click.echo(f"{rel.id:>4}  {rel.tipo:<13} {rel.horario}  {'ativo' if rel.ativo else 'inativo':<7}  "
+                       f"{rel.nome}  ({PERIODOS.get(rel.periodo, 'datas fixas')}; último: {idade})")
+
+    @relatorios_cli.command('gerar')
+    @click.option('--id', 'relatorio_id', type=int, default=None, help='Gera só este relatório.')
+    @click.option('--pendentes', is_flag=True, help='Só os que já passaram do horário hoje.')
+    def gerar_cmd(relatorio_id, pendentes):
+        if pendentes:
+            click.echo(f"{gerar_relatorios_pendentes()} relatório(s) gerado(s).")
+            return
+        query = RelatorioAgendado.query
+        query = query.filter_by(id=relatorio_id) if relatorio_id else query.filter_by(ativo=True)
+        for rel in query.order_by(RelatorioAgendado.id).all():
+            snap = gerar_snapshot(rel)
+            click.echo(f"{rel.id:>4}  {rel.nome}: {snap.duracao_ms} ms")
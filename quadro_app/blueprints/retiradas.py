@@ -1,8 +1,10 @@
 # quadro_app/blueprints/retiradas.py
-from flask import Blueprint, request, jsonify, session
-from datetime import datetime
+from flask import Blueprint, request, jsonify, session, current_app
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, text
 from ..extensions import db, tz_cuiaba
-from quadro_app.models import RetiradaAntecipada, Usuario
+from ..monitor_sql import orcamento_sql
+from quadro_app.models import RetiradaAntecipada, ConciliacaoRetirada, Usuario
 from quadro_app import socketio
 
 retiradas_bp = Blueprint('retiradas', __name__, url_prefix='/api/retiradas')
@@ -10,6 +12,11 @@ retiradas_bp = Blueprint('retiradas', __name__, url_prefix='/api/retiradas')
 PAGE_KEY = 'retiradas_antecipadas'      # base: ver a aba e preencher
 CONFERIR_KEY = 'retiradas_conferir'     # extra: marcar/desmarcar o checkbox
 
+HISTORICO_LIMITE_PADRAO = 50
+HISTORICO_LIMITE_MAXIMO = 200
+# Retirada não conferida há mais que isso entra como pendência na conciliação.
+DIAS_PENDENCIA_PADRAO = 7
+
 
 def _usuario_atual():
     uid = session.get('user_id')
@@ -49,18 +56,79 @@ def serialize(r):
 
 
 @retiradas_bp.route('', methods=['GET'])
+@orcamento_sql(2)
 def listar():
+    """Retiradas em aberto (conferido=False), todas de uma vez: é a lista de
+    trabalho e fica pequena. As já conferidas saem em /historico."""
     u = _usuario_atual()
     if not _pode_ver(u):
         return jsonify({'error': 'Acesso restrito.'}), 403
-    registros = RetiradaAntecipada.query.order_by(RetiradaAntecipada.id.desc()).all()
+    registros = RetiradaAntecipada.query.filter(RetiradaAntecipada.conferido.is_(False))\
+        .order_by(RetiradaAntecipada.id.desc()).all()
     # Informa ao frontend se o usuario pode marcar o checkbox.
     return jsonify({
-        'registros': [serialize(r) for r in registros],
+        'abertas': [serialize(r) for r in registros],
         'pode_conferir': _pode_conferir(u),
     })
 
 
+@retiradas_bp.route('/historico', methods=['GET'])
+@orcamento_sql(2)
+def historico():
+    """
+    Retiradas já conferidas, mais recentes primeiro, em páginas por cursor.
+    Filtros: ?data_inicio= e ?data_fim= (YYYY-MM-DD), ?separador= e ?codigo=
+    (valor exato). Paginação: ?limit= e ?cursor=<proximo_cursor> ("data|id").
+    """
+    u = _usuario_atual()
+    if not _pode_ver(u):
+        return jsonify({'error': 'Acesso restrito.'}), 403
+
+    query = RetiradaAntecipada.query.filter(RetiradaAntecipada.conferido.is_(True))
+    data_inicio = request.args.get('data_inicio')
+    if data_inicio:
+        query = query.filter(RetiradaAntecipada.data >= data_inicio)
+    data_fim = request.args.get('data_fim')
+    if data_fim:
+        query = query.filter(RetiradaAntecipada.data <= data_fim)
+    separador = (request.args.get('separador') or '').strip()
+    if separador:
+        query = query.filter(RetiradaAntecipada.separador_nome == separador)
+    codigo = (request.args.get('codigo') or '').strip()
+    if codigo:
+        query = query.filter(RetiradaAntecipada.codigo == codigo)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        data_cursor, _, id_cursor = cursor.rpartition('|')
+        try:
+            id_cursor = int(id_cursor)
+        except ValueError:
+            return jsonify({'error': 'cursor invalido.'}), 400
+        query = query.filter(or_(
+            RetiradaAntecipada.data < data_cursor,
+            and_(RetiradaAntecipada.data == data_cursor, RetiradaAntecipada.id < id_cursor),
+        ))
+
+    try:
+        limit = int(request.args.get('limit', HISTORICO_LIMITE_PADRAO))
+    except ValueError:
+        limit = HISTORICO_LIMITE_PADRAO
+    limit = max(1, min(limit, HISTORICO_LIMITE_MAXIMO))
+
+    rows = query.order_by(RetiradaAntecipada.data.desc(), RetiradaAntecipada.id.desc())\
+        .limit(limit + 1).all()
+    proximo_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        proximo_cursor = f"{rows[-1].data}|{rows[-1].id}"
+
+    return jsonify({
+        'itens': [serialize(r) for r in rows],
+        'proximo_cursor': proximo_cursor,
+    })
+
+
 @retiradas_bp.route('', methods=['POST'])
 def criar():
     u = _usuario_atual()
@@ -157,3 +225,188 @@ def excluir(retirada_id):
     db.session.commit()
     socketio.emit('retiradas_atualizado')
     return jsonify({'status': 'success'})
+
+
+# ==========================================
+# CONCILIAÇÃO
+# ==========================================
+# numero_separacao e codigo são texto livre. Em vez de conferir linha a linha,
+# conciliar_retiradas() cruza tudo em lote e grava o resultado em
+# conciliacao_retirada (uma linha por retirada):
+#   - separação: numero_separacao x separacao.numero_movimentacao
+#     (sem_separacao; separacao_cancelada se o número está nas canceladas);
+#   - ajustes: a campanha cuja janela cobre a data da retirada; a soma das
+#     retiradas do código na campanha deve bater com a falta apontada pelos
+#     ajustes não cancelados do código (divergencia_quantidade);
+#   - pendente_antiga: não conferida há mais de RETIRADAS_DIAS_PENDENCIA dias.
+# A conferência do dia é um SELECT em conciliacao_retirada.
+
+_SQL_CONCILIAR = """
+WITH ret AS (
+    SELECT r.id, r.data, r.codigo, r.separador_nome, r.quantidade, r.numero_separacao,
+           r.conferido, UPPER(TRIM(r.codigo)) AS codigo_norm, TRIM(r.numero_separacao) AS numero_norm,
+           (SELECT c.id FROM campanha_ajuste c
+             WHERE substr(c.data_inicio, 1, 10) <= r.data
+               AND (c.data_fim IS NULL OR substr(c.data_fim, 1, 10) >= r.data)
+             ORDER BY c.data_inicio DESC, c.id DESC LIMIT 1) AS campanha_id
+      FROM retirada_antecipada r
+),
+soma_ret AS (
+    SELECT campanha_id, codigo_norm, SUM(COALESCE(quantidade, 0)) AS qtd
+      FROM ret WHERE campanha_id IS NOT NULL
+     GROUP BY campanha_id, codigo_norm
+),
+falta_aj AS (
+    SELECT campanha_id, UPPER(TRIM(codigo)) AS codigo_norm,
+           SUM(COALESCE(quantidade_sistema, 0) - quantidade_real) AS falta
+      FROM ajuste_estoque WHERE status != 'Cancelado'
+     GROUP BY campanha_id, UPPER(TRIM(codigo))
+),
+canceladas AS (
+    SELECT DISTINCT TRIM(numero_separacao) AS numero FROM separacao_cancelada
+),
+base AS (
+    SELECT ret.*, s.id AS separacao_id, s.status AS separacao_status,
+           sr.qtd AS qtd_retirada_campanha, fa.falta AS qtd_falta_ajuste,
+           s.id IS NULL AS sem_separacao,
+           -- COALESCE: com data (ou soma) NULL a comparação dá NULL, e as
+           -- colunas de destino são NOT NULL. Sem data, não conta como antiga.
+           COALESCE(s.id IS NULL AND cc.numero IS NOT NULL, 0) AS separacao_cancelada,
+           COALESCE(fa.falta IS NOT NULL AND fa.falta != sr.qtd, 0) AS divergencia_quantidade,
+           COALESCE(NOT ret.conferido AND ret.data < :corte, 0) AS pendente_antiga
+      FROM ret
+      LEFT JOIN separacao s ON s.numero_movimentacao = ret.numero_norm AND ret.numero_norm != ''
+      LEFT JOIN canceladas cc ON cc.numero = ret.numero_norm AND ret.numero_norm != ''
+      LEFT JOIN soma_ret sr ON sr.campanha_id = ret.campanha_id AND sr.codigo_norm = ret.codigo_norm
+      LEFT JOIN falta_aj fa ON fa.campanha_id = ret.campanha_id AND fa.codigo_norm = ret.codigo_norm
+)
+INSERT INTO conciliacao_retirada (
+    retirada_id, data, codigo, separador_nome, quantidade, numero_separacao, conferido,
+    separacao_id, separacao_status, campanha_id, qtd_retirada_campanha, qtd_falta_ajuste,
+    sem_separacao, separacao_cancelada, divergencia_quantidade, pendente_antiga,
+    divergente, calculado_em)
+SELECT id, data, codigo, separador_nome, quantidade, numero_separacao, conferido,
+       separacao_id, separacao_status, campanha_id, qtd_retirada_campanha, qtd_falta_ajuste,
+       sem_separacao, separacao_cancelada, divergencia_quantidade, pendente_antiga,
+       sem_separacao OR divergencia_quantidade OR pendente_antiga, :agora
+  FROM base
+"""
+
+_FLAGS_CONCILIACAO = ('sem_separacao', 'separacao_cancelada', 'divergencia_quantidade', 'pendente_antiga')
+
+
+def conciliar_retiradas(dias_pendencia=None):
+    """Recalcula conciliacao_retirada inteira numa transação (DELETE + um
+    INSERT ... SELECT). Devolve o resumo da execução."""
+    if dias_pendencia is None:
+        dias_pendencia = current_app.config.get('RETIRADAS_DIAS_PENDENCIA', DIAS_PENDENCIA_PADRAO)
+    agora = datetime.now(tz_cuiaba)
+    corte = (agora - timedelta(days=dias_pendencia)).strftime('%Y-%m-%d')
+
+    db.session.execute(text("DELETE FROM conciliacao_retirada"))
+    db.session.execute(text(_SQL_CONCILIAR), {'corte': corte, 'agora': agora.isoformat()})
+    db.session.commit()
+    return _resumo_conciliacao()
+
+
+def _resumo_conciliacao():
+    somas = ', '.join(f'COALESCE(SUM({f}), 0)' for f in _FLAGS_CONCILIACAO + ('divergente',))
+    row = db.session.execute(text(
+        f"SELECT COUNT(*), {somas}, MAX(calculado_em) FROM conciliacao_retirada"
+    )).one()
+    return dict(zip(('total',) + _FLAGS_CONCILIACAO + ('divergentes', 'calculado_em'), row))
+
+
+def serialize_conciliacao(c):
+    return {
+        'retirada_id': c.retirada_id,
+        'data': c.data,
+        'codigo': c.codigo,
+        'separador_nome': c.separador_nome,
+        'quantidade': c.quantidade,
+        'numero_separacao': c.numero_separacao,
+        'conferido': bool(c.conferido),
+        'separacao_id': c.separacao_id,
+        'separacao_status': c.separacao_status,
+        'campanha_id': c.campanha_id,
+        'qtd_retirada_campanha': c.qtd_retirada_campanha,
+        'qtd_falta_ajuste': c.qtd_falta_ajuste,
+        'problemas': [f for f in _FLAGS_CONCILIACAO if getattr(c, f)],
+    }
+
+
+@retiradas_bp.route('/conciliacao', methods=['GET'])
+@orcamento_sql(3)
+def conciliacao():
+    """
+    Relatório da última conciliação. Por padrão só as retiradas com problema;
+    ?todas=1 traz todas. ?problema=<flag> filtra por um tipo de problema.
+    """
+    u = _usuario_atual()
+    if not _pode_ver(u):
+        return jsonify({'error': 'Acesso restrito.'}), 403
+
+    query = ConciliacaoRetirada.query
+    if request.args.get('todas') != '1':
+        query = query.filter(ConciliacaoRetirada.divergente.is_(True))
+    problema = request.args.get('problema')
+    if problema:
+        if problema not in _FLAGS_CONCILIACAO:
+            return jsonify({'error': 'problema invalido.'}), 400
+        query = query.filter(getattr(ConciliacaoRetirada, problema).is_(True))
+    rows = query.order_by(ConciliacaoRetirada.data.desc(), ConciliacaoRetirada.retirada_id.desc()).all()
+
+    return jsonify({
+        'itens': [serialize_conciliacao(r) for r in rows],
+        'resumo': _resumo_conciliacao(),
+    })
+
+
+@retiradas_bp.route('/conciliacao/recalcular', methods=['POST'])
+def recalcular_conciliacao():
+    u = _usuario_atual()
+    if not _pode_conferir(u):
+        return jsonify({'error': 'Você não tem permissão para conciliar retiradas.'}), 403
+    try:
+        resumo = conciliar_retiradas()
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERRO ao conciliar retiradas: {e}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'status': 'success', 'resumo': resumo})
+
+
+def iniciar_conciliacao_retiradas(app):
+    """Recalcula a conciliação logo depois de subir e então uma vez por dia."""
+    def _loop():
+        socketio.sleep(60)   # deixa o servidor terminar de subir
+        while True:
+            with app.app_context():
+                try:
+                    r = conciliar_retiradas()
+                    if r['divergentes']:
+                        print(f"[retiradas] conciliação: {r['divergentes']} de {r['total']} com problema.")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[retiradas] erro na conciliação: {e}")
+            socketio.sleep(24 * 3600)
+
+    socketio.start_background_task(_loop)
+
+
+def registrar_comandos_retiradas(app):
+    """flask --app run retiradas conciliar [--dias N]"""
+    import click
+
+    @app.cli.group('retiradas')
+    def retiradas_cli():
+        """Retiradas antecipadas."""
+
+    @retiradas_cli.command('conciliar')
+    @click.option('--dias', type=int, default=None,
+                  help='Dias sem conferência para virar pendência (padrão: RETIRADAS_DIAS_PENDENCIA).')
+    def conciliar_cmd(dias):
+        r = conciliar_retiradas(dias_pendencia=dias)
+        click.echo(f"{r['total']} retirada(s) conciliada(s); {r['divergentes']} com problema.")
+        for flag in _FLAGS_CONCILIACAO:
+            click.echo(f"  {flag}: {r[flag]}")
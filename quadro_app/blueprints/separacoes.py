@@ -1,14 +1,18 @@
 # quadro_app/blueprints/separacoes.py
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta, time
-from sqlalchemy import or_, func, and_
+from sqlalchemy import or_, and_, exists
 from ..extensions import db, tz_cuiaba
-from quadro_app.models import Separacao, Usuario, ItemExcluido, ListaDinamica
-from quadro_app.utils import registrar_log, criar_notificacao
-from quadro_app import socketio
+from quadro_app.models import Separacao, Usuario, ItemExcluido, ListaDinamica, Cliente
+from quadro_app.dimensoes import nome_cliente, filtro_nome_cliente
+from quadro_app.utils import registrar_log, criar_notificacao, criar_notificacoes
+from quadro_app import socketio, observacoes
+from quadro_app.blueprints.versoes import obter_versao
 
 separacoes_bp = Blueprint('separacoes', __name__, url_prefix='/api/separacoes')
 
+STATUS_SEPARACAO = ['Em Separação', 'Em Conferência', 'Finalizado']
+
 
 # ============================================================
 # Tempo em horas uteis (mesmo padrao da auditoria de compras)
@@ -139,17 +143,13 @@ def get_clientes_nomes():
     campo 'Nome do Cliente' para evitar dois nomes para o mesmo cliente.
     Ignora nomes que não começam com letra (aspas, pontos, números)."""
     try:
-        from quadro_app.blueprints.clientes import get_clientes_ocultos
-        ocultos = get_clientes_ocultos()
-        linhas = db.session.query(Separacao.nome_cliente).filter(
-            Separacao.nome_cliente.isnot(None),
-            Separacao.nome_cliente != ''
-        ).distinct().all()
+        # Um nome por cliente do cadastro (variantes já normalizadas), sem os ocultos.
+        linhas = db.session.query(Cliente.nome).filter(
+            Cliente.oculto.is_(False),
+            exists().where(Separacao.cliente_id == Cliente.id)
+        ).all()
         nomes = sorted(
-            {l[0].strip() for l in linhas
-             if l[0] and l[0].strip()
-             and _NOME_VALIDO.match(l[0].strip())
-             and l[0].strip() not in ocultos},
+            {n.strip() for (n,) in linhas if n and _NOME_VALIDO.match(n.strip())},
             key=lambda n: n.lower()
         )
         return jsonify(nomes)
@@ -158,16 +158,37 @@ def get_clientes_nomes():
         return jsonify([])
 
 
-def serialize_separacao(s):
+def serialize_separacao(s, resumo=None):
+    """Observações resumidas (quantidade + última); a lista completa sai em
+    GET /<id>/observacoes. Para listas, use serialize_separacoes."""
+    if resumo is None:
+        resumo = observacoes.resumos('separacao', [s.id]).get(s.id, {'qtd': 0, 'ultima': None})
     return {
-        'id': s.id, 'numero_movimentacao': s.numero_movimentacao, 'nome_cliente': s.nome_cliente,
+        'id': s.id, 'numero_movimentacao': s.numero_movimentacao, 'nome_cliente': nome_cliente(s),
         'separadores_nomes': s.separadores_nomes,
         'vendedor_nome': s.vendedor_nome, 'status': s.status,
         'data_criacao': s.data_criacao, 'data_inicio_conferencia': s.data_inicio_conferencia,
         'data_finalizacao': s.data_finalizacao, 'conferente_nome': s.conferente_nome,
-        'observacoes': s.observacoes, 'qtd_pecas': s.qtd_pecas
+        'qtd_observacoes': resumo['qtd'], 'ultima_observacao': resumo['ultima'],
+        'qtd_pecas': s.qtd_pecas
     }
 
+
+def serialize_separacoes(itens):
+    resumos = observacoes.resumos('separacao', [s.id for s in itens])
+    return [serialize_separacao(s, resumos[s.id]) for s in itens]
+
+
+def _dados_lixeira(s):
+    """Snapshot só com colunas do modelo, com as observações na coluna JSON
+    (importar_json as devolve para a tabela na restauração). O cliente_id vai
+    junto para a restauração manter o cadastro (ver garantias._dados_lixeira)."""
+    dados = serialize_separacao(s, {'qtd': 0, 'ultima': None})
+    del dados['qtd_observacoes'], dados['ultima_observacao']
+    dados['cliente_id'] = s.cliente_id
+    dados['observacoes'] = observacoes.remover_da_entidade('separacao', s.id)
+    return dados
+
 @separacoes_bp.route('', methods=['POST'])
 def criar_separacao():
     dados = request.get_json()
@@ -226,7 +247,7 @@ def editar_separacao(separacao_id):
         
         if existente:
             return jsonify({
-                'error': f'Erro: O número de movimentação {novo_num_str} já está sendo usado na separação do cliente "{existente.nome_cliente}".'
+                'error': f'Erro: O número de movimentação {novo_num_str} já está sendo usado na separação do cliente "{nome_cliente(existente)}".'
             }), 409
 
     # Captura o estado anterior dos campos auditaveis (antes de alterar).
@@ -282,13 +303,13 @@ def deletar_separacao(separacao_id):
     separacao = Separacao.query.get_or_404(separacao_id)
     item_excluido = ItemExcluido(
         tipo_item='Separacao', item_id_original=str(separacao.id),
-        dados_item=serialize_separacao(separacao), excluido_por=editor_nome,
+        dados_item=_dados_lixeira(separacao), excluido_por=editor_nome,
         data_exclusao=datetime.now(tz_cuiaba).isoformat()
     )
     db.session.add(item_excluido)
     registrar_log(
         separacao_id, editor_nome, 'EXCLUSAO', 
-        detalhes={'info': f"Mov. {separacao.numero_movimentacao} para '{separacao.nome_cliente}' foi movido para a lixeira."}, 
+        detalhes={'info': f"Mov. {separacao.numero_movimentacao} para '{nome_cliente(separacao)}' foi movido para a lixeira."}, 
         log_type='separacoes'
     )
     db.session.delete(separacao)
@@ -296,14 +317,10 @@ def deletar_separacao(separacao_id):
     socketio.emit('separacao_deletada', {'separacao_id': separacao_id})
     return jsonify({'status': 'success'})
 
-@separacoes_bp.route('/<int:separacao_id>/status', methods=['PUT'])
-def atualizar_status_separacao(separacao_id):
-    dados = request.get_json()
-    novo_status = dados.get('status')
-    editor_nome = dados.get('editor_nome', 'Sistema')
-    separacao = Separacao.query.get_or_404(separacao_id)
+def _aplicar_status(separacao, novo_status, agora):
+    """Aplica a transição de status (sem commit) e devolve os detalhes do log,
+    incluindo o tempo gasto no status anterior."""
     status_antigo = separacao.status
-    agora = datetime.now(tz_cuiaba)
 
     # Quando o status ATUAL (que esta saindo) comecou, para calcular ha
     # quanto tempo a separacao ficou nele (em horas uteis).
@@ -320,15 +337,29 @@ def atualizar_status_separacao(separacao_id):
         # Ao reverter uma separação finalizada (ex.: retorno à conferência),
         # limpa a data de finalização para não exibir um "Fim" obsoleto.
         separacao.data_finalizacao = None
-    db.session.commit()
 
-    # Monta o detalhe do log incluindo o tempo gasto no status anterior.
     detalhes_status = {'status': {'de': status_antigo, 'para': novo_status}}
     if inicio_status is not None:
         segundos = _segundos_uteis(inicio_status, agora)
         texto = _format_duracao(segundos)
         if texto:
             detalhes_status['info'] = f"Ficou {texto} (horas úteis) em \"{status_antigo}\"."
+    return detalhes_status
+
+
+def _msg_finalizada(separacao):
+    return f"Separação Mov. {separacao.numero_movimentacao} ({nome_cliente(separacao)}) foi finalizada."
+
+
+@separacoes_bp.route('/<int:separacao_id>/status', methods=['PUT'])
+def atualizar_status_separacao(separacao_id):
+    dados = request.get_json()
+    novo_status = dados.get('status')
+    editor_nome = dados.get('editor_nome', 'Sistema')
+    separacao = Separacao.query.get_or_404(separacao_id)
+    detalhes_status = _aplicar_status(separacao, novo_status, datetime.now(tz_cuiaba))
+    db.session.commit()
+
     registrar_log(separacao_id, editor_nome, 'STATUS_ALTERADO', detalhes=detalhes_status, log_type='separacoes')
     socketio.emit('status_separacao_atualizado', {'separacao_id': separacao_id, 'novo_status': novo_status})
 
@@ -336,30 +367,88 @@ def atualizar_status_separacao(separacao_id):
     if novo_status == 'Finalizado' and separacao.vendedor_nome:
         vendedor = Usuario.query.filter_by(nome=separacao.vendedor_nome).first()
         if vendedor:
-            criar_notificacao(
-                vendedor.id,
-                f"Separação Mov. {separacao.numero_movimentacao} ({separacao.nome_cliente}) foi finalizada.",
-                link='/separacoes'
-            )
+            criar_notificacao(vendedor.id, _msg_finalizada(separacao), link='/separacoes')
     return jsonify({'status': 'success'})
 
+
+@separacoes_bp.route('/status-lote', methods=['PUT'])
+def atualizar_status_lote():
+    """Aplica várias transições de status de uma vez (ex.: finalizar tudo no
+    fim do turno). Corpo: {itens: [{id, status}], editor_nome} ou, quando
+    todas vão para o mesmo status, {ids: [...], status, editor_nome}.
+
+    Tudo em uma transação: logs em lote, uma busca de vendedores, notificações
+    em lote e um único evento de socket. Itens inválidos não impedem os demais;
+    o resultado de cada um volta em 'resultados'."""
+    dados = request.get_json() or {}
+    editor_nome = dados.get('editor_nome', 'Sistema')
+    itens = dados.get('itens')
+    if itens is None and isinstance(dados.get('ids'), list):
+        itens = [{'id': i, 'status': dados.get('status')} for i in dados['ids']]
+    if not isinstance(itens, list) or not itens:
+        return jsonify({'error': 'Informe as separações e o novo status.'}), 400
+
+    ids = [i.get('id') for i in itens if isinstance(i, dict)]
+    separacoes = {s.id: s for s in Separacao.query.filter(Separacao.id.in_(ids)).all()}
+    agora = datetime.now(tz_cuiaba)
+
+    resultados, alteradas = [], []
+    for item in itens:
+        sid = item.get('id') if isinstance(item, dict) else None
+        novo_status = item.get('status') if isinstance(item, dict) else None
+        separacao = separacoes.get(sid)
+        if separacao is None:
+            resultados.append({'id': sid, 'ok': False, 'error': 'Separação não encontrada.'})
+            continue
+        if novo_status not in STATUS_SEPARACAO:
+            resultados.append({'id': sid, 'ok': False, 'error': f'Status inválido: {novo_status}'})
+            continue
+        detalhes_status = _aplicar_status(separacao, novo_status, agora)
+        registrar_log(sid, editor_nome, 'STATUS_ALTERADO', detalhes=detalhes_status,
+                      log_type='separacoes', commit=False)
+        alteradas.append(separacao)
+        resultados.append({'id': sid, 'ok': True, 'novo_status': novo_status})
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao atualizar em lote: {e}'}), 500
+
+    if alteradas:
+        socketio.emit('status_separacoes_lote', {
+            'itens': [{'separacao_id': s.id, 'novo_status': s.status} for s in alteradas]
+        })
+
+        finalizadas = [s for s in alteradas if s.status == 'Finalizado' and s.vendedor_nome]
+        if finalizadas:
+            nomes = {s.vendedor_nome for s in finalizadas}
+            vendedores = {u.nome: u.id for u in Usuario.query.filter(Usuario.nome.in_(nomes)).all()}
+            criar_notificacoes([
+                (vendedores[s.vendedor_nome], _msg_finalizada(s), '/separacoes')
+                for s in finalizadas if s.vendedor_nome in vendedores
+            ])
+
+    return jsonify({'status': 'success', 'resultados': resultados})
+
 @separacoes_bp.route('/<int:separacao_id>/observacao', methods=['POST'])
 def adicionar_observacao(separacao_id):
     dados = request.get_json()
     autor, texto = dados.get('autor', 'N/A'), dados.get('texto', '')
-    separacao = Separacao.query.get_or_404(separacao_id)
-    obs_atuais = separacao.observacoes or []
-    nova_obs = {
-        'texto': texto, 'autor': autor, 'role': dados.get('role', 'N/A'),
-        'timestamp': datetime.now(tz_cuiaba).isoformat()
-    }
-    obs_atuais.append(nova_obs)
-    separacao.observacoes = list(obs_atuais)
+    Separacao.query.get_or_404(separacao_id)
+    nota = observacoes.adicionar('separacao', separacao_id, texto, autor, role=dados.get('role', 'N/A'))
     db.session.commit()
     registrar_log(separacao_id, autor, 'OBSERVACAO_ADICIONADA', detalhes={'info': texto}, log_type='separacoes')
-    socketio.emit('observacao_adicionada', {'separacao_id': separacao_id, 'observacao': nova_obs})
+    socketio.emit('observacao_adicionada', {'separacao_id': separacao_id,
+                                            'observacao': observacoes.serialize_observacao(nota)})
     return jsonify({'status': 'success'})
 
+@separacoes_bp.route('/<int:separacao_id>/observacoes', methods=['GET'])
+def listar_observacoes(separacao_id):
+    """Histórico completo de observações (as listagens só trazem a última)."""
+    Separacao.query.get_or_404(separacao_id)
+    return jsonify(observacoes.listar('separacao', separacao_id))
+
 @separacoes_bp.route('/ativas', methods=['GET'])
 def get_separacoes_ativas():
     user_role = request.args.get('user_role')
@@ -368,7 +457,7 @@ def get_separacoes_ativas():
     if user_role == 'Vendedor' and user_name:
         query = query.filter_by(vendedor_nome=user_name)
     ativas = query.order_by(Separacao.data_criacao.desc()).all()
-    return jsonify([serialize_separacao(s) for s in ativas])
+    return jsonify(serialize_separacoes(ativas))
 
 @separacoes_bp.route('/recentes-finalizadas', methods=['GET'])
 def get_recentes_finalizadas():
@@ -376,20 +465,15 @@ def get_recentes_finalizadas():
     recentes = Separacao.query.filter_by(status='Finalizado')\
         .order_by(Separacao.data_finalizacao.desc())\
         .limit(10).all()
-    return jsonify([serialize_separacao(s) for s in recentes])
+    return jsonify(serialize_separacoes(recentes))
 
 @separacoes_bp.route('/status-ativas', methods=['GET'])
 def get_status_separacoes_ativas():
+    """Indicador barato de mudança nas separações: a versão do domínio
+    'separacoes' sobe a cada alteração. Prefira /api/versoes."""
     try:
-        query = Separacao.query.filter(Separacao.status.in_(['Em Separação', 'Em Conferência']))
-        count = query.count()
-        latest_creation_obj = db.session.query(func.max(Separacao.data_criacao)).filter(Separacao.status.in_(['Em Separação', 'Em Conferência'])).first()
-        latest_creation = latest_creation_obj[0] if latest_creation_obj and latest_creation_obj[0] else None
-        latest_conference_start_obj = db.session.query(func.max(Separacao.data_inicio_conferencia)).filter(Separacao.status == 'Em Conferência').first()
-        latest_conference_start = latest_conference_start_obj[0] if latest_conference_start_obj and latest_conference_start_obj[0] else None
-        updates = list(filter(None, [latest_creation, latest_conference_start]))
-        latest_update = max(updates) if updates else None
-        return jsonify({'total_ativas': count, 'ultimo_update': latest_update})
+        versao = obter_versao('separacoes')
+        return jsonify({'versao': versao, 'ultimo_update': versao})
     except Exception as e:
         print(f"ERRO CRÍTICO na rota /status-ativas: {e}")
         return jsonify({'error': str(e)}), 500
@@ -406,13 +490,13 @@ def get_separacoes_paginadas():
     if search_term:
         search_filter = or_(
             Separacao.numero_movimentacao.ilike(f'%{search_term}%'),
-            Separacao.nome_cliente.ilike(f'%{search_term}%'),
+            filtro_nome_cliente(Separacao, search_term),
             Separacao.vendedor_nome.ilike(f'%{search_term}%'),
             Separacao.separadores_nomes.cast(db.String).ilike(f'%{search_term}%')
         )
         query = query.filter(search_filter)
     pagination = query.order_by(Separacao.numero_movimentacao.desc()).paginate(page=page + 1, per_page=limit, error_out=False)
-    return jsonify({'finalizadas': [serialize_separacao(s) for s in pagination.items], 'temMais': pagination.has_next})
+    return jsonify({'finalizadas': serialize_separacoes(pagination.items), 'temMais': pagination.has_next})
 
 @separacoes_bp.route('/tabela-paginada', methods=['POST'])
 def get_tabela_separacoes_paginada():
@@ -423,14 +507,14 @@ def get_tabela_separacoes_paginada():
     if search_term:
         search_filter = or_(
             Separacao.numero_movimentacao.ilike(f'%{search_term}%'),
-            Separacao.nome_cliente.ilike(f'%{search_term}%'),
+            filtro_nome_cliente(Separacao, search_term),
             Separacao.vendedor_nome.ilike(f'%{search_term}%'),
             Separacao.separadores_nomes.cast(db.String).ilike(f'%{search_term}%'),
             Separacao.conferente_nome.ilike(f'%{search_term}%')
         )
         query = query.filter(search_filter)
     pagination = query.order_by(Separacao.numero_movimentacao.desc()).paginate(page=page + 1, per_page=limit, error_out=False)
-    return jsonify({'separacoes': [serialize_separacao(s) for s in pagination.items], 'temMais': pagination.has_next})
+    return jsonify({'separacoes': serialize_separacoes(pagination.items), 'temMais': pagination.has_next})
 
 
 # --- INÍCIO DA CORREÇÃO ---
@@ -452,102 +536,108 @@ def format_seconds_to_hms(seconds):
 # --- FIM DA CORREÇÃO ---
 
 
-@separacoes_bp.route('/dashboard-data', methods=['POST'])
-def get_dashboard_logistica_data():
-    filtros = request.get_json() or {}
+def calcular_dashboard_logistica(filtros):
+    """Produtividade de separadores e conferentes no período (dashboard de
+    logística e relatórios agendados)."""
     data_inicio_str = filtros.get('dataInicio')
     data_fim_str = filtros.get('dataFim')
 
-    try:
-        if not data_inicio_str and not data_fim_str:
-             return jsonify({'separadores': [], 'conferentes': []})
-
-        ids_excluidos_query = db.session.query(ItemExcluido.item_id_original).filter_by(tipo_item='Separacao')
-        ids_excluidos = {str(item_id[0]) for item_id in ids_excluidos_query.all()}
-        query = Separacao.query.filter_by(status='Finalizado')
-        if ids_excluidos:
-            query = query.filter(db.cast(Separacao.id, db.String).notin_(ids_excluidos))
-        if data_inicio_str:
-            query = query.filter(Separacao.data_finalizacao >= data_inicio_str)
-        if data_fim_str:
-            query = query.filter(Separacao.data_finalizacao <= data_fim_str + 'T23:59:59')
-        separacoes_finalizadas = query.all()
-        
-        separador_stats = {}
-        conferente_stats = {}
-        data_corte = datetime(2024, 1, 1, 0, 0, 0, tzinfo=tz_cuiaba)
-
-        for sep in separacoes_finalizadas:
-            lista_separadores = sep.separadores_nomes or []
-            num_separadores = len(lista_separadores)
-
-            if num_separadores > 0:
-                total_pecas_tarefa = sep.qtd_pecas or 0
-                base_pecas = total_pecas_tarefa // num_separadores
-                resto_pecas = total_pecas_tarefa % num_separadores
-                distribuicao = [base_pecas] * num_separadores
-                
-                for i in range(resto_pecas):
-                    distribuicao[i] += 1
-                
-                for i, nome_separador in enumerate(lista_separadores):
-                    stats = separador_stats.setdefault(nome_separador, {'count': 0, 'total_seconds': 0, 'items_for_avg': 0, 'total_pecas': 0})
-                    
-                    stats['count'] += 1
-                    stats['total_pecas'] += distribuicao[i]
-                    
-                    # --- INÍCIO DA LÓGICA DE TEMPO ---
-                    # O tempo total da tarefa é adicionado para CADA separador que participou.
-                    # Ele não é dividido.
-                    try:
-                        if sep.data_criacao and sep.data_inicio_conferencia:
-                            data_criacao_obj = datetime.fromisoformat(sep.data_criacao)
-                            if data_criacao_obj >= data_corte:
-                                start = data_criacao_obj
-                                end = datetime.fromisoformat(sep.data_inicio_conferencia)
-                                duration = (end - start).total_seconds()
-                                if duration >= 0:
-                                    stats['total_seconds'] += duration
-                                    stats['items_for_avg'] += 1
-                    except (ValueError, TypeError):
-                        continue
-                    # --- FIM DA LÓGICA DE TEMPO ---
-
-            conferente_nome = sep.conferente_nome
-            if conferente_nome:
-                stats = conferente_stats.setdefault(conferente_nome, {'count': 0, 'total_seconds': 0, 'items_for_avg': 0, 'total_pecas': 0})
+    if not data_inicio_str and not data_fim_str:
+        return {'separadores': [], 'conferentes': []}
+
+    ids_excluidos_query = db.session.query(ItemExcluido.item_id_original).filter_by(tipo_item='Separacao')
+    ids_excluidos = {str(item_id[0]) for item_id in ids_excluidos_query.all()}
+    query = Separacao.query.filter_by(status='Finalizado')
+    if ids_excluidos:
+        query = query.filter(db.cast(Separacao.id, db.String).notin_(ids_excluidos))
+    if data_inicio_str:
+        query = query.filter(Separacao.data_finalizacao >= data_inicio_str)
+    if data_fim_str:
+        query = query.filter(Separacao.data_finalizacao <= data_fim_str + 'T23:59:59')
+    separacoes_finalizadas = query.all()
+
+    separador_stats = {}
+    conferente_stats = {}
+    data_corte = datetime(2024, 1, 1, 0, 0, 0, tzinfo=tz_cuiaba)
+
+    for sep in separacoes_finalizadas:
+        lista_separadores = sep.separadores_nomes or []
+        num_separadores = len(lista_separadores)
+
+        if num_separadores > 0:
+            total_pecas_tarefa = sep.qtd_pecas or 0
+            base_pecas = total_pecas_tarefa // num_separadores
+            resto_pecas = total_pecas_tarefa % num_separadores
+            distribuicao = [base_pecas] * num_separadores
+
+            for i in range(resto_pecas):
+                distribuicao[i] += 1
+
+            for i, nome_separador in enumerate(lista_separadores):
+                stats = separador_stats.setdefault(nome_separador, {'count': 0, 'total_seconds': 0, 'items_for_avg': 0, 'total_pecas': 0})
+
                 stats['count'] += 1
-                stats['total_pecas'] += sep.qtd_pecas or 0
+                stats['total_pecas'] += distribuicao[i]
+
+                # --- INÍCIO DA LÓGICA DE TEMPO ---
+                # O tempo total da tarefa é adicionado para CADA separador que participou.
+                # Ele não é dividido.
                 try:
-                    if sep.data_inicio_conferencia and sep.data_finalizacao:
-                        data_inicio_obj = datetime.fromisoformat(sep.data_inicio_conferencia)
-                        if data_inicio_obj >= data_corte:
-                            start = data_inicio_obj
-                            end = datetime.fromisoformat(sep.data_finalizacao)
+                    if sep.data_criacao and sep.data_inicio_conferencia:
+                        data_criacao_obj = datetime.fromisoformat(sep.data_criacao)
+                        if data_criacao_obj >= data_corte:
+                            start = data_criacao_obj
+                            end = datetime.fromisoformat(sep.data_inicio_conferencia)
                             duration = (end - start).total_seconds()
                             if duration >= 0:
                                 stats['total_seconds'] += duration
                                 stats['items_for_avg'] += 1
                 except (ValueError, TypeError):
                     continue
-        
-        for _, data in separador_stats.items():
-            data['total_pecas'] = round(data['total_pecas'])
+                # --- FIM DA LÓGICA DE TEMPO ---
+
+        conferente_nome = sep.conferente_nome
+        if conferente_nome:
+            stats = conferente_stats.setdefault(conferente_nome, {'count': 0, 'total_seconds': 0, 'items_for_avg': 0, 'total_pecas': 0})
+            stats['count'] += 1
+            stats['total_pecas'] += sep.qtd_pecas or 0
+            try:
+                if sep.data_inicio_conferencia and sep.data_finalizacao:
+                    data_inicio_obj = datetime.fromisoformat(sep.data_inicio_conferencia)
+                    if data_inicio_obj >= data_corte:
+                        start = data_inicio_obj
+                        end = datetime.fromisoformat(sep.data_finalizacao)
+                        duration = (end - start).total_seconds()
+                        if duration >= 0:
+                            stats['total_seconds'] += duration
+                            stats['items_for_avg'] += 1
+            except (ValueError, TypeError):
+                continue
+
+    for _, data in separador_stats.items():
+        data['total_pecas'] = round(data['total_pecas'])
+
+    resultado_separadores = sorted([
+        {'nome': nome, 'count': data['count'], 'total_pecas': data['total_pecas'], 'avg_time_str': format_seconds_to_hms(data['total_seconds'] / data['items_for_avg'] if data['items_for_avg'] > 0 else None)}
+        for nome, data in separador_stats.items()
+    ], key=lambda x: x['count'], reverse=True)
+
+    resultado_conferentes = sorted([
+        {'nome': nome, 'count': data['count'], 'total_pecas': data['total_pecas'], 'avg_time_str': format_seconds_to_hms(data['total_seconds'] / data['items_for_avg'] if data['items_for_avg'] > 0 else None)}
+        for nome, data in conferente_stats.items()
+    ], key=lambda x: x['count'], reverse=True)
 
-        resultado_separadores = sorted([
-            {'nome': nome, 'count': data['count'], 'total_pecas': data['total_pecas'], 'avg_time_str': format_seconds_to_hms(data['total_seconds'] / data['items_for_avg'] if data['items_for_avg'] > 0 else None)}
-            for nome, data in separador_stats.items()
-        ], key=lambda x: x['count'], reverse=True)
-        
-        resultado_conferentes = sorted([
-            {'nome': nome, 'count': data['count'], 'total_pecas': data['total_pecas'], 'avg_time_str': format_seconds_to_hms(data['total_seconds'] / data['items_for_avg'] if data['items_for_avg'] > 0 else None)}
-            for nome, data in conferente_stats.items()
-        ], key=lambda x: x['count'], reverse=True)
-
-        return jsonify({
-            'separadores': resultado_separadores,
-            'conferentes': resultado_conferentes
-        })
+    return {
+        'separadores': resultado_separadores,
+        'conferentes': resultado_conferentes
+    }
+
+
+@separacoes_bp.route('/dashboard-data', methods=['POST'])
+def get_dashboard_logistica_data():
+    filtros = request.get_json() or {}
+    try:
+        return jsonify(calcular_dashboard_logistica(filtros))
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -4,6 +4,7 @@ from datetime import datetime
 from sqlalchemy import or_
 from ..extensions import db, tz_cuiaba
 from quadro_app.models import SeparacaoCancelada
+from quadro_app.dimensoes import nome_cliente, filtro_nome_cliente
 from quadro_app.utils import registrar_log
 from quadro_app import socketio
 
@@ -17,7 +18,7 @@ def serialize(s):
         'id': s.id,
         'data': s.data,
         'numero_separacao': s.numero_separacao,
-        'nome_cliente': s.nome_cliente,
+        'nome_cliente': nome_cliente(s),
         'separador_nome': s.separador_nome,
         'criado_por': s.criado_por,
         'data_criacao': s.data_criacao,
@@ -35,7 +36,7 @@ def listar_paginadas():
     if search:
         query = query.filter(or_(
             SeparacaoCancelada.numero_separacao.ilike(f'%{search}%'),
-            SeparacaoCancelada.nome_cliente.ilike(f'%{search}%'),
+            filtro_nome_cliente(SeparacaoCancelada, search),
             SeparacaoCancelada.separador_nome.ilike(f'%{search}%'),
         ))
 
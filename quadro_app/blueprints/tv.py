@@ -0,0 +1,100 @@
+# quadro_app/blueprints/tv.py
+import threading
+from collections import OrderedDict
+from flask import Blueprint, request, jsonify
+from ..extensions import db
+from quadro_app.models import Separacao, Cliente
+from quadro_app.dimensoes import coluna_nome_cliente
+from quadro_app.blueprints.versoes import obter_versao
+from quadro_app.monitor_sql import orcamento_sql
+
+tv_bp = Blueprint('tv', __name__, url_prefix='/api/tv')
+
+STATUS_ATIVOS = ['Em Separação', 'Em Conferência']
+LIMITE_FINALIZADAS = 10
+# Quantas versões anteriores ficam guardadas para responder ao modo 'since'.
+# Uma TV que ficou mais atrasada que isso recebe o snapshot completo.
+HISTORICO_MAXIMO = 50
+
+
+# Snapshots recentes da TV de expedição, compartilhados por todas as TVs.
+# A chave é a versão do domínio 'separacoes' (blueprints/versoes.py): enquanto
+# ela não muda, o snapshot é servido da memória sem tocar nas tabelas.
+_lock = threading.Lock()
+_historico = OrderedDict()   # versao -> {id: linha}
+
+
+def _linha_tv(row):
+    """Projeção compacta de uma separação: só o que o painel exibe."""
+    return {
+        'id': row.id,
+        'numero_movimentacao': row.numero_movimentacao,
+        'nome_cliente': row.nome_cliente,
+        'status': row.status,
+        'data_finalizacao': row.data_finalizacao,
+    }
+
+
+def _montar_snapshot():
+    """Ativas + últimas finalizadas, sem carregar as colunas JSON."""
+    colunas = (Separacao.id, Separacao.numero_movimentacao, coluna_nome_cliente(Separacao),
+               Separacao.status, Separacao.data_finalizacao)
+    com_cliente = (Cliente, Cliente.id == Separacao.cliente_id)
+    ativas = db.session.query(*colunas).outerjoin(*com_cliente)\
+        .filter(Separacao.status.in_(STATUS_ATIVOS)).all()
+    finalizadas = db.session.query(*colunas).outerjoin(*com_cliente)\
+        .filter(Separacao.status == 'Finalizado')\
+        .order_by(Separacao.data_finalizacao.desc())\
+        .limit(LIMITE_FINALIZADAS).all()
+    return {row.id: _linha_tv(row) for row in ativas + finalizadas}
+
+
+def _snapshot_da_versao(versao):
+    with _lock:
+        linhas = _historico.get(versao)
+        if linhas is None:
+            linhas = _montar_snapshot()
+            _historico[versao] = linhas
+            while len(_historico) > HISTORICO_MAXIMO:
+                _historico.popitem(last=False)
+        return linhas
+
+
+def _diff(antigo, novo):
+    alteradas = [linha for sid, linha in novo.items() if antigo.get(sid) != linha]
+    removidas = [sid for sid in antigo if sid not in novo]
+    return alteradas, removidas
+
+
+@tv_bp.route('/expedicao/snapshot', methods=['GET'])
+@orcamento_sql(3)
+def snapshot_expedicao():
+    """Tudo que a TV de expedição precisa em uma chamada.
+
+    Sem parâmetros devolve o snapshot completo e a versão. Com ?since=<versao>
+    devolve apenas as linhas alteradas/novas e os ids removidos desde aquela
+    versão. Se a versão for desconhecida (muito antiga ou anterior ao último
+    reinício do servidor), cai para o snapshot completo com 'completo': true."""
+    try:
+        versao = obter_versao('separacoes')
+        linhas = _snapshot_da_versao(versao)
+        since = request.args.get('since', type=int)
+        anterior = _historico.get(since) if since is not None else None
+
+        if anterior is None:
+            return jsonify({
+                'versao': versao,
+                'completo': True,
+                'separacoes': list(linhas.values()),
+            })
+
+        alteradas, removidas = _diff(anterior, linhas) if since != versao else ([], [])
+        return jsonify({
+            'versao': versao,
+            'completo': False,
+            'alteradas': alteradas,
+            'removidas': removidas,
+        })
+    except Exception as e:
+        print(f"ERRO em snapshot_expedicao: {e}")
+        return jsonify({'error': str(e)}), 500
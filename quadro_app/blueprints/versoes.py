@@ -0,0 +1,156 @@
+# quadro_app/blueprints/versoes.py
+from flask import Blueprint, jsonify
+from sqlalchemy import event, select, update
+from ..extensions import db
+from quadro_app.models import (
+    VersaoDominio, Pedido, Sugestao, Separacao, Conferencia, Garantia,
+    RegistroCompra, MovimentacaoCompra, RetiradaAntecipada, SeparacaoCancelada,
+    AnotacaoColuna, AnotacaoCard, CampanhaAjuste, AjusteEstoque, ItemExcluido,
+    ListaDinamica, Usuario, Observacao, Cliente,
+)
+from quadro_app import socketio
+from quadro_app.monitor_sql import orcamento_sql
+
+versoes_bp = Blueprint('versoes', __name__, url_prefix='/api/versoes')
+
+# Modelo -> domínio cujo contador sobe quando o modelo é alterado.
+# Log e Notificacao ficam de fora de propósito: acompanham quase toda ação e
+# não representam mudança de dados que uma tela precise recarregar.
+DOMINIO_POR_MODELO = {
+    Pedido: 'pedidos',
+    Sugestao: 'sugestoes',
+    Separacao: 'separacoes',
+    Conferencia: 'conferencias',
+    Garantia: 'garantias',
+    RegistroCompra: 'registro_compras',
+    MovimentacaoCompra: 'registro_compras',
+    RetiradaAntecipada: 'retiradas',
+    SeparacaoCancelada: 'separacoes_canceladas',
+    AnotacaoColuna: 'anotacoes',
+    AnotacaoCard: 'anotacoes',
+    CampanhaAjuste: 'estoque',
+    AjusteEstoque: 'estoque',
+    ItemExcluido: 'lixeira',
+    ListaDinamica: 'listas',
+    Usuario: 'usuarios',
+}
+# Observacao é de três domínios: vale o da entidade dona da nota.
+DOMINIO_POR_ENTIDADE_OBSERVACAO = {
+    'conferencia': 'conferencias',
+    'separacao': 'separacoes',
+    'garantia': 'garantias',
+}
+# Cliente é uma dimensão: o nome exibido nas telas destes domínios vem dele,
+# então renomear/mesclar precisa invalidar o que elas guardaram (ex.: o
+# snapshot da TV, indexado pela versão de 'separacoes').
+DOMINIOS_POR_DIMENSAO = {
+    Cliente: ('separacoes', 'separacoes_canceladas', 'garantias'),
+}
+DOMINIOS = sorted(set(DOMINIO_POR_MODELO.values()))
+
+_CHAVE_PENDENTES = 'versoes_pendentes'
+
+
+def garantir_dominios():
+    """Cria a linha de cada domínio que ainda não existe (contador em 0)."""
+    existentes = {d for (d,) in db.session.query(VersaoDominio.dominio).all()}
+    faltando = [d for d in DOMINIOS if d not in existentes]
+    for dominio in faltando:
+        db.session.add(VersaoDominio(dominio=dominio, versao=0))
+    if faltando:
+        db.session.commit()
+
+
+def _incrementar(session, dominios):
+    """Sobe o contador dos domínios na transação corrente e guarda os novos
+    valores para serem emitidos via socket depois do commit."""
+    if not dominios:
+        return
+    tabela = VersaoDominio.__table__
+    session.execute(
+        update(tabela)
+        .where(tabela.c.dominio.in_(dominios))
+        .values(versao=tabela.c.versao + 1)
+    )
+    novos = session.execute(
+        select(tabela.c.dominio, tabela.c.versao).where(tabela.c.dominio.in_(dominios))
+    ).all()
+    session.info.setdefault(_CHAVE_PENDENTES, {}).update(dict(novos))
+
+
+def _dominios_do_modelo(modelo):
+    if modelo in DOMINIOS_POR_DIMENSAO:
+        return DOMINIOS_POR_DIMENSAO[modelo]
+    dominio = DOMINIO_POR_MODELO.get(modelo)
+    return (dominio,) if dominio else ()
+
+
+def _dominios(obj):
+    if isinstance(obj, Observacao):
+        dominio = DOMINIO_POR_ENTIDADE_OBSERVACAO.get(obj.entidade)
+        return (dominio,) if dominio else ()
+    return _dominios_do_modelo(type(obj))
+
+
+def _ao_flush(session, flush_context, instances):
+    dominios = set()
+    for obj in list(session.new) + list(session.deleted):
+        dominios.update(_dominios(obj))
+    for obj in session.dirty:
+        do_obj = _dominios(obj)
+        if do_obj and session.is_modified(obj):
+            dominios.update(do_obj)
+    _incrementar(session, sorted(dominios))
+
+
+def _ao_executar(orm_execute_state):
+    """Cobre os UPDATE/DELETE em massa (Query.update/delete), que não passam
+    pelo flush."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    dominios = _dominios_do_modelo(mapper.class_) if mapper is not None else ()
+    if dominios:
+        _incrementar(orm_execute_state.session, sorted(dominios))
+
+
+def _ao_commit(session):
+    pendentes = session.info.pop(_CHAVE_PENDENTES, None)
+    if pendentes:
+        socketio.emit('versoes_atualizadas', pendentes)
+
+
+def _ao_rollback(session, transacao_anterior):
+    session.info.pop(_CHAVE_PENDENTES, None)
+
+
+def registrar_contadores_versao():
+    """Liga os eventos da sessão que mantêm os contadores de versão."""
+    if event.contains(db.session, 'before_flush', _ao_flush):
+        return
+    event.listen(db.session, 'before_flush', _ao_flush)
+    event.listen(db.session, 'do_orm_execute', _ao_executar)
+    event.listen(db.session, 'after_commit', _ao_commit)
+    event.listen(db.session, 'after_soft_rollback', _ao_rollback)
+
+
+def obter_versoes(dominios=None):
+    query = db.session.query(VersaoDominio.dominio, VersaoDominio.versao)
+    if dominios:
+        query = query.filter(VersaoDominio.dominio.in_(dominios))
+    return dict(query.all())
+
+
+def obter_versao(dominio):
+    return db.session.query(VersaoDominio.versao).filter_by(dominio=dominio).scalar() or 0
+
+
+@versoes_bp.route('', methods=['GET'])
+@orcamento_sql(1)
+def listar_versoes():
+    """Todas as versões de uma vez: {dominio: versao}. Os clientes guardam o
+    último valor visto e só recarregam os domínios que mudaram."""
+    try:
+        return jsonify(obter_versoes())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
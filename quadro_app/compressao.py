@@ -0,0 +1,201 @@
+# quadro_app/compressao.py
+"""Compressão gzip/brotli das respostas HTTP (middleware WSGI).
+
+As listas da API (/api/separacoes/ativas, /api/lixeira, /api/usuarios...)
+são JSON grandes e repetitivos, buscados o tempo todo pelas TVs e quiosques
+pelo Wi-Fi. O middleware negocia a codificação pelo Accept-Encoding (brotli
+quando o pacote 'brotli' está instalado, senão gzip) e comprime a resposta
+quando:
+
+    - o Content-Type é de texto (JSON, HTML, JS, CSS, SVG...);
+    - o tamanho é conhecido (Content-Length) e >= COMPRESSAO_TAMANHO_MINIMO;
+    - ela ainda não vem comprimida (ex.: estáticos de assets.py).
+
+Resposta sem Content-Length é tratada como streaming e passa direto, sem ser
+acumulada em memória. O tráfego do Socket.IO também não passa por aqui: o
+middleware fica por dentro do middleware do engine.io (ver create_app).
+
+Configuração (app.config): COMPRESSAO_ATIVA, COMPRESSAO_TAMANHO_MINIMO,
+COMPRESSAO_NIVEL_GZIP (1-9), COMPRESSAO_NIVEL_BROTLI (0-11).
+
+Para medir o ganho em cada endpoint: flask --app run compressao bench
+"""
+import gzip
+import time
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: só gzip
+    brotli = None
+
+TIPOS_COMPRIMIVEIS = (
+    'application/json', 'application/javascript', 'application/xml',
+    'text/', 'image/svg+xml',
+)
+STATUS_SEM_CORPO = ('204', '304')
+
+
+def comprimir(dados, codificacao, nivel):
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=nivel)
+    return gzip.compress(dados, compresslevel=nivel, mtime=0)
+
+
+class CompressaoMiddleware:
+    def __init__(self, wsgi_app, tamanho_minimo=1024, nivel_gzip=6, nivel_brotli=4):
+        self.wsgi_app = wsgi_app
+        self.tamanho_minimo = tamanho_minimo
+        self.niveis = {'gzip': nivel_gzip, 'br': nivel_brotli}
+
+    def _codificacao(self, environ):
+        aceitas = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        if brotli is not None and aceitas.quality('br') > 0:
+            return 'br'
+        if aceitas.quality('gzip') > 0:
+            return 'gzip'
+        return None
+
+    def _elegivel(self, status, headers):
+        if status[:3] in STATUS_SEM_CORPO:
+            return False
+        h = {k.lower(): v for k, v in headers}
+        if 'content-encoding' in h or 'no-transform' in h.get('cache-control', ''):
+            return False
+        if not h.get('content-type', '').startswith(TIPOS_COMPRIMIVEIS):
+            return False
+        try:
+            return int(h['content-length']) >= self.tamanho_minimo
+        except (KeyError, ValueError):
+            return False   # sem tamanho = streaming: não acumula
+
+    def __call__(self, environ, start_response):
+        codificacao = self._codificacao(environ)
+        if codificacao is None or environ.get('HTTP_UPGRADE') or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+
+        # O start_response real só é chamado depois de decidir se comprime.
+        capturado = {}
+
+        def _start_response(status, headers, exc_info=None):
+            capturado.update(status=status, headers=headers, exc_info=exc_info)
+
+            def _write(dados):
+                # write() legado: a resposta segue sem compressão.
+                if 'write' not in capturado:
+                    capturado['write'] = start_response(status, headers, exc_info)
+                capturado['write'](dados)
+            return _write
+
+        corpo = self.wsgi_app(environ, _start_response)
+        if 'write' in capturado:
+            return corpo
+        if not self._elegivel(capturado['status'], capturado['headers']):
+            start_response(capturado['status'], capturado['headers'], capturado['exc_info'])
+            return corpo
+
+        try:
+            dados = b''.join(corpo)
+        finally:
+            if hasattr(corpo, 'close'):
+                corpo.close()
+        comprimido = comprimir(dados, codificacao, self.niveis[codificacao])
+
+        headers = []
+        vary = None
+        for k, v in capturado['headers']:
+            chave = k.lower()
+            if chave == 'content-length':
+                continue
+            if chave == 'vary':
+                vary = v
+                continue
+            if chave == 'etag' and not v.startswith('W/'):
+                v = 'W/' + v   # o corpo mudou de bytes: ETag forte deixa de valer
+            headers.append((k, v))
+        headers.append(('Vary', f"{vary}, Accept-Encoding" if vary else 'Accept-Encoding'))
+        headers.append(('Content-Encoding', codificacao))
+        headers.append(('Content-Length', str(len(comprimido))))
+        start_response(capturado['status'], headers, capturado['exc_info'])
+        return [comprimido]
+
+
+def init_compressao(app):
+    """Envolve app.wsgi_app. Chamar antes de socketio.init_app, para que o
+    engine.io responda /socket.io sem passar pela compressão."""
+    app.config.setdefault('COMPRESSAO_ATIVA', True)
+    app.config.setdefault('COMPRESSAO_TAMANHO_MINIMO', 1024)
+    app.config.setdefault('COMPRESSAO_NIVEL_GZIP', 6)
+    app.config.setdefault('COMPRESSAO_NIVEL_BROTLI', 4)
+    if app.config['COMPRESSAO_ATIVA']:
+        app.wsgi_app = CompressaoMiddleware(
+            app.wsgi_app,
+            tamanho_minimo=app.config['COMPRESSAO_TAMANHO_MINIMO'],
+            nivel_gzip=app.config['COMPRESSAO_NIVEL_GZIP'],
+            nivel_brotli=app.config['COMPRESSAO_NIVEL_BROTLI'],
+        )
+    _registrar_comando_bench(app)
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+ENDPOINTS_BENCH = (
+    '/api/separacoes/ativas',
+    '/api/conferencias/ativas',
+    '/api/lixeira',
+    '/api/registro-compras',
+    '/api/usuarios',
+)
+
+
+def _registrar_comando_bench(app):
+    import click
+
+    @app.cli.group('compressao')
+    def compressao_cli():
+        """Compressão das respostas HTTP."""
+
+    @compressao_cli.command('bench')
+    @click.option('--repeticoes', default=20, show_default=True, help='Compressões por medida.')
+    @click.option('--usuario', default=None, help='ID do usuário da sessão (padrão: primeiro Admin).')
+    @click.argument('endpoints', nargs=-1)
+    def bench_cmd(repeticoes, usuario, endpoints):
+        """Bytes na rede e CPU de compressão por endpoint, com os dados do banco."""
+        from .models import Usuario
+
+        if usuario is None:
+            admin = Usuario.query.filter_by(role='Admin').first()
+            if not admin:
+                raise click.ClickException('Nenhum Admin cadastrado; use --usuario.')
+            usuario = admin.id
+
+        cliente = app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['user_id'] = usuario
+
+        codificacoes = [('gzip', app.config['COMPRESSAO_NIVEL_GZIP'])]
+        if brotli is not None:
+            codificacoes.append(('br', app.config['COMPRESSAO_NIVEL_BROTLI']))
+        else:
+            click.echo('(brotli não instalado: medindo só gzip)')
+
+        click.echo(f"{'endpoint':<28} {'original':>10} " + ' '.join(
+            f"{c + ' bytes':>12} {'%':>5} {c + ' ms':>9}" for c, _ in codificacoes))
+        for url in endpoints or ENDPOINTS_BENCH:
+            resp = cliente.get(url, headers={'Accept-Encoding': 'identity'})
+            if resp.status_code != 200:
+                click.echo(f"{url:<28} HTTP {resp.status_code}")
+                continue
+            dados = resp.get_data()
+            linha = f"{url:<28} {len(dados):>10} "
+            for cod, nivel in codificacoes:
+                inicio = time.process_time()
+                for _ in range(repeticoes):
+                    comprimido = comprimir(dados, cod, nivel)
+                cpu_ms = (time.process_time() - inicio) * 1000 / repeticoes
+                pct = 100 * len(comprimido) / len(dados) if dados else 0
+                linha += f"{len(comprimido):>12} {pct:>5.1f} {cpu_ms:>9.2f} "
+            click.echo(linha.rstrip())
@@ -0,0 +1,202 @@
+# quadro_app/dimensoes.py
+"""Cadastros de fornecedores e clientes (tabelas 'fornecedor' e 'cliente').
+
+Os nomes eram texto livre repetido em cada linha: agrupar era agrupar por
+string e renomear um cliente regravava milhares de linhas. Agora cada nome
+normalizado (normalizar_nome) tem uma linha no cadastro e as tabelas de origem
+apontam para ela por um id inteiro:
+
+    Conferencia.nome_fornecedor   -> fornecedor_id
+    Garantia.fornecedor           -> fornecedor_id
+    RegistroCompra.fornecedor     -> fornecedor_id
+    Separacao.nome_cliente        -> cliente_id
+    SeparacaoCancelada.nome_cliente -> cliente_id
+    Garantia.nome_cliente         -> cliente_id
+
+As rotas continuam gravando só o nome digitado: o id é resolvido no flush
+(registrar_vinculo_dimensoes), criando o cadastro quando o nome é novo.
+migrar_dimensoes() preenche os ids dos bancos anteriores aos cadastros.
+"""
+import unicodedata
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, or_, select, text
+from sqlalchemy.dialects.sqlite import insert
+
+from .extensions import db, tz_cuiaba
+from .models import (
+    Fornecedor, Cliente, Conferencia, Garantia, RegistroCompra, Separacao,
+    SeparacaoCancelada, ListaDinamica,
+)
+
+# modelo -> ((coluna do nome digitado, coluna do id, cadastro), ...)
+VINCULOS = {
+    Conferencia: (('nome_fornecedor', 'fornecedor_id', Fornecedor),),
+    Garantia: (('fornecedor', 'fornecedor_id', Fornecedor),
+               ('nome_cliente', 'cliente_id', Cliente)),
+    RegistroCompra: (('fornecedor', 'fornecedor_id', Fornecedor),),
+    Separacao: (('nome_cliente', 'cliente_id', Cliente),),
+    SeparacaoCancelada: (('nome_cliente', 'cliente_id', Cliente),),
+}
+
+# Lista dinâmica onde ficavam os clientes ocultos do autocomplete (agora
+# Cliente.oculto). Só é lida pela migração.
+LISTA_CLIENTES_OCULTOS = 'clientes_ocultos'
+
+
+def normalizar_nome(nome):
+    """Chave de comparação do cadastro: sem acentos, maiúsculas e espaços
+    simples. ' Auto Peças  Silva' e 'AUTO PECAS SILVA' são o mesmo nome."""
+    if not nome:
+        return None
+    sem_acento = ''.join(c for c in unicodedata.normalize('NFKD', str(nome))
+                         if not unicodedata.combining(c))
+    return ' '.join(sem_acento.upper().split()) or None
+
+
+def _nome_exibicao(nome):
+    return ' '.join(str(nome).split())
+
+
+def obter_id(session, cadastro, nome, cache=None):
+    """Id do cadastro para o nome, criando a linha se ainda não existe (sem
+    commit). INSERT ... ON CONFLICT DO NOTHING: duas requisições com o mesmo
+    nome novo não disputam o índice único."""
+    normalizado = normalizar_nome(nome)
+    if normalizado is None:
+        return None
+    if cache is not None and (cadastro, normalizado) in cache:
+        return cache[(cadastro, normalizado)]
+    tabela = cadastro.__table__
+    session.execute(
+        insert(tabela)
+        .values(nome=_nome_exibicao(nome), nome_normalizado=normalizado,
+                criado_em=datetime.now(tz_cuiaba).isoformat())
+        .on_conflict_do_nothing(index_elements=['nome_normalizado'])
+    )
+    id_ = session.execute(
+        select(tabela.c.id).where(tabela.c.nome_normalizado == normalizado)
+    ).scalar()
+    if cache is not None:
+        cache[(cadastro, normalizado)] = id_
+    return id_
+
+
+def buscar(cadastro, nome):
+    normalizado = normalizar_nome(nome)
+    if normalizado is None:
+        return None
+    return cadastro.query.filter_by(nome_normalizado=normalizado).first()
+
+
+def _ao_flush(session, flush_context, instances):
+    """Resolve o id do cadastro das linhas novas e das que tiveram o nome
+    alterado. Uma linha nova que já traz um id válido (cópia de outra linha)
+    mantém o id."""
+    cache = {}
+    novos = session.new
+    for obj in (*novos, *session.dirty):
+        for coluna_nome, coluna_id, cadastro in VINCULOS.get(type(obj), ()):
+            if obj in novos:
+                atual = getattr(obj, coluna_id)
+                if atual is not None and session.get(cadastro, atual) is not None:
+                    continue
+            elif not inspect(obj).attrs[coluna_nome].history.has_changes():
+                continue
+            setattr(obj, coluna_id, obter_id(session, cadastro, getattr(obj, coluna_nome), cache))
+
+
+def registrar_vinculo_dimensoes():
+    """Liga a resolução dos ids ao flush da sessão."""
+    if event.contains(db.session, 'before_flush', _ao_flush):
+        return
+    event.listen(db.session, 'before_flush', _ao_flush)
+
+
+# ==========================================
+# LEITURA
+# ==========================================
+
+def nome_cliente(obj):
+    """Nome do cliente para exibir: o do cadastro (segue as renomeações) ou,
+    sem cadastro, o digitado."""
+    return obj.cliente.nome if obj.cliente is not None else obj.nome_cliente
+
+
+def coluna_nome_cliente(modelo):
+    """Mesma regra de nome_cliente() para consultas por coluna; a consulta
+    precisa de .outerjoin(Cliente, Cliente.id == modelo.cliente_id)."""
+    return func.coalesce(Cliente.nome, modelo.nome_cliente).label('nome_cliente')
+
+
+def filtro_nome_cliente(modelo, termo):
+    """ilike pelo nome digitado ou pelo nome atual do cadastro."""
+    padrao = f'%{termo}%'
+    return or_(modelo.nome_cliente.ilike(padrao),
+               modelo.cliente_id.in_(select(Cliente.id).where(Cliente.nome.ilike(padrao))))
+
+
+# ==========================================
+# MIGRAÇÃO
+# ==========================================
+
+def migrar_dimensoes():
+    """Bancos anteriores aos cadastros: cria as linhas de fornecedor/cliente a
+    partir dos nomes distintos e preenche os ids que estão NULL. O mapa
+    nome -> id vai para uma tabela temporária e cada coluna é preenchida com
+    um único UPDATE (nome_cliente de separacao não tem índice: um UPDATE por
+    nome varreria a tabela uma vez por cliente). O nome exibido é a grafia mais
+    usada. Só toca as linhas sem id, então roda a cada inicialização sem custo
+    depois da primeira."""
+    # Contagem de cada grafia somando todas as colunas do mesmo cadastro: a
+    # mais usada é criada primeiro e vira o nome exibido.
+    contagem = {}
+    for modelo, vinculos in VINCULOS.items():
+        tabela = modelo.__table__
+        for coluna_nome, coluna_id, cadastro in vinculos:
+            c_nome, c_id = tabela.c[coluna_nome], tabela.c[coluna_id]
+            por_cadastro = contagem.setdefault(cadastro, {})
+            for nome, qtd in db.session.execute(
+                select(c_nome, func.count()).where(c_id.is_(None), c_nome.isnot(None))
+                .group_by(c_nome)
+            ).all():
+                por_cadastro[nome] = por_cadastro.get(nome, 0) + qtd
+    cache, ids = {}, {}
+    for cadastro, por_cadastro in contagem.items():
+        for nome in sorted(por_cadastro, key=por_cadastro.get, reverse=True):
+            ids[(cadastro, nome)] = obter_id(db.session, cadastro, nome, cache)
+
+    total = 0
+    for modelo, vinculos in VINCULOS.items():
+        tabela = modelo.__table__
+        for coluna_nome, coluna_id, cadastro in vinculos:
+            mapa = [{'nome': nome, 'id': id_} for (c, nome), id_ in ids.items()
+                    if c is cadastro and id_ is not None]
+            if not mapa:
+                continue
+            db.session.execute(text("CREATE TEMP TABLE IF NOT EXISTS _mapa_dimensao "
+                                    "(nome TEXT PRIMARY KEY, id INTEGER NOT NULL)"))
+            db.session.execute(text("DELETE FROM _mapa_dimensao"))
+            db.session.execute(text("INSERT INTO _mapa_dimensao (nome, id) VALUES (:nome, :id)"), mapa)
+            total += db.session.execute(text(
+                f"UPDATE {tabela.name} SET {coluna_id} = "
+                f"(SELECT id FROM _mapa_dimensao WHERE nome = {tabela.name}.{coluna_nome}) "
+                f"WHERE {coluna_id} IS NULL AND {coluna_nome} IN (SELECT nome FROM _mapa_dimensao)"
+            )).rowcount
+    if cache:
+        db.session.execute(text("DROP TABLE IF EXISTS _mapa_dimensao"))
+
+    # Clientes ocultos: da lista dinâmica para Cliente.oculto.
+    lista = ListaDinamica.query.filter_by(nome=LISTA_CLIENTES_OCULTOS).first()
+    ocultos = list(lista.itens or []) if lista else []
+    for nome in ocultos:
+        cliente = buscar(Cliente, nome)
+        if cliente:
+            cliente.oculto = True
+    if ocultos:
+        lista.itens = []
+    if cache or ocultos:
+        db.session.commit()
+    if total or ocultos:
+        print(f"[dimensoes] {total} linha(s) vinculada(s) aos cadastros de fornecedor/cliente; "
+              f"{len(ocultos)} cliente(s) oculto(s) migrado(s).")
@@ -0,0 +1,457 @@
+# quadro_app/fotos.py
+"""Pipeline de fotos das peças (ajustes de estoque).
+
+O upload é validado no próprio request (o conteúdo precisa ser uma imagem de
+verdade, não só ter a extensão certa), recebe um nome pelo hash do conteúdo e
+o original é gravado em disco ali mesmo, antes do ajuste ir para o banco. O
+trabalho pesado — corrigir a orientação, remover EXIF, reduzir para a versão
+de exibição e gerar a miniatura — roda em um pool de threads, fora do request,
+a partir desse arquivo.
+
+Caminhos (relativos a static/):
+    uploads/pecas/originais/<hash>.<ext>  upload como veio (servido até o
+                                          processamento terminar)
+    uploads/pecas/<hash>.<ext>            versão de exibição (máx. 1600px)
+    uploads/pecas/thumbs/<hash>.<ext>     miniatura (máx. 320px)
+
+O ajuste nasce apontando para o original; quando o processamento termina,
+aplicar_processada() troca para a versão de exibição e a miniatura. Se o
+processamento falhar (ou o processo reiniciar no meio), o ajuste continua no
+original, que existe em disco; `flask fotos reprocessar` refaz os pendentes.
+
+Fotos iguais compartilham o arquivo; a manutenção (coleta de órfãs,
+verificação de integridade e uso de disco) fica no fim deste módulo e é
+exposta como comandos `flask fotos ...`. O original de uma foto já processada
+fica sem referência e sai na coleta de órfãs.
+
+Pillow é opcional: sem ele, a imagem é validada pela assinatura dos bytes e
+o original é a própria versão de exibição (sem miniatura).
+"""
+import hashlib
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow não instalado: modo degradado
+    Image = None
+
+UPLOAD_SUBDIR = os.path.join('uploads', 'pecas')
+THUMB_SUBDIR = os.path.join(UPLOAD_SUBDIR, 'thumbs')
+ORIGINAL_SUBDIR = os.path.join(UPLOAD_SUBDIR, 'originais')
+PREFIXO_ORIGINAL = 'uploads/pecas/originais/'
+
+TAMANHO_EXIBICAO = 1600
+TAMANHO_THUMB = 320
+QUALIDADE_EXIBICAO = 82
+QUALIDADE_THUMB = 70
+# Limite do arquivo enviado (fotos de celular costumam ter 3-8 MB).
+TAMANHO_MAXIMO_BYTES = 20 * 1024 * 1024
+
+FORMATOS_ACEITOS = {'JPEG', 'PNG', 'WEBP', 'MPO'}   # MPO = JPEG de alguns celulares
+_EXTENSAO_FORMATO = {'JPEG': 'jpg', 'MPO': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+# Assinaturas usadas quando o Pillow não está disponível.
+_ASSINATURAS = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='fotos')
+
+
+class FotoInvalida(ValueError):
+    """O arquivo enviado não é uma imagem aceita."""
+
+
+class FotoPendente:
+    """Upload validado e já gravado como original, aguardando processamento.
+    Os caminhos dependem só do hash, então podem ir para o banco antes do
+    processamento terminar (ver caminhos_iniciais)."""
+
+    def __init__(self, sha256, extensao_original, extensao, static_folder):
+        self.sha256 = sha256
+        self.extensao = extensao
+        self.static_folder = static_folder
+        self.original_path = f"{PREFIXO_ORIGINAL}{sha256}.{extensao_original}"
+        if Image:
+            self.foto_path = f"uploads/pecas/{sha256}.{extensao}"
+            self.thumb_path = f"uploads/pecas/thumbs/{sha256}.{extensao}"
+        else:
+            self.foto_path, self.thumb_path = self.original_path, None
+
+    @classmethod
+    def do_original(cls, original_path, static_folder):
+        """Reconstrói a foto a partir do caminho do original (reprocessamento)."""
+        sha256, _, extensao_original = original_path.rsplit('/', 1)[-1].partition('.')
+        return cls(sha256, extensao_original, _extensao_saida(), static_folder)
+
+    def _abs(self, rel):
+        return os.path.join(self.static_folder, *rel.split('/'))
+
+    @property
+    def ja_processada(self):
+        arquivos = [self.foto_path] + ([self.thumb_path] if self.thumb_path else [])
+        return all(os.path.exists(self._abs(p)) for p in arquivos)
+
+    def caminhos_iniciais(self):
+        """(foto_path, foto_thumb_path) para gravar no ajuste agora: as versões
+        finais se já existem (foto repetida), senão o original, sem miniatura."""
+        if self.ja_processada:
+            return self.foto_path, self.thumb_path
+        return self.original_path, None
+
+
+def _extensao_saida():
+    return 'webp' if Image and features.check('webp') else 'jpg'
+
+
+def _validar_sem_pillow(conteudo):
+    if conteudo[:4] == b'RIFF' and conteudo[8:12] == b'WEBP':
+        return 'webp'
+    for assinatura, ext in _ASSINATURAS:
+        if conteudo.startswith(assinatura):
+            return ext
+    raise FotoInvalida('Arquivo enviado nao e uma imagem valida.')
+
+
+def preparar_upload(file_storage, static_folder):
+    """Lê, valida e grava o original do upload. Retorna FotoPendente, None
+    (sem arquivo) ou levanta FotoInvalida."""
+    if not file_storage or not file_storage.filename:
+        return None
+    conteudo = file_storage.read(TAMANHO_MAXIMO_BYTES + 1)
+    if not conteudo:
+        return None
+    if len(conteudo) > TAMANHO_MAXIMO_BYTES:
+        raise FotoInvalida('Foto muito grande (maximo 20 MB).')
+
+    if Image is None:
+        extensao_original = _validar_sem_pillow(conteudo)
+    else:
+        try:
+            with Image.open(io.BytesIO(conteudo)) as img:
+                formato = img.format
+                img.verify()
+        except Exception:
+            raise FotoInvalida('Arquivo enviado nao e uma imagem valida.')
+        if formato not in FORMATOS_ACEITOS:
+            raise FotoInvalida(f'Formato de imagem nao suportado: {formato}.')
+        extensao_original = _EXTENSAO_FORMATO[formato]
+
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+    foto = FotoPendente(sha256, extensao_original, _extensao_saida(), static_folder)
+    # Foto repetida: os arquivos já existem e podem estar órfãos. Renovar o
+    # mtime faz a coleta respeitar a carência até o novo ajuste referenciá-los.
+    for rel in (foto.foto_path, foto.thumb_path):
+        if rel and rel != foto.original_path:
+            _renovar(foto._abs(rel))
+    destino = foto._abs(foto.original_path)
+    if not _renovar(destino):
+        _gravar_atomico(destino, lambda tmp: _gravar_bytes(tmp, conteudo))
+    return foto
+
+
+def _renovar(caminho):
+    """Atualiza o mtime do arquivo; False se ele não existe."""
+    try:
+        os.utime(caminho)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _gravar_atomico(caminho, escrever):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    # Nome temporário único: a mesma foto pode estar sendo gravada por dois
+    # workers ao mesmo tempo (uploads repetidos); o último os.replace vence.
+    tmp = f"{caminho}.{uuid.uuid4().hex}.tmp"
+    escrever(tmp)
+    os.replace(tmp, caminho)
+
+
+def _gravar_bytes(caminho, conteudo):
+    with open(caminho, 'wb') as f:
+        f.write(conteudo)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _salvar_imagem(img, caminho, tamanho, qualidade):
+    copia = img.copy()
+    copia.thumbnail((tamanho, tamanho), Image.LANCZOS)
+    formato = 'WEBP' if caminho.endswith('.webp') else 'JPEG'
+    # Sem 'exif=' no save: os metadados (GPS, aparelho...) não são gravados.
+    _gravar_atomico(caminho, lambda tmp: copia.save(
+        tmp, format=formato, quality=qualidade, optimize=True))
+
+
+def processar(foto):
+    """Gera versão de exibição e miniatura a partir do original em disco.
+    Roda no pool de threads."""
+    if foto.ja_processada:
+        return
+    with Image.open(foto._abs(foto.original_path)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGB')
+        if foto.extensao == 'jpg' and img.mode == 'RGBA':
+            img = img.convert('RGB')
+        _salvar_imagem(img, foto._abs(foto.foto_path), TAMANHO_EXIBICAO, QUALIDADE_EXIBICAO)
+        _salvar_imagem(img, foto._abs(foto.thumb_path), TAMANHO_THUMB, QUALIDADE_THUMB)
+
+
+def aplicar_processada(foto):
+    """Troca o original pelas versões processadas nos ajustes que ainda
+    apontam para ele. Precisa de app context; faz commit. Retorna os ids."""
+    from .extensions import db
+    from .models import AjusteEstoque
+
+    ajustes = AjusteEstoque.query.filter_by(foto_path=foto.original_path).all()
+    for ajuste in ajustes:
+        ajuste.foto_path = foto.foto_path
+        ajuste.foto_thumb_path = foto.thumb_path
+    db.session.commit()
+    return [a.id for a in ajustes]
+
+
+def agendar_processamento(foto, ao_terminar=None):
+    """Envia a foto para o pool. ao_terminar() é chamado quando os arquivos
+    estiverem prontos (ex.: para aplicar_processada e avisar as telas). Se o
+    processamento falhar, o ajuste continua servindo o original."""
+    def _tarefa():
+        try:
+            processar(foto)
+        except Exception as e:
+            print(f"[fotos] erro ao processar {foto.sha256}, mantendo o original "
+                  f"({foto.original_path}): {e}")
+            return
+        if ao_terminar:
+            try:
+                ao_terminar()
+            except Exception as e:
+                print(f"[fotos] erro no callback de {foto.sha256}: {e}")
+    return _executor.submit(_tarefa)
+
+
+def reprocessar_pendentes(static_folder):
+    """Processa de forma síncrona as fotos cujos ajustes ainda apontam para o
+    original (falha ou reinício no meio do processamento). Precisa de app
+    context. Retorna {'processadas': [...], 'falhas': {caminho: erro}}."""
+    from .extensions import db
+    from .models import AjusteEstoque
+
+    resultado = {'processadas': [], 'falhas': {}}
+    if Image is None:
+        return resultado
+    pendentes = [c for (c,) in db.session.query(AjusteEstoque.foto_path)
+                 .filter(AjusteEstoque.foto_path.like(f'{PREFIXO_ORIGINAL}%')).distinct()]
+    for original in pendentes:
+        foto = FotoPendente.do_original(original, static_folder)
+        try:
+            processar(foto)
+        except Exception as e:
+            resultado['falhas'][original] = str(e)
+            continue
+        aplicar_processada(foto)
+        resultado['processadas'].append(original)
+    return resultado
+
+
+# ============================================================
+# CACHE HTTP
+# ============================================================
+# O nome do arquivo é o hash do conteúdo e cada arquivo só aparece no disco
+# completo (gravação atômica), então uma URL de foto nunca muda de conteúdo: o
+# navegador pode guardá-la por um ano sem revalidar (a galeria rola milhares
+# de miniaturas).
+
+PREFIXO_URL_FOTOS = '/static/uploads/pecas/'
+CACHE_FOTOS_SEGUNDOS = 365 * 24 * 3600
+
+
+def _cache_fotos_imutaveis(response):
+    from flask import request
+    if request.path.startswith(PREFIXO_URL_FOTOS) and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = CACHE_FOTOS_SEGUNDOS
+        response.cache_control.immutable = True
+    return response
+
+
+def registrar_cache_fotos(app):
+    app.after_request(_cache_fotos_imutaveis)
+
+
+# ============================================================
+# ARMAZENAMENTO: referências, coleta de órfãs, integridade e uso
+# ============================================================
+# Como o nome é o hash do conteúdo, a mesma foto enviada duas vezes aponta
+# para o mesmo arquivo. O contador de referências é o número de ajustes que
+# usam o caminho (AjusteEstoque.foto_path / foto_thumb_path); um arquivo sem
+# nenhuma referência é órfão e pode ser apagado.
+
+# Arquivos mais novos que isso nunca são coletados: podem ser de um upload
+# cujo ajuste ainda está sendo gravado/processado.
+CARENCIA_GC_SEGUNDOS = 3600
+
+
+def _referencias(caminhos=None):
+    """Counter {caminho relativo a static/: nº de ajustes que o usam}."""
+    from collections import Counter
+    from .extensions import db
+    from .models import AjusteEstoque
+
+    refs = Counter()
+    for coluna in (AjusteEstoque.foto_path, AjusteEstoque.foto_thumb_path):
+        query = db.session.query(coluna, db.func.count(AjusteEstoque.id))\
+            .filter(coluna.isnot(None))
+        if caminhos is not None:
+            query = query.filter(coluna.in_(list(caminhos)))
+        for caminho, n in query.group_by(coluna).all():
+            refs[caminho] += n
+    return refs
+
+
+def _arquivos_armazenados(static_folder):
+    """Gera (caminho relativo a static/, caminho absoluto) das fotos em disco."""
+    for subdir in (UPLOAD_SUBDIR, THUMB_SUBDIR, ORIGINAL_SUBDIR):
+        pasta = os.path.join(static_folder, subdir)
+        if not os.path.isdir(pasta):
+            continue
+        for nome in os.listdir(pasta):
+            absoluto = os.path.join(pasta, nome)
+            if os.path.isfile(absoluto) and not nome.endswith('.tmp'):
+                yield f"{subdir.replace(os.sep, '/')}/{nome}", absoluto
+
+
+def remover_se_orfas(static_folder, caminhos):
+    """Apaga do disco os caminhos informados que não têm mais referência.
+    Usado depois de excluir ajustes (ex.: excluir_campanha). Arquivos dentro
+    da carência ficam (um upload repetido pode estar prestes a usá-los);
+    coletar_orfas os remove depois. Retorna quantos arquivos foram removidos."""
+    import time
+    caminhos = {c for c in caminhos if c}
+    if not caminhos:
+        return 0
+    ainda_usados = _referencias(caminhos)
+    limite = time.time() - CARENCIA_GC_SEGUNDOS
+    removidos = 0
+    for rel in caminhos - set(ainda_usados):
+        absoluto = os.path.join(static_folder, *rel.split('/'))
+        try:
+            if os.stat(absoluto).st_mtime > limite:
+                continue
+            os.remove(absoluto)
+            removidos += 1
+        except FileNotFoundError:
+            pass
+    return removidos
+
+
+def coletar_orfas(static_folder, simular=False, carencia=CARENCIA_GC_SEGUNDOS):
+    """Remove (ou só lista, com simular=True) as fotos sem nenhuma referência."""
+    import time
+    refs = _referencias()
+    limite = time.time() - carencia
+    orfas, bytes_liberados = [], 0
+    for rel, absoluto in _arquivos_armazenados(static_folder):
+        if rel in refs:
+            continue
+        info = os.stat(absoluto)
+        if info.st_mtime > limite:
+            continue
+        orfas.append(rel)
+        bytes_liberados += info.st_size
+        if not simular:
+            os.remove(absoluto)
+    return {'removidas': orfas, 'bytes': bytes_liberados, 'simulado': simular}
+
+
+def verificar_integridade(static_folder):
+    """Confere as fotos referenciadas pelos ajustes: arquivo ausente ou que
+    não abre como imagem. Retorna {'ausentes': [...], 'corrompidas': [...]}."""
+    ausentes, corrompidas = [], []
+    for rel in _referencias():
+        absoluto = os.path.join(static_folder, *rel.split('/'))
+        if not os.path.isfile(absoluto):
+            ausentes.append(rel)
+            continue
+        if Image is None:
+            continue
+        try:
+            with Image.open(absoluto) as img:
+                img.verify()
+        except Exception:
+            corrompidas.append(rel)
+    return {'ausentes': ausentes, 'corrompidas': corrompidas}
+
+
+def uso_disco(static_folder):
+    """Resumo do armazenamento: total em disco, referenciado e órfão."""
+    refs = _referencias()
+    resumo = {
+        'arquivos': 0, 'bytes': 0,
+        'referenciados': 0, 'bytes_referenciados': 0,
+        'orfaos': 0, 'bytes_orfaos': 0,
+        # Quantos ajustes reaproveitam um arquivo que já existia.
+        'referencias_deduplicadas': sum(n - 1 for n in refs.values() if n > 1),
+    }
+    for rel, absoluto in _arquivos_armazenados(static_folder):
+        tamanho = os.path.getsize(absoluto)
+        resumo['arquivos'] += 1
+        resumo['bytes'] += tamanho
+        if rel in refs:
+            resumo['referenciados'] += 1
+            resumo['bytes_referenciados'] += tamanho
+        else:
+            resumo['orfaos'] += 1
+            resumo['bytes_orfaos'] += tamanho
+    return resumo
+
+
+def registrar_comandos_fotos(app):
+    """Comandos de manutenção: flask --app run fotos gc|verificar|uso|reprocessar."""
+    import click
+
+    @app.cli.group('fotos')
+    def fotos_cli():
+        """Manutenção das fotos de peças (static/uploads/pecas)."""
+
+    @fotos_cli.command('gc')
+    @click.option('--simular', is_flag=True, help='Só lista o que seria removido.')
+    def gc_cmd(simular):
+        r = coletar_orfas(app.static_folder, simular=simular)
+        acao = 'Seriam removidas' if simular else 'Removidas'
+        click.echo(f"{acao} {len(r['removidas'])} foto(s) órfã(s), {r['bytes'] / 1024:.1f} KB.")
+        for rel in r['removidas']:
+            click.echo(f"  {rel}")
+
+    @fotos_cli.command('verificar')
+    def verificar_cmd():
+        r = verificar_integridade(app.static_folder)
+        click.echo(f"Ausentes: {len(r['ausentes'])} | Corrompidas: {len(r['corrompidas'])}")
+        for rel in r['ausentes']:
+            click.echo(f"  ausente: {rel}")
+        for rel in r['corrompidas']:
+            click.echo(f"  corrompida: {rel}")
+
+    @fotos_cli.command('reprocessar')
+    def reprocessar_cmd():
+        r = reprocessar_pendentes(app.static_folder)
+        click.echo(f"Processadas: {len(r['processadas'])} | Falhas: {len(r['falhas'])}")
+        for rel, erro in r['falhas'].items():
+            click.echo(f"  falha: {rel}: {erro}")
+
+    @fotos_cli.command('uso')
+    def uso_cmd():
+        r = uso_disco(app.static_folder)
+        click.echo(
+            f"{r['arquivos']} arquivo(s), {r['bytes'] / 1048576:.1f} MB | "
+            f"referenciados: {r['referenciados']} ({r['bytes_referenciados'] / 1048576:.1f} MB) | "
+            f"órfãos: {r['orfaos']} ({r['bytes_orfaos'] / 1048576:.1f} MB) | "
+            f"referências deduplicadas: {r['referencias_deduplicadas']}"
+        )
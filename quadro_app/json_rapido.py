@@ -0,0 +1,180 @@
+# quadro_app/json_rapido.py
+"""Serialização JSON com orjson (com volta automática para o json padrão).
+
+Usado em dois lugares:
+    - respostas do Flask (jsonify / return dict): ProvedorJSONRapido, em app.json;
+    - pacotes do Socket.IO: JSONSocketIO, passado como json= no SocketIO().
+
+O resultado é o mesmo JSON de antes (chaves ordenadas como no provider
+padrão do Flask; datas, Decimal etc. convertidos pelo mesmo default). Se o
+orjson não estiver instalado, ou recusar algum valor (ex.: inteiro maior que
+64 bits), cai no json da biblioteca padrão.
+
+Para comparar com o provider padrão usando os serializers reais:
+    flask --app run json bench
+"""
+import json
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson não instalado: json padrão
+    orjson = None
+
+_default = DefaultJSONProvider.default
+
+if orjson is not None:
+    # Datas passam pelo default do Flask (formato HTTP, como antes).
+    _OPCOES = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _orjson_dumps(obj, sort_keys=False, indent=None):
+    opcoes = _OPCOES
+    if sort_keys:
+        opcoes |= orjson.OPT_SORT_KEYS
+    if indent:
+        opcoes |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_default, option=opcoes)
+
+
+class ProvedorJSONRapido(DefaultJSONProvider):
+    """JSON provider do Flask que usa orjson quando possível."""
+
+    def dumps(self, obj, **kwargs):
+        # Argumentos que o orjson não sabe tratar (cls, default...) vão para o json padrão.
+        extras = set(kwargs) - {'sort_keys', 'indent', 'separators', 'ensure_ascii'}
+        if orjson is not None and not extras:
+            try:
+                return _orjson_dumps(
+                    obj, sort_keys=kwargs.get('sort_keys', self.sort_keys),
+                    indent=kwargs.get('indent')).decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            corpo = _orjson_dumps(obj, sort_keys=self.sort_keys, indent=indent)
+        except TypeError:
+            return super().response(obj)
+        return self._app.response_class(corpo + b"\n", mimetype=self.mimetype)
+
+
+class JSONSocketIO:
+    """Módulo 'json' para o python-socketio/engine.io: dumps/loads com a mesma
+    assinatura da biblioteca padrão (o socketio passa separators=...)."""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        if orjson is not None:
+            try:
+                return _orjson_dumps(obj).decode('utf-8')
+            except TypeError:
+                pass
+        kwargs.setdefault('default', _default)
+        return json.dumps(obj, **kwargs)
+
+    @staticmethod
+    def loads(s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+
+def init_json_rapido(app):
+    app.json = ProvedorJSONRapido(app)
+    _registrar_comando_bench(app)
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def _payloads_bench(linhas):
+    """{nome: lista de dicts} gerados pelos serialize_* reais. Usa as linhas
+    do banco; se a tabela estiver vazia, objetos de exemplo (não gravados)."""
+    from .models import Conferencia, Separacao, Pedido
+    from .blueprints.conferencias import serialize_conferencias
+    from .blueprints.separacoes import serialize_separacoes
+    from .blueprints.pedidos import serialize_pedido
+
+    def exemplos(modelo, i):
+        if modelo is Pedido:
+            return Pedido(id=i, vendedor='Vendedor Exemplo', status='Aberto', tipo_req='Pedido Produto',
+                          comprador='Comprador', data_criacao='2025-01-01T08:00:00-04:00',
+                          observacao_geral='Observação de exemplo com acentuação',
+                          itens=[{'codigo': f'P{i}-{k}', 'quantidade': k + 1, 'status': 'Aguardando'}
+                                 for k in range(5)],
+                          codigo=f'P{i}', descricao='Peça de exemplo')
+        if modelo is Separacao:
+            return Separacao(id=i, numero_movimentacao=f'{i:06d}', nome_cliente='Cliente Exemplo Ltda',
+                             separadores_nomes=['Separador A', 'Separador B'], vendedor_nome='Vendedor',
+                             status='Em Separação', data_criacao='2025-01-01T08:00:00-04:00', qtd_pecas=12)
+        return Conferencia(id=i, data_recebimento='2025-01-01', numero_nota_fiscal=str(100000 + i),
+                           nome_fornecedor='Fornecedor Exemplo S.A.', nome_transportadora='Transportadora',
+                           qtd_volumes=3, vendedor_nome='Vendedor', recebido_por='Recebedor',
+                           status='Em Conferência', conferentes=['Conferente A'],
+                           total_itens=40, prioridade='Prioridade 2')
+
+    resultado = {}
+    def serialize_pedidos(pedidos):
+        return [serialize_pedido(p) for p in pedidos]
+
+    for nome, modelo, serializar in (('conferencias', Conferencia, serialize_conferencias),
+                                     ('separacoes', Separacao, serialize_separacoes),
+                                     ('pedidos', Pedido, serialize_pedidos)):
+        objetos = modelo.query.limit(linhas).all()
+        origem = 'banco'
+        if not objetos:
+            objetos = [exemplos(modelo, i) for i in range(1, linhas + 1)]
+            origem = 'exemplo'
+        resultado[nome] = (origem, serializar(objetos))
+    return resultado
+
+
+def _registrar_comando_bench(app):
+    import click
+
+    @app.cli.group('json')
+    def json_cli():
+        """Serialização JSON (orjson)."""
+
+    @json_cli.command('bench')
+    @click.option('--linhas', default=500, show_default=True, help='Registros por payload.')
+    @click.option('--repeticoes', default=50, show_default=True)
+    def bench_cmd(linhas, repeticoes):
+        """Tempo de jsonify/emit: provider padrão do Flask x orjson."""
+        if orjson is None:
+            raise click.ClickException('orjson não está instalado.')
+        padrao = DefaultJSONProvider(app)
+        rapido = ProvedorJSONRapido(app)
+
+        def medir(func, payload):
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                func(payload)
+            return (time.perf_counter() - inicio) * 1000 / repeticoes
+
+        with app.test_request_context():
+            click.echo(f"{'payload':<14} {'origem':<8} {'linhas':>6} {'bytes':>9} "
+                       f"{'stdlib ms':>10} {'orjson ms':>10} {'ganho':>6} {'socket ms':>10} {'orjson ms':>10}")
+            for nome, (origem, payload) in _payloads_bench(linhas).items():
+                t_padrao = medir(lambda p: padrao.response(p), payload)
+                t_rapido = medir(lambda p: rapido.response(p), payload)
+                s_padrao = medir(lambda p: json.dumps(p, separators=(',', ':')), payload)
+                s_rapido = medir(lambda p: JSONSocketIO.dumps(p, separators=(',', ':')), payload)
+                tamanho = len(rapido.response(payload).get_data())
+                click.echo(f"{nome:<14} {origem:<8} {len(payload):>6} {tamanho:>9} "
+                           f"{t_padrao:>10.3f} {t_rapido:>10.3f} {t_padrao / t_rapido:>5.1f}x "
+                           f"{s_padrao:>10.3f} {s_rapido:>10.3f}")
@@ -7,6 +7,33 @@ from .extensions import db
 
 # --- MODELOS PRINCIPAIS ---
 
+class Fornecedor(db.Model):
+    """Cadastro único de cada fornecedor.
+
+    Conferencia, Garantia e RegistroCompra continuam gravando o nome digitado,
+    e fornecedor_id aponta para esta linha (preenchido no flush, ver
+    dimensoes.py). Nomes que só diferem em caixa, acentos ou espaços caem no
+    mesmo registro pelo índice único de nome_normalizado."""
+    __tablename__ = 'fornecedor'
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(200), nullable=False)
+    nome_normalizado = db.Column(db.String(200), nullable=False, unique=True)
+    criado_em = db.Column(db.String(100))
+
+
+class Cliente(db.Model):
+    """Cadastro único de cada cliente (Separacao, SeparacaoCancelada e
+    Garantia apontam para cá por cliente_id). O nome exibido nas telas é o
+    daqui: renomear um cliente altera só esta linha, e mesclar troca o
+    cliente_id das linhas dos nomes mesclados."""
+    __tablename__ = 'cliente'
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(200), nullable=False)
+    nome_normalizado = db.Column(db.String(200), nullable=False, unique=True)
+    oculto = db.Column(db.Boolean, nullable=False, default=False)   # fora do autocomplete
+    criado_em = db.Column(db.String(100))
+
+
 class Pedido(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     vendedor = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
@@ -39,7 +66,8 @@ class Sugestao(db.Model):
 class Separacao(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     numero_movimentacao = db.Column(db.String(20), unique=True, nullable=False, index=True) # <-- ADICIONADO: Índice
-    nome_cliente = db.Column(db.String(200))
+    nome_cliente = db.Column(db.String(200))   # como foi digitado; o nome exibido vem de Cliente
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), index=True)
     separadores_nomes = db.Column(MutableList.as_mutable(JSON))
     vendedor_nome = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
     status = db.Column(db.String(50), default='Em Separação', index=True) # <-- ADICIONADO: Índice
@@ -47,23 +75,33 @@ class Separacao(db.Model):
     data_inicio_conferencia = db.Column(db.String(100))
     data_finalizacao = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
     conferente_nome = db.Column(db.String(100))
+    # Legado: as observações ficam na tabela 'observacao' (ver Observacao).
+    # A coluna só é lida pela migração e pela restauração da lixeira.
     observacoes = db.Column(MutableList.as_mutable(JSON))
     qtd_pecas = db.Column(db.Integer, default=0)
 
+    cliente = db.relationship('Cliente', lazy='joined')
+
 class Conferencia(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     data_recebimento = db.Column(db.String(100))
     numero_nota_fiscal = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
     nome_fornecedor = db.Column(db.String(200), index=True) # <-- ADICIONADO: Índice
+    # active_history: o resumo por fornecedor (blueprints/fornecedores.py)
+    # precisa do valor anterior para saber quais dias recalcular.
+    fornecedor_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('fornecedor.id'), index=True), active_history=True)
     nome_transportadora = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
     qtd_volumes = db.Column(db.Integer, index=True) # <-- ADICIONADO: Índice
     vendedor_nome = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
     recebido_por = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
     status = db.Column(db.String(50), index=True) # <-- ADICIONADO: Índice
     data_inicio_conferencia = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
-    data_conferencia_finalizada = db.Column(db.String(100), index=True) # <-- ADICIONADO: Índice
+    data_conferencia_finalizada = db.column_property(
+        db.Column(db.String(100), index=True), active_history=True) # <-- ADICIONADO: Índice
     data_finalizacao = db.Column(db.String(100), index=True)
     conferentes = db.Column(MutableList.as_mutable(JSON))
+    # Legado: ver Observacao (mesmo caso de Separacao.observacoes).
     observacoes = db.Column(MutableList.as_mutable(JSON))
     resolvido_gestor = db.Column(db.Boolean, default=False, index=True) # <-- ADICIONADO: Índice
     resolvido_contabilidade = db.Column(db.Boolean, default=False, index=True) # <-- ADICIONADO: Índice
@@ -103,8 +141,13 @@ class ItemExcluido(db.Model):
     excluido_por = db.Column(db.String(100))
     data_exclusao = db.Column(db.String(100), nullable=False)
     
-    # Índice para buscas mais rápidas
-    __table_args__ = (db.Index('idx_tipo_id_original', 'tipo_item', 'item_id_original'),)
+    # Índice para buscas mais rápidas; os de data_exclusao atendem a listagem
+    # (mais recentes primeiro, com ou sem ?tipo=) e o expurgo por retenção.
+    __table_args__ = (
+        db.Index('idx_tipo_id_original', 'tipo_item', 'item_id_original'),
+        db.Index('idx_item_excluido_data', 'data_exclusao', 'id'),
+        db.Index('idx_item_excluido_tipo_data', 'tipo_item', 'data_exclusao', 'id'),
+    )
 
 class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -115,6 +158,9 @@ class Log(db.Model):
     detalhes = db.Column(db.JSON)
     timestamp = db.Column(db.String(100))
 
+    # Histórico de um item (logs.get_logs_for_item) já sai ordenado do índice.
+    __table_args__ = (db.Index('idx_log_tipo_item', 'log_type', 'item_id', 'timestamp'),)
+
 class RetiradaAntecipada(db.Model):
     """Peça retirada por um separador antes da conferência do estoque.
     O checkbox 'conferido' sinaliza que o item já foi acertado (linha verde)."""
@@ -131,6 +177,76 @@ class RetiradaAntecipada(db.Model):
     criado_por = db.Column(db.String(100))
 
 
+class ConciliacaoRetirada(db.Model):
+    """Relatório pré-calculado da conciliação das retiradas antecipadas.
+
+    Uma linha por retirada, recalculada em lote (ver conciliar_retiradas em
+    blueprints/retiradas.py): a separação do número informado, a campanha de
+    ajuste que cobre a data e o que os ajustes daquela campanha mostram para o
+    código. Não é editada pela aplicação; é apagada e gerada de novo a cada
+    execução."""
+    __tablename__ = 'conciliacao_retirada'
+    retirada_id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.String(100), index=True)
+    codigo = db.Column(db.String(100))
+    separador_nome = db.Column(db.String(100))
+    quantidade = db.Column(db.Integer)
+    numero_separacao = db.Column(db.String(20))
+    conferido = db.Column(db.Boolean, nullable=False, default=False)
+
+    separacao_id = db.Column(db.Integer)
+    separacao_status = db.Column(db.String(50))
+    campanha_id = db.Column(db.Integer)
+    # Soma das retiradas do código na campanha x falta apontada pelos ajustes
+    # (quantidade_sistema - quantidade_real) do mesmo código na campanha.
+    qtd_retirada_campanha = db.Column(db.Integer)
+    qtd_falta_ajuste = db.Column(db.Integer)
+
+    sem_separacao = db.Column(db.Boolean, nullable=False, default=False)
+    separacao_cancelada = db.Column(db.Boolean, nullable=False, default=False)
+    divergencia_quantidade = db.Column(db.Boolean, nullable=False, default=False)
+    pendente_antiga = db.Column(db.Boolean, nullable=False, default=False)
+    divergente = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    calculado_em = db.Column(db.String(100))
+
+
+class Observacao(db.Model):
+    """Observação de uma conferência ou separação, ou acompanhamento de uma
+    garantia.
+
+    Tabela só de acréscimo: registrar uma nota é um INSERT, em vez de regravar
+    a lista JSON inteira da entidade. 'seq' numera as notas de cada entidade a
+    partir de 1 e é o que as rotas de edição recebem. Editar troca o texto e
+    guarda o anterior em ObservacaoEdicao; excluir só marca excluida_em."""
+    __tablename__ = 'observacao'
+    __table_args__ = (
+        db.Index('idx_observacao_entidade_seq', 'entidade', 'entidade_id', 'seq', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    entidade = db.Column(db.String(20), nullable=False)   # 'conferencia' | 'separacao' | 'garantia'
+    entidade_id = db.Column(db.Integer, nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    texto = db.Column(db.Text)
+    autor = db.Column(db.String(100))
+    role = db.Column(db.String(50))                       # só nas separações
+    timestamp = db.Column(db.String(100))
+    editado_em = db.Column(db.String(100))
+    editado_por = db.Column(db.String(100))
+    excluida_em = db.Column(db.String(100))
+    excluida_por = db.Column(db.String(100))
+
+
+class ObservacaoEdicao(db.Model):
+    """Texto anterior de uma Observacao, gravado a cada edição."""
+    __tablename__ = 'observacao_edicao'
+    id = db.Column(db.Integer, primary_key=True)
+    observacao_id = db.Column(db.Integer, db.ForeignKey('observacao.id', ondelete='CASCADE'),
+                              nullable=False, index=True)
+    texto_anterior = db.Column(db.Text)
+    editado_por = db.Column(db.String(100))
+    editado_em = db.Column(db.String(100))
+
+
 class SeparacaoCancelada(db.Model):
     """Registro simples (apenas controle) de uma separação que foi cancelada.
     Não tem relação com a tabela Separacao — é um lançamento manual em estilo
@@ -140,10 +256,13 @@ class SeparacaoCancelada(db.Model):
     data = db.Column(db.String(20), index=True)          # data informada (YYYY-MM-DD)
     numero_separacao = db.Column(db.String(20), index=True)
     nome_cliente = db.Column(db.String(200), index=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), index=True)
     separador_nome = db.Column(db.String(100), index=True)
     criado_por = db.Column(db.String(100))
     data_criacao = db.Column(db.String(100), index=True)
 
+    cliente = db.relationship('Cliente', lazy='joined')
+
 
 class Notificacao(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -211,6 +330,7 @@ class AjusteEstoque(db.Model):
 
     # Foto (caminho relativo a static/)
     foto_path = db.Column(db.String(255))
+    foto_thumb_path = db.Column(db.String(255))
     foto_cadastrada_no_erp = db.Column(db.Boolean, default=False, index=True)
     foto_cadastrada_em = db.Column(db.String(50))
     foto_cadastrada_por = db.Column(db.String(100))
@@ -222,20 +342,22 @@ class AnotacaoColuna(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
     cor = db.Column(db.String(20), default='#6366f1')   # cor do cabeçalho da coluna
-    ordem = db.Column(db.Integer, default=0, index=True)
+    # Chave de ordenação fracionária (ver blueprints/anotacoes.py): mover uma
+    # coluna altera só a posição dela.
+    posicao = db.Column(db.String(64), index=True)
 
     cards = db.relationship(
         'AnotacaoCard',
         backref='coluna',
         cascade='all, delete-orphan',
-        order_by='AnotacaoCard.ordem',
-        lazy='joined',
+        order_by='AnotacaoCard.posicao',
     )
 
 
 class AnotacaoCard(db.Model):
     """Card (anotação) que pertence a uma coluna do Kanban."""
     __tablename__ = 'anotacao_card'
+    __table_args__ = (db.Index('idx_anotacao_card_coluna_posicao', 'coluna_id', 'posicao'),)
     id = db.Column(db.Integer, primary_key=True)
     coluna_id = db.Column(
         db.Integer,
@@ -246,7 +368,7 @@ class AnotacaoCard(db.Model):
     titulo = db.Column(db.String(200))
     conteudo = db.Column(db.Text)
     cor = db.Column(db.String(20))           # cor opcional do card (sobrescreve padrão)
-    ordem = db.Column(db.Integer, default=0, index=True)
+    posicao = db.Column(db.String(64))       # chave fracionária dentro da coluna
     criado_por = db.Column(db.String(100))
     data_criacao = db.Column(db.String(100))
 
@@ -254,6 +376,7 @@ class AnotacaoCard(db.Model):
 class RegistroCompra(db.Model):
     id = db.Column(db.Integer, primary_key=True, index=True)
     fornecedor = db.Column(db.String(200), nullable=False, index=True)
+    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedor.id'), index=True)
     comprador_nome = db.Column(db.String(100), nullable=True, index=True)
     observacao = db.Column(db.Text, index=True)
     status = db.Column(db.String(50), default='Aguardando', index=True) # Pedido, Em Cotação, Aguardando
@@ -270,14 +393,21 @@ class Garantia(db.Model):
     passa a aparecer na aba de Finalizadas. Pode retornar para 'Pendente' caso
     volte a ser trabalhado."""
     __tablename__ = 'garantia'
+    __table_args__ = (
+        db.Index('idx_garantia_status_inicio', 'status', 'data_inicio'),
+        db.Index('idx_garantia_finalizado_em', 'finalizado_em'),
+    )
     id = db.Column(db.Integer, primary_key=True)
 
     # Dados do processo
     nome_cliente = db.Column(db.String(200), index=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), index=True)
     descricao_peca = db.Column(db.Text)
     codigo_peca = db.Column(db.String(100), index=True)
     marca = db.Column(db.String(100))
     fornecedor = db.Column(db.String(200), index=True)
+    fornecedor_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('fornecedor.id'), index=True), active_history=True)
     defeito = db.Column(db.Text)
     quantidade = db.Column(db.Integer, default=1)
 
@@ -285,11 +415,11 @@ class Garantia(db.Model):
     data_inicio = db.Column(db.String(20), index=True)
     data_envio_fornecedor = db.Column(db.String(20))
     ultimo_contato = db.Column(db.String(20))
-    data_final = db.Column(db.String(20))        # preenchida ao finalizar
+    data_final = db.column_property(db.Column(db.String(20)), active_history=True)  # preenchida ao finalizar
 
-    # Linha do tempo de acompanhamento: lista de {texto, autor, timestamp}.
-    # Recebe edições constantes ("em contato com fornecedor dia 30/06...").
-    acompanhamento = db.Column(MutableList.as_mutable(JSON), default=[])
+    # Legado: a linha do tempo de acompanhamento ("em contato com fornecedor
+    # dia 30/06...") fica na tabela 'observacao' (ver Observacao).
+    acompanhamento = db.Column(MutableList.as_mutable(JSON))
     conclusao = db.Column(db.Text)               # desfecho/observação final
 
     # 'Pendente' | 'Recusada' | 'Concedida' | 'Abandono'
@@ -302,6 +432,8 @@ class Garantia(db.Model):
     finalizado_por = db.Column(db.String(100))
     finalizado_em = db.Column(db.String(100))
 
+    cliente = db.relationship('Cliente', lazy='joined')
+
 
 class MovimentacaoCompra(db.Model):
     """
@@ -314,16 +446,83 @@ class MovimentacaoCompra(db.Model):
     """
     __tablename__ = 'movimentacao_compra'
     id = db.Column(db.Integer, primary_key=True)
-    registro_id = db.Column(
+    registro_id = db.column_property(db.Column(
         db.Integer,
         db.ForeignKey('registro_compra.id', ondelete='CASCADE'),
         nullable=False,
         index=True,
-    )
+    ), active_history=True)
     # status_anterior = NULL marca o evento de criação do registro.
     status_anterior = db.Column(db.String(50))
     status_novo = db.Column(db.String(50), nullable=False)
     timestamp = db.Column(db.String(50), nullable=False, index=True)
     autor = db.Column(db.String(100))
 
-    registro = db.relationship('RegistroCompra', backref=db.backref('movimentacoes', lazy='dynamic'))
\ No newline at end of file
+    registro = db.relationship('RegistroCompra', backref=db.backref('movimentacoes', lazy='dynamic'))
+
+
+class ResumoFornecedor(db.Model):
+    """Scorecard dos fornecedores, uma linha por fornecedor e dia.
+
+    Junta o que está espalhado em três lugares: conferências finalizadas no dia
+    (e quantas abriram divergência), garantias finalizadas no dia (desfecho e
+    dias de processo) e compras que chegaram a 'Pedido Efetuado' no dia (tempo
+    em horário de expediente desde a criação). Não é editada pela aplicação: as
+    linhas tocadas por cada alteração são recalculadas no flush (ver
+    blueprints/fornecedores.py), e um período qualquer é a soma dos seus dias."""
+    __tablename__ = 'resumo_fornecedor'
+    __table_args__ = (db.Index('idx_resumo_fornecedor_dia', 'dia', 'fornecedor_id'),)
+    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedor.id'), primary_key=True)
+    dia = db.Column(db.String(10), primary_key=True)      # YYYY-MM-DD
+
+    conferencias = db.Column(db.Integer, nullable=False, default=0)
+    divergencias = db.Column(db.Integer, nullable=False, default=0)
+    garantias_concedidas = db.Column(db.Integer, nullable=False, default=0)
+    garantias_recusadas = db.Column(db.Integer, nullable=False, default=0)
+    garantias_abandono = db.Column(db.Integer, nullable=False, default=0)
+    garantias_dias = db.Column(db.Float, nullable=False, default=0)       # soma
+    compras = db.Column(db.Integer, nullable=False, default=0)
+    compras_segundos_uteis = db.Column(db.Float, nullable=False, default=0)  # soma
+
+class VersaoDominio(db.Model):
+    """Contador de versão por domínio (pedidos, separacoes, conferencias...).
+
+    Incrementado dentro da mesma transação de qualquer alteração nas tabelas do
+    domínio (ver blueprints/versoes.py). Os clientes comparam o número com o
+    que já têm para saber se precisam recarregar, em vez de contar linhas."""
+    __tablename__ = 'versao_dominio'
+    dominio = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, default=0, nullable=False)
+
+
+class RelatorioAgendado(db.Model):
+    """Relatório recorrente salvo (tipo + filtros) que é gerado num horário
+    fixo todo dia e fica guardado em SnapshotRelatorio.
+
+    'periodo' é relativo ('mes_passado', 'semana_atual'...) e vira
+    dataInicio/dataFim no momento de gerar (ver blueprints/relatorios_agendados.py)."""
+    __tablename__ = 'relatorio_agendado'
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(120), nullable=False)
+    tipo = db.Column(db.String(30), nullable=False)          # 'pedidos' | 'compras' | 'conferencias' | 'logistica'
+    periodo = db.Column(db.String(30))                       # NULL = usa as datas de 'filtros'
+    filtros = db.Column(db.JSON, nullable=False, default=dict)
+    horario = db.Column(db.String(5), nullable=False, default='06:00')   # HH:MM
+    ativo = db.Column(db.Boolean, nullable=False, default=True)
+    criado_por = db.Column(db.String(100))
+    criado_em = db.Column(db.String(100))
+    atualizado_em = db.Column(db.String(100))               # snapshots anteriores ficam obsoletos
+
+class SnapshotRelatorio(db.Model):
+    """Resultado de uma geração de RelatorioAgendado: os dados já calculados
+    (o mesmo JSON que a rota ao vivo devolve) e o período resolvido."""
+    __tablename__ = 'snapshot_relatorio'
+    __table_args__ = (db.Index('idx_snapshot_relatorio_gerado', 'relatorio_id', 'gerado_em'),)
+    id = db.Column(db.Integer, primary_key=True)
+    relatorio_id = db.Column(db.Integer, db.ForeignKey('relatorio_agendado.id', ondelete='CASCADE'),
+                             nullable=False)
+    gerado_em = db.Column(db.String(100), nullable=False)
+    data_inicio = db.Column(db.String(10))
+    data_fim = db.Column(db.String(10))
+    duracao_ms = db.Column(db.Integer)
+    dados = db.Column(db.JSON, nullable=False)
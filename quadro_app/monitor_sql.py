@@ -0,0 +1,109 @@
+# quadro_app/monitor_sql.py
+"""Contagem de queries SQL por requisição.
+
+Cada requisição HTTP ganha um contador de queries e do tempo gasto no banco
+(listeners before/after_cursor_execute do SQLAlchemy). Os números saem no
+header Server-Timing (visível na aba Network do navegador) e são comparados
+com o orçamento da rota:
+
+    @orcamento_sql(5)
+    def minha_rota(): ...
+
+Rotas sem orçamento próprio usam SQL_ORCAMENTO_PADRAO. Estourar o orçamento,
+ou repetir o mesmo SQL mais de SQL_LIMITE_REPETICAO vezes (sinal típico de
+N+1), gera um aviso no console. Com app.testing (ou SQL_ORCAMENTO_ESTRITO)
+o estouro levanta OrcamentoSQLExcedido, fazendo o teste falhar.
+"""
+import time
+from collections import Counter
+from functools import wraps
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class OrcamentoSQLExcedido(AssertionError):
+    """A rota executou mais queries do que o orçamento permite."""
+
+
+def orcamento_sql(max_queries):
+    """Define o número máximo de queries esperado para a rota."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            return f(*args, **kwargs)
+        decorated.orcamento_sql = max_queries
+        return decorated
+    return decorator
+
+
+def _antes_cursor(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_sql_inicio', []).append(time.perf_counter())
+
+
+def _depois_cursor(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info['_sql_inicio'].pop()
+    if not has_request_context() or '_sql_queries' not in g:
+        return
+    g._sql_queries += 1
+    g._sql_tempo += time.perf_counter() - inicio
+    g._sql_statements[statement] += 1
+
+
+def _erro_cursor(exception_context):
+    # Query que falhou não passa pelo after_cursor_execute: descarta o início.
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('_sql_inicio'):
+        conn.info['_sql_inicio'].pop()
+
+
+def _iniciar_contagem():
+    g._sql_inicio_req = time.perf_counter()
+    g._sql_queries = 0
+    g._sql_tempo = 0.0
+    g._sql_statements = Counter()
+
+
+def _orcamento_da_rota(app):
+    view = app.view_functions.get(request.endpoint) if request.endpoint else None
+    orcamento = getattr(view, 'orcamento_sql', None)
+    return orcamento if orcamento is not None else app.config.get('SQL_ORCAMENTO_PADRAO')
+
+
+def _finalizar_contagem(response):
+    if '_sql_queries' not in g:
+        return response
+    app = current_app
+    total_ms = (time.perf_counter() - g._sql_inicio_req) * 1000
+    db_ms = g._sql_tempo * 1000
+    response.headers.add(
+        'Server-Timing',
+        f'db;desc="{g._sql_queries} queries";dur={db_ms:.1f}, app;dur={total_ms:.1f}'
+    )
+
+    rota = f"{request.method} {request.path}"
+    limite_rep = app.config.get('SQL_LIMITE_REPETICAO')
+    if limite_rep:
+        repetidas = [(sql, n) for sql, n in g._sql_statements.items() if n > limite_rep]
+        for sql, n in repetidas:
+            print(f"[monitor_sql] possível N+1 em {rota}: {n}x {' '.join(sql.split())[:120]}")
+
+    orcamento = _orcamento_da_rota(app)
+    if orcamento is not None and g._sql_queries > orcamento:
+        msg = f"{rota} executou {g._sql_queries} queries (orçamento: {orcamento})"
+        if app.testing or app.config.get('SQL_ORCAMENTO_ESTRITO'):
+            raise OrcamentoSQLExcedido(msg)
+        print(f"[monitor_sql] {msg}")
+    return response
+
+
+def init_monitor_sql(app):
+    app.config.setdefault('SQL_ORCAMENTO_PADRAO', 50)
+    app.config.setdefault('SQL_LIMITE_REPETICAO', 10)
+    app.config.setdefault('SQL_ORCAMENTO_ESTRITO', False)
+    if not event.contains(Engine, 'before_cursor_execute', _antes_cursor):
+        event.listen(Engine, 'before_cursor_execute', _antes_cursor)
+        event.listen(Engine, 'after_cursor_execute', _depois_cursor)
+        event.listen(Engine, 'handle_error', _erro_cursor)
+    app.before_request(_iniciar_contagem)
+    app.after_request(_finalizar_contagem)
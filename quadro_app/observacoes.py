@@ -0,0 +1,216 @@
+# quadro_app/observacoes.py
+"""Observações das conferências e separações e acompanhamentos das garantias.
+
+As notas ficavam em colunas JSON (Conferencia.observacoes,
+Separacao.observacoes, Garantia.acompanhamento): cada nota nova regravava a
+lista inteira e qualquer listagem carregava todas elas. Agora cada nota é uma
+linha da tabela 'observacao' (ver models.Observacao):
+
+    - adicionar() é um único INSERT (o seq é calculado no próprio INSERT);
+    - as listagens usam resumos(): quantidade + última nota de vários itens
+      numa consulta só; a lista completa (listar()) só é lida no detalhe;
+    - editar() guarda o texto anterior em observacao_edicao;
+    - excluir() só marca a nota como excluída.
+
+As colunas JSON continuam no modelo por dois motivos: a migração dos bancos
+antigos (migrar_observacoes_json, chamada no create_app) e a lixeira, cujo
+snapshot leva as notas (excluídas e histórico de edições inclusive) na própria
+coluna; importar_json() as devolve para a tabela quando o item é restaurado.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+
+from .extensions import db, tz_cuiaba
+from .models import Conferencia, Separacao, Garantia, Observacao, ObservacaoEdicao
+
+# entidade -> (modelo, coluna JSON legada)
+ENTIDADES = {
+    'conferencia': (Conferencia, 'observacoes'),
+    'separacao': (Separacao, 'observacoes'),
+    'garantia': (Garantia, 'acompanhamento'),
+}
+_ENTIDADE_POR_MODELO = {modelo: nome for nome, (modelo, _) in ENTIDADES.items()}
+
+
+def _agora():
+    return datetime.now(tz_cuiaba).isoformat()
+
+
+def serialize_observacao(o):
+    return {
+        'seq': o.seq,
+        'texto': o.texto,
+        'autor': o.autor,
+        'role': o.role,
+        'timestamp': o.timestamp,
+        'editado_em': o.editado_em,
+        'editado_por': o.editado_por,
+    }
+
+
+def _ativas(entidade):
+    return Observacao.query.filter(Observacao.entidade == entidade,
+                                   Observacao.excluida_em.is_(None))
+
+
+def _proximo_seq(entidade, entidade_id):
+    return (select(func.coalesce(func.max(Observacao.seq), 0) + 1)
+            .where(Observacao.entidade == entidade, Observacao.entidade_id == entidade_id)
+            .scalar_subquery())
+
+
+def adicionar(entidade, entidade_id, texto, autor, role=None, timestamp=None):
+    """Acrescenta uma nota (sem commit). O seq sai do próprio INSERT, então
+    duas notas simultâneas na mesma entidade não disputam o mesmo número."""
+    nota = Observacao(
+        entidade=entidade, entidade_id=entidade_id, seq=_proximo_seq(entidade, entidade_id),
+        texto=texto, autor=autor, role=role, timestamp=timestamp or _agora(),
+    )
+    db.session.add(nota)
+    db.session.flush()
+    return nota
+
+
+def listar(entidade, entidade_id):
+    """Notas da entidade (sem as excluídas), da mais antiga para a mais nova."""
+    notas = _ativas(entidade).filter(Observacao.entidade_id == entidade_id)\
+                             .order_by(Observacao.seq).all()
+    return [serialize_observacao(o) for o in notas]
+
+
+def buscar(entidade, entidade_id, seq):
+    return _ativas(entidade).filter(Observacao.entidade_id == entidade_id,
+                                    Observacao.seq == seq).first()
+
+
+def editar(nota, texto, editor_nome):
+    """Troca o texto da nota, guardando o anterior no histórico (sem commit)."""
+    agora = _agora()
+    db.session.add(ObservacaoEdicao(observacao_id=nota.id, texto_anterior=nota.texto,
+                                    editado_por=editor_nome, editado_em=agora))
+    nota.texto = texto
+    nota.editado_em = agora
+    nota.editado_por = editor_nome
+
+
+def excluir(nota, editor_nome):
+    nota.excluida_em = _agora()
+    nota.excluida_por = editor_nome
+
+
+def historico_edicoes(nota):
+    edicoes = ObservacaoEdicao.query.filter_by(observacao_id=nota.id)\
+                                    .order_by(ObservacaoEdicao.id).all()
+    return [{'texto_anterior': e.texto_anterior, 'editado_por': e.editado_por,
+             'editado_em': e.editado_em} for e in edicoes]
+
+
+def resumos(entidade, ids):
+    """{entidade_id: {'qtd': n, 'ultima': nota | None}} para todos os ids, numa
+    consulta: a contagem agrupada e a nota de maior seq saem do índice
+    (entidade, entidade_id, seq)."""
+    ids = [i for i in set(ids) if i is not None]
+    resultado = {i: {'qtd': 0, 'ultima': None} for i in ids}
+    if not ids:
+        return resultado
+    contagem = (
+        db.session.query(Observacao.entidade_id.label('entidade_id'),
+                         func.count().label('qtd'),
+                         func.max(Observacao.seq).label('ultimo_seq'))
+        .filter(Observacao.entidade == entidade, Observacao.entidade_id.in_(ids),
+                Observacao.excluida_em.is_(None))
+        .group_by(Observacao.entidade_id)
+        .subquery()
+    )
+    linhas = (
+        db.session.query(Observacao, contagem.c.qtd)
+        .join(contagem, (Observacao.entidade_id == contagem.c.entidade_id)
+              & (Observacao.seq == contagem.c.ultimo_seq))
+        .filter(Observacao.entidade == entidade)
+        .all()
+    )
+    for nota, qtd in linhas:
+        resultado[nota.entidade_id] = {'qtd': qtd, 'ultima': serialize_observacao(nota)}
+    return resultado
+
+
+def remover_da_entidade(entidade, entidade_id):
+    """Apaga as notas de uma entidade que vai para a lixeira e devolve a lista
+    para o snapshot (sem commit). Vão todas, inclusive as excluídas (com
+    excluida_em/excluida_por), cada uma com o 'historico' de edições: na
+    restauração, importar_json() recria as notas e o histórico como estavam."""
+    notas = Observacao.query.filter_by(entidade=entidade, entidade_id=entidade_id)\
+                            .order_by(Observacao.seq).all()
+    edicoes = {}
+    if notas:
+        for e in ObservacaoEdicao.query.filter(ObservacaoEdicao.observacao_id.in_([n.id for n in notas]))\
+                                       .order_by(ObservacaoEdicao.id):
+            edicoes.setdefault(e.observacao_id, []).append(
+                {'texto_anterior': e.texto_anterior, 'editado_por': e.editado_por,
+                 'editado_em': e.editado_em})
+    snapshot = []
+    for n in notas:
+        item = {k: v for k, v in serialize_observacao(n).items() if k != 'seq'}
+        if n.excluida_em:
+            item['excluida_em'] = n.excluida_em
+            item['excluida_por'] = n.excluida_por
+        if n.id in edicoes:
+            item['historico'] = edicoes[n.id]
+        snapshot.append(item)
+    ids = select(Observacao.id).where(Observacao.entidade == entidade,
+                                      Observacao.entidade_id == entidade_id)
+    ObservacaoEdicao.query.filter(ObservacaoEdicao.observacao_id.in_(ids))\
+                          .delete(synchronize_session=False)
+    Observacao.query.filter_by(entidade=entidade, entidade_id=entidade_id)\
+                    .delete(synchronize_session=False)
+    return snapshot
+
+
+def importar_json(obj):
+    """Move as notas da coluna JSON legada de obj para a tabela (sem commit).
+    obj precisa já ter id (flush feito). Retorna quantas notas foram movidas.
+    Notas vindas da lixeira podem trazer excluida_em/excluida_por e o
+    'historico' de edições, que volta para observacao_edicao."""
+    entidade = _ENTIDADE_POR_MODELO.get(type(obj))
+    if entidade is None:
+        return 0
+    coluna = ENTIDADES[entidade][1]
+    entradas = [e for e in (getattr(obj, coluna) or []) if isinstance(e, dict)]
+    if entradas:
+        base = db.session.query(func.coalesce(func.max(Observacao.seq), 0))\
+                         .filter_by(entidade=entidade, entidade_id=obj.id).scalar()
+        db.session.execute(insert(Observacao), [{
+            'entidade': entidade, 'entidade_id': obj.id, 'seq': base + n,
+            'texto': e.get('texto'), 'autor': e.get('autor'), 'role': e.get('role'),
+            'timestamp': e.get('timestamp'),
+            'editado_em': e.get('editado_em'), 'editado_por': e.get('editado_por'),
+            'excluida_em': e.get('excluida_em'), 'excluida_por': e.get('excluida_por'),
+        } for n, e in enumerate(entradas, start=1)])
+        historicos = {base + n: e['historico'] for n, e in enumerate(entradas, start=1)
+                      if e.get('historico')}
+        if historicos:
+            ids = dict(db.session.query(Observacao.seq, Observacao.id)
+                       .filter(Observacao.entidade == entidade, Observacao.entidade_id == obj.id,
+                               Observacao.seq.in_(historicos)))
+            db.session.execute(insert(ObservacaoEdicao), [{
+                'observacao_id': ids[seq], 'texto_anterior': h.get('texto_anterior'),
+                'editado_por': h.get('editado_por'), 'editado_em': h.get('editado_em'),
+            } for seq, lista in historicos.items() for h in lista])
+    setattr(obj, coluna, None)
+    return len(entradas)
+
+
+def migrar_observacoes_json():
+    """Bancos anteriores à tabela 'observacao': copia as listas JSON para a
+    tabela e limpa a coluna. Só toca as linhas que ainda têm lista, então
+    roda a cada inicialização sem custo depois da primeira."""
+    total = 0
+    for modelo, coluna in ENTIDADES.values():
+        campo = getattr(modelo, coluna)
+        pendentes = modelo.query.filter(campo.isnot(None), func.json_array_length(campo) > 0).all()
+        for obj in pendentes:
+            total += importar_json(obj)
+    if total:
+        db.session.commit()
+        print(f"[observacoes] {total} nota(s) migrada(s) das colunas JSON.")
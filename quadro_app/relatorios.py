@@ -0,0 +1,110 @@
+# quadro_app/relatorios.py
+"""Relatórios de texto (histórico de pedidos e registro de compras).
+
+As estatísticas vêm prontas do banco (GROUP BY por vendedor, comprador,
+fornecedor) e o texto é um template Jinja em templates/relatorios/. A mesma
+rota atende os três formatos pelo campo 'formato' do corpo:
+
+    (ausente) -> JSON {'relatorio': texto}, para a pré-visualização na tela;
+    'txt'     -> o template renderizado em streaming, como anexo .txt;
+    'csv'     -> as linhas de estatística em streaming, como anexo .csv.
+
+O download sai direto da consulta: o navegador não precisa reenviar o texto
+da pré-visualização para o servidor devolver como arquivo.
+
+PERIODOS/resolver_periodo atendem os relatórios agendados
+(blueprints/relatorios_agendados.py), que guardam períodos relativos.
+"""
+import csv
+import io
+from datetime import datetime, timedelta
+
+from flask import Response, jsonify, render_template, stream_template, stream_with_context
+
+from .extensions import tz_cuiaba
+
+FORMATOS_DOWNLOAD = ('txt', 'csv')
+
+# Períodos relativos dos relatórios agendados: viram dataInicio/dataFim
+# (YYYY-MM-DD) no dia em que o relatório é gerado.
+PERIODOS = {
+    'hoje': 'Hoje',
+    'ontem': 'Ontem',
+    'semana_atual': 'Esta semana',
+    'semana_passada': 'Semana passada',
+    'mes_atual': 'Este mês',
+    'mes_passado': 'Mês passado',
+    'ultimos_7_dias': 'Últimos 7 dias',
+    'ultimos_30_dias': 'Últimos 30 dias',
+}
+
+
+def resolver_periodo(periodo, hoje):
+    """(data_inicio, data_fim) do período relativo no dia 'hoje' (date).
+    Semanas começam na segunda-feira."""
+    if periodo == 'hoje':
+        inicio = fim = hoje
+    elif periodo == 'ontem':
+        inicio = fim = hoje - timedelta(days=1)
+    elif periodo == 'semana_atual':
+        inicio, fim = hoje - timedelta(days=hoje.weekday()), hoje
+    elif periodo == 'semana_passada':
+        fim = hoje - timedelta(days=hoje.weekday() + 1)
+        inicio = fim - timedelta(days=6)
+    elif periodo == 'mes_atual':
+        inicio, fim = hoje.replace(day=1), hoje
+    elif periodo == 'mes_passado':
+        fim = hoje.replace(day=1) - timedelta(days=1)
+        inicio = fim.replace(day=1)
+    elif periodo == 'ultimos_7_dias':
+        inicio, fim = hoje - timedelta(days=6), hoje
+    elif periodo == 'ultimos_30_dias':
+        inicio, fim = hoje - timedelta(days=29), hoje
+    else:
+        raise ValueError(f"Período desconhecido: {periodo}")
+    return inicio.isoformat(), fim.isoformat()
+
+
+def texto_periodo(filtros, separador='até', prefixo='De '):
+    """'Todo o período', 'A partir de X', 'Até Y' ou o intervalo."""
+    inicio, fim = filtros.get('dataInicio'), filtros.get('dataFim')
+    if inicio and fim:
+        return f"{prefixo}{inicio} {separador} {fim}"
+    if inicio:
+        return f"A partir de {inicio}"
+    if fim:
+        return f"Até {fim}"
+    return "Todo o período"
+
+
+def _linhas_csv(cabecalho, linhas):
+    """Gera o CSV linha a linha (';' como os outros CSVs, para o Excel PT-BR)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+    for linha in (cabecalho, *linhas):
+        escritor.writerow(linha)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def responder_relatorio(formato, template, prefixo_arquivo, cabecalho_csv, linhas_csv,
+                        gerado_em=None, **contexto):
+    """Resposta do relatório no formato pedido (ver docstring do módulo).
+    linhas_csv é um iterável de listas, consumido só no formato 'csv'.
+    gerado_em (datetime) é o momento dos dados; padrão: agora."""
+    agora = gerado_em or datetime.now(tz_cuiaba)
+    contexto['gerado_em'] = agora.strftime('%d/%m/%Y %H:%M:%S')
+    if formato not in FORMATOS_DOWNLOAD:
+        return jsonify({'relatorio': render_template(template, **contexto).strip()})
+
+    nome_arquivo = f"{prefixo_arquivo}_{agora.strftime('%Y-%m-%d')}.{formato}"
+    if formato == 'csv':
+        corpo, mimetype = stream_with_context(_linhas_csv(cabecalho_csv, linhas_csv)), 'text/csv'
+    else:
+        corpo, mimetype = stream_template(template, **contexto), 'text/plain'
+    return Response(
+        corpo,
+        mimetype=mimetype,
+        headers={"Content-disposition": f"attachment; filename={nome_arquivo}"}
+    )
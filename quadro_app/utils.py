@@ -34,9 +34,33 @@ def criar_notificacao(user_id, mensagem, link=None):
     except Exception as e:
         print(f"Erro ao criar notificação: {e}")
 
-def registrar_log(item_id, autor, acao, detalhes=None, log_type='pedidos'):
+def criar_notificacoes(destinos):
+    """Versão em lote de criar_notificacao: recebe [(user_id, mensagem, link)],
+    grava todas com um único commit e depois emite um 'nova_notificacao' por
+    notificação, na sala do destinatário (o front mostra uma de cada vez)."""
+    if not destinos:
+        return
+    try:
+        agora = datetime.now(tz_cuiaba).isoformat()
+        for user_id, mensagem, link in destinos:
+            db.session.add(Notificacao(
+                user_id=user_id, mensagem=mensagem, link=link,
+                lida=False, timestamp=agora
+            ))
+        db.session.commit()
+
+        from quadro_app import socketio
+        for user_id, mensagem, link in destinos:
+            socketio.emit('nova_notificacao', {'mensagem': mensagem, 'link': link}, room=user_id)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao criar notificações em lote: {e}")
+
+def registrar_log(item_id, autor, acao, detalhes=None, log_type='pedidos', commit=True):
     """
     Registra um log no banco de dados local (SQLite).
+    Com commit=False o log apenas entra na transação corrente (operações em
+    lote fazem um único commit no final).
     """
     try:
         novo_log = Log(
@@ -48,6 +72,8 @@ def registrar_log(item_id, autor, acao, detalhes=None, log_type='pedidos'):
             timestamp=datetime.now(tz_cuiaba).isoformat()
         )
         db.session.add(novo_log)
-        db.session.commit()
+        if commit:
+            db.session.commit()
     except Exception as e:
-        db.session.rollback()
\ No newline at end of file
+        if commit:
+            db.session.rollback()
\ No newline at end of file
@@ -37,6 +37,7 @@ export const separacoesAPI = {
     create: (dados) => apiCall('/api/separacoes', { method: 'POST', body: dados }),
     update: (id, dados) => apiCall(`/api/separacoes/${id}`, { method: 'PUT', body: dados }),
     updateStatus: (id, status) => apiCall(`/api/separacoes/${id}/status`, { method: 'PUT', body: { status, editor_nome: AppState.currentUser.nome } }),
+    updateStatusLote: (ids, status) => apiCall('/api/separacoes/status-lote', { method: 'PUT', body: { ids, status, editor_nome: AppState.currentUser.nome } }),
     addObservacao: (id, texto) => apiCall(`/api/separacoes/${id}/observacao`, { method: 'POST', body: { texto, autor: AppState.currentUser.nome, role: AppState.currentUser.role } }),
     getFila: () => apiCall('/api/separacoes/fila-separadores'),
     updateFila: (nomes) => apiCall('/api/separacoes/fila-separadores', { method: 'PUT', body: nomes })
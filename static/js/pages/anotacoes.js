@@ -163,17 +163,21 @@ function iniciarDragAndDrop() {
     });
 }
 
+// Ids dos vizinhos do item solto (null nas pontas): o servidor gera uma
+// posição entre as deles e só altera a linha do item movido.
+function vizinhos(item, seletor) {
+    const id = (el) => (el && el.matches(seletor) ? Number(el.dataset.cardId || el.dataset.colunaId) : null);
+    return { antes_id: id(item.previousElementSibling), depois_id: id(item.nextElementSibling) };
+}
+
 async function onCardSolto(evt) {
     arrastando = false;
     const cardId = Number(evt.item.dataset.cardId);
-    const destCont = evt.to;
-    const colunaId = Number(destCont.dataset.colunaId);
-    const ordem = Array.from(destCont.querySelectorAll('.kanban-card'))
-        .map(c => Number(c.dataset.cardId));
+    const colunaId = Number(evt.to.dataset.colunaId);
     try {
         await api('/api/anotacoes/cards/mover', {
             method: 'PUT',
-            body: JSON.stringify({ card_id: cardId, coluna_id: colunaId, ordem }),
+            body: JSON.stringify({ card_id: cardId, coluna_id: colunaId, ...vizinhos(evt.item, '.kanban-card') }),
         });
     } catch (e) {
         showToast(e.message, 'error');
@@ -181,14 +185,13 @@ async function onCardSolto(evt) {
     }
 }
 
-async function onColunaSolta() {
+async function onColunaSolta(evt) {
     arrastando = false;
-    const ordem = Array.from(el.board.querySelectorAll('.kanban-coluna'))
-        .map(c => Number(c.dataset.colunaId));
+    const colunaId = Number(evt.item.dataset.colunaId);
     try {
         await api('/api/anotacoes/colunas/ordem', {
             method: 'PUT',
-            body: JSON.stringify({ ordem }),
+            body: JSON.stringify({ coluna_id: colunaId, ...vizinhos(evt.item, '.kanban-coluna') }),
         });
     } catch (e) {
         showToast(e.message, 'error');
@@ -196,6 +199,36 @@ async function onColunaSolta() {
     }
 }
 
+// ---------------------------------------------------------------------------
+// Deltas em tempo real (movimentos de outros usuários e os próprios)
+// ---------------------------------------------------------------------------
+function porPosicao(a, b) {
+    if (a.posicao === b.posicao) return a.id - b.id;
+    return a.posicao < b.posicao ? -1 : 1;
+}
+
+function aplicarCardMovido({ id, coluna_id, posicao }) {
+    let card = null;
+    colunasCache.forEach(col => {
+        const i = col.cards.findIndex(c => c.id === id);
+        if (i >= 0) card = col.cards.splice(i, 1)[0];
+    });
+    const destino = colunasCache.find(c => c.id === coluna_id);
+    if (!card || !destino) return carregar();
+    Object.assign(card, { coluna_id, posicao });
+    destino.cards.push(card);
+    destino.cards.sort(porPosicao);
+    render();
+}
+
+function aplicarColunaMovida({ id, posicao }) {
+    const col = colunasCache.find(c => c.id === id);
+    if (!col) return carregar();
+    col.posicao = posicao;
+    colunasCache.sort(porPosicao);
+    render();
+}
+
 // ---------------------------------------------------------------------------
 // Carregamento
 // ---------------------------------------------------------------------------
@@ -386,6 +419,8 @@ export function initAnotacoesPage() {
     // Atualização em tempo real (outros usuários editando o quadro).
     if (AppState.socket) {
         AppState.socket.on('anotacoes_atualizado', carregar);
+        AppState.socket.on('anotacao_card_movido', aplicarCardMovido);
+        AppState.socket.on('anotacao_coluna_movida', aplicarColunaMovida);
     }
 
     carregar();
@@ -161,6 +161,7 @@ export function initConferenciasPage() {
         AppState.socket.off('conferencia_finalizada');
         AppState.socket.off('conferencia_editada');
         AppState.socket.off('conferencia_deletada');
+        AppState.socket.off('conferencias_lote');
 
         const refresh = () => fetchData();
 
@@ -169,6 +170,7 @@ export function initConferenciasPage() {
         AppState.socket.on('conferencia_finalizada', refresh);
         AppState.socket.on('conferencia_editada', refresh);
         AppState.socket.on('conferencia_deletada', refresh);
+        AppState.socket.on('conferencias_lote', refresh);
     }
 
     fetchData(); // Carga inicial
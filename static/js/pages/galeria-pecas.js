@@ -5,71 +5,160 @@ import { formatarData, showConfirmModal } from '../ui.js';
 
 const state = {
     filtro: 'pendentes',
+    campanhaId: '',
     items: [],
+    cursor: null,
+    temMais: true,
+    carregando: false,
 };
 
+const TAMANHO_PAGINA = 48;
+
 function els() {
     return {
         tabs: document.getElementById('galeria-tabs'),
+        campanha: document.getElementById('galeria-campanha'),
         grid: document.getElementById('galeria-grid'),
+        sentinela: document.getElementById('galeria-sentinela'),
         lightbox: document.getElementById('foto-lightbox-galeria'),
         lightboxImg: document.getElementById('foto-lightbox-galeria-img'),
     };
 }
 
-function urlPorFiltro() {
-    if (state.filtro === 'pendentes') return '/api/estoque/ajustes?com_foto=1&cadastrada_no_erp=0';
-    if (state.filtro === 'cadastradas') return '/api/estoque/ajustes?com_foto=1&cadastrada_no_erp=1';
-    return '/api/estoque/ajustes?com_foto=1';
+function urlPagina() {
+    const params = new URLSearchParams({ limit: TAMANHO_PAGINA });
+    if (state.filtro === 'pendentes') params.set('cadastrada_no_erp', '0');
+    if (state.filtro === 'cadastradas') params.set('cadastrada_no_erp', '1');
+    if (state.campanhaId) params.set('campanha_id', state.campanhaId);
+    if (state.cursor) params.set('cursor', state.cursor);
+    return `/api/estoque/galeria?${params}`;
+}
+
+function pertenceAoFiltro(item) {
+    if (state.filtro === 'pendentes' && item.foto_cadastrada_no_erp) return false;
+    if (state.filtro === 'cadastradas' && !item.foto_cadastrada_no_erp) return false;
+    if (state.campanhaId && item.campanha_id !== undefined && String(item.campanha_id) !== state.campanhaId) return false;
+    return true;
 }
 
-async function carregar() {
+/**
+ * Busca a próxima página (cursor). Com recarregar=true volta ao início,
+ * usado ao trocar de aba/campanha.
+ */
+async function carregar(recarregar = true) {
     const e = els();
-    e.grid.innerHTML = '<p class="empty-state">Carregando...</p>';
+    if (recarregar) {
+        state.items = [];
+        state.cursor = null;
+        state.temMais = true;
+        e.grid.innerHTML = '<p class="empty-state">Carregando...</p>';
+    }
+    if (state.carregando || !state.temMais) return;
+    state.carregando = true;
     try {
-        const res = await fetch(urlPorFiltro());
+        const res = await fetch(urlPagina());
         if (!res.ok) throw new Error('Falha ao carregar');
-        state.items = await res.json();
-        render();
+        const data = await res.json();
+        state.items.push(...data.itens);
+        state.cursor = data.proximo_cursor;
+        state.temMais = Boolean(data.proximo_cursor);
+        if (recarregar) render(); else anexar(data.itens);
     } catch (err) {
-        e.grid.innerHTML = `<p class="empty-state">Erro: ${err.message}</p>`;
+        if (recarregar) e.grid.innerHTML = `<p class="empty-state">Erro: ${err.message}</p>`;
+        else showToast(err.message, 'error');
+        state.temMais = false;
+    } finally {
+        state.carregando = false;
     }
 }
 
+function htmlCard(a) {
+    const acao = a.foto_cadastrada_no_erp
+        ? `<button class="btn btn--secondary btn--sm btn-desmarcar">Desmarcar</button>`
+        : `<button class="btn btn--primary btn--sm btn-marcar">Marcar cadastrada</button>`;
+    return `
+        <div class="galeria-card" data-id="${a.id}">
+            <img src="${a.thumb_url || a.foto_url}" class="galeria-card__img" loading="lazy" decoding="async" data-foto="${a.foto_url}" alt="Peça ${a.codigo}">
+            <div class="galeria-card__body">
+                <div class="galeria-card__codigo">${a.codigo}</div>
+                <div class="galeria-card__marca">${a.marca}</div>
+                <div class="galeria-card__meta">${formatarData(a.data_criacao)}</div>
+                <div class="galeria-card__meta">por ${a.criado_por}</div>
+                ${a.foto_cadastrada_no_erp ? `<div class="galeria-card__cadastrada">✓ cadastrada por ${a.foto_cadastrada_por || '—'}</div>` : ''}
+                <div class="galeria-card__actions">${acao}</div>
+            </div>
+        </div>
+    `;
+}
+
+function ligarCard(card) {
+    const id = parseInt(card.dataset.id);
+    card.querySelector('.galeria-card__img').addEventListener('click', (ev) => {
+        abrirLightbox(ev.currentTarget.dataset.foto);
+    });
+    card.querySelector('.btn-marcar')?.addEventListener('click', () => marcar(state.items.find(i => i.id === id)));
+    card.querySelector('.btn-desmarcar')?.addEventListener('click', () => desmarcar(state.items.find(i => i.id === id)));
+}
+
 function render() {
     const e = els();
     if (!state.items.length) {
         e.grid.innerHTML = '<p class="empty-state">Nenhuma foto neste filtro.</p>';
         return;
     }
-    e.grid.innerHTML = state.items.map(a => {
-        const acao = a.foto_cadastrada_no_erp
-            ? `<button class="btn btn--secondary btn--sm btn-desmarcar">Desmarcar</button>`
-            : `<button class="btn btn--primary btn--sm btn-marcar">Marcar cadastrada</button>`;
-        return `
-            <div class="galeria-card" data-id="${a.id}">
-                <img src="${a.foto_url}" class="galeria-card__img" data-foto="${a.foto_url}" alt="Peça ${a.codigo}">
-                <div class="galeria-card__body">
-                    <div class="galeria-card__codigo">${a.codigo}</div>
-                    <div class="galeria-card__marca">${a.marca}</div>
-                    <div class="galeria-card__meta">${formatarData(a.data_criacao)}</div>
-                    <div class="galeria-card__meta">por ${a.criado_por}</div>
-                    ${a.foto_cadastrada_no_erp ? `<div class="galeria-card__cadastrada">✓ cadastrada por ${a.foto_cadastrada_por || '—'}</div>` : ''}
-                    <div class="galeria-card__actions">${acao}</div>
-                </div>
-            </div>
-        `;
-    }).join('');
-
-    e.grid.querySelectorAll('.galeria-card').forEach(card => {
-        const id = parseInt(card.dataset.id);
-        const item = state.items.find(i => i.id === id);
-        card.querySelector('.galeria-card__img').addEventListener('click', (ev) => {
-            abrirLightbox(ev.currentTarget.dataset.foto);
-        });
-        card.querySelector('.btn-marcar')?.addEventListener('click', () => marcar(item));
-        card.querySelector('.btn-desmarcar')?.addEventListener('click', () => desmarcar(item));
-    });
+    e.grid.innerHTML = state.items.map(htmlCard).join('');
+    e.grid.querySelectorAll('.galeria-card').forEach(ligarCard);
+}
+
+function anexar(itens) {
+    const e = els();
+    e.grid.insertAdjacentHTML('beforeend', itens.map(htmlCard).join(''));
+    itens.forEach(a => ligarCard(e.grid.querySelector(`.galeria-card[data-id="${a.id}"]`)));
+}
+
+/**
+ * Aplica um ajuste alterado (socket ou marcar/desmarcar) sem recarregar as
+ * páginas já carregadas: troca o card, ou remove se saiu do filtro.
+ */
+function aplicarAlteracao(ajuste) {
+    const e = els();
+    const idx = state.items.findIndex(i => i.id === ajuste.id);
+    if (idx === -1) {
+        // Foto nova (acabou de ser processada): entra no topo, é a mais recente.
+        if (!ajuste.foto_url || !pertenceAoFiltro(ajuste)) return;
+        state.items.unshift(ajuste);
+        if (state.items.length === 1) { render(); return; }
+        e.grid.insertAdjacentHTML('afterbegin', htmlCard(ajuste));
+        ligarCard(e.grid.querySelector(`.galeria-card[data-id="${ajuste.id}"]`));
+        return;
+    }
+    const card = e.grid.querySelector(`.galeria-card[data-id="${ajuste.id}"]`);
+    if (!ajuste.foto_url || !pertenceAoFiltro(ajuste)) {
+        state.items.splice(idx, 1);
+        card?.remove();
+        if (!state.items.length) render();
+        return;
+    }
+    state.items[idx] = { ...state.items[idx], ...ajuste };
+    if (card) {
+        card.outerHTML = htmlCard(state.items[idx]);
+        ligarCard(e.grid.querySelector(`.galeria-card[data-id="${ajuste.id}"]`));
+    }
+}
+
+async function carregarCampanhas() {
+    const e = els();
+    if (!e.campanha) return;
+    try {
+        const res = await fetch('/api/estoque/campanhas');
+        if (!res.ok) return;
+        const campanhas = await res.json();
+        e.campanha.insertAdjacentHTML('beforeend', campanhas
+            .map(c => `<option value="${c.id}">${c.nome}${c.status === 'Ativa' ? '' : ' (finalizada)'}</option>`)
+            .join(''));
+    } catch (err) {
+        console.error('Erro ao carregar campanhas:', err);
+    }
 }
 
 function abrirLightbox(url) {
@@ -83,7 +172,7 @@ async function marcar(item) {
         const res = await fetch(`/api/estoque/ajustes/${item.id}/foto-cadastrada`, { method: 'POST' });
         if (!res.ok) throw new Error('Erro ao marcar');
         showToast('Marcada como cadastrada no ERP.', 'success');
-        carregar();
+        aplicarAlteracao((await res.json()).ajuste);
     } catch (e) {
         showToast(e.message, 'error');
     }
@@ -95,7 +184,7 @@ async function desmarcar(item) {
             const res = await fetch(`/api/estoque/ajustes/${item.id}/foto-cadastrada`, { method: 'DELETE' });
             if (!res.ok) throw new Error('Erro ao desmarcar');
             showToast('Desmarcada.', 'success');
-            carregar();
+            aplicarAlteracao((await res.json()).ajuste);
         } catch (e) {
             showToast(e.message, 'error');
         }
@@ -115,6 +204,18 @@ export function initGaleriaPecasPage() {
         });
     });
 
+    e.campanha?.addEventListener('change', () => {
+        state.campanhaId = e.campanha.value;
+        carregar();
+    });
+
+    // Próxima página quando o fim da grade chega perto da tela.
+    if (e.sentinela && 'IntersectionObserver' in window) {
+        new IntersectionObserver((entradas) => {
+            if (entradas.some(en => en.isIntersecting) && state.items.length) carregar(false);
+        }, { rootMargin: '600px' }).observe(e.sentinela);
+    }
+
     e.lightbox.addEventListener('click', () => {
         e.lightbox.style.display = 'none';
         e.lightboxImg.src = '';
@@ -122,8 +223,9 @@ export function initGaleriaPecasPage() {
 
     if (AppState.socket) {
         AppState.socket.off('ajuste_estoque_atualizado');
-        AppState.socket.on('ajuste_estoque_atualizado', () => carregar());
+        AppState.socket.on('ajuste_estoque_atualizado', aplicarAlteracao);
     }
 
+    carregarCampanhas();
     carregar();
 }
@@ -3,10 +3,13 @@ import { AppState } from '../state.js';
 import { showToast } from '../toasts.js';
 import { formatarData, toggleButtonLoading, showConfirmModal } from '../ui.js';
 
+const TAMANHO_PAGINA = 50;
+
 let elementos = {};
-let todos = [];
-let termoBusca = '';
-let filtroStatus = '';
+let todos = [];            // páginas já carregadas (sem a linha do tempo)
+let cursor = null;
+let carregando = false;
+let debounceFiltro = null;
 let podeReabrir = false;
 let podeExcluir = false;
 let garantiaAtual = null;
@@ -38,15 +41,8 @@ function badge(status) {
     return `<span class="gar-badge ${cls}">${escapeHtml(status)}</span>`;
 }
 
-function renderTabela(registros) {
+function anexarLinhas(registros) {
     const tbody = elementos.tbody;
-    tbody.innerHTML = '';
-
-    if (!registros || registros.length === 0) {
-        tbody.innerHTML = `<tr><td colspan="12" style="text-align:center; padding:2rem;">Nenhuma garantia finalizada encontrada.</td></tr>`;
-        return;
-    }
-
     registros.forEach(g => {
         const tr = document.createElement('tr');
         tr.innerHTML = `
@@ -71,41 +67,75 @@ function renderTabela(registros) {
     });
 }
 
-function aplicarFiltro() {
-    const q = termoBusca.trim().toLowerCase();
-    let lista = todos;
-    if (filtroStatus) lista = lista.filter(g => g.status === filtroStatus);
-    if (q) {
-        lista = lista.filter(g => {
-            const campos = [g.nome_cliente, g.codigo_peca, g.descricao_peca, g.marca, g.fornecedor, g.defeito, g.conclusao];
-            return campos.some(c => String(c || '').toLowerCase().includes(q));
-        });
-    }
-    renderTabela(lista);
+function urlPagina() {
+    const params = new URLSearchParams({ aba: 'finalizadas', limit: TAMANHO_PAGINA });
+    const filtros = {
+        status: elementos.filtro?.value,
+        cliente: elementos.cliente?.value.trim(),
+        fornecedor: elementos.fornecedor?.value.trim(),
+        codigo: elementos.codigo?.value.trim(),
+        data_inicio: elementos.dataInicio?.value,
+        data_fim: elementos.dataFim?.value,
+        ordenar: elementos.ordenar?.value,
+        cursor,
+    };
+    Object.entries(filtros).forEach(([k, v]) => { if (v) params.set(k, v); });
+    return `/api/garantias?${params}`;
 }
 
-async function carregar() {
-    elementos.spinner.style.display = 'block';
-    elementos.tabela.style.display = 'none';
+/**
+ * Busca a primeira página com os filtros atuais (recarregar=true) ou a
+ * próxima página a partir do cursor.
+ */
+async function carregar(recarregar = true) {
+    if (carregando) return;
+    carregando = true;
+    if (recarregar) {
+        cursor = null;
+        todos = [];
+        elementos.spinner.style.display = 'block';
+        elementos.tabela.style.display = 'none';
+    }
+    elementos.btnMais.style.display = 'none';
     try {
-        const res = await fetch('/api/garantias?aba=finalizadas');
+        const res = await fetch(urlPagina());
         if (!res.ok) throw new Error('Falha ao carregar.');
         const data = await res.json();
         podeReabrir = !!data.pode_reabrir;
         podeExcluir = !!data.pode_reabrir; // mesma permissão da aba de finalizadas
-        todos = data.registros || [];
-        aplicarFiltro();
+        if (recarregar) elementos.tbody.innerHTML = '';
+        todos.push(...data.registros);
+        anexarLinhas(data.registros);
+        if (todos.length === 0) {
+            elementos.tbody.innerHTML = `<tr><td colspan="12" style="text-align:center; padding:2rem;">Nenhuma garantia finalizada encontrada.</td></tr>`;
+        }
+        cursor = data.proximo_cursor;
+        elementos.btnMais.style.display = cursor ? 'block' : 'none';
     } catch (e) {
         showToast('Não foi possível carregar as garantias finalizadas.', 'error');
     } finally {
+        carregando = false;
         elementos.spinner.style.display = 'none';
         elementos.tabela.style.display = 'table';
     }
 }
 
-function abrirModal(id) {
-    const g = todos.find(x => x.id === Number(id));
-    if (!g) return;
+function filtrarComAtraso() {
+    clearTimeout(debounceFiltro);
+    debounceFiltro = setTimeout(() => carregar(), 300);
+}
+
+async function abrirModal(id) {
+    // A listagem não traz a linha do tempo: busca o processo completo.
+    let g;
+    try {
+        const res = await fetch(`/api/garantias/${id}`);
+        if (!res.ok) throw new Error();
+        g = await res.json();
+    } catch (e) {
+        showToast('Não foi possível carregar o processo.', 'error');
+        return;
+    }
     garantiaAtual = g;
 
     document.getElementById('garantia-fin-modal-title').textContent =
@@ -203,19 +233,23 @@ export async function initGarantiasFinalizadasPage() {
         tabela: document.getElementById('tabela-garantias-finalizadas'),
         tbody: document.getElementById('tabela-garantias-finalizadas-body'),
         spinner: document.getElementById('gf-loading-spinner'),
-        busca: document.getElementById('gf-busca'),
         filtro: document.getElementById('gf-filtro-status'),
+        cliente: document.getElementById('gf-filtro-cliente'),
+        fornecedor: document.getElementById('gf-filtro-fornecedor'),
+        codigo: document.getElementById('gf-filtro-codigo'),
+        dataInicio: document.getElementById('gf-filtro-data-inicio'),
+        dataFim: document.getElementById('gf-filtro-data-fim'),
+        ordenar: document.getElementById('gf-ordenar'),
+        btnMais: document.getElementById('btn-carregar-mais-gf'),
     };
     if (!elementos.tabela) return;
 
-    elementos.busca?.addEventListener('input', (e) => {
-        termoBusca = e.target.value;
-        aplicarFiltro();
-    });
-    elementos.filtro?.addEventListener('change', (e) => {
-        filtroStatus = e.target.value;
-        aplicarFiltro();
-    });
+    // Filtros consultados no servidor (a aba é paginada).
+    [elementos.cliente, elementos.fornecedor, elementos.codigo].forEach(inp =>
+        inp?.addEventListener('input', filtrarComAtraso));
+    [elementos.filtro, elementos.dataInicio, elementos.dataFim, elementos.ordenar].forEach(sel =>
+        sel?.addEventListener('change', () => carregar()));
+    elementos.btnMais.addEventListener('click', () => carregar(false));
 
     elementos.tbody.addEventListener('click', (e) => {
         const abrir = e.target.closest('[data-action="abrir"]');
@@ -232,7 +266,7 @@ export async function initGarantiasFinalizadasPage() {
     // setupAllModalCloseHandlers (ui.js).
 
     if (AppState.socket) {
-        AppState.socket.on('garantias_atualizado', carregar);
+        AppState.socket.on('garantias_atualizado', () => carregar());
     }
 
     carregar();
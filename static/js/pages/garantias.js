@@ -4,8 +4,9 @@ import { showToast } from '../toasts.js';
 import { formatarData, toggleButtonLoading, showConfirmModal } from '../ui.js';
 
 let elementos = {};
-let todos = [];          // cache dos registros pendentes
+let todos = [];          // cache dos registros pendentes (sem a linha do tempo)
 let termoBusca = '';
+let ordenacao = 'recentes';
 let podeEditar = false;
 let garantiaAtual = null; // registro aberto no modal
 
@@ -47,7 +48,7 @@ function renderTabela(registros) {
 
     registros.forEach(g => {
         const tr = document.createElement('tr');
-        const nAcomp = (g.acompanhamento || []).length;
+        const nAcomp = g.qtd_acompanhamentos ?? 0;
         tr.innerHTML = `
             <td><strong>${escapeHtml(g.nome_cliente)}</strong></td>
             <td>${escapeHtml(g.codigo_peca)}</td>
@@ -87,16 +88,16 @@ async function carregar() {
     elementos.spinner.style.display = 'block';
     elementos.tabela.style.display = 'none';
     try {
-        const res = await fetch('/api/garantias?aba=pendentes');
+        const res = await fetch(`/api/garantias?aba=pendentes&ordenar=${ordenacao}`);
         if (!res.ok) throw new Error('Falha ao carregar.');
         const data = await res.json();
         podeEditar = !!data.pode_editar;
         todos = data.registros || [];
         aplicarFiltro();
         // Mantém o modal sincronizado se estiver aberto.
-        if (garantiaAtual) {
-            const atualizado = todos.find(g => g.id === garantiaAtual.id);
-            if (atualizado) {
+        if (garantiaAtual && todos.some(g => g.id === garantiaAtual.id)) {
+            const atualizado = await buscarGarantia(garantiaAtual.id);
+            if (atualizado && garantiaAtual) {
                 garantiaAtual = atualizado;
                 renderTimeline(garantiaAtual);
                 renderMeta(garantiaAtual);
@@ -186,9 +187,21 @@ function abrirEdicao(id) {
     document.getElementById('garantia-edit-modal-overlay').style.display = 'flex';
 }
 
+// A listagem não traz a linha do tempo: o processo completo vem daqui.
+async function buscarGarantia(id) {
+    try {
+        const res = await fetch(`/api/garantias/${id}`);
+        if (!res.ok) throw new Error();
+        return await res.json();
+    } catch (e) {
+        showToast('Não foi possível carregar o processo.', 'error');
+        return null;
+    }
+}
+
 // --- Modal de acompanhamento + finalização ---
-function abrirAcompanhamento(id) {
-    const g = todos.find(x => x.id === Number(id));
+async function abrirAcompanhamento(id) {
+    const g = await buscarGarantia(id);
     if (!g) return;
     garantiaAtual = g;
 
@@ -222,21 +235,21 @@ function renderTimeline(g) {
         lista.innerHTML = `<li class="garantia-timeline-empty">Nenhum acompanhamento ainda.</li>`;
         return;
     }
-    // Mais recentes primeiro (mantém o índice original para a API).
+    // Mais recentes primeiro; a API identifica cada entrada pelo seq.
     lista.innerHTML = entradas
-        .map((e, i) => ({ e, i }))
+        .slice()
         .reverse()
-        .map(({ e, i }) => {
+        .map(e => {
             const editado = e.editado_em
                 ? ` <em>(editado por ${escapeHtml(e.editado_por || '')} em ${formatarData(e.editado_em)})</em>`
                 : '';
             const acoes = podeEditar
                 ? `<div class="garantia-timeline-acoes">
-                       <button class="btn-link" data-acomp-edit="${i}">Editar</button>
-                       <button class="btn-link btn-link--danger" data-acomp-del="${i}">Excluir</button>
+                       <button class="btn-link" data-acomp-edit="${e.seq}">Editar</button>
+                       <button class="btn-link btn-link--danger" data-acomp-del="${e.seq}">Excluir</button>
                    </div>`
                 : '';
-            return `<li class="garantia-timeline-item" data-idx="${i}">
+            return `<li class="garantia-timeline-item" data-seq="${e.seq}">
                 <div class="garantia-timeline-head">
                     <span class="garantia-timeline-autor">${escapeHtml(e.autor || 'N/A')}</span>
                     <span class="garantia-timeline-data">${formatarData(e.timestamp)}${editado}</span>
@@ -316,10 +329,10 @@ async function adicionarAcompanhamento(e) {
 }
 
 // Edição inline de um acompanhamento
-function editarAcompanhamentoInline(idx) {
-    const li = document.querySelector(`#acomp-lista .garantia-timeline-item[data-idx="${idx}"]`);
+function editarAcompanhamentoInline(seq) {
+    const li = document.querySelector(`#acomp-lista .garantia-timeline-item[data-seq="${seq}"]`);
     if (!li || !garantiaAtual) return;
-    const entrada = (garantiaAtual.acompanhamento || [])[idx];
+    const entrada = (garantiaAtual.acompanhamento || []).find(e => e.seq === seq);
     if (!entrada) return;
     const textoDiv = li.querySelector('.garantia-timeline-texto');
     const acoes = li.querySelector('.garantia-timeline-acoes');
@@ -327,19 +340,19 @@ function editarAcompanhamentoInline(idx) {
     textoDiv.innerHTML = `
         <textarea class="acomp-edit-area" rows="2">${escapeHtml(entrada.texto)}</textarea>
         <div class="garantia-timeline-acoes">
-            <button class="btn-link" data-acomp-save="${idx}">Salvar</button>
-            <button class="btn-link" data-acomp-cancel="${idx}">Cancelar</button>
+            <button class="btn-link" data-acomp-save="${seq}">Salvar</button>
+            <button class="btn-link" data-acomp-cancel="${seq}">Cancelar</button>
         </div>`;
     textoDiv.querySelector('textarea').focus();
 }
 
-async function salvarAcompanhamentoEdit(idx) {
-    const li = document.querySelector(`#acomp-lista .garantia-timeline-item[data-idx="${idx}"]`);
+async function salvarAcompanhamentoEdit(seq) {
+    const li = document.querySelector(`#acomp-lista .garantia-timeline-item[data-seq="${seq}"]`);
     const area = li?.querySelector('.acomp-edit-area');
     const texto = (area?.value || '').trim();
     if (!texto) { showToast('O texto não pode ficar vazio.', 'error'); return; }
     try {
-        const res = await fetch(`/api/garantias/${garantiaAtual.id}/acompanhamento/${idx}`, {
+        const res = await fetch(`/api/garantias/${garantiaAtual.id}/acompanhamento/${seq}`, {
             method: 'PUT',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ texto }),
@@ -357,10 +370,10 @@ async function salvarAcompanhamentoEdit(idx) {
     }
 }
 
-async function excluirAcompanhamento(idx) {
+async function excluirAcompanhamento(seq) {
     showConfirmModal('Excluir este acompanhamento?', async () => {
         try {
-            const res = await fetch(`/api/garantias/${garantiaAtual.id}/acompanhamento/${idx}`, { method: 'DELETE' });
+            const res = await fetch(`/api/garantias/${garantiaAtual.id}/acompanhamento/${seq}`, { method: 'DELETE' });
             if (!res.ok) throw new Error('Falha ao excluir.');
             const data = await res.json();
             garantiaAtual = data.registro;
@@ -416,6 +429,7 @@ export async function initGarantiasPage() {
         tbody: document.getElementById('tabela-garantias-body'),
         spinner: document.getElementById('g-loading-spinner'),
         busca: document.getElementById('g-busca'),
+        ordenar: document.getElementById('g-ordenar'),
         btnNova: document.getElementById('btn-nova-garantia'),
     };
     if (!elementos.tabela) return;
@@ -440,6 +454,11 @@ export async function initGarantiasPage() {
         aplicarFiltro();
     });
 
+    elementos.ordenar?.addEventListener('change', (e) => {
+        ordenacao = e.target.value;
+        carregar();
+    });
+
     // Ações na tabela.
     elementos.tbody.addEventListener('click', (e) => {
         const acomp = e.target.closest('[data-action="acompanhar"]');
@@ -230,12 +230,28 @@ async function confirmarMerge() {
     const radio = el.mergeOptions.querySelector('input[name="merge-target"]:checked');
     const para = el.mergeNovo.value.trim() || (radio ? radio.value : '');
     if (!para) return showToast('Escolha ou digite o nome correto.', 'error');
+    try {
+        // Pré-visualiza (dry-run) quantos registros serão alterados antes de gravar.
+        const previa = await api('/api/clientes/mesclar', {
+            method: 'PUT',
+            body: JSON.stringify({ nomes, para, dry_run: true }),
+        });
+        el.mergeOverlay.style.display = 'none';
+        showConfirmModal(
+            `Unificar ${nomes.length} nomes em "${para}"? ${previa.registros} registro(s) serão alterados.`,
+            () => executarMerge(nomes, para),
+        );
+    } catch (err) {
+        showToast(err.message, 'error');
+    }
+}
+
+async function executarMerge(nomes, para) {
     try {
         const r = await api('/api/clientes/mesclar', {
             method: 'PUT',
             body: JSON.stringify({ nomes, para, editor_nome: autor() }),
         });
-        el.mergeOverlay.style.display = 'none';
         selecionados.clear();
         atualizarBarraMerge();
         showToast(`${nomes.length} nomes unificados (${r.registros} separações).`, 'success');
@@ -191,7 +191,7 @@ export function initGerenciarPrioridadePage() {
         // Recarrega quando muda prioridade, inicia ou finaliza uma conferência,
         // ou quando chega um novo recebimento.
         ['prioridade_atualizada', 'conferencia_iniciada', 'conferencia_finalizada',
-         'novo_recebimento', 'conferencia_editada', 'conferencia_deletada']
+         'conferencias_lote', 'novo_recebimento', 'conferencia_editada', 'conferencia_deletada']
             .forEach(ev => AppState.socket.on(ev, carregar));
     }
 
@@ -671,6 +671,7 @@ export async function initGerenciarSeparacoesPage() {
         AppState.socket.off('separacao_atualizada');
         AppState.socket.off('separacao_deletada');
         AppState.socket.off('status_separacao_atualizado');
+        AppState.socket.off('status_separacoes_lote');
         AppState.socket.off('fila_separadores_atualizada');
 
         AppState.socket.on('nova_separacao', () => {
@@ -679,6 +680,7 @@ export async function initGerenciarSeparacoesPage() {
         });
         AppState.socket.on('separacao_atualizada', () => loadTableData(true));
         AppState.socket.on('status_separacao_atualizado', () => loadTableData(true));
+        AppState.socket.on('status_separacoes_lote', () => loadTableData(true));
         AppState.socket.on('separacao_deletada', () => loadTableData(true));
         AppState.socket.on('fila_separadores_atualizada', () => fetchAndRenderFila());
     }
@@ -12,8 +12,8 @@ let temMais = true;
 let filtrosAtuais = {};
 let elementos = {};
 
-// --- Lógica do Modal de Detalhes (sem alterações) ---
-function openDetailsModal(item) {
+// --- Lógica do Modal de Detalhes ---
+async function openDetailsModal(item) {
     const modalOverlay = document.getElementById('details-modal-overlay');
     const modalTitle = document.getElementById('details-modal-title');
     const modalBody = document.getElementById('details-modal-body');
@@ -35,10 +35,21 @@ function openDetailsModal(item) {
         </div>
     `;
 
-    if (item.observacoes && item.observacoes.length > 0) {
+    // O histórico não vem na listagem: busca o detalhe da conferência.
+    let observacoes = [];
+    if (item.qtd_observacoes) {
+        try {
+            const response = await fetch(`/api/conferencias/${item.id}`);
+            if (response.ok) observacoes = (await response.json()).observacoes || [];
+        } catch (error) {
+            console.error('Erro ao buscar observações:', error);
+        }
+    }
+
+    if (observacoes.length > 0) {
         detailsHTML += '<h4>Histórico de Ações</h4>';
         detailsHTML += '<div class="obs-log-container" style="max-height: 250px;">'; // Altura maior no modal
-        [...item.observacoes].reverse().forEach(obs => {
+        [...observacoes].reverse().forEach(obs => {
             detailsHTML += `<div class="obs-entry"><strong>${obs.autor}:</strong> ${obs.texto}<small>${formatarData(obs.timestamp)}</small></div>`;
         });
         detailsHTML += '</div>';
@@ -21,7 +21,10 @@ const estadoOrc = {
 
 // --- Elementos do DOM ---
 let quadroRua, quadroOrcamentos, formFiltros, btnLimpar, btnGerarRelatorio;
-let relatorioContainer, relatorioOutput, btnFecharRelatorio, btnSalvarRelatorio;
+let relatorioContainer, relatorioOutput, btnFecharRelatorio, btnSalvarRelatorio, btnSalvarRelatorioCSV;
+// Filtros do relatório exibido: o download (TXT/CSV) gera o arquivo no
+// servidor a partir deles, em vez de reenviar o texto da tela.
+let filtrosRelatorio = null;
 let btnCarregarMais, loadingSpinner;
 
 /**
@@ -157,6 +160,7 @@ async function gerarRelatorio() {
         const result = await response.json();
         if (!response.ok) throw new Error(result.error || 'Erro desconhecido no servidor.');
 
+        filtrosRelatorio = filtros;
         if (relatorioOutput) relatorioOutput.textContent = result.relatorio;
         if (relatorioContainer) relatorioContainer.style.display = 'block';
 
@@ -169,20 +173,17 @@ async function gerarRelatorio() {
     }
 }
 
-async function salvarRelatorio() {
-    const texto = relatorioOutput.textContent;
-    if (!texto) {
+async function salvarRelatorio(formato) {
+    if (!filtrosRelatorio) {
         showToast("Não há relatório para salvar.", "error");
         return;
     }
 
     try {
-        const response = await fetch('/api/download-relatorio', {
+        const response = await fetch('/api/relatorio', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'text/plain'
-            },
-            body: texto
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ...filtrosRelatorio, formato })
         });
 
         if (!response.ok) throw new Error('Falha ao gerar o arquivo no servidor.');
@@ -193,7 +194,7 @@ async function salvarRelatorio() {
         a.style.display = 'none';
         a.href = url;
 
-        let filename = `relatorio-${new Date().toISOString().split('T')[0]}.txt`;
+        let filename = `relatorio-${new Date().toISOString().split('T')[0]}.${formato}`;
         const contentDisposition = response.headers.get('content-disposition');
         if (contentDisposition && contentDisposition.indexOf('attachment') !== -1) {
             const matches = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/.exec(contentDisposition);
@@ -272,6 +273,7 @@ export function initHistoricoPage() {
     relatorioOutput = document.getElementById('relatorio-output');
     btnFecharRelatorio = document.getElementById('btn-fechar-relatorio');
     btnSalvarRelatorio = document.getElementById('btn-salvar-relatorio');
+    btnSalvarRelatorioCSV = document.getElementById('btn-salvar-relatorio-csv');
 
     const btnCSV = document.getElementById('btn-baixar-csv');
     if (btnCSV) {
@@ -308,7 +310,8 @@ export function initHistoricoPage() {
 
     if (btnGerarRelatorio) btnGerarRelatorio.addEventListener('click', gerarRelatorio);
     if (btnFecharRelatorio) btnFecharRelatorio.addEventListener('click', () => relatorioContainer.style.display = 'none');
-    if (btnSalvarRelatorio) btnSalvarRelatorio.addEventListener('click', salvarRelatorio);
+    if (btnSalvarRelatorio) btnSalvarRelatorio.addEventListener('click', () => salvarRelatorio('txt'));
+    if (btnSalvarRelatorioCSV) btnSalvarRelatorioCSV.addEventListener('click', () => salvarRelatorio('csv'));
 
     // Carrega a primeira página de dados ao entrar
     carregarTudo(true);
@@ -3,40 +3,35 @@ import { AppState } from '../state.js';
 import { showToast } from '../toasts.js';
 import { formatarData, showConfirmModal } from '../ui.js';
 
+const TAMANHO_PAGINA = 50;
+
 let allItems = [];
 let elements = {};
 let tipoAtivo = '';
+let cursor = null;
+let carregando = false;
+let debounceBusca = null;
+const selecionados = new Set();
 
-function getDescricaoPrincipal(item) {
-    const dados = item.dados_item;
-    switch (item.tipo_item) {
-        case 'Pedido':
-            return `Vendedor: ${dados.vendedor || 'N/A'} - Cód: ${dados.codigo || (dados.itens && dados.itens[0]?.codigo)}`;
-        case 'Sugestao':
-            return `Vendedor: ${dados.vendedor || 'N/A'} - Itens: ${dados.itens?.length || 0}`;
-        case 'Separacao':
-            return `Mov: ${dados.numero_movimentacao} - Cliente: ${dados.nome_cliente}`;
-        case 'Conferencia':
-            return `NF: ${dados.numero_nota_fiscal} - Fornecedor: ${dados.nome_fornecedor}`;
-        case 'Garantia':
-            return `Cliente: ${dados.nome_cliente || 'N/A'} - Cód: ${dados.codigo_peca || 'N/A'} (${dados.status || ''})`;
-        default:
-            return `ID Original: ${item.item_id_original}`;
-    }
-}
-
-function openDetailsModal(item) {
+async function openDetailsModal(item) {
     const modalOverlay = document.getElementById('details-modal-overlay');
     const modalTitle = document.getElementById('details-modal-title');
     const modalBody = document.getElementById('details-modal-body');
 
     modalTitle.textContent = `Detalhes do Item Excluído (Tipo: ${item.tipo_item})`;
-
-    // Formata o JSON para exibição
-    const formattedJson = JSON.stringify(item.dados_item, null, 2);
-    modalBody.innerHTML = `<pre style="background: var(--bg-muted); padding: 1rem; border-radius: 8px;">${formattedJson}</pre>`;
-
+    modalBody.innerHTML = '<div class="spinner" style="display: block; margin: 1rem auto;"></div>';
     modalOverlay.style.display = 'flex';
+
+    try {
+        // A listagem não traz o snapshot; busca só deste item.
+        const response = await fetch(`/api/lixeira/${item.id}`);
+        if (!response.ok) throw new Error('Falha ao buscar os dados do item.');
+        const completo = await response.json();
+        const formattedJson = JSON.stringify(completo.dados_item, null, 2);
+        modalBody.innerHTML = `<pre style="background: var(--bg-muted); padding: 1rem; border-radius: 8px;">${formattedJson}</pre>`;
+    } catch (error) {
+        modalBody.innerHTML = `<p style="color: var(--clr-danger);">${error.message}</p>`;
+    }
 }
 
 async function restaurarItem(itemId) {
@@ -62,82 +57,173 @@ async function restaurarItem(itemId) {
     });
 }
 
+function atualizarBarraLote() {
+    elements.contadorSelecao.textContent = `${selecionados.size} selecionado(s)`;
+    elements.barraLote.style.display = selecionados.size ? 'flex' : 'none';
+    elements.selecionarTodos.checked = allItems.length > 0 && selecionados.size === allItems.length;
+}
 
-function renderTable() {
-    const searchTerm = elements.filtroInput.value.toLowerCase().trim();
-    const filteredItems = allItems.filter(item => {
-        if (tipoAtivo && item.tipo_item !== tipoAtivo) return false;
-        if (!searchTerm) return true;
-        return item.tipo_item.toLowerCase().includes(searchTerm) ||
-            getDescricaoPrincipal(item).toLowerCase().includes(searchTerm) ||
-            item.excluido_por.toLowerCase().includes(searchTerm);
-    });
-
-    elements.tableBody.innerHTML = '';
-    if (filteredItems.length === 0) {
-        elements.tableBody.innerHTML = '<tr><td colspan="5">Nenhum item na lixeira.</td></tr>';
-        return;
+async function executarLote(url, mensagemSucesso) {
+    try {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ids: [...selecionados], editor_nome: AppState.currentUser.nome })
+        });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'Falha na operação em lote.');
+        const falhas = (data.resultados || []).filter(r => !r.ok);
+        showToast(mensagemSucesso(data), 'success');
+        falhas.forEach(f => showToast(`Item ${f.id}: ${f.error}`, 'error'));
+        await fetchAndRenderLixeira();
+    } catch (error) {
+        showToast(`Erro: ${error.message}`, 'error');
     }
+}
 
-    filteredItems.forEach(item => {
-        const tr = document.createElement('tr');
-        tr.innerHTML = `
-            <td>${item.tipo_item}</td>
-            <td>${getDescricaoPrincipal(item)}</td>
-            <td>${item.excluido_por}</td>
-            <td>${formatarData(item.data_exclusao)}</td>
-            <td class="actions-cell">
-               <button class="btn-action btn-details" data-id="${item.id}">Ver Dados</button>
-               <button class="btn-action btn-restore" data-id="${item.id}">Restaurar</button>
-            </td>`;
-        elements.tableBody.appendChild(tr);
-    });
+function restaurarSelecionados() {
+    showConfirmModal(`Restaurar ${selecionados.size} item(ns) para seus locais originais?`, () =>
+        executarLote('/api/lixeira/restaurar-lote',
+            data => `${data.resultados.filter(r => r.ok).length} item(ns) restaurado(s).`));
 }
 
-async function fetchAndRenderLixeira() {
-    elements.spinner.style.display = 'block';
-    elements.table.style.display = 'none';
+function expurgarSelecionados() {
+    showConfirmModal(`Excluir DEFINITIVAMENTE ${selecionados.size} item(ns)? Esta ação não pode ser desfeita.`, () =>
+        executarLote('/api/lixeira/expurgar-lote', data => `${data.removidos} item(ns) excluído(s) definitivamente.`));
+}
+
+function criarLinha(item) {
+    const tr = document.createElement('tr');
+    tr.innerHTML = `
+        <td><input type="checkbox" class="check-lote" data-id="${item.id}" ${selecionados.has(item.id) ? 'checked' : ''}></td>
+        <td>${item.tipo_item}</td>
+        <td>${item.resumo}</td>
+        <td>${item.excluido_por}</td>
+        <td>${formatarData(item.data_exclusao)}</td>
+        <td class="actions-cell">
+           <button class="btn-action btn-details" data-id="${item.id}">Ver Dados</button>
+           <button class="btn-action btn-restore" data-id="${item.id}">Restaurar</button>
+        </td>`;
+    return tr;
+}
+
+function urlPagina() {
+    const params = new URLSearchParams({ limit: TAMANHO_PAGINA });
+    const filtros = {
+        tipo: tipoAtivo,
+        q: elements.filtroInput.value.trim(),
+        autor: elements.filtroAutor?.value.trim(),
+        data_inicio: elements.filtroDataInicio?.value,
+        data_fim: elements.filtroDataFim?.value,
+        cursor,
+    };
+    Object.entries(filtros).forEach(([k, v]) => { if (v) params.set(k, v); });
+    return `/api/lixeira?${params}`;
+}
+
+/**
+ * Busca a primeira página com os filtros atuais (recarregar=true) ou a
+ * próxima página a partir do cursor.
+ */
+async function fetchAndRenderLixeira(recarregar = true) {
+    if (carregando) return;
+    carregando = true;
+    if (recarregar) {
+        cursor = null;
+        allItems = [];
+        selecionados.clear();
+        elements.spinner.style.display = 'block';
+        elements.table.style.display = 'none';
+    }
+    elements.btnMais.style.display = 'none';
 
     try {
-        const response = await fetch('/api/lixeira');
+        const response = await fetch(urlPagina());
         if (!response.ok) throw new Error('Falha ao buscar itens da lixeira.');
-        allItems = await response.json();
-        renderTable();
+        const data = await response.json();
+        if (recarregar) elements.tableBody.innerHTML = '';
+        allItems.push(...data.itens);
+        data.itens.forEach(item => elements.tableBody.appendChild(criarLinha(item)));
+        if (allItems.length === 0) {
+            elements.tableBody.innerHTML = '<tr><td colspan="6">Nenhum item na lixeira.</td></tr>';
+        }
+        cursor = data.proximo_cursor;
+        elements.btnMais.style.display = cursor ? 'block' : 'none';
+        atualizarBarraLote();
     } catch (error) {
         showToast(error.message, 'error');
-        elements.tableBody.innerHTML = '<tr><td colspan="5" style="color: var(--clr-danger);">Erro ao carregar dados.</td></tr>';
+        if (recarregar) {
+            elements.tableBody.innerHTML = '<tr><td colspan="6" style="color: var(--clr-danger);">Erro ao carregar dados.</td></tr>';
+        }
     } finally {
+        carregando = false;
         elements.spinner.style.display = 'none';
         elements.table.style.display = 'table';
     }
 }
 
+function buscarComAtraso() {
+    clearTimeout(debounceBusca);
+    debounceBusca = setTimeout(() => fetchAndRenderLixeira(), 300);
+}
+
 export function initLixeiraPage() {
     elements = {
         spinner: document.getElementById('loading-spinner-lixeira'),
         table: document.getElementById('tabela-lixeira'),
         tableBody: document.getElementById('tabela-lixeira-body'),
         filtroInput: document.getElementById('filtro-tabela-lixeira'),
+        filtroAutor: document.getElementById('filtro-autor-lixeira'),
+        filtroDataInicio: document.getElementById('filtro-data-inicio-lixeira'),
+        filtroDataFim: document.getElementById('filtro-data-fim-lixeira'),
         btnAtualizar: document.getElementById('btn-atualizar-lixeira'),
+        btnMais: document.getElementById('btn-carregar-mais-lixeira'),
+        barraLote: document.getElementById('barra-lote-lixeira'),
+        contadorSelecao: document.getElementById('contador-selecao-lixeira'),
+        selecionarTodos: document.getElementById('selecionar-todos-lixeira'),
     };
     if (!elements.tableBody) return;
 
-    elements.btnAtualizar.addEventListener('click', fetchAndRenderLixeira);
-    elements.filtroInput.addEventListener('input', renderTable);
+    elements.btnAtualizar.addEventListener('click', () => fetchAndRenderLixeira());
+    elements.btnMais.addEventListener('click', () => fetchAndRenderLixeira(false));
+    elements.filtroInput.addEventListener('input', buscarComAtraso);
+    elements.filtroAutor?.addEventListener('input', buscarComAtraso);
+    elements.filtroDataInicio?.addEventListener('change', () => fetchAndRenderLixeira());
+    elements.filtroDataFim?.addEventListener('change', () => fetchAndRenderLixeira());
 
     document.querySelectorAll('.filter-pill[data-tipo]').forEach(btn => {
         btn.addEventListener('click', () => {
             document.querySelectorAll('.filter-pill[data-tipo]').forEach(b => b.classList.remove('filter-pill--active'));
             btn.classList.add('filter-pill--active');
             tipoAtivo = btn.dataset.tipo;
-            renderTable();
+            fetchAndRenderLixeira();
         });
     });
 
+    elements.selecionarTodos.addEventListener('change', () => {
+        selecionados.clear();
+        if (elements.selecionarTodos.checked) allItems.forEach(i => selecionados.add(i.id));
+        elements.tableBody.querySelectorAll('.check-lote').forEach(cb => { cb.checked = elements.selecionarTodos.checked; });
+        atualizarBarraLote();
+    });
+    elements.tableBody.addEventListener('change', (e) => {
+        if (!e.target.classList.contains('check-lote')) return;
+        const id = parseInt(e.target.dataset.id);
+        if (e.target.checked) selecionados.add(id); else selecionados.delete(id);
+        atualizarBarraLote();
+    });
+    document.getElementById('btn-restaurar-lote-lixeira').addEventListener('click', restaurarSelecionados);
+    document.getElementById('btn-expurgar-lote-lixeira').addEventListener('click', expurgarSelecionados);
+
+    if (AppState.socket) {
+        AppState.socket.off('lixeira_lote');
+        AppState.socket.on('lixeira_lote', () => fetchAndRenderLixeira());
+    }
+
     elements.tableBody.addEventListener('click', (e) => {
         const target = e.target;
         const itemId = target.dataset.id;
-        if (!itemId) return;
+        if (!itemId || target.classList.contains('check-lote')) return;
 
         if (target.classList.contains('btn-details')) {
             const item = allItems.find(i => i.id == itemId);
@@ -148,4 +234,4 @@ export function initLixeiraPage() {
     });
 
     fetchAndRenderLixeira();
-}
\ No newline at end of file
+}
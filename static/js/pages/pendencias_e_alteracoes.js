@@ -20,13 +20,13 @@ function isObsSistema(texto) {
 }
 
 /** Renderiza UMA entrada de observação.
- *  indiceReal = posição na lista original (necessário para editar).
+ *  obs.seq identifica a observação na API (necessário para editar).
  *  editavel = mostra o lápis (apenas no modal, em obs comuns). */
-function renderObsEntry(obs, indiceReal, editavel) {
+function renderObsEntry(obs, editavel) {
     const lapis = (editavel && !isObsSistema(obs.texto))
-        ? `<button class="btn-icon btn-edit-obs" data-action="editar-obs" data-index="${indiceReal}" title="Editar observação"><img src="/static/edit.svg" alt="Editar"></button>`
+        ? `<button class="btn-icon btn-edit-obs" data-action="editar-obs" data-seq="${obs.seq}" title="Editar observação"><img src="/static/edit.svg" alt="Editar"></button>`
         : '';
-    return `<div class="obs-entry" data-index="${indiceReal}">`
+    return `<div class="obs-entry" data-seq="${obs.seq}">`
         + `<div class="obs-entry__head"><strong>${obs.autor}:</strong> <span class="obs-texto">${obs.texto}</span>${lapis}</div>`
         + `<small>${formatarData(obs.timestamp)}${obs.editado_em ? ' (editado)' : ''}</small>`
         + `</div>`;
@@ -56,15 +56,14 @@ function criarCardPendencia(item, tipo) {
         actions = `<button class="btn btn--secondary" data-action="resolver">Ver/Atualizar</button>`;
     }
 
+    // A listagem traz só a última observação; o histórico completo é
+    // buscado ao abrir o modal.
     let observacoesHTML = '';
-    if (item.observacoes) {
-        // Render do mais novo para o mais antigo, preservando o índice real.
+    if (item.ultima_observacao) {
+        const anteriores = item.qtd_observacoes - 1;
         observacoesHTML = '<div class="obs-log-container">'
-            + item.observacoes
-                .map((obs, i) => ({ obs, i }))
-                .reverse()
-                .map(({ obs, i }) => renderObsEntry(obs, i, false))
-                .join('')
+            + renderObsEntry(item.ultima_observacao, false)
+            + (anteriores > 0 ? `<small class="obs-anteriores">+ ${anteriores} observação(ões) anterior(es)</small>` : '')
             + '</div>';
     }
 
@@ -91,14 +90,25 @@ function criarCardPendencia(item, tipo) {
     return card;
 }
 
-/** Pinta o histórico de observações no container do modal (com lápis). */
-function pintarHistorico(item, histContainer) {
+/** Busca o histórico completo da conferência e pinta no container do modal
+ *  (mais novas primeiro, com lápis). */
+async function pintarHistorico(id, histContainer) {
+    histContainer.innerHTML = '<h4>Histórico de Ações:</h4><div class="spinner" style="display: block; margin: 1rem auto;"></div>';
+    let observacoes = [];
+    try {
+        const res = await fetch(`/api/conferencias/${id}`);
+        if (!res.ok) throw new Error();
+        observacoes = (await res.json()).observacoes || [];
+    } catch (e) {
+        histContainer.innerHTML = '<h4>Histórico de Ações:</h4><p>Não foi possível carregar as observações.</p>';
+        return;
+    }
     histContainer.innerHTML = '<h4>Histórico de Ações:</h4>';
-    if (item && item.observacoes && item.observacoes.length > 0) {
-        histContainer.innerHTML += item.observacoes
-            .map((obs, i) => ({ obs, i }))
+    if (observacoes.length > 0) {
+        histContainer.innerHTML += observacoes
+            .slice()
             .reverse()
-            .map(({ obs, i }) => renderObsEntry(obs, i, true))
+            .map(obs => renderObsEntry(obs, true))
             .join('');
     } else {
         histContainer.innerHTML += '<p>Nenhuma observação ainda.</p>';
@@ -109,22 +119,20 @@ function openResolverModal(item) {
     const modal = state.elementos.resolverModal;
     modal.form.dataset.id = item.id;
     modal.obsInput.value = '';
-    pintarHistorico(item, modal.form.querySelector('#historico-observacoes'));
+    pintarHistorico(item.id, modal.form.querySelector('#historico-observacoes'));
     modal.overlay.style.display = 'flex';
 }
 
 /** Após adicionar/editar uma observação, repinta o histórico no modal já
- *  aberto com o item atualizado (sem fechar/reabrir manualmente). */
+ *  aberto (sem fechar/reabrir manualmente). */
 function reabrirHistoricoAtual(id) {
-    const todos = [...(state.pend_fornecedor || []), ...(state.pend_alteracao || [])];
-    const item = todos.find(c => String(c.id) === String(id));
-    pintarHistorico(item, state.elementos.resolverModal.form.querySelector('#historico-observacoes'));
+    pintarHistorico(id, state.elementos.resolverModal.form.querySelector('#historico-observacoes'));
 }
 
 /** Transforma uma entrada de observação em modo de edição inline. */
 function iniciarEdicaoObs(entryEl) {
     if (!entryEl || entryEl.querySelector('.obs-edit-area')) return;
-    const indice = entryEl.dataset.index;
+    const seq = entryEl.dataset.seq;
     const textoAtual = entryEl.querySelector('.obs-texto')?.textContent || '';
     const head = entryEl.querySelector('.obs-entry__head');
 
@@ -151,7 +159,7 @@ function iniciarEdicaoObs(entryEl) {
         const saveBtn = editor.querySelector('.obs-edit-save');
         toggleButtonLoading(saveBtn, true, 'Salvando...');
         try {
-            const res = await fetch(`/api/conferencias/${id}/observacao/${indice}`, {
+            const res = await fetch(`/api/conferencias/${id}/observacao/${seq}`, {
                 method: 'PUT',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ texto: novo, autor: AppState.currentUser.nome })
@@ -278,14 +278,26 @@ async function handleRuaFormAction(actionType, event) {
 }
 
 // Abre o modal global de detalhes mostrando as observações (somente leitura).
-function openObsModal(item) {
+// A listagem só traz a contagem; as observações vêm do detalhe da conferência.
+async function openObsModal(item) {
     const overlay = document.getElementById('details-modal-overlay');
     const title = document.getElementById('details-modal-title');
     const body = document.getElementById('details-modal-body');
     if (!overlay || !body) return;
 
     title.textContent = `Observações — NF ${item.numero_nota_fiscal || ''}`;
-    const obs = item.observacoes || [];
+    body.innerHTML = '<div class="spinner" style="display: block; margin: 1rem auto;"></div>';
+    overlay.style.display = 'flex';
+
+    let obs = [];
+    try {
+        const response = await fetch(`/api/conferencias/${item.id}`);
+        if (!response.ok) throw new Error();
+        obs = (await response.json()).observacoes || [];
+    } catch (error) {
+        body.innerHTML = '<p style="color: var(--clr-danger);">Falha ao buscar as observações.</p>';
+        return;
+    }
 
     if (obs.length === 0) {
         body.innerHTML = '<p style="color: var(--text-muted);">Nenhuma observação registrada para este lançamento.</p>';
@@ -299,7 +311,6 @@ function openObsModal(item) {
             ).join('')
             + '</div>';
     }
-    overlay.style.display = 'flex';
 }
 
 // --- 4. Lógica de Carregamento e Renderização ---
@@ -324,7 +335,7 @@ function renderizarLinhas(listaRecebimentos, limpar = false) {
         let actionsHTML = '';
 
         // Botão de visualizar observação — disponível a todos (somente leitura).
-        const qtdObs = (item.observacoes || []).length;
+        const qtdObs = item.qtd_observacoes || 0;
         actionsHTML += `<button class="btn-action btn-ver-obs" data-id="${item.id}" title="Ver observações">👁${qtdObs ? ` ${qtdObs}` : ''}</button>`;
 
         const rolesPermitidasParaEdicao = ['Admin', 'Estoque', 'Recepção', 'Contabilidade'];
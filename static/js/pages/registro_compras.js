@@ -79,6 +79,9 @@ function aplicarFiltros() {
     renderizarLinhas(filtrados);
 }
 
+// Filtros do relatório exibido; os downloads são gerados a partir deles.
+let filtrosRelatorio = null;
+
 async function gerarRelatorio() {
     showToast("Gerando relatório analítico...", "info");
     const filtros = {
@@ -96,12 +99,30 @@ async function gerarRelatorio() {
             body: JSON.stringify(filtros)
         });
         const data = await res.json();
+        if (!res.ok) throw new Error(data.error);
+        filtrosRelatorio = filtros;
         elementos.relatorioOutput.textContent = data.relatorio;
         elementos.relatorioContainer.style.display = 'block';
         elementos.relatorioContainer.scrollIntoView({ behavior: 'smooth' });
     } catch (e) { showToast("Erro no relatório", "error"); }
 }
 
+async function baixarRelatorio(formato) {
+    if (!filtrosRelatorio) return;
+    try {
+        const res = await fetch('/api/registro-compras/relatorio', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ...filtrosRelatorio, formato })
+        });
+        if (!res.ok) throw new Error();
+        const blob = await res.blob();
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a'); a.href = url; a.download = `relatorio_compras.${formato}`; a.click();
+        window.URL.revokeObjectURL(url);
+    } catch (e) { showToast("Erro ao baixar o relatório", "error"); }
+}
+
 export function initRegistroComprasPage() {
     elementos = {
         btnBusca: document.getElementById('btn-abrir-modal-busca'),
@@ -190,13 +211,8 @@ export function initRegistroComprasPage() {
     });
 
     elementos.btnRelatorio.addEventListener('click', gerarRelatorio);
-    document.getElementById('btn-salvar-relatorio').addEventListener('click', async () => {
-        const texto = elementos.relatorioOutput.textContent;
-        const res = await fetch('/api/download-relatorio', { method: 'POST', headers: { 'Content-Type': 'text/plain' }, body: texto });
-        const blob = await res.blob();
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a'); a.href = url; a.download = `relatorio_compras.txt`; a.click();
-    });
+    document.getElementById('btn-salvar-relatorio').addEventListener('click', () => baixarRelatorio('txt'));
+    document.getElementById('btn-salvar-relatorio-csv').addEventListener('click', () => baixarRelatorio('csv'));
     document.getElementById('btn-fechar-relatorio').addEventListener('click', () => elementos.relatorioContainer.style.display = 'none');
 
     carregarCompradores();
@@ -362,7 +362,7 @@ function renderRecentes(els, ajustes) {
             : a.status === 'Ajustado' ? 'status-ajustado'
             : 'status-cancelado';
         const fotoHtml = a.foto_url
-            ? `<img src="${a.foto_url}" class="ajuste-thumb" alt="Foto">`
+            ? `<img src="${a.thumb_url || a.foto_url}" class="ajuste-thumb" loading="lazy" alt="Foto">`
             : '';
         return `
             <div class="ajuste-mini-card">
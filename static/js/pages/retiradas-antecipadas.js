@@ -3,11 +3,17 @@ import { AppState } from '../state.js';
 import { showToast } from '../toasts.js';
 import { formatarData, toggleButtonLoading, showConfirmModal } from '../ui.js';
 
+const TAMANHO_PAGINA_HISTORICO = 50;
+
 let elementos = {};
 let separadoresLista = [];
 let podeConferir = false;
 let separadorTag = null;
-let todosRegistros = [];   // cache dos registros para filtrar client-side
+let abertas = [];          // retiradas em aberto (lista completa; a busca filtra client-side)
+let historico = [];        // páginas já carregadas do histórico (conferidas)
+let cursorHistorico = null;
+let carregandoHistorico = false;
+let debounceHistorico = null;
 let termoBusca = '';
 
 // --- Tag input simples com autocomplete (seleção única) ---
@@ -79,7 +85,36 @@ function createSingleTagInput(container, getOptions) {
     };
 }
 
-// --- Render da tabela ---
+// --- Render das tabelas ---
+function criarLinha(r) {
+    const tr = document.createElement('tr');
+    if (r.conferido) tr.classList.add('retirada-ok');
+
+    const checkboxAttrs = podeConferir ? '' : 'disabled title="Você não tem permissão para conferir"';
+    // Editar: liberado para quem vê a página (Preencher).
+    // Excluir: restrito a quem pode conferir (+ Admin).
+    const acoesHTML =
+        `<button class="btn-action btn-edit" data-action="editar" data-id="${r.id}">Editar</button>`
+        + (podeConferir
+            ? `<button class="btn-action btn-delete btn-delete--icon" data-action="excluir" data-id="${r.id}" title="Excluir">X</button>`
+            : '');
+
+    tr.innerHTML = `
+        <td style="text-align:center;">
+            <input type="checkbox" class="retirada-check" data-id="${r.id}" ${r.conferido ? 'checked' : ''} ${checkboxAttrs}>
+        </td>
+        <td>${formatarDataSimples(r.data)}</td>
+        <td><strong>${r.codigo || ''}</strong></td>
+        <td>${r.marca || '-'}</td>
+        <td>${r.separador_nome || ''}</td>
+        <td style="text-align:center;">${r.quantidade ?? ''}</td>
+        <td>${r.numero_separacao || '-'}</td>
+        <td>${r.criado_por || '-'}</td>
+        <td><div class="actions-cell">${acoesHTML}</div></td>
+    `;
+    return tr;
+}
+
 function renderTabela(registros) {
     const tbody = elementos.tbody;
     tbody.innerHTML = '';
@@ -87,39 +122,11 @@ function renderTabela(registros) {
     if (!registros || registros.length === 0) {
         const msg = termoBusca.trim()
             ? 'Nenhuma retirada encontrada para a busca.'
-            : 'Nenhuma retirada registrada.';
+            : 'Nenhuma retirada em aberto.';
         tbody.innerHTML = `<tr><td colspan="9" style="text-align:center; padding:2rem;">${msg}</td></tr>`;
         return;
     }
-
-    registros.forEach(r => {
-        const tr = document.createElement('tr');
-        if (r.conferido) tr.classList.add('retirada-ok');
-
-        const checkboxAttrs = podeConferir ? '' : 'disabled title="Você não tem permissão para conferir"';
-        // Editar: liberado para quem vê a página (Preencher).
-        // Excluir: restrito a quem pode conferir (+ Admin).
-        const acoesHTML =
-            `<button class="btn-action btn-edit" data-action="editar" data-id="${r.id}">Editar</button>`
-            + (podeConferir
-                ? `<button class="btn-action btn-delete btn-delete--icon" data-action="excluir" data-id="${r.id}" title="Excluir">X</button>`
-                : '');
-
-        tr.innerHTML = `
-            <td style="text-align:center;">
-                <input type="checkbox" class="retirada-check" data-id="${r.id}" ${r.conferido ? 'checked' : ''} ${checkboxAttrs}>
-            </td>
-            <td>${formatarDataSimples(r.data)}</td>
-            <td><strong>${r.codigo || ''}</strong></td>
-            <td>${r.marca || '-'}</td>
-            <td>${r.separador_nome || ''}</td>
-            <td style="text-align:center;">${r.quantidade ?? ''}</td>
-            <td>${r.numero_separacao || '-'}</td>
-            <td>${r.criado_por || '-'}</td>
-            <td><div class="actions-cell">${acoesHTML}</div></td>
-        `;
-        tbody.appendChild(tr);
-    });
+    registros.forEach(r => tbody.appendChild(criarLinha(r)));
 }
 
 // Formata YYYY-MM-DD para DD/MM/YYYY sem depender de fuso.
@@ -130,12 +137,12 @@ function formatarDataSimples(data) {
     return data;
 }
 
-// Filtra os registros pelo termo de busca, varrendo todas as colunas.
+// Filtra as retiradas em aberto pelo termo de busca, varrendo todas as colunas.
 function aplicarFiltro() {
     const q = termoBusca.trim().toLowerCase();
-    if (!q) return renderTabela(todosRegistros);
+    if (!q) return renderTabela(abertas);
 
-    const filtrados = todosRegistros.filter(r => {
+    const filtrados = abertas.filter(r => {
         const campos = [
             r.data || '',
             formatarDataSimples(r.data),      // também busca no formato DD/MM/YYYY exibido
@@ -151,8 +158,12 @@ function aplicarFiltro() {
     renderTabela(filtrados);
 }
 
+function buscarRegistro(id) {
+    return abertas.find(r => r.id == id) || historico.find(r => r.id == id);
+}
+
 // --- API ---
-async function carregar() {
+async function carregarAbertas() {
     elementos.spinner.style.display = 'block';
     elementos.tabela.style.display = 'none';
     try {
@@ -160,7 +171,7 @@ async function carregar() {
         if (!res.ok) throw new Error('Falha ao carregar.');
         const data = await res.json();
         podeConferir = !!data.pode_conferir;
-        todosRegistros = data.registros || [];
+        abertas = data.abertas || [];
         aplicarFiltro();
     } catch (e) {
         showToast('Não foi possível carregar as retiradas.', 'error');
@@ -170,6 +181,56 @@ async function carregar() {
     }
 }
 
+function urlHistorico() {
+    const params = new URLSearchParams({ limit: TAMANHO_PAGINA_HISTORICO });
+    const filtros = {
+        data_inicio: elementos.histDataInicio.value,
+        data_fim: elementos.histDataFim.value,
+        separador: elementos.histSeparador.value,
+        codigo: elementos.histCodigo.value.trim(),
+        cursor: cursorHistorico,
+    };
+    Object.entries(filtros).forEach(([k, v]) => { if (v) params.set(k, v); });
+    return `/api/retiradas/historico?${params}`;
+}
+
+/**
+ * Busca a primeira página do histórico com os filtros atuais (recarregar=true)
+ * ou a próxima página a partir do cursor.
+ */
+async function carregarHistorico(recarregar = true) {
+    if (carregandoHistorico) return;
+    carregandoHistorico = true;
+    if (recarregar) {
+        cursorHistorico = null;
+        historico = [];
+    }
+    elementos.histBtnMais.style.display = 'none';
+    try {
+        const res = await fetch(urlHistorico());
+        if (!res.ok) throw new Error('Falha ao carregar.');
+        const data = await res.json();
+        if (recarregar) elementos.histTbody.innerHTML = '';
+        historico.push(...data.itens);
+        data.itens.forEach(r => elementos.histTbody.appendChild(criarLinha(r)));
+        if (historico.length === 0) {
+            elementos.histTbody.innerHTML = '<tr><td colspan="9" style="text-align:center; padding:2rem;">Nenhuma retirada conferida no período.</td></tr>';
+        }
+        cursorHistorico = data.proximo_cursor;
+        elementos.histBtnMais.style.display = cursorHistorico ? 'block' : 'none';
+    } catch (e) {
+        showToast('Não foi possível carregar o histórico.', 'error');
+    } finally {
+        carregandoHistorico = false;
+    }
+}
+
+async function carregar() {
+    // O histórico depende de pode_conferir (vem junto com as abertas).
+    await carregarAbertas();
+    carregarHistorico();
+}
+
 async function alternarConferido(id, valor) {
     try {
         const res = await fetch(`/api/retiradas/${id}/conferido`, {
@@ -181,14 +242,12 @@ async function alternarConferido(id, valor) {
             const err = await res.json();
             throw new Error(err.error || 'Falha ao atualizar.');
         }
-        // Atualiza só a linha (sem recarregar tudo).
-        const tr = elementos.tbody.querySelector(`.retirada-check[data-id="${id}"]`)?.closest('tr');
-        if (tr) tr.classList.toggle('retirada-ok', valor);
+        // A retirada muda de lista (aberta <-> histórico).
+        carregar();
     } catch (e) {
         showToast(e.message, 'error');
         // Reverte o checkbox visualmente.
-        const cb = elementos.tbody.querySelector(`.retirada-check[data-id="${id}"]`);
-        if (cb) cb.checked = !valor;
+        document.querySelectorAll(`.retirada-check[data-id="${id}"]`).forEach(cb => { cb.checked = !valor; });
     }
 }
 
@@ -209,25 +268,18 @@ async function excluir(id) {
 function abrirEdicao(id) {
     const overlay = document.getElementById('edit-retirada-modal-overlay');
     const form = document.getElementById('form-edit-retirada');
-    // Busca os dados atuais na linha renderizada (evita outra ida ao servidor).
-    const cb = elementos.tbody.querySelector(`.retirada-check[data-id="${id}"]`);
-    const tr = cb?.closest('tr');
-    if (!tr) return;
-    const cels = tr.querySelectorAll('td');
+    const r = buscarRegistro(id);
+    if (!r) return;
 
     form.dataset.id = id;
-    // data: converte DD/MM/YYYY de volta para YYYY-MM-DD.
-    const dataTxt = cels[1].textContent.trim();
-    const p = dataTxt.split('/');
-    document.getElementById('edit-ret-data').value = p.length === 3 ? `${p[2]}-${p[1]}-${p[0]}` : '';
-    document.getElementById('edit-ret-codigo').value = cels[2].textContent.trim();
-    document.getElementById('edit-ret-marca').value = cels[3].textContent.trim() === '-' ? '' : cels[3].textContent.trim();
-    document.getElementById('edit-ret-quantidade').value = cels[5].textContent.trim();
-    const numTxt = cels[6].textContent.trim();
-    document.getElementById('edit-ret-numero-separacao').value = numTxt === '-' ? '' : numTxt;
+    document.getElementById('edit-ret-data').value = (r.data || '').slice(0, 10);
+    document.getElementById('edit-ret-codigo').value = r.codigo || '';
+    document.getElementById('edit-ret-marca').value = r.marca || '';
+    document.getElementById('edit-ret-quantidade').value = r.quantidade ?? '';
+    document.getElementById('edit-ret-numero-separacao').value = r.numero_separacao || '';
 
     // Popula o select de separador com a lista + valor atual garantido.
-    const atual = cels[4].textContent.trim();
+    const atual = r.separador_nome || '';
     const opcoes = separadoresLista.includes(atual) ? separadoresLista : [atual, ...separadoresLista];
     const sel = document.getElementById('edit-ret-separador');
     sel.innerHTML = opcoes.map(n => `<option value="${n}" ${n === atual ? 'selected' : ''}>${n}</option>`).join('');
@@ -322,10 +374,16 @@ export async function initRetiradasAntecipadasPage() {
         tbody: document.getElementById('tabela-retiradas-body'),
         spinner: document.getElementById('ret-loading-spinner'),
         busca: document.getElementById('ret-busca'),
+        histTbody: document.getElementById('tabela-retiradas-historico-body'),
+        histDataInicio: document.getElementById('ret-hist-data-inicio'),
+        histDataFim: document.getElementById('ret-hist-data-fim'),
+        histSeparador: document.getElementById('ret-hist-separador'),
+        histCodigo: document.getElementById('ret-hist-codigo'),
+        histBtnMais: document.getElementById('btn-carregar-mais-retiradas'),
     };
     if (!elementos.form) return;
 
-    // Busca por todas as colunas (filtra os registros já carregados).
+    // Busca por todas as colunas (filtra as retiradas em aberto já carregadas).
     elementos.busca?.addEventListener('input', (e) => {
         termoBusca = e.target.value;
         aplicarFiltro();
@@ -342,20 +400,35 @@ export async function initRetiradasAntecipadasPage() {
         if (res.ok) separadoresLista = (await res.json()).filter(n => n.toLowerCase() !== 'separacao');
     } catch (e) { /* segue sem autocomplete */ }
 
+    elementos.histSeparador.innerHTML = '<option value="">Todos os separadores</option>'
+        + separadoresLista.map(n => `<option value="${n}">${n}</option>`).join('');
+
+    // Filtros do histórico (consultados no servidor).
+    elementos.histDataInicio.addEventListener('change', () => carregarHistorico());
+    elementos.histDataFim.addEventListener('change', () => carregarHistorico());
+    elementos.histSeparador.addEventListener('change', () => carregarHistorico());
+    elementos.histCodigo.addEventListener('input', () => {
+        clearTimeout(debounceHistorico);
+        debounceHistorico = setTimeout(() => carregarHistorico(), 300);
+    });
+    elementos.histBtnMais.addEventListener('click', () => carregarHistorico(false));
+
     separadorTag = createSingleTagInput(document.getElementById('ret-separador-tag'), () => separadoresLista);
 
     elementos.form.addEventListener('submit', onSubmit);
 
-    // Delegação: checkbox e excluir.
-    elementos.tbody.addEventListener('change', (e) => {
-        const cb = e.target.closest('.retirada-check');
-        if (cb && !cb.disabled) alternarConferido(cb.dataset.id, cb.checked);
-    });
-    elementos.tbody.addEventListener('click', (e) => {
-        const editBtn = e.target.closest('[data-action="editar"]');
-        if (editBtn) { abrirEdicao(editBtn.dataset.id); return; }
-        const delBtn = e.target.closest('[data-action="excluir"]');
-        if (delBtn) excluir(delBtn.dataset.id);
+    // Delegação: checkbox, editar e excluir (nas duas tabelas).
+    [elementos.tbody, elementos.histTbody].forEach(tbody => {
+        tbody.addEventListener('change', (e) => {
+            const cb = e.target.closest('.retirada-check');
+            if (cb && !cb.disabled) alternarConferido(cb.dataset.id, cb.checked);
+        });
+        tbody.addEventListener('click', (e) => {
+            const editBtn = e.target.closest('[data-action="editar"]');
+            if (editBtn) { abrirEdicao(editBtn.dataset.id); return; }
+            const delBtn = e.target.closest('[data-action="excluir"]');
+            if (delBtn) excluir(delBtn.dataset.id);
+        });
     });
 
     // Submit do modal de edição.
@@ -3,6 +3,7 @@ import { AppState } from '../state.js';
 import { showToast } from '../toasts.js';
 import { formatarData, showConfirmModal, openLogModal } from '../ui.js';
 import { attachAutocomplete } from '../autocomplete.js';
+import { separacoesAPI } from '../apiClient.js';
 
 let state = {};
 let debounceTimer;
@@ -33,16 +34,30 @@ function resetState() {
 }
 
 // --- FUNÇÕES DE MODAL (OBSERVAÇÃO COM HISTÓRICO) ---
-function openObservacaoModal(separacao) {
+async function openObservacaoModal(separacao) {
     const modal = state.elementos.obsModal;
     modal.form.dataset.id = separacao.id;
     modal.textoInput.value = '';
 
     const historicoContainer = document.getElementById('separacao-historico-observacoes');
     historicoContainer.innerHTML = '<h4>Histórico de Observações:</h4>';
+    modal.overlay.style.display = 'flex';
+    setTimeout(() => modal.textoInput.focus(), 100);
+
+    // Os cards só trazem a última observação; o histórico vem sob demanda.
+    let obsArray = [];
+    if (separacao.qtd_observacoes) {
+        try {
+            const response = await fetch(`/api/separacoes/${separacao.id}/observacoes`);
+            if (!response.ok) throw new Error();
+            obsArray = (await response.json()).reverse();
+        } catch (error) {
+            historicoContainer.innerHTML += '<p>Falha ao carregar as observações.</p>';
+            return;
+        }
+    }
 
-    if (separacao.observacoes && Object.keys(separacao.observacoes).length > 0) {
-        const obsArray = Object.values(separacao.observacoes).sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
+    if (obsArray.length > 0) {
         obsArray.forEach(obs => {
             const entry = document.createElement('div');
             entry.className = 'obs-entry';
@@ -57,9 +72,6 @@ function openObservacaoModal(separacao) {
     } else {
         historicoContainer.innerHTML += '<p>Nenhuma observação registrada.</p>';
     }
-
-    modal.overlay.style.display = 'flex';
-    setTimeout(() => modal.textoInput.focus(), 100);
 }
 
 // --- TAG INPUT COM AUTOCOMPLETE ---
@@ -268,8 +280,8 @@ function openEditModal(separacao) {
 // Assinatura do estado visível de uma separação. Se mudar, o card é
 // recriado; se for igual, o card no DOM é preservado (sem flicker).
 function assinaturaSeparacao(s) {
-    const obs = s.observacoes ? Object.values(s.observacoes).length : 0;
-    const ultimaObs = obs ? Object.values(s.observacoes).sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp))[0]?.timestamp : '';
+    const obs = s.qtd_observacoes || 0;
+    const ultimaObs = s.ultima_observacao?.timestamp;
     return [
         s.status,
         s.nome_cliente,
@@ -328,9 +340,8 @@ function criarCardElement(separacao) {
 
     // Barra de preview da última observação
     let obsPreviewHTML = '';
-    if (separacao.observacoes && Object.keys(separacao.observacoes).length > 0) {
-        const obsArray = Object.values(separacao.observacoes).sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-        const ultima = obsArray[0];
+    if (separacao.ultima_observacao) {
+        const ultima = separacao.ultima_observacao;
         obsPreviewHTML = `<div class="obs-preview" data-action="open-obs" title="${ultima.autor}: ${ultima.texto}">⚠ "${ultima.texto}" — ${ultima.autor}</div>`;
     }
 
@@ -391,6 +402,12 @@ function renderAtivas() {
 
     sincronizarColuna(state.elementos.quadroAndamento, andamento, 'Nenhuma separação ativa.');
     sincronizarColuna(state.elementos.quadroConferencia, conferencia, 'Nenhuma conferência ativa.');
+
+    // "Finalizar todas" age sobre as conferências visíveis (respeita o filtro).
+    const perms = AppState.currentUser.permissions || {};
+    const podeFinalizar = perms.pode_finalizar_separacao && AppState.currentUser.role !== 'Vendedor';
+    state.conferenciaVisivel = conferencia.map(s => s.id);
+    state.elementos.btnFinalizarConferencia.hidden = !podeFinalizar || conferencia.length === 0;
 }
 
 // Atualiza a coluna de forma incremental: mantém cards inalterados,
@@ -486,6 +503,21 @@ const handleFinalize = (id) => showConfirmModal('Finalizar esta separação?', a
     } catch (e) { showToast('Erro ao finalizar', 'error'); }
 });
 
+// Fim do turno: finaliza de uma vez as conferências visíveis (uma requisição,
+// um commit e um único evento de socket no servidor).
+const handleFinalizeAll = () => {
+    const ids = state.conferenciaVisivel || [];
+    if (!ids.length) return;
+    showConfirmModal(`Finalizar ${ids.length} separação(ões) em conferência?`, async () => {
+        try {
+            const { resultados } = await separacoesAPI.updateStatusLote(ids, 'Finalizado');
+            const falhas = resultados.filter(r => !r.ok).length;
+            showToast(falhas ? `${ids.length - falhas} finalizada(s), ${falhas} com erro` : 'Finalizadas!', falhas ? 'error' : 'success');
+            fetchActiveSeparacoes(); carregarFinalizados(true);
+        } catch (e) { showToast(e.message || 'Erro ao finalizar', 'error'); }
+    });
+};
+
 const handleReturnToConference = (id) => showConfirmModal('Retornar esta separação para a conferência?', async () => {
     try {
         const res = await fetch(`/api/separacoes/${id}/status`, { method: 'PUT', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ status: 'Em Conferência', editor_nome: AppState.currentUser.nome }) });
@@ -515,6 +547,7 @@ export async function initSeparacoesPage() {
         formSeparacao: document.getElementById('form-separacao'),
         quadroAndamento: document.getElementById('quadro-separacoes-andamento'),
         quadroConferencia: document.getElementById('quadro-separacoes-conferencia'),
+        btnFinalizarConferencia: document.getElementById('btn-finalizar-conferencia'),
         quadroFinalizadas: document.getElementById('quadro-separacoes-finalizadas'),
         filtroInput: document.getElementById('filtro-separacoes'),
         btnReload: document.getElementById('btn-reload-separacoes'),
@@ -580,6 +613,7 @@ export async function initSeparacoesPage() {
 
     // Listeners de Paginação
     state.elementos.btnCarregarMais.onclick = () => carregarFinalizados();
+    state.elementos.btnFinalizarConferencia.onclick = handleFinalizeAll;
 
     // Listener de Criação
     state.elementos.formSeparacao.onsubmit = async (e) => {
@@ -676,6 +710,7 @@ export async function initSeparacoesPage() {
         AppState.socket.off('separacao_atualizada');
         AppState.socket.off('separacao_deletada');
         AppState.socket.off('status_separacao_atualizado');
+        AppState.socket.off('status_separacoes_lote');
 
         // Quando alguém cria uma separação
         AppState.socket.on('nova_separacao', () => {
@@ -693,6 +728,12 @@ export async function initSeparacoesPage() {
             carregarFinalizados(true); // Recarrega a coluna de finalizados
         });
 
+        // Mudança de status em lote: um único evento para N separações
+        AppState.socket.on('status_separacoes_lote', () => {
+            fetchActiveSeparacoes();
+            carregarFinalizados(true);
+        });
+
         AppState.socket.on('separacao_deletada', () => {
             fetchActiveSeparacoes();
         });
@@ -68,7 +68,7 @@ export function initTvPrioridadePage() {
     carregar();
 
     if (AppState.socket) {
-        ['prioridade_atualizada', 'conferencia_iniciada', 'conferencia_finalizada',
+        ['prioridade_atualizada', 'conferencia_iniciada', 'conferencia_finalizada', 'conferencias_lote',
          'conferencia_editada', 'conferencia_deletada']
             .forEach(ev => AppState.socket.on(ev, carregar));
     }
@@ -20,24 +20,39 @@ function createTvCard(separacao) {
     return card;
 }
 
+// Estado local do painel: última versão recebida e as linhas por id.
+// O servidor responde só o que mudou desde 'versao' (modo since).
+const tvState = { versao: null, separacoes: new Map() };
+
 async function fetchAndRenderTvData() {
     try {
-        // 1. Busca as ativas (Separação e Conferência)
-        const resAtivas = await fetch('/api/separacoes/ativas');
-        const ativas = await resAtivas.json();
-
-        // 2. Busca as recentes finalizadas
-        const resFinalizadas = await fetch('/api/separacoes/recentes-finalizadas');
-        const finalizadas = await resFinalizadas.json();
-
-        // Filtra as ativas
-        const emSeparacao = ativas.filter(s => s.status === 'Em Separação');
-        const emConferencia = ativas.filter(s => s.status === 'Em Conferência');
+        const url = tvState.versao === null
+            ? '/api/tv/expedicao/snapshot'
+            : `/api/tv/expedicao/snapshot?since=${tvState.versao}`;
+        const res = await fetch(url);
+        const snap = await res.json();
+        if (snap.error) throw new Error(snap.error);
+
+        if (snap.completo) {
+            tvState.separacoes = new Map(snap.separacoes.map(s => [s.id, s]));
+        } else {
+            snap.alteradas.forEach(s => tvState.separacoes.set(s.id, s));
+            snap.removidas.forEach(id => tvState.separacoes.delete(id));
+            // Nada mudou: mantém o DOM como está.
+            if (snap.versao === tvState.versao) return;
+        }
+        tvState.versao = snap.versao;
+
+        const todas = [...tvState.separacoes.values()];
+        const emSeparacao = todas.filter(s => s.status === 'Em Separação');
+        const emConferencia = todas.filter(s => s.status === 'Em Conferência');
+        const finalizadas = todas.filter(s => s.status === 'Finalizado')
+            .sort((a, b) => (b.data_finalizacao || '').localeCompare(a.data_finalizacao || ''));
 
         // Renderiza as 3 colunas
         renderColumn('list-separacao', 'count-separacao', emSeparacao, 'desc'); // Mais novos primeiro
         renderColumn('list-conferencia', 'count-conferencia', emConferencia, 'asc'); // Mais antigos primeiro (prioridade)
-        renderColumn('list-finalizado', 'count-finalizado', finalizadas, 'none'); // Ordem do banco (já vem por data)
+        renderColumn('list-finalizado', 'count-finalizado', finalizadas, 'none'); // Já ordenadas por data de finalização
 
     } catch (error) {
         console.error("Erro ao atualizar TV:", error);
@@ -82,16 +97,11 @@ export function initTvExpedicaoPage() {
     fetchAndRenderTvData(); // Carga inicial
 
     if (AppState.socket) {
-        // A TV atualiza para QUALQUER evento logístico
-        const updateLogistics = () => {
-            console.log("Evento logístico detectado, atualizando painel...");
+        // Um único evento com as versões por domínio: só busca o diff quando
+        // a versão de 'separacoes' passou da que o painel já exibe.
+        AppState.socket.on('versoes_atualizadas', (versoes) => {
+            if (versoes.separacoes === undefined || versoes.separacoes === tvState.versao) return;
             fetchAndRenderTvData();
-        };
-
-        AppState.socket.on('nova_separacao', updateLogistics);
-        AppState.socket.on('separacao_atualizada', updateLogistics);
-        AppState.socket.on('status_separacao_atualizado', updateLogistics);
-        AppState.socket.on('conferencia_iniciada', updateLogistics);
-        AppState.socket.on('conferencia_finalizada', updateLogistics);
+        });
     }
-}
\ No newline at end of file
+}